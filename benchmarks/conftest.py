@@ -0,0 +1,127 @@
+import importlib
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, NamedTuple
+
+import pytest
+
+from hatanaka import compress
+from synthetic import make_obs
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CONTAINERS = ['gz', 'bz2', 'Z', 'zip', 'xz', 'none']
+# the containers that need optional dependencies are only benchmarked if these are installed
+for _compression, _module in [('zst', 'zstandard'), ('lz4', 'lz4.frame')]:
+    try:
+        importlib.import_module(_module)
+        CONTAINERS.insert(-1, _compression)
+    except ImportError:
+        pass
+
+_results = []
+
+
+class Dataset(NamedTuple):
+    version: int
+    rnx: Path
+    epochs: int
+    compressed: Dict[str, Path]
+
+    @property
+    def size(self):
+        return self.rnx.stat().st_size
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('hatanaka', 'synthetic RINEX files of the benchmarks')
+    group.addoption('--rinex-interval', type=float, default=1.0,
+                    help='observation interval in seconds (default: 1)')
+    group.addoption('--rinex-duration', type=float, default=900.0,
+                    help='time span of the files in seconds (default: 900)')
+    group.addoption('--rinex-nsat', type=int, default=32,
+                    help='number of satellites per epoch (default: 32)')
+    group.addoption('--rinex-ntypes', type=int, default=8,
+                    help='number of observation types per GNSS system (default: 8)')
+    group.addoption('--rinex-rounds', type=int, default=3,
+                    help='number of timed runs of each benchmark (default: 3)')
+
+
+@pytest.fixture(scope='session', params=[2, 3, 4], ids=lambda v: f'rinex{v}')
+def dataset(request, tmp_path_factory):
+    """A synthetic observation file of the given RINEX version and its compressed variants."""
+    opts = request.config.option
+    obs = make_obs(request.param, interval=opts.rinex_interval, duration=opts.rinex_duration,
+                   nsat=opts.rinex_nsat, ntypes=opts.rinex_ntypes)
+    root = tmp_path_factory.mktemp(f'rinex{request.param}')
+    rnx = root / 'synthetic.rnx'
+    rnx.write_bytes(obs.content)
+    crx = compress(obs.content, compression='none')
+    compressed = {}
+    for compression in CONTAINERS:
+        suffix = '' if compression == 'none' else '.' + compression
+        path = root / f'synthetic.crx{suffix}'
+        if compression == 'zip':
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+                z.writestr('synthetic.crx', crx)
+        else:
+            path.write_bytes(compress(obs.content, compression=compression))
+        compressed[compression] = path
+    return Dataset(request.param, rnx, obs.epochs, compressed)
+
+
+@pytest.fixture
+def measure(benchmark, request):
+    """Benchmark func(*args, **kwargs) and record the throughput and the peak RSS.
+
+    The throughput is relative to the size of the plain RINEX file in both directions.
+    The peak RSS is measured in a separate run in a fresh process.
+    """
+    def run(dataset, func, *args, **kwargs):
+        result = benchmark.pedantic(func, args, kwargs, iterations=1,
+                                    rounds=request.config.option.rinex_rounds)
+        if benchmark.disabled:
+            return result
+        mean = benchmark.stats.stats.mean
+        info = benchmark.extra_info
+        info['MB/s'] = dataset.size / 1e6 / mean
+        info['epochs/s'] = dataset.epochs / mean
+        info['peak RSS (MiB)'] = _peak_rss(func, args, kwargs)
+        _results.append((request.node.name, info))
+        return result
+
+    return run
+
+
+def _peak_rss(func, args, kwargs):
+    if resource is None:
+        return None
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(_run_peak_rss, func, args, kwargs).result()
+
+
+def _run_peak_rss(func, args, kwargs):
+    func(*args, **kwargs)
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kilobytes on Linux, bytes on macOS
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    width = max(len(name) for name, _ in _results)
+    terminalreporter.section('throughput and memory usage')
+    terminalreporter.write_line(f'{"Name":{width}s} {"MB/s":>9s} {"epochs/s":>10s} {"peak RSS (MiB)":>15s}')
+    for name, info in _results:
+        rss = info['peak RSS (MiB)']
+        rss = '-' if rss is None else f'{rss:.1f}'
+        terminalreporter.write_line(
+            f'{name:{width}s} {info["MB/s"]:9.1f} {info["epochs/s"]:10.0f} {rss:>15s}')
@@ -0,0 +1,245 @@
+"""Generator of synthetic RINEX observation files for the benchmarks.
+
+The files look like the output of a real receiver: the satellites rise and set,
+the pseudoranges, carrier phases and Doppler shifts follow smooth orbits with
+some noise, the phases have occasional cycle slips flagged in the LLI,
+and there are gaps of single satellites, single observations and whole epochs.
+The output depends only on the parameters and the seed.
+
+Run ``python benchmarks/synthetic.py --help`` to write a file to disk.
+"""
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+__all__ = ['SyntheticObs', 'make_obs']
+
+# carrier wavelengths in meters, by frequency band
+_WAVELENGTHS = {'1': 0.190293673, '2': 0.244210213, '5': 0.254828049, '7': 0.248349369,
+                '6': 0.236332464, '8': 0.251547001}
+# frequency bands and tracking codes of the RINEX 3/4 observation types, per system
+_BANDS = {'G': ['1C', '2W', '5Q', '1L', '2L'],
+          'R': ['1C', '2C', '1P', '2P'],
+          'E': ['1C', '5Q', '7Q', '8Q', '6C'],
+          'C': ['2I', '7I', '6I', '1P', '5P']}
+_RINEX2_BANDS = ['1', '2', '5', '7', '8', '6']
+# period of the variation of the ranges in seconds, about that of the GPS orbits
+_PERIOD = 43082.0
+
+
+class SyntheticObs(NamedTuple):
+    content: bytes
+    epochs: int
+
+
+def make_obs(version: int = 3, *, interval: float = 30.0, duration: float = 86400.0,
+             nsat: int = 32, ntypes: int = 8, slip_rate: float = 1e-3,
+             gap_rate: float = 1e-3, start: datetime = datetime(2021, 1, 1),
+             seed: int = 0) -> SyntheticObs:
+    """Generate a RINEX observation file.
+
+    Parameters
+    ----------
+    version : 2, 3 or 4
+        RINEX version of the output.
+    interval : float, default 30
+        Observation interval in seconds, e.g. 1 for 1 Hz data.
+    duration : float, default 86400
+        Time span of the file in seconds.
+    nsat : int, default 32
+        Number of satellites in view at each epoch.
+    ntypes : int, default 8
+        Number of observation types per GNSS system, from 4 to 20.
+    slip_rate : float, default 0.001
+        Probability of a cycle slip per satellite and epoch.
+    gap_rate : float, default 0.001
+        Probability of a gap per satellite and epoch. A tenth of it is used for
+        gaps of whole epochs and for the blank observation fields.
+    start : datetime
+        Time of the first epoch.
+    seed : int, default 0
+        Seed of the random numbers.
+
+    Returns
+    -------
+    SyntheticObs
+        The contents of the file and the number of epochs in it.
+    """
+    if version not in (2, 3, 4):
+        raise ValueError(f'invalid RINEX version {version}')
+    if not 4 <= ntypes <= 20:
+        raise ValueError('ntypes must be between 4 and 20')
+    rng = random.Random(seed)
+    systems = 'GR' if version == 2 else 'GREC'
+    codes = {sys: _obs_codes(version, sys, ntypes) for sys in systems}
+    pool = [f'{sys}{prn:02d}' for prn in range(1, 33) for sys in systems]
+    nsat = min(nsat, len(pool))
+    in_view = {prn: _Satellite(rng, codes[prn[0]]) for prn in rng.sample(pool, nsat)}
+
+    lines = _header(version, systems, codes, interval, start)
+    n_epochs = 0
+    epoch_gap = 0
+    for i in range(int(duration / interval)):
+        t = i * interval
+        # satellites set and others rise in their place
+        for prn in list(in_view):
+            if rng.random() < interval / 20000:
+                del in_view[prn]
+                new = rng.choice([x for x in pool if x not in in_view])
+                in_view[new] = _Satellite(rng, codes[new[0]])
+        if epoch_gap > 0:
+            epoch_gap -= 1
+            continue
+        if rng.random() < gap_rate / 10:
+            epoch_gap = rng.randint(1, 10)
+            continue
+        observed = [prn for prn in sorted(in_view) if rng.random() >= gap_rate]
+        clock = (t % 1000) * 1e-7 - 5e-5
+        records = [in_view[prn].observe(rng, t, slip_rate, gap_rate / 10) for prn in observed]
+        lines += _epoch(version, start + timedelta(seconds=t), observed, clock, records)
+        n_epochs += 1
+    return SyntheticObs(('\n'.join(lines) + '\n').encode(), n_epochs)
+
+
+class _Satellite:
+    def __init__(self, rng, codes):
+        self.codes = codes
+        self.range = rng.uniform(22e6, 23e6)
+        self.amplitude = rng.uniform(1e6, 3e6)
+        self.phase = rng.uniform(0, 2 * math.pi)
+        self.snr = rng.uniform(35, 50)
+        self.ambiguity = {code: rng.randint(-10 ** 6, 10 ** 6) for code in codes}
+
+    def observe(self, rng, t, slip_rate, blank_rate):
+        omega = 2 * math.pi / _PERIOD
+        rho = self.range + self.amplitude * math.sin(omega * t + self.phase)
+        rate = self.amplitude * omega * math.cos(omega * t + self.phase)
+        fields = []
+        for code in self.codes:
+            if rng.random() < blank_rate:
+                fields.append(None)
+                continue
+            wavelength = _WAVELENGTHS[code[1]]
+            lli = ssi = None
+            if code[0] == 'C' or code[0] == 'P':
+                value = rho + rng.gauss(0, 0.3)
+            elif code[0] == 'L':
+                if rng.random() < slip_rate:
+                    self.ambiguity[code] += rng.randint(-1000, 1000) or 1
+                    lli = 1
+                value = rho / wavelength + self.ambiguity[code] + rng.gauss(0, 0.01)
+                ssi = min(9, max(1, int(self.snr / 6)))
+            elif code[0] == 'D':
+                value = -rate / wavelength + rng.gauss(0, 0.05)
+            else:
+                value = self.snr + rng.gauss(0, 1)
+            fields.append((value, lli, ssi))
+        return fields
+
+
+def _obs_codes(version, sys, ntypes):
+    if version == 2:
+        return [(('C' if band == '1' else 'P') if kind == 'C' else kind) + band
+                for band in _RINEX2_BANDS for kind in 'CLDS'][:ntypes]
+    return [kind + band for band in _BANDS[sys] for kind in 'CLDS'][:ntypes]
+
+
+def _header(version, systems, codes, interval, start):
+    def line(content, label):
+        return content.ljust(60) + label
+
+    if version == 2:
+        lines = [line(f'{2.11:9.2f}           OBSERVATION DATA    M (MIXED)', 'RINEX VERSION / TYPE')]
+    else:
+        lines = [line(f'{3.04 if version == 3 else 4.01:9.2f}           OBSERVATION DATA    M',
+                      'RINEX VERSION / TYPE')]
+    lines += [
+        line(f'{"synthetic":20s}{"hatanaka":20s}{start:%Y%m%d %H%M%S} UTC', 'PGM / RUN BY / DATE'),
+        line('SYNT', 'MARKER NAME'),
+        line(f'{"benchmark":20s}{"hatanaka":40s}', 'OBSERVER / AGENCY'),
+        line(f'{"0":20s}{"SYNTHETIC":20s}{"1.0":20s}', 'REC # / TYPE / VERS'),
+        line(f'{"0":20s}{"SYNTHETIC":20s}', 'ANT # / TYPE'),
+        line(f'{3120000.0:14.4f}{1100000.0:14.4f}{5560000.0:14.4f}', 'APPROX POSITION XYZ'),
+        line(f'{0:14.4f}{0:14.4f}{0:14.4f}', 'ANTENNA: DELTA H/E/N'),
+    ]
+    if version == 2:
+        lines.append(line('     1     1', 'WAVELENGTH FACT L1/2'))
+        type_codes = codes['G']
+        for i in range(0, len(type_codes), 9):
+            first = f'{len(type_codes):6d}' if i == 0 else ' ' * 6
+            lines.append(line(first + ''.join(f'    {c:>2s}' for c in type_codes[i:i + 9]),
+                              '# / TYPES OF OBSERV'))
+    else:
+        for sys in systems:
+            for i in range(0, len(codes[sys]), 13):
+                first = f'{sys}  {len(codes[sys]):3d}' if i == 0 else ' ' * 6
+                lines.append(line(first + ''.join(f' {c}' for c in codes[sys][i:i + 13]),
+                                  'SYS / # / OBS TYPES'))
+    lines += [
+        line(f'{interval:10.3f}', 'INTERVAL'),
+        line(f'{start.year:6d}{start.month:6d}{start.day:6d}{start.hour:6d}{start.minute:6d}'
+             f'{start.second:13.7f}     GPS', 'TIME OF FIRST OBS'),
+        ' ' * 60 + 'END OF HEADER',
+    ]
+    return lines
+
+
+def _epoch(version, t, observed, clock, records):
+    seconds = t.second + t.microsecond * 1e-6
+    if version == 2:
+        sats = ''.join(prn for prn in observed)
+        first = f' {t:%y} {t.month:2d} {t.day:2d} {t.hour:2d} {t.minute:2d}{seconds:11.7f}  0{len(observed):3d}'
+        lines = [first + sats[:36].ljust(36) + _fortran(clock, 12, 9)]
+        for i in range(36, len(sats), 36):
+            lines.append(' ' * 32 + sats[i:i + 36])
+        per_line = 5
+    else:
+        lines = [f'> {t:%Y %m %d %H %M}{seconds:11.7f}  0{len(observed):3d}      {_fortran(clock, 15, 12)}']
+        per_line = None
+    for prn, fields in zip(observed, records):
+        text = [_field(x) for x in fields]
+        if per_line is None:
+            lines.append((prn + ''.join(text)).rstrip())
+        else:
+            for i in range(0, len(text), per_line):
+                lines.append(''.join(text[i:i + per_line]).rstrip())
+    return lines
+
+
+def _field(field):
+    if field is None:
+        return ' ' * 16
+    value, lli, ssi = field
+    return f'{_fortran(value, 14, 3)}{" " if lli is None else lli}{" " if ssi is None else ssi}'
+
+
+def _fortran(value, width, decimals):
+    # Fortran F format, which leaves out the zero before the decimal point, e.g. '-.123'
+    text = f'{round(value, decimals) + 0.0:{width}.{decimals}f}'
+    return text.replace('0.', '.', 1).rjust(width) if abs(value) < 1 else text
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic RINEX observation file.')
+    parser.add_argument('output', type=Path)
+    parser.add_argument('--version', type=int, default=3, choices=[2, 3, 4])
+    parser.add_argument('--interval', type=float, default=30.0, help='seconds (default: 30)')
+    parser.add_argument('--duration', type=float, default=86400.0, help='seconds (default: 86400)')
+    parser.add_argument('--nsat', type=int, default=32)
+    parser.add_argument('--ntypes', type=int, default=8)
+    parser.add_argument('--slip-rate', type=float, default=1e-3)
+    parser.add_argument('--gap-rate', type=float, default=1e-3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    obs = make_obs(args.version, interval=args.interval, duration=args.duration, nsat=args.nsat,
+                   ntypes=args.ntypes, slip_rate=args.slip_rate, gap_rate=args.gap_rate,
+                   seed=args.seed)
+    args.output.write_bytes(obs.content)
+    print(f'Wrote {args.output}: {len(obs.content) / 1e6:.1f} MB, {obs.epochs} epochs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import CONTAINERS
+from hatanaka import compress, compress_on_disk, decompress, decompress_on_disk, transcode
+
+# zip archives can only be decompressed
+COMPRESSIONS = [x for x in CONTAINERS if x != 'zip']
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_compress(measure, dataset, compression):
+    rnx = dataset.rnx.read_bytes()
+    measure(dataset, compress, rnx, compression=compression)
+
+
+@pytest.mark.parametrize('compression', CONTAINERS)
+def test_decompress(measure, dataset, compression):
+    content = dataset.compressed[compression].read_bytes()
+    assert measure(dataset, decompress, content) == dataset.rnx.read_bytes()
+
+
+@pytest.mark.parametrize('threads', [1, None])
+def test_decompress_no_reinit(measure, dataset, threads):
+    # the data arcs are only initialized at the first epoch, as in most archived files,
+    # so the default number of threads should not be slower than serial decoding
+    content = dataset.compressed['none'].read_bytes()
+    assert measure(dataset, decompress, content, threads=threads) == dataset.rnx.read_bytes()
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_compress_on_disk(measure, dataset, compression, tmp_path):
+    path = shutil.copy(dataset.rnx, tmp_path)
+    measure(dataset, compress_on_disk, path, compression=compression)
+
+
+@pytest.mark.parametrize('compression', CONTAINERS)
+def test_decompress_on_disk(measure, dataset, compression, tmp_path):
+    path = shutil.copy(dataset.compressed[compression], tmp_path)
+    out_path = measure(dataset, decompress_on_disk, path)
+    assert out_path.read_bytes() == dataset.rnx.read_bytes()
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_transcode(measure, dataset, compression):
+    # the common migration of .crx.Z archives to another container
+    content = dataset.compressed['Z'].read_bytes()
+    measure(dataset, transcode, content, compression)
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_cli_compress(measure, dataset, compression, tmp_path):
+    path = shutil.copy(dataset.rnx, tmp_path)
+    measure(dataset, run_cli, 'compress_cli', path, '-c', compression)
+
+
+@pytest.mark.parametrize('compression', CONTAINERS)
+def test_cli_decompress(measure, dataset, compression, tmp_path):
+    path = shutil.copy(dataset.compressed[compression], tmp_path)
+    measure(dataset, run_cli, 'decompress_cli', path)
+    assert (tmp_path / 'synthetic.rnx').read_bytes() == dataset.rnx.read_bytes()
+
+
+def run_cli(name, *args):
+    # a new interpreter for each run, as when invoked from the shell
+    code = f'import sys; from hatanaka.cli import {name}; sys.exit({name}())'
+    subprocess.run([sys.executable, '-c', code, *map(str, args)], check=True,
+                   stdout=subprocess.DEVNULL)
@@ -0,0 +1,17 @@
+import pytest
+
+from hatanaka import compress, decompress
+from synthetic import make_obs
+
+
+@pytest.mark.parametrize('version', [2, 3, 4])
+def test_roundtrip(version):
+    obs = make_obs(version, interval=1, duration=120, nsat=40, ntypes=20,
+                   slip_rate=0.05, gap_rate=0.1)
+    assert 0 < obs.epochs < 120
+    assert obs.content.startswith(f'{version:6d}.'.encode())
+    assert b'SYS / # / OBS TYPES' in obs.content or version == 2
+    # the values are formatted like in CRX2RNX
+    assert decompress(compress(obs.content)) == obs.content
+    assert make_obs(version, interval=1, duration=120, nsat=40, ntypes=20,
+                    slip_rate=0.05, gap_rate=0.1) == obs
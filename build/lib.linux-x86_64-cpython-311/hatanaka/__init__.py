@@ -0,0 +1,10 @@
+from .async_compression import *
+from .general_compression import *
+from .hatanaka import *
+from .index import *
+from .observations import *
+from .stats import *
+from .streaming import *
+
+__version__ = '2.8.1'
+rnxcmp_version = '4.1.0'
@@ -0,0 +1,440 @@
+/*
+ * In-process interface to RNX2CRX and CRX2RNX.
+ *
+ * The converters in rnxcmp/source are compiled with RNXCMP_LIBRARY defined,
+ * which leaves out their main() functions. All the state of a conversion is
+ * kept in a context allocated by crx2rnx() / rnx2crx(), so that conversions
+ * can run concurrently from several threads with the GIL released.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <stdlib.h>
+#include <string.h>
+
+#include "rnxcmp.h"
+
+/* growable buffer for the diagnostic messages */
+typedef struct {
+    char *data;
+    size_t len;
+    size_t size;
+} msg_buffer;
+
+static int
+msg_write(void *opaque, const char *buf, size_t size)
+{
+    msg_buffer *msg = (msg_buffer *)opaque;
+    if (msg->len + size > msg->size) {
+        size_t new_size = msg->size ? msg->size : 256;
+        char *p;
+        while (new_size < msg->len + size)
+            new_size *= 2;
+        if ((p = realloc(msg->data, new_size)) == NULL)
+            return 1;
+        msg->data = p;
+        msg->size = new_size;
+    }
+    memcpy(msg->data + msg->len, buf, size);
+    msg->len += size;
+    return 0;
+}
+
+typedef int (*converter)(rnx_io *io, const void *options);
+
+/* Run a conversion on the whole input held in a buffer.
+   Returns a (exit code, output, messages) tuple. */
+static PyObject *
+run(converter func, const void *options, Py_buffer *input)
+{
+    rnx_io io;
+    msg_buffer msg = {NULL, 0, 0};
+    int status;
+    PyObject *result = NULL;
+
+    if (rnx_io_init(&io) != 0)
+        return PyErr_NoMemory();
+    rnx_io_set_input_buffer(&io, input->buf, (size_t)input->len);
+    io.err_write = msg_write;
+    io.err_opaque = &msg;
+
+    Py_BEGIN_ALLOW_THREADS
+    status = func(&io, options);
+    Py_END_ALLOW_THREADS
+
+    result = Py_BuildValue("(iy#y#)", status,
+                           io.out_buf, (Py_ssize_t)io.out_len,
+                           msg.data ? msg.data : "", (Py_ssize_t)msg.len);
+    rnx_io_free(&io);
+    free(msg.data);
+    return result;
+}
+
+/* state of a conversion between Python read() and write() callables */
+typedef struct {
+    PyObject *read;
+    PyObject *write;
+    PyObject *epoch;
+    PyThreadState *tstate;
+    PyObject *exc_type, *exc_value, *exc_tb;  /* exception raised by a callback */
+} stream_state;
+
+static void
+stream_fetch_error(stream_state *st)
+{
+    if (st->exc_type == NULL)
+        PyErr_Fetch(&st->exc_type, &st->exc_value, &st->exc_tb);
+    else
+        PyErr_Clear();
+}
+
+static size_t
+stream_read(void *opaque, char *buf, size_t size)
+{
+    stream_state *st = (stream_state *)opaque;
+    PyObject *data;
+    Py_buffer view;
+    size_t n = (size_t)-1;
+
+    PyEval_RestoreThread(st->tstate);
+    data = PyObject_CallFunction(st->read, "n", (Py_ssize_t)size);
+    if (data != NULL) {
+        if (PyObject_GetBuffer(data, &view, PyBUF_SIMPLE) == 0) {
+            if ((size_t)view.len > size) {
+                PyErr_SetString(PyExc_ValueError, "read() returned more data than requested");
+            } else {
+                memcpy(buf, view.buf, (size_t)view.len);
+                n = (size_t)view.len;
+            }
+            PyBuffer_Release(&view);
+        }
+        Py_DECREF(data);
+    }
+    if (n == (size_t)-1)
+        stream_fetch_error(st);
+    st->tstate = PyEval_SaveThread();
+    return n;
+}
+
+static int
+stream_write(void *opaque, const char *buf, size_t size)
+{
+    stream_state *st = (stream_state *)opaque;
+    PyObject *ret;
+    int err = 0;
+
+    PyEval_RestoreThread(st->tstate);
+    ret = PyObject_CallFunction(st->write, "y#", buf, (Py_ssize_t)size);
+    if (ret == NULL) {
+        stream_fetch_error(st);
+        err = 1;
+    }
+    Py_XDECREF(ret);
+    st->tstate = PyEval_SaveThread();
+    return err;
+}
+
+/* Run a conversion reading the input from read(size) and passing the output to write(data)
+   as soon as the converter needs more input. Decoded epochs are passed to epoch, if given
+   (crx2rnx only). Returns a (exit code, messages) tuple. */
+static PyObject *
+run_stream(converter func, void *options, PyObject *read, PyObject *write, PyObject *epoch)
+{
+    rnx_io io;
+    msg_buffer msg = {NULL, 0, 0};
+    stream_state st = {read, write, epoch, NULL, NULL, NULL, NULL};
+    int status;
+    PyObject *result = NULL;
+
+    if (!PyCallable_Check(read) || !PyCallable_Check(write)) {
+        PyErr_SetString(PyExc_TypeError, "read and write must be callable");
+        return NULL;
+    }
+    if (rnx_io_init(&io) != 0)
+        return PyErr_NoMemory();
+    io.read = stream_read;
+    io.read_opaque = &st;
+    io.write = stream_write;
+    io.write_opaque = &st;
+    io.flush_on_read = 1;
+    io.err_write = msg_write;
+    io.err_opaque = &msg;
+    if (epoch != NULL)
+        ((crx2rnx_options *)options)->epoch_opaque = &st;
+
+    st.tstate = PyEval_SaveThread();
+    status = func(&io, options);
+    if (status != RNX_EXIT_IO_ERROR && rnx_flush(&io) != 0)
+        status = RNX_EXIT_IO_ERROR;
+    PyEval_RestoreThread(st.tstate);
+
+    if (st.exc_type != NULL) {
+        PyErr_Restore(st.exc_type, st.exc_value, st.exc_tb);
+    } else {
+        result = Py_BuildValue("(iy#)", status,
+                               msg.data ? msg.data : "", (Py_ssize_t)msg.len);
+    }
+    rnx_io_free(&io);
+    free(msg.data);
+    return result;
+}
+
+/* Pass a decoded epoch to the epoch(line, sat_list, ntype, values, flags, clock) callable.
+   The arrays are passed as bytes objects in native byte order. */
+static int
+stream_epoch(void *opaque, const crx2rnx_epoch *epoch)
+{
+    stream_state *st = (stream_state *)opaque;
+    PyObject *ret = NULL, *clock;
+    Py_ssize_t i, nvalues = 0;
+
+    for (i = 0; i < epoch->nsat; i++)
+        nvalues += epoch->ntype[i];
+    PyEval_RestoreThread(st->tstate);
+    if (epoch->has_clock) {
+        clock = PyLong_FromLongLong(epoch->clock);
+    } else {
+        Py_INCREF(Py_None);
+        clock = Py_None;
+    }
+    if (clock != NULL) {
+        ret = PyObject_CallFunction(st->epoch, "y#y#y#y#y#O",
+                                    epoch->line, (Py_ssize_t)strlen(epoch->line),
+                                    epoch->sat_list, (Py_ssize_t)epoch->nsat * 3,
+                                    (const char *)epoch->ntype,
+                                    (Py_ssize_t)(epoch->nsat * sizeof(int)),
+                                    (const char *)epoch->values,
+                                    (Py_ssize_t)(nvalues * sizeof(long long)),
+                                    epoch->flags, nvalues * 2,
+                                    clock);
+        Py_DECREF(clock);
+    }
+    if (ret == NULL)
+        stream_fetch_error(st);
+    Py_XDECREF(ret);
+    st->tstate = PyEval_SaveThread();
+    return ret == NULL;
+}
+
+static int
+crx2rnx_func(rnx_io *io, const void *options)
+{
+    return crx2rnx(io, (const crx2rnx_options *)options);
+}
+
+static int
+rnx2crx_func(rnx_io *io, const void *options)
+{
+    return rnx2crx(io, (const rnx2crx_options *)options);
+}
+
+/* Set an optional time of the options from an int or None. */
+static int
+get_time_option(PyObject *value, int *has_value, long long *result)
+{
+    if (value == NULL || value == Py_None)
+        return 0;
+    *result = PyLong_AsLongLong(value);
+    if (*result == -1 && PyErr_Occurred())
+        return -1;
+    if (has_value != NULL)
+        *has_value = 1;
+    return 0;
+}
+
+PyDoc_STRVAR(crx2rnx_doc,
+"crx2rnx(data, skip_strange_epochs=False, start=None, end=None, interval=None,\n"
+"        systems=None, satellites=None, obs_types=None)\n"
+"--\n\n"
+"Decompress Compact RINEX data given as a bytes-like object.\n"
+"Only the epochs from start to end (exclusive) are output and, if interval is given,\n"
+"only the epochs whose time is a multiple of it. The times are given as integers in units\n"
+"of 100 ns since 1970-01-01.\n"
+"systems, satellites and obs_types select the data that is output, e.g. 'GE', 'G01E11'\n"
+"and 'C1C L1C', and the header is rewritten to match.\n"
+"Returns a tuple of (exit code, output, messages) of CRX2RNX.");
+
+static PyObject *
+py_crx2rnx(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"data", "skip_strange_epochs", "start", "end", "interval",
+                             "systems", "satellites", "obs_types", NULL};
+    Py_buffer input;
+    int skip_strange_epochs = 0;
+    PyObject *start = NULL, *end = NULL, *interval = NULL;
+    crx2rnx_options options;
+    PyObject *result;
+
+    memset(&options, 0, sizeof(options));
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*|pOOOzzz:crx2rnx", kwlist,
+                                     &input, &skip_strange_epochs, &start, &end, &interval,
+                                     &options.projection.systems, &options.projection.satellites,
+                                     &options.projection.obs_types))
+        return NULL;
+    options.skip_strange_epochs = skip_strange_epochs;
+    if (get_time_option(start, &options.has_start, &options.start) != 0 ||
+        get_time_option(end, &options.has_end, &options.end) != 0 ||
+        get_time_option(interval, NULL, &options.interval) != 0) {
+        PyBuffer_Release(&input);
+        return NULL;
+    }
+    result = run(crx2rnx_func, &options, &input);
+    PyBuffer_Release(&input);
+    return result;
+}
+
+PyDoc_STRVAR(rnx2crx_doc,
+"rnx2crx(data, reinit_every_nth=0, skip_strange_epochs=False,\n"
+"        systems=None, satellites=None, obs_types=None, date=None)\n"
+"--\n\n"
+"Compress RINEX observation data given as a bytes-like object.\n"
+"systems, satellites and obs_types select the data that is output, as for crx2rnx().\n"
+"date is the time of the CRINEX PROG / DATE line in seconds since 1970-01-01 UTC,\n"
+"by default $SOURCE_DATE_EPOCH or the current time.\n"
+"Returns a tuple of (exit code, output, messages) of RNX2CRX.");
+
+static PyObject *
+py_rnx2crx(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"data", "reinit_every_nth", "skip_strange_epochs",
+                             "systems", "satellites", "obs_types", "date", NULL};
+    Py_buffer input;
+    long reinit_every_nth = 0;
+    int skip_strange_epochs = 0;
+    PyObject *date = NULL;
+    rnx2crx_options options;
+    PyObject *result;
+
+    memset(&options, 0, sizeof(options));
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*|lpzzzO:rnx2crx", kwlist,
+                                     &input, &reinit_every_nth, &skip_strange_epochs,
+                                     &options.projection.systems, &options.projection.satellites,
+                                     &options.projection.obs_types, &date))
+        return NULL;
+    options.reinit_every_nth = reinit_every_nth;
+    options.skip_strange_epochs = skip_strange_epochs;
+    if (get_time_option(date, &options.has_date, &options.date) != 0) {
+        PyBuffer_Release(&input);
+        return NULL;
+    }
+    result = run(rnx2crx_func, &options, &input);
+    PyBuffer_Release(&input);
+    return result;
+}
+
+PyDoc_STRVAR(crx2rnx_stream_doc,
+"crx2rnx_stream(read, write, skip_strange_epochs=False,\n"
+"               systems=None, satellites=None, obs_types=None)\n"
+"--\n\n"
+"Decompress Compact RINEX data incrementally.\n"
+"The input is requested with read(size) until it returns an empty bytes object\n"
+"and the output is passed to write(data) in chunks.\n"
+"Returns a tuple of (exit code, messages) of CRX2RNX.");
+
+static PyObject *
+py_crx2rnx_stream(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"read", "write", "skip_strange_epochs",
+                             "systems", "satellites", "obs_types", NULL};
+    PyObject *read, *write;
+    int skip_strange_epochs = 0;
+    crx2rnx_options options;
+
+    memset(&options, 0, sizeof(options));
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|pzzz:crx2rnx_stream", kwlist,
+                                     &read, &write, &skip_strange_epochs,
+                                     &options.projection.systems, &options.projection.satellites,
+                                     &options.projection.obs_types))
+        return NULL;
+    options.skip_strange_epochs = skip_strange_epochs;
+    return run_stream(crx2rnx_func, &options, read, write, NULL);
+}
+
+PyDoc_STRVAR(rnx2crx_stream_doc,
+"rnx2crx_stream(read, write, reinit_every_nth=0, skip_strange_epochs=False,\n"
+"               systems=None, satellites=None, obs_types=None, date=None)\n"
+"--\n\n"
+"Compress RINEX observation data incrementally.\n"
+"The input is requested with read(size) until it returns an empty bytes object\n"
+"and the output is passed to write(data) in chunks.\n"
+"Returns a tuple of (exit code, messages) of RNX2CRX.");
+
+static PyObject *
+py_rnx2crx_stream(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"read", "write", "reinit_every_nth", "skip_strange_epochs",
+                             "systems", "satellites", "obs_types", "date", NULL};
+    PyObject *read, *write, *date = NULL;
+    long reinit_every_nth = 0;
+    int skip_strange_epochs = 0;
+    rnx2crx_options options;
+
+    memset(&options, 0, sizeof(options));
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|lpzzzO:rnx2crx_stream", kwlist,
+                                     &read, &write, &reinit_every_nth, &skip_strange_epochs,
+                                     &options.projection.systems, &options.projection.satellites,
+                                     &options.projection.obs_types, &date))
+        return NULL;
+    options.reinit_every_nth = reinit_every_nth;
+    options.skip_strange_epochs = skip_strange_epochs;
+    if (get_time_option(date, &options.has_date, &options.date) != 0)
+        return NULL;
+    return run_stream(rnx2crx_func, &options, read, write, NULL);
+}
+
+PyDoc_STRVAR(crx2rnx_epochs_doc,
+"crx2rnx_epochs(read, write, epoch, skip_strange_epochs=False)\n"
+"--\n\n"
+"Decode Compact RINEX data incrementally without formatting the observations as text.\n"
+"The input is requested with read(size). Epochs with flag 0 or 1 are passed to\n"
+"epoch(line, sat_list, ntype, values, flags, clock), where ntype and values are bytes objects\n"
+"holding C int and long long arrays. All other output, such as the header and event records,\n"
+"is passed to write(data) as text before the following epoch.\n"
+"Returns a tuple of (exit code, messages) of CRX2RNX.");
+
+static PyObject *
+py_crx2rnx_epochs(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"read", "write", "epoch", "skip_strange_epochs", NULL};
+    PyObject *read, *write, *epoch;
+    int skip_strange_epochs = 0;
+    crx2rnx_options options;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|p:crx2rnx_epochs", kwlist,
+                                     &read, &write, &epoch, &skip_strange_epochs))
+        return NULL;
+    if (!PyCallable_Check(epoch)) {
+        PyErr_SetString(PyExc_TypeError, "epoch must be callable");
+        return NULL;
+    }
+    memset(&options, 0, sizeof(options));
+    options.skip_strange_epochs = skip_strange_epochs;
+    options.epoch_fn = stream_epoch;
+    return run_stream(crx2rnx_func, &options, read, write, epoch);
+}
+
+static PyMethodDef rnxcmp_methods[] = {
+    {"crx2rnx", (PyCFunction)(void (*)(void))py_crx2rnx, METH_VARARGS | METH_KEYWORDS, crx2rnx_doc},
+    {"rnx2crx", (PyCFunction)(void (*)(void))py_rnx2crx, METH_VARARGS | METH_KEYWORDS, rnx2crx_doc},
+    {"crx2rnx_stream", (PyCFunction)(void (*)(void))py_crx2rnx_stream, METH_VARARGS | METH_KEYWORDS,
+     crx2rnx_stream_doc},
+    {"rnx2crx_stream", (PyCFunction)(void (*)(void))py_rnx2crx_stream, METH_VARARGS | METH_KEYWORDS,
+     rnx2crx_stream_doc},
+    {"crx2rnx_epochs", (PyCFunction)(void (*)(void))py_crx2rnx_epochs, METH_VARARGS | METH_KEYWORDS,
+     crx2rnx_epochs_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef rnxcmp_module = {
+    PyModuleDef_HEAD_INIT,
+    "_rnxcmp",
+    "In-process RNX2CRX and CRX2RNX converters.",
+    -1,
+    rnxcmp_methods
+};
+
+PyMODINIT_FUNC
+PyInit__rnxcmp(void)
+{
+    return PyModule_Create(&rnxcmp_module);
+}
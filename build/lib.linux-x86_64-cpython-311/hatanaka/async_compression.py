@@ -0,0 +1,152 @@
+import asyncio
+import functools
+import os
+import weakref
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Union
+
+from .general_compression import _as_buffer, _check_compression, _compress_container, \
+    _decompress_container
+from .hatanaka import _arun
+
+__all__ = ['adecompress', 'acompress', 'set_max_concurrent_conversions']
+
+_max_concurrent_conversions = os.cpu_count() or 1
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_max_concurrent_conversions(limit: int = None):
+    """Set the number of Hatanaka conversions :func:`adecompress` and :func:`acompress`
+    are allowed to run at the same time.
+
+    Parameters
+    ----------
+    limit : int, optional
+        Maximum number of concurrent conversions. Defaults to the number of CPUs.
+    """
+    global _max_concurrent_conversions
+    if limit is not None and limit < 1:
+        raise ValueError('limit must be at least 1')
+    _max_concurrent_conversions = limit or os.cpu_count() or 1
+    _semaphores.clear()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(_max_concurrent_conversions)
+    return _semaphores[loop]
+
+
+async def adecompress(content: Union[Path, str, bytes, memoryview], *,
+                      skip_strange_epochs: bool = False, strict: bool = False,
+                      executor: Executor = None) -> bytes:
+    """Decompress compressed RINEX files without blocking the event loop.
+
+    Asynchronous version of :func:`decompress`. Reading the file and the conventional
+    decompression (.gz|.Z|.zip|.bz2) are run in the executor. The number of Hatanaka
+    decompressions running at the same time is limited by :func:`set_max_concurrent_conversions`.
+
+    Parameters
+    ----------
+    content : Path or str or bytes-like
+        Path to a compressed RINEX file or file contents as a bytes-like object.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+    strict : bool, default False
+        If True, a ValueError is raised if the decoded file is not RINEX.
+    executor : concurrent.futures.Executor, optional
+        Executor to run the blocking operations in. The default executor of the event loop is
+        used by default.
+
+    Returns
+    -------
+    bytes
+        Decompressed RINEX file contents.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression.
+    ValueError
+        For invalid file contents.
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(content, (Path, str)):
+        content = await loop.run_in_executor(executor, Path(content).read_bytes)
+    elif not isinstance(content, bytes):
+        content = _as_buffer(content)
+    txt = await loop.run_in_executor(executor, _decompress_container, content)
+    if len(txt) < 80:
+        raise ValueError('file is too short to be a valid RINEX file')
+    header = bytes(txt[:80])
+    if b'COMPACT RINEX' in header:
+        async with _get_semaphore():
+            txt = await _arun('crx2rnx', txt, executor, skip_strange_epochs=skip_strange_epochs)
+    elif strict and not header.endswith(b'RINEX VERSION / TYPE'):
+        raise ValueError('not a valid RINEX file')
+    return bytes(txt)
+
+
+async def acompress(content: Union[Path, str, bytes, memoryview], *,
+                    compression: str = 'gz', skip_strange_epochs: bool = False,
+                    reinit_every_nth: int = None, compresslevel: int = None,
+                    threads: int = None,
+                    executor: Executor = None) -> bytes:
+    """Compress RINEX files without blocking the event loop.
+
+    Asynchronous version of :func:`compress`. Reading the file and the conventional
+    compression are run in the executor. The number of Hatanaka compressions running at
+    the same time is limited by :func:`set_max_concurrent_conversions`.
+
+    Parameters
+    ----------
+    content : Path or str or bytes-like
+        Path to a RINEX file or file contents as a bytes-like object.
+    compression : 'gz' (default), 'bz2', 'Z' or 'none'
+        Which compression (if any) to apply in addition to the Hatanaka compression.
+    skip_strange_epochs : bool, default False
+        For Hatanaka compression. Warn and skip strange epochs instead of raising an exception.
+    reinit_every_nth : int, optional
+        For Hatanaka compression. Initialize the compression operation at every # epochs.
+    compresslevel : int, optional
+        Compression level of gzip and bzip2 from 1 (fastest) to 9 (smallest, default).
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression. Defaults to the number of CPUs.
+    executor : concurrent.futures.Executor, optional
+        Executor to run the blocking operations in. The default executor of the event loop is
+        used by default.
+
+    Returns
+    -------
+    bytes
+        Compressed RINEX file contents.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka compression.
+    ValueError
+        For invalid file contents.
+    """
+    _check_compression(compression)
+    if reinit_every_nth is not None and reinit_every_nth > 0:
+        assert isinstance(reinit_every_nth, int)
+    else:
+        reinit_every_nth = 0
+    loop = asyncio.get_running_loop()
+    if isinstance(content, (Path, str)):
+        content = await loop.run_in_executor(executor, Path(content).read_bytes)
+    elif not isinstance(content, bytes):
+        content = _as_buffer(content)
+    if len(content) < 80:
+        raise ValueError('file is too short to be a valid RINEX file')
+    if b'OBSERVATION DATA' in bytes(content[:80]):
+        async with _get_semaphore():
+            content = await _arun('rnx2crx', content, executor,
+                                  reinit_every_nth=reinit_every_nth,
+                                  skip_strange_epochs=skip_strange_epochs)
+    func = functools.partial(_compress_container, content, compression, compresslevel, threads)
+    return bytes(await loop.run_in_executor(executor, func))
@@ -0,0 +1,2 @@
+# The rnx2crx and crx2rnx executables will be built and placed here when
+# 'setup.py build' or 'setup.py install' is run.
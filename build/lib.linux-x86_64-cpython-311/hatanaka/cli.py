@@ -0,0 +1,193 @@
+import argparse
+import os
+import sys
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from hatanaka import ConversionStats, __version__, compress, compress_on_disk, decompress, \
+    decompress_on_disk, rnxcmp_version
+from hatanaka.general_compression import _record_warnings, _run_many
+from hatanaka.hatanaka import _popen
+
+__all__ = ['decompress_cli', 'compress_cli']
+
+
+def decompress_cli(args: List[str] = None) -> int:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        description='Decompress compressed RINEX files.',
+        epilog='This program will decompress any RINEX files compressed with Hatanaka compression'
+               '(.crx|.##d) and/or with a conventional compression format (.gz|.Z|.zip|.bz2) to '
+               'their plain RINEX counterpart. Already decompressed files are ignored. '
+               'Exit codes: 0 - success, 1 - error, 2 - warning.'
+    )
+    parser.add_argument('files', type=Path, nargs='*',
+                        help='Compressed RINEX files. '
+                             'stdin and stdout are used if no input files are provided.')
+    parser.add_argument(
+        '-s', '--skip-strange-epochs', action='store_true',
+        help='This option may be used for salvaging usable data when middle of the'
+             'Compact RINEX file is missing. The data after the missing part, are, however, '
+             'useless until the compression operation of all data are initialized at some epoch. '
+             'Combination with use of -e option of RNX2CRX may be effective.\n'
+             'Caution: It is assumed that no change in the list of data types '
+             'happens in the lost part of the data.')
+    parser.add_argument('--start', type=datetime.fromisoformat, metavar='TIME',
+                        help='only output the epochs from this time onwards, '
+                             'e.g. 2021-01-01T12:00:00')
+    parser.add_argument('--end', type=datetime.fromisoformat, metavar='TIME',
+                        help='only output the epochs before this time')
+    parser.add_argument('--interval', type=float, metavar='SECONDS',
+                        help='only output the epochs whose time is a multiple of this interval')
+    _add_projection_args(parser)
+    _add_common_args(parser)
+    args = parser.parse_args(args)
+    return _run(decompress, decompress_on_disk, args, skip_strange_epochs=args.skip_strange_epochs,
+                start=args.start, end=args.end, interval=args.interval,
+                systems=args.systems, satellites=args.satellites, obs_types=args.obs_types)
+
+
+def compress_cli(args: List[str] = None) -> int:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        description='Compress RINEX files.',
+        epilog='This program applies Hatanaka and optionally a conventional '
+               'compression (gzip by default) to any provided RINEX files. '
+               'Already compressed files are ignored. '
+               'Exit codes: 0 - success, 1 - error, 2 - warning.'
+    )
+    parser.add_argument('files', type=Path, nargs='*',
+                        help='RINEX files. '
+                             'stdin and stdout are used if no input files are provided.')
+    parser.add_argument('-c', '--compression', default='gz', choices=['gz', 'bz2', 'Z', 'none'],
+                        help='which compression to apply in addition to Hatanaka compression '
+                             '(default: gz)')
+    parser.add_argument('-l', '--level', type=int, choices=range(1, 10), metavar='{1-9}',
+                        help='gzip or bzip2 compression level, '
+                             '1 is the fastest and 9 the smallest (default: 9)')
+    parser.add_argument(
+        '-s', '--skip-strange-epochs', action='store_true',
+        help='warn and skip strange epochs instead of raising an exception')
+    parser.add_argument(
+        '-e', '--reinit-every-nth', type=int, metavar='#',
+        help='Initialize the compression operation at every # epochs. '
+             'When some part of the Compact RINEX file is lost, the data can not be recovered '
+             'thereafter until all the data arc are initialized for differential operation. '
+             'This option may be used to increase chances to recover parts of data by using '
+             'the --skip-strange-epochs option of rinex-decompress at the cost of '
+             'increasing the file size.')
+    _add_projection_args(parser)
+    _add_common_args(parser)
+    args = parser.parse_args(args)
+    return _run(compress, compress_on_disk, args,
+                compression=args.compression,
+                skip_strange_epochs=args.skip_strange_epochs,
+                reinit_every_nth=args.reinit_every_nth,
+                compresslevel=args.level,
+                threads=1 if args.jobs != 1 and len(args.files) > 1 else None,
+                systems=args.systems, satellites=args.satellites, obs_types=args.obs_types)
+
+
+def _run(func, func_on_disk, args, **kwargs):
+    missing_files = [x for x in args.files if not x.exists()]
+    if missing_files:
+        for f in missing_files:
+            print(f"Error: '{str(f)}' was not found", file=sys.stderr)
+            exit(1)
+
+    n_errors = 0
+    n_warnings = 0
+    total = ConversionStats()
+    results = _run_many(func_on_disk, args.files, args.jobs, delete=args.delete, **kwargs)
+    for i, (in_file, out_file, warning_list, error, stats) in enumerate(results, 1):
+        for category, message in warning_list:
+            warnings.warn(message, category)
+        n_warnings += len(warning_list)
+        total += stats
+        if args.progress:
+            print(f'[{i}/{len(args.files)}] {str(in_file)}: {_format_stats(stats)}',
+                  file=sys.stderr)
+        if error is not None:
+            print(f"Error: failed to {func.__name__} '{str(in_file)}': {error}", file=sys.stderr)
+            n_errors += 1
+            continue
+        if out_file == in_file:
+            print(f'{str(in_file)} is already {func.__name__}ed')
+        else:
+            print(f'Created {str(out_file)}')
+        if args.delete and not in_file.exists():
+            print(f'Deleted {str(in_file)}')
+
+    if len(args.files) == 0:
+        with _record_warnings() as warning_list:
+            converted = func(sys.stdin.buffer.read(), stats=total, **kwargs)
+            sys.stdout.buffer.write(converted)
+        n_warnings += len(warning_list)
+        if args.progress:
+            print(f'<stdin>: {_format_stats(total)}', file=sys.stderr)
+
+    if args.stats:
+        print(total.summary(), file=sys.stderr)
+
+    if n_errors > 0:
+        return 1
+    if n_warnings > 0:
+        return 2
+    return 0
+
+
+def _format_stats(stats):
+    speed = max(stats.bytes_in, stats.bytes_out) / 1e6 / stats.wall if stats.wall > 0 else 0
+    return (f'{stats.bytes_in / 1e6:.2f} MB -> {stats.bytes_out / 1e6:.2f} MB '
+            f'in {stats.wall:.3f} s ({speed:.1f} MB/s)')
+
+
+def _add_projection_args(parser):
+    parser.add_argument('--systems', metavar='GNSS',
+                        help='only keep the observations of these GNSS systems, e.g. GE')
+    parser.add_argument('--satellites', metavar='PRNS',
+                        help='only keep the observations of these satellites, e.g. G01,G05,E11')
+    parser.add_argument('--obs-types', metavar='TYPES',
+                        help='only keep these observation types, e.g. C1C,L1C,C5Q,L5Q')
+
+
+def _add_common_args(parser):
+    parser.add_argument('-d', '--delete', action='store_true',
+                        help='delete the input file if conversion '
+                             'finishes without any errors and warnings')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                        help='number of files to process in parallel '
+                             '(default: 1, 0: number of CPUs)')
+    parser.add_argument('--progress', action='store_true',
+                        help='print the size and speed of each file to stderr once it is done')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the total sizes, timings and speeds of the conversion stages '
+                             'to stderr at the end')
+    parser.add_argument('--version', action='version', version=__version__)
+    parser.add_argument('--rnxcmp-version', action='version', version=rnxcmp_version)
+
+
+def _wrap(program, args):
+    try:
+        if args is None:
+            args = sys.argv[1:]
+        proc = _popen(program, args)
+        proc.wait()
+        return proc.returncode
+    except KeyboardInterrupt:
+        sys.stderr = open(os.devnull, 'w')
+        raise
+
+
+def rnx2crx(args: List[str] = None):
+    return _wrap('rnx2crx', args)
+
+
+def crx2rnx(args: List[str] = None):
+    return _wrap('crx2rnx', args)
@@ -0,0 +1,916 @@
+import bz2
+import gzip
+import io
+import mmap
+import os
+import re
+import struct
+import time
+import warnings
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional, Union
+
+import ncompress as lzw
+
+from .hatanaka import crx2rnx, rnx2crx
+from .stats import ConversionStats, StatsArg, _add_to_counters, _conversion, _count_input, \
+    _count_output, _nbytes, _stage, _timed
+
+__all__ = [
+    'decompress', 'decompress_on_disk', 'decompress_many', 'get_decompressed_path',
+    'compress', 'compress_on_disk', 'compress_many', 'get_compressed_path'
+]
+
+
+def decompress(content: Union[Path, str, bytes, memoryview, BinaryIO], *,
+               skip_strange_epochs: bool = False, strict: bool = False,
+               start: datetime = None, end: datetime = None,
+               interval: Union[float, timedelta] = None, threads: int = None,
+               systems: Iterable[str] = None, satellites: Iterable[str] = None,
+               obs_types: Iterable[str] = None, stats: StatsArg = None) -> bytes:
+    """Decompress compressed RINEX files.
+
+    Any RINEX files compressed with Hatanaka compression (.crx|.##d) and/or with a conventional
+    compression format (.gz|.Z|.zip|.bz2) are decompressed to their plain RINEX counterpart.
+    Already decompressed files are returned as is.
+
+    Compression type is deduced automatically from the file contents.
+
+    Parameters
+    ----------
+    content : Path or str or bytes-like or binary file object
+        Path to a compressed RINEX file or file contents as a bytes-like object
+        (bytes, bytearray, memoryview, mmap, ...) or as a binary file object.
+        Bytes-like objects are used without copying and large files are memory-mapped.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+        This option may be used for salvaging usable data when middle of the Compact
+        RINEX file is missing. The data after the missing part, are, however, useless
+        until the compression operation of all data are initialized at some epoch.
+        Using this together with of reinit_every_nth option of rnx2crx may be effective.
+        Caution: It is assumed that no change in the list of data types happens in the
+        lost part of the data.
+    strict : bool, default False
+        If True, a ValueError is raised if the decoded file is not RINEX.
+    start : datetime.datetime, optional
+        Only return the epochs from this time onwards (in the time system of the file).
+    end : datetime.datetime, optional
+        Only return the epochs before this time.
+        When start or end are given for a Compact RINEX file, only the part of the file
+        from the preceding epoch where all data arcs are initialized (see reinit_every_nth
+        of :func:`compress`) is decoded. An index built with :func:`build_index` is used
+        to also skip reading and decompressing the rest of the file, if available.
+    interval : float or datetime.timedelta, optional
+        Only return the epochs whose time is a multiple of this interval, in seconds.
+        Event records are kept. The epochs are selected by the Hatanaka decoder, which
+        skips the formatting of the others.
+    threads : int, optional
+        Number of threads for Hatanaka decompression. Defaults to the number of CPUs.
+        Large Compact RINEX files are split at the epochs where all data arcs are initialized
+        (see reinit_every_nth of :func:`compress`) and the parts are decoded in parallel.
+    systems : str or iterable of str, optional
+        Only return the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        Only return the observations of these satellites, e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        Only return these observation types, e.g. ['C1C', 'L1C'] (RINEX 3/4) or ['C1', 'L1'] (RINEX 2).
+        The unwanted data fields are dropped by the Hatanaka decoder without being formatted
+        and the observation type records of the header are rewritten to match.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
+
+    Returns
+    -------
+    bytes
+        Decompressed RINEX file contents.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression.
+    ValueError
+        For invalid file contents.
+    """
+    projection = _projection(systems, satellites, obs_types)
+    with _conversion(stats):
+        if start is not None or end is not None or interval is not None:
+            from .index import _decompress_range
+            txt = _decompress_range(content, start, end, _to_timedelta(interval),
+                                    skip_strange_epochs, threads, projection)
+        else:
+            with _open_input(content) as txt:
+                txt = bytes(_decompress(txt, skip_strange_epochs, strict, threads, projection)[1])
+        _count_output(txt)
+    return txt
+
+
+def decompress_on_disk(path: Union[Path, str], *, delete: bool = False,
+                       skip_strange_epochs: bool = False, strict: bool = False,
+                       start: datetime = None, end: datetime = None,
+                       interval: Union[float, timedelta] = None, threads: int = None,
+                       systems: Iterable[str] = None, satellites: Iterable[str] = None,
+                       obs_types: Iterable[str] = None, stats: StatsArg = None) -> Path:
+    """Decompress compressed RINEX files and write the resulting file to disk.
+
+    Any RINEX files compressed with Hatanaka compression (.crx|.##d) and/or with a conventional
+    compression format (.gz|.Z|.zip|.bz2) are decompressed to their plain RINEX counterpart.
+    Already decompressed files are ignored.
+
+    Compression type is deduced automatically from the file contents.
+
+    Parameters
+    ----------
+    path : Path or str
+        Path to a compressed RINEX file.
+    delete : bool, default False
+        Delete the source file after successful decompression if no errors or warnings were raised.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+        This option may be used for salvaging usable data when middle of the Compact
+        RINEX file is missing. The data after the missing part, are, however, useless
+        until the compression operation of all data are initialized at some epoch.
+        Using this together with of reinit_every_nth option of rnx2crx may be effective.
+        Caution: It is assumed that no change in the list of data types happens in the
+        lost part of the data.
+    strict : bool, default False
+        If True, a ValueError is raised if the decoded file is not RINEX.
+    start : datetime.datetime, optional
+        Only keep the epochs from this time onwards.
+    end : datetime.datetime, optional
+        Only keep the epochs before this time.
+    interval : float or datetime.timedelta, optional
+        Only keep the epochs whose time is a multiple of this interval, in seconds.
+    threads : int, optional
+        Number of threads for Hatanaka decompression. Defaults to the number of CPUs.
+        Large Compact RINEX files are split at the epochs where all data arcs are initialized
+        (see reinit_every_nth of :func:`compress`) and the parts are decoded in parallel.
+    systems : str or iterable of str, optional
+        Only keep the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        Only keep the observations of these satellites, e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        Only keep these observation types, e.g. ['C1C', 'L1C'] (RINEX 3/4) or ['C1', 'L1'] (RINEX 2).
+        The unwanted data fields are dropped by the Hatanaka decoder without being formatted
+        and the observation type records of the header are rewritten to match.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
+
+    Returns
+    -------
+    Path
+        Path to the decompressed RINEX file.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression.
+    ValueError
+        For invalid file contents.
+    """
+    path = Path(path)
+    projection = _projection(systems, satellites, obs_types)
+    with _conversion(stats), _record_warnings() as warning_list, ExitStack() as stack:
+        if start is not None or end is not None or interval is not None:
+            from .index import _decompress_range
+            txt = _decompress_range(path, start, end, _to_timedelta(interval),
+                                    skip_strange_epochs, threads, projection)
+        else:
+            txt = stack.enter_context(_open_input(path))
+            txt = _decompress(txt, skip_strange_epochs, strict, threads, projection)[1]
+        out_path = get_decompressed_path(path)
+        if out_path == path:
+            # file does not need decompressing
+            return out_path
+        _write_file(out_path, txt)
+    assert out_path.exists()
+    if delete:
+        if len(warning_list) == 0 and out_path != path:
+            path.unlink()
+    return out_path
+
+
+def decompress_many(paths: Iterable[Union[Path, str]], *, workers: int = None,
+                    delete: bool = False, skip_strange_epochs: bool = False,
+                    strict: bool = False, threads: int = None) -> List[Path]:
+    """Decompress several compressed RINEX files on disk in parallel.
+
+    Same as calling :func:`decompress_on_disk` for each file, but the files are processed
+    by a pool of worker processes.
+
+    Parameters
+    ----------
+    paths : iterable of Path or str
+        Paths to compressed RINEX files.
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, the files are processed sequentially in the current process.
+    delete : bool, default False
+        Delete each source file after successful decompression if no errors or warnings were
+        raised for it.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+    strict : bool, default False
+        If True, a ValueError is raised if the decoded file is not RINEX.
+    threads : int, optional
+        Number of threads for Hatanaka decompression of each file.
+        Defaults to 1 if there are several worker processes, otherwise to the number of CPUs.
+
+    Returns
+    -------
+    list of Path
+        Paths to the decompressed RINEX files, in the same order as the input paths.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression.
+    ValueError
+        For invalid file contents.
+        If several files fail, the first error is raised after all other files have been processed.
+
+    Warns
+    -----
+    Warnings for the individual files are re-raised in the calling process.
+    """
+    paths = list(paths)
+    if threads is None and workers != 1 and len(paths) > 1:
+        # the worker processes already keep the CPUs busy
+        threads = 1
+    return _raise_many(_run_many(
+        decompress_on_disk, paths, workers,
+        delete=delete, skip_strange_epochs=skip_strange_epochs, strict=strict, threads=threads))
+
+
+def get_decompressed_path(path: Union[Path, str]) -> Path:
+    """Get the decompressed path corresponding to a compressed RINEX file after decompression.
+
+    Parameters
+    ----------
+    path : path or str
+        Path to the compressed RINEX file.
+
+    Returns
+    -------
+    Path
+        The path of the resulting RINEX file after decompression.
+    """
+    path = Path(path)
+    parts = path.name.split('.')
+    if len(parts) <= 1:
+        raise ValueError(f"'{str(path)}' is not a valid RINEX file name")
+    if parts[-1].lower() in ['z', 'gz', 'bz2', 'zip']:
+        parts.pop()
+    suffix = parts[-1]
+    if len(parts) == 1:
+        return path.parent / (parts[0] + '.rnx')
+    elif re.fullmatch(r'\d\dd', suffix):
+        suffix = suffix[:2] + 'o'
+    elif re.fullmatch(r'\d\dD', suffix):
+        suffix = suffix[:2] + 'O'
+    elif suffix == 'crx':
+        suffix = 'rnx'
+    elif suffix == 'CRX':
+        suffix = 'RNX'
+    out_path = path.parent / '.'.join(parts[:-1] + [suffix])
+    return out_path
+
+
+def compress(content: Union[Path, str, bytes, memoryview, BinaryIO], *,
+             compression: str = 'gz', skip_strange_epochs: bool = False,
+             reinit_every_nth: int = None, compresslevel: int = None,
+             threads: int = None, workers: int = None, systems: Iterable[str] = None,
+             satellites: Iterable[str] = None, obs_types: Iterable[str] = None,
+             stats: StatsArg = None) -> bytes:
+    """Compress RINEX files.
+
+    Applies Hatanaka (if observation data) and optionally a conventional compression (gzip by default)
+    to the provided RINEX file. Already compressed files are returned as is.
+
+    Parameters
+    ----------
+    content : Path or str or bytes-like or binary file object
+        Path to a RINEX file or file contents as a bytes-like object
+        (bytes, bytearray, memoryview, mmap, ...) or as a binary file object.
+        Bytes-like objects are used without copying and large files are memory-mapped.
+    compression : 'gz' (default), 'bz2', 'Z' or 'none'
+        Which compression (if any) to apply in addition to the Hatanaka compression.
+    skip_strange_epochs : bool, default False
+        For Hatanaka compression. Warn and skip strange epochs instead of raising an exception.
+    reinit_every_nth : int, optional
+        For Hatanaka compression. Initialize the compression operation at every # epochs.
+        When some part of the Compact RINEX file is lost, the data can not be recovered
+        thereafter until all the data arc are initialized for differential operation.
+        This option may be used to increase chances to recover parts of data by using the
+        skip_strange option of crx2rnx at the cost of increasing the file size.
+    compresslevel : int, optional
+        Compression level of gzip and bzip2 from 1 (fastest) to 9 (smallest, default).
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression. Defaults to the number of CPUs.
+        Large files are compressed in independent blocks, the output does not depend on
+        the number of threads.
+    workers : int, optional
+        For Hatanaka compression. Split large files into up to this many parts at epoch
+        boundaries and compress them in parallel threads. The parts are joined into a single
+        Compact RINEX file in which all data arcs are initialized at the first epoch of each part,
+        as with reinit_every_nth. By default, the file is compressed in one go.
+    systems : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these satellites,
+        e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        For Hatanaka compression. Only keep these observation types, e.g. ['C1C', 'L1C'].
+        The observation type records of the header are rewritten to match.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
+
+    Returns
+    -------
+    bytes
+        Compressed RINEX file contents.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka compression.
+    ValueError
+        For invalid file contents.
+    """
+    projection = _projection(systems, satellites, obs_types)
+    with _conversion(stats), _open_input(content) as txt:
+        txt = bytes(_compress(txt, compression, skip_strange_epochs, reinit_every_nth,
+                              compresslevel, threads, workers, projection)[1])
+        _count_output(txt)
+    return txt
+
+
+def compress_on_disk(path: Union[Path, str], *, compression: str = 'gz', delete: bool = False,
+                     skip_strange_epochs: bool = False,
+                     reinit_every_nth: int = None, compresslevel: int = None,
+                     threads: int = None, workers: int = None, systems: Iterable[str] = None,
+                     satellites: Iterable[str] = None, obs_types: Iterable[str] = None,
+                     stats: StatsArg = None) -> Path:
+    """Compress RINEX files.
+
+    Applies Hatanaka (if observation data) and optionally a conventional compression (gzip by default)
+    to the provided RINEX file. Already compressed files are ignored.
+
+    Parameters
+    ----------
+    path : Path or str
+        Path to a RINEX file.
+    compression : 'gz' (default), 'bz2', 'Z', or 'none'
+        Which compression (if any) to apply in addition to the Hatanaka compression.
+    delete : bool, default False
+        Delete the source file after successful compression if no errors or warnings were raised.
+    skip_strange_epochs : bool, default False
+        For Hatanaka compression. Warn and skip strange epochs instead of raising an exception.
+    reinit_every_nth : int, optional
+        For Hatanaka compression. Initialize the compression operation at every # epochs.
+        When some part of the Compact RINEX file is lost, the data can not be recovered
+        thereafter until all the data arc are initialized for differential operation.
+        This option may be used to increase chances to recover parts of data by using the
+        skip_strange option of crx2rnx at the cost of increasing the file size.
+    compresslevel : int, optional
+        Compression level of gzip and bzip2 from 1 (fastest) to 9 (smallest, default).
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression. Defaults to the number of CPUs.
+        Large files are compressed in independent blocks, the output does not depend on
+        the number of threads.
+    workers : int, optional
+        For Hatanaka compression. Split large files into up to this many parts at epoch
+        boundaries and compress them in parallel threads. The parts are joined into a single
+        Compact RINEX file in which all data arcs are initialized at the first epoch of each part,
+        as with reinit_every_nth. By default, the file is compressed in one go.
+    systems : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these satellites,
+        e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        For Hatanaka compression. Only keep these observation types, e.g. ['C1C', 'L1C'].
+        The observation type records of the header are rewritten to match.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
+
+    Returns
+    -------
+    Path
+        Path to the compressed RINEX file.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka compression.
+    ValueError
+        For invalid file contents.
+    """
+    path = Path(path)
+    if path.name.lower().endswith(('.gz', '.bz2', '.z', '.zip')):
+        # already compressed
+        return path
+    with _conversion(stats), _record_warnings() as warning_list, _open_input(path) as txt:
+        is_obs, txt = _compress(txt, compression=compression,
+                                skip_strange_epochs=skip_strange_epochs,
+                                reinit_every_nth=reinit_every_nth,
+                                compresslevel=compresslevel, threads=threads,
+                                workers=workers,
+                                projection=_projection(systems, satellites, obs_types))
+        out_path = get_compressed_path(path, is_obs, compression)
+        if out_path == path:
+            return out_path
+        _write_file(out_path, txt)
+    assert out_path.exists()
+    if delete:
+        if len(warning_list) == 0:
+            path.unlink()
+    return out_path
+
+
+def compress_many(paths: Iterable[Union[Path, str]], *, workers: int = None,
+                  compression: str = 'gz', delete: bool = False,
+                  skip_strange_epochs: bool = False,
+                  reinit_every_nth: int = None, compresslevel: int = None,
+                  threads: int = None) -> List[Path]:
+    """Compress several RINEX files on disk in parallel.
+
+    Same as calling :func:`compress_on_disk` for each file, but the files are processed
+    by a pool of worker processes.
+
+    Parameters
+    ----------
+    paths : iterable of Path or str
+        Paths to RINEX files.
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, the files are processed sequentially in the current process.
+    compression : 'gz' (default), 'bz2', 'Z', or 'none'
+        Which compression (if any) to apply in addition to the Hatanaka compression.
+    delete : bool, default False
+        Delete each source file after successful compression if no errors or warnings were
+        raised for it.
+    skip_strange_epochs : bool, default False
+        For Hatanaka compression. Warn and skip strange epochs instead of raising an exception.
+    reinit_every_nth : int, optional
+        For Hatanaka compression. Initialize the compression operation at every # epochs.
+    compresslevel : int, optional
+        Compression level of gzip and bzip2 from 1 (fastest) to 9 (smallest, default).
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression of each file.
+        Defaults to 1 if several worker processes are used, otherwise to the number of CPUs.
+
+    Returns
+    -------
+    list of Path
+        Paths to the compressed RINEX files, in the same order as the input paths.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka compression.
+    ValueError
+        For invalid file contents.
+        If several files fail, the first error is raised after all other files have been processed.
+
+    Warns
+    -----
+    Warnings for the individual files are re-raised in the calling process.
+    """
+    paths = list(paths)
+    if threads is None and workers != 1 and len(paths) > 1:
+        # the worker processes already keep the CPUs busy
+        threads = 1
+    return _raise_many(_run_many(
+        compress_on_disk, paths, workers,
+        compression=compression, delete=delete, skip_strange_epochs=skip_strange_epochs,
+        reinit_every_nth=reinit_every_nth, compresslevel=compresslevel, threads=threads))
+
+
+def get_compressed_path(path, is_obs=None, compression='gz'):
+    """Get the compressed path corresponding to a RINEX file after compression.
+
+    Parameters
+    ----------
+    path : path or str
+        Path to the RINEX file being compressed.
+    is_obs : bool, optional
+        Whether the RINEX file contains observation data.
+        Needed for correct renaming of files with .rnx suffix,
+        which will be Hatanaka-compressed if they contain observation data.
+    compression : 'gz' (default), 'bz2', 'Z', or 'none'
+        Compression (if any) applied in addition to the Hatanaka compression.
+
+    Returns
+    -------
+    Path
+        The path of the resulting RINEX file after compression.
+    """
+    path = Path(path)
+    parts = path.name.split('.')
+    if len(parts) < 2:
+        raise ValueError(f"'{str(path)}' is not a valid RINEX file name")
+    suffix = parts[-1]
+    if re.fullmatch(r'\d\do', suffix):
+        suffix = suffix[:2] + 'd'
+    elif re.fullmatch(r'\d\dO', suffix):
+        suffix = suffix[:2] + 'D'
+    elif suffix.lower() == 'rnx':
+        if is_obs is None:
+            raise ValueError(f'whether {path.name} contains observation data is ambiguous, '
+                             'need to specify is_obs argument')
+        elif is_obs:
+            if suffix == 'RNX':
+                suffix = 'CRX'
+            else:
+                suffix = 'crx'
+    out_parts = parts[:-1] + [suffix]
+    if compression != 'none':
+        out_parts.append(compression)
+    out_path = path.parent / '.'.join(out_parts)
+    return out_path
+
+
+def _is_lzw(magic_bytes: bytes) -> bool:
+    return magic_bytes == b'\x1F\x9D'
+
+
+def _is_gz(magic_bytes: bytes) -> bool:
+    return magic_bytes == b'\x1F\x8B'
+
+
+def _is_zip(magic_bytes: bytes) -> bool:
+    return magic_bytes == b'\x50\x4B'
+
+
+def _is_bz2(magic_bytes: bytes) -> bool:
+    return magic_bytes == b'\x42\x5A'
+
+
+# files larger than this are memory-mapped instead of being read into memory
+_MMAP_THRESHOLD = 2 ** 20
+
+
+@contextmanager
+def _open_input(content):
+    """Provide the input of decompress() or compress() as a bytes-like object.
+
+    Paths and binary file objects are read or memory-mapped and buffer objects are passed through
+    without copying. The memory map, if any, is closed on exit.
+    """
+    if isinstance(content, (Path, str)):
+        with open(content, 'rb') as f, _read_file(f) as txt:
+            yield txt
+    elif isinstance(content, bytes):
+        _count_input(content)
+        yield content
+    elif isinstance(content, io.IOBase) or (hasattr(content, 'read') and not _is_buffer(content)):
+        with _read_file(content) as txt:
+            yield txt
+    else:
+        txt = _as_buffer(content)
+        _count_input(txt)
+        yield txt
+
+
+def _is_buffer(content) -> bool:
+    try:
+        memoryview(content).release()
+        return True
+    except TypeError:
+        return False
+
+
+def _as_buffer(content):
+    try:
+        return memoryview(content).cast('B')
+    except TypeError:
+        raise ValueError('input must be a path, a bytes-like object or a binary file object') from None
+
+
+@contextmanager
+def _read_file(f: BinaryIO):
+    if not isinstance(f.read(0), bytes):
+        raise ValueError('file object must be opened in binary mode')
+    try:
+        fileno = f.fileno()
+        pos = f.tell()
+        size = os.fstat(fileno).st_size - pos
+    except (AttributeError, OSError):
+        size = 0
+    if size <= 0 or size < _MMAP_THRESHOLD:
+        with _timed('read') as done:
+            txt = f.read()
+            done(len(txt))
+        yield txt
+        return
+    with _timed('read') as done:
+        # the pages are only read when accessed
+        m = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        done(size)
+    try:
+        yield memoryview(m)[pos:]
+        f.seek(0, io.SEEK_END)
+    finally:
+        try:
+            m.close()
+        except BufferError:
+            # a view of it is still referenced, e.g. from an exception traceback
+            pass
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable binary stream over a bytes-like object for the readers not accepting one directly."""
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._buffer[self._pos:self._pos + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def _write_file(path: Path, txt):
+    with _timed('write') as done, path.open('wb') as f:
+        f.write(txt)
+        done(_nbytes(txt))
+
+
+def _as_stream(txt):
+    return txt if isinstance(txt, bytes) else _BufferReader(txt)
+
+
+def _to_timedelta(seconds: Union[float, timedelta, None]) -> Optional[timedelta]:
+    if seconds is None or isinstance(seconds, timedelta):
+        return seconds
+    return timedelta(seconds=seconds)
+
+
+def _projection(systems, satellites, obs_types) -> dict:
+    return {k: v for k, v in dict(systems=systems, satellites=satellites,
+                                  obs_types=obs_types).items() if v is not None}
+
+
+def _project_rinex(txt: bytes, projection: dict) -> bytes:
+    """Apply a projection to plain RINEX observation data by passing it through the codec."""
+    if not projection:
+        return txt
+    return crx2rnx(rnx2crx(txt, **projection))
+
+
+def _decompress(txt: bytes, skip_strange_epochs: bool, strict: bool,
+                threads: int = None, projection: dict = None) -> (bool, bytes):
+    return _decompress_hatanaka(_decompress_container(txt), skip_strange_epochs, strict, threads,
+                                projection)
+
+
+@_stage('container_decode')
+def _decompress_container(txt: bytes) -> bytes:
+    if len(txt) < 2:
+        raise ValueError('empty file')
+    magic_bytes = bytes(txt[:2])
+
+    if _is_gz(magic_bytes):
+        return gzip.decompress(txt)
+    if _is_bz2(magic_bytes):
+        return bz2.decompress(txt)
+    elif _is_zip(magic_bytes):
+        with zipfile.ZipFile(_BufferReader(txt), 'r') as z:
+            flist = z.namelist()
+            if len(flist) == 0:
+                raise ValueError('zip archive is empty')
+            elif len(flist) > 1:
+                raise ValueError('more than one file in zip archive')
+            with z.open(flist[0], 'r') as f:
+                return f.read()
+    elif _is_lzw(magic_bytes):
+        return lzw.decompress(_as_stream(txt))
+    else:
+        return txt
+
+
+@_stage('hatanaka')
+def _decompress_hatanaka(txt: bytes, skip_strange_epochs, strict, threads=None,
+                         projection=None) -> (bool, bytes):
+    if len(txt) < 80:
+        raise ValueError('file is too short to be a valid RINEX file')
+    projection = projection or {}
+    header = bytes(txt[:80])
+    is_crinex = b'COMPACT RINEX' in header
+    if is_crinex:
+        txt = crx2rnx(txt, skip_strange_epochs=skip_strange_epochs, threads=threads, **projection)
+    elif strict and not header.endswith(b'RINEX VERSION / TYPE'):
+        raise ValueError('not a valid RINEX file')
+    is_obs = b'OBSERVATION DATA' in bytes(txt[:80])
+    if is_obs and not is_crinex:
+        txt = _project_rinex(txt, projection)
+    return is_obs, txt
+
+
+def _compress(txt: bytes, compression, skip_strange_epochs, reinit_every_nth,
+              compresslevel=None, threads=None, workers=None, projection=None) -> (bool, bytes):
+    _check_compression(compression)
+    is_obs, txt = _compress_hatanaka(txt, skip_strange_epochs, reinit_every_nth, workers,
+                                     projection)
+    return is_obs, _compress_container(txt, compression, compresslevel, threads)
+
+
+def _check_compression(compression):
+    if compression == 'zip':
+        raise NotImplementedError('zip compression is not supported')
+    elif compression not in _compressors:
+        raise ValueError(f"invalid compression '{compression}'")
+
+
+@_stage('container_encode')
+def _compress_container(txt: bytes, compression, compresslevel=None, threads=None) -> bytes:
+    if threads is None or threads <= 0:
+        threads = os.cpu_count() or 1
+    return _compressors[compression](txt, compresslevel, threads)
+
+
+# uncompressed size of the blocks compressed in parallel by _compress_gz()
+_GZ_BLOCK_SIZE = 2 ** 17
+# the largest back-reference distance of deflate
+_GZ_WINDOW_SIZE = 2 ** 15
+
+
+def _compress_gz(txt, compresslevel, threads):
+    """Compress to the gzip format in independent blocks like pigz.
+
+    Each block is deflated separately, primed with the preceding 32 kB of the input as a dictionary,
+    and ended on a byte boundary with a sync flush. The concatenated blocks form a single standard
+    deflate stream. The result does not depend on the number of threads.
+    """
+    if compresslevel is None:
+        compresslevel = 9
+    if len(txt) <= _GZ_BLOCK_SIZE:
+        return gzip.compress(txt, compresslevel)
+    view = memoryview(txt).cast('B')
+
+    def deflate(start):
+        c = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+                             **({'zdict': view[start - _GZ_WINDOW_SIZE:start]} if start else {}))
+        end = start + _GZ_BLOCK_SIZE
+        last = end >= len(view)
+        return c.compress(view[start:end]) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    xfl = {9: 2, 1: 4}.get(compresslevel, 0)
+    header = struct.pack('<4sLBB', b'\x1f\x8b\x08\x00', int(time.time()), xfl, 255)
+    blocks = _map_threads(deflate, range(0, len(view), _GZ_BLOCK_SIZE), threads)
+    trailer = struct.pack('<LL', zlib.crc32(view), len(view) & 0xffffffff)
+    return b''.join([header, *blocks, trailer])
+
+
+def _compress_bz2(txt, compresslevel, threads):
+    """Compress to the bzip2 format in independent streams like pbzip2.
+
+    Each bzip2 block is compressed as a separate stream. Multi-stream files are supported by
+    bzip2 itself and all common decompressors. The result does not depend on the number of threads.
+    """
+    if compresslevel is None:
+        compresslevel = 9
+    block_size = compresslevel * 100000
+    if len(txt) <= block_size:
+        return bz2.compress(txt, compresslevel)
+    view = memoryview(txt).cast('B')
+    blocks = _map_threads(lambda start: bz2.compress(view[start:start + block_size], compresslevel),
+                          range(0, len(view), block_size), threads)
+    return b''.join(blocks)
+
+
+def _compress_lzw(txt, compresslevel, threads):
+    return lzw.compress(_as_stream(txt))
+
+
+def _compress_none(txt, compresslevel, threads):
+    return txt
+
+
+def _map_threads(func, items, threads):
+    # zlib and bz2 release the GIL while compressing
+    if threads <= 1:
+        return [func(x) for x in items]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(func, items))
+
+
+# Compression backends by compression name.
+# Each is called with the data, the compression level (None for default) and the number of threads.
+_compressors = {
+    'gz': _compress_gz,
+    'bz2': _compress_bz2,
+    'Z': _compress_lzw,
+    'none': _compress_none,
+}
+
+
+@_stage('hatanaka')
+def _compress_hatanaka(txt: bytes, skip_strange_epochs, reinit_every_nth,
+                       workers=None, projection=None) -> (bool, bytes):
+    if len(txt) < 80:
+        raise ValueError('file is too short to be a valid RINEX file')
+
+    header = bytes(txt[:80])
+    is_obs = b'OBSERVATION DATA' in header
+    if is_obs:
+        return is_obs, rnx2crx(txt, skip_strange_epochs=skip_strange_epochs,
+                               reinit_every_nth=reinit_every_nth, workers=workers,
+                               **(projection or {}))
+    else:
+        is_obs = b'COMPACT RINEX' in header
+        return is_obs, txt
+
+
+def _run_on_disk(func_on_disk, path, kwargs):
+    """Run func_on_disk and return its result and warnings, or the exception raised by it,
+    and its ConversionStats."""
+    stats = ConversionStats()
+    with warnings.catch_warnings(record=True) as warning_list:
+        warnings.simplefilter('always')
+        try:
+            out_path = func_on_disk(path, stats=stats, **kwargs)
+            error = None
+        except Exception as e:
+            out_path = None
+            error = e
+    warning_list = [(w.category, str(w.message)) for w in warning_list]
+    return out_path, warning_list, error, stats
+
+
+def _run_many(func_on_disk, paths, workers, **kwargs):
+    """Apply func_on_disk to each path using a pool of worker processes.
+
+    Yields (path, out_path, warnings, error, stats) tuples in the order of the input paths.
+    The warnings are (category, message) tuples, which are left for the caller to report.
+    The stats of the files converted by the worker processes are added to the process-wide
+    counters of the calling process.
+    """
+    paths = [Path(p) for p in paths]
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        for path in paths:
+            yield (path,) + _run_on_disk(func_on_disk, path, kwargs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_on_disk, func_on_disk, path, kwargs) for path in paths]
+        for path, future in zip(paths, futures):
+            result = future.result()
+            _add_to_counters(result[-1])
+            yield (path,) + result
+
+
+def _raise_many(results):
+    out_paths = []
+    first_error = None
+    for path, out_path, warning_list, error, _ in results:
+        for category, message in warning_list:
+            warnings.warn(message, category)
+        if error is not None and first_error is None:
+            first_error = error
+        out_paths.append(out_path)
+    if first_error is not None:
+        raise first_error
+    return out_paths
+
+
+@contextmanager
+def _record_warnings():
+    with warnings.catch_warnings(record=True) as warning_list:
+        yield warning_list
+    for w in warning_list:
+        warnings.showwarning(message=w.message, category=w.category, filename=w.filename,
+                             lineno=w.lineno, file=w.file, line=w.line)
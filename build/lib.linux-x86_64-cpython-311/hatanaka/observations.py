@@ -0,0 +1,779 @@
+import io
+import queue
+import threading
+from array import array
+from collections import namedtuple
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+
+from . import hatanaka
+from .general_compression import _check_compression, _compress_container
+from .hatanaka import _check
+from .streaming import _CHUNK_SIZE, _decode_crinex, _open_rinex
+
+__all__ = ['iter_epochs', 'read_obs_arrays', 'write_obs_arrays', 'Epoch', 'Observation', 'ObsArrays']
+
+Observation = namedtuple('Observation', ['value', 'lli', 'ssi'])
+Observation.__doc__ = """A single observation of a satellite.
+
+value : float or None
+    Observed value, None if the data field is blank.
+lli : int or None
+    Loss of lock indicator.
+ssi : int or None
+    Signal strength indicator.
+"""
+
+ObsArrays = namedtuple('ObsArrays', ['time', 'flag', 'clock', 'satellites', 'obs_types',
+                                     'values', 'lli', 'ssi'])
+ObsArrays.__doc__ = """Observations of a RINEX file as NumPy arrays.
+
+time : numpy.ndarray of datetime64[ns], shape (n_epochs,)
+    Epoch times. NaT if missing.
+flag : numpy.ndarray of int8, shape (n_epochs,)
+    Epoch flags.
+clock : numpy.ndarray of float64, shape (n_epochs,)
+    Receiver clock offsets in seconds. NaN if not given.
+satellites : list of str
+    Satellites along the second axis of the observation arrays, sorted.
+obs_types : list of str
+    Observation types along the third axis of the observation arrays, in the order of their
+    first appearance in the header.
+values : numpy.ndarray of float64, shape (n_epochs, n_satellites, n_obs_types)
+    Observation values. NaN for blank or missing observations.
+lli : numpy.ndarray of int8, shape (n_epochs, n_satellites, n_obs_types)
+    Loss of lock indicators. -1 if blank.
+ssi : numpy.ndarray of int8, shape (n_epochs, n_satellites, n_obs_types)
+    Signal strength indicators. -1 if blank.
+"""
+
+# value of a blank data field in the arrays decoded by the extension module
+_MISSING_VALUE = -2 ** 63
+
+
+class Epoch:
+    """A single epoch of a RINEX observation file.
+
+    Attributes
+    ----------
+    time : datetime.datetime or None
+        Epoch time in the time system of the file. None for event records without a time.
+    flag : int
+        Epoch flag. 0: OK, 1: power failure since the previous epoch, 2-5: event records,
+        6: cycle slip records.
+    satellites : list of str
+        Satellites observed at this epoch, e.g. 'G01'.
+    clock : float or None
+        Receiver clock offset in seconds, if given.
+    records : list of str
+        Special records (header lines, comments, ...) following an event epoch.
+    """
+
+    __slots__ = ('time', 'flag', 'satellites', 'clock', 'records',
+                 '_obs_types', '_decode', '_observations')
+
+    def __init__(self, time, flag, satellites=(), clock=None, records=()):
+        self.time = time
+        self.flag = flag
+        self.satellites = list(satellites)
+        self.clock = clock
+        self.records = list(records)
+        self._obs_types = {}
+        # returns the values of all data fields in units of 0.001 and two flag bytes per field
+        self._decode = None
+        self._observations = None
+
+    @property
+    def observations(self) -> Dict[str, Dict[str, Observation]]:
+        """Observations of each satellite by observation type.
+
+        The observation values are only decoded on the first access.
+        """
+        if self._observations is None:
+            observations = {}
+            if self._decode is not None:
+                values, flags = self._decode()
+                pos = 0
+                for sat in self.satellites:
+                    types = _types_of(self._obs_types, sat)
+                    observations[sat] = {
+                        t: Observation(None if values[k] == _MISSING_VALUE else values[k] / 1000,
+                                       _int(flags[2 * k:2 * k + 1], None),
+                                       _int(flags[2 * k + 1:2 * k + 2], None))
+                        for t, k in zip(types, range(pos, pos + len(types)))}
+                    pos += len(types)
+            self._observations = observations
+            self._decode = None
+        return self._observations
+
+    def __repr__(self):
+        return (f'Epoch(time={self.time!r}, flag={self.flag}, satellites={self.satellites!r}, '
+                f'clock={self.clock!r})')
+
+
+def iter_epochs(file: Union[Path, str, bytes, BinaryIO], *,
+                skip_strange_epochs: bool = False) -> Iterator[Epoch]:
+    """Iterate over the epochs of a RINEX observation file.
+
+    The file is decoded on the fly while iterating, so only a single epoch is held in memory
+    at a time. The epoch time, flag, satellites and receiver clock offset are parsed for every
+    epoch, while the observation values are only decoded when
+    :attr:`Epoch.observations` is accessed.
+
+    Compact RINEX files are decoded directly into numbers by the ``hatanaka._rnxcmp`` extension
+    module without formatting the intermediate RINEX text, if the extension is available.
+
+    Parameters
+    ----------
+    file : Path or str or bytes or binary file-like
+        Path to a RINEX observation file (optionally Hatanaka-compressed and/or compressed
+        with .gz|.Z|.zip|.bz2), its contents or a file object opened in binary mode.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+
+    Yields
+    ------
+    Epoch
+        The epochs of the file, including any event records.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression. Raised when the erroneous part of the file
+        is reached.
+    ValueError
+        For invalid file contents.
+    """
+    with ExitStack() as stack:
+        header, stream = _open_rinex(file, stack)
+        stack.callback(stream.close)
+        if b'COMPACT RINEX' in header:
+            if hatanaka._rnxcmp is not None:
+                items = _decode_epochs(stream, skip_strange_epochs)
+                stack.callback(items.close)
+            else:
+                stream = _decode_crinex(stream, skip_strange_epochs)
+                stack.callback(stream.close)
+                items = io.BufferedReader(stream, _CHUNK_SIZE)
+        elif b'OBSERVATION DATA' in header:
+            items = io.BufferedReader(stream, _CHUNK_SIZE)
+        else:
+            raise ValueError('not a RINEX observation file')
+        yield from _parse_epochs(iter(items))
+
+
+def read_obs_arrays(file: Union[Path, str, bytes, BinaryIO], *,
+                    skip_strange_epochs: bool = False) -> ObsArrays:
+    """Read the observations of a RINEX observation file into NumPy arrays.
+
+    Compact RINEX files are decoded straight into numbers without the RINEX text as an
+    intermediate step if the ``hatanaka._rnxcmp`` extension module is available.
+    Requires NumPy, which can be installed with ``pip install hatanaka[numpy]``.
+
+    Only epochs with flags 0 and 1 are included, event records are left out.
+
+    Parameters
+    ----------
+    file : Path or str or bytes or binary file-like
+        Path to a RINEX observation file (optionally Hatanaka-compressed and/or compressed
+        with .gz|.Z|.zip|.bz2), its contents or a file object opened in binary mode.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+
+    Returns
+    -------
+    ObsArrays
+        The epoch times, flags and clock offsets and the observation values, LLI and SSI
+        as arrays of shape (n_epochs, n_satellites, n_obs_types).
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression.
+    ValueError
+        For invalid file contents.
+    ImportError
+        If NumPy is not installed.
+    """
+    np = _import_numpy('read_obs_arrays')
+    times = []
+    flags = []
+    clocks = []
+    sat_index = {}
+    type_index = {}
+    # indices of the data fields of each system in the observation types, by header
+    type_indices = {}
+    fields = []
+    no_types = np.empty(0, dtype=np.intp)
+    for epoch in iter_epochs(file, skip_strange_epochs=skip_strange_epochs):
+        if epoch.flag not in (0, 1):
+            continue
+        obs_types = epoch._obs_types
+        if id(obs_types) not in type_indices:
+            for types in obs_types.values():
+                for t in types:
+                    type_index.setdefault(t, len(type_index))
+            type_indices[id(obs_types)] = (obs_types, {
+                system: np.array([type_index[t] for t in types], dtype=np.intp)
+                for system, types in obs_types.items()})
+        indices = type_indices[id(obs_types)][1]
+        sats = [sat_index.setdefault(sat, len(sat_index)) for sat in epoch.satellites]
+        types = [indices.get(sat[0] if None not in indices else None, no_types)
+                 for sat in epoch.satellites]
+        values, epoch_flags = epoch._decode() if epoch._decode is not None else (b'', b'')
+        fields.append((len(times),
+                       np.repeat(np.array(sats, dtype=np.intp), [len(x) for x in types]),
+                       np.concatenate(types) if types else no_types,
+                       np.frombuffer(values, dtype=np.int64),
+                       np.frombuffer(epoch_flags, dtype=np.uint8)))
+        times.append(epoch.time)
+        flags.append(epoch.flag)
+        clocks.append(np.nan if epoch.clock is None else epoch.clock)
+
+    satellites = sorted(sat_index)
+    sat_order = np.empty(len(sat_index), dtype=np.intp)
+    sat_order[[sat_index[sat] for sat in satellites]] = np.arange(len(satellites))
+    shape = (len(times), len(satellites), len(type_index))
+    values = np.full(shape, np.nan)
+    lli = np.full(shape, -1, dtype=np.int8)
+    ssi = np.full(shape, -1, dtype=np.int8)
+    if fields:
+        epoch_idx = np.concatenate([np.full(len(f[1]), f[0], np.intp) for f in fields])
+        sat_idx = sat_order[np.concatenate([f[1] for f in fields])]
+        type_idx = np.concatenate([f[2] for f in fields])
+        raw = np.concatenate([f[3] for f in fields])
+        valid = raw != _MISSING_VALUE
+        values[epoch_idx[valid], sat_idx[valid], type_idx[valid]] = raw[valid] / 1000
+        raw_flags = np.concatenate([f[4] for f in fields]).reshape(-1, 2).astype(np.int16) - ord('0')
+        for out, col in ((lli, 0), (ssi, 1)):
+            digits = (raw_flags[:, col] >= 0) & (raw_flags[:, col] <= 9)
+            out[epoch_idx[digits], sat_idx[digits], type_idx[digits]] = raw_flags[digits, col]
+    return ObsArrays(
+        time=np.array([np.datetime64('NaT') if t is None else np.datetime64(t, 'ns') for t in times],
+                      dtype='datetime64[ns]'),
+        flag=np.array(flags, dtype=np.int8),
+        clock=np.array(clocks, dtype=np.float64),
+        satellites=satellites,
+        obs_types=list(type_index),
+        values=values,
+        lli=lli,
+        ssi=ssi,
+    )
+
+
+def write_obs_arrays(time, satellites: List[str], obs_types: List[str], values, lli=None,
+                     ssi=None, *, flag=None, clock=None, header: Dict[str, Any] = None,
+                     reinit_every_nth: int = None, compression: str = 'none') -> bytes:
+    """Encode observations given as NumPy arrays into a Compact RINEX 3 file.
+
+    The observations are differenced and encoded directly, without formatting them as
+    RINEX text first. The output is byte-identical to that of ``rnx2crx`` for the
+    equivalent RINEX 3 file, where the epochs list the satellites with any data in the given
+    order, the values are formatted as F14.3 and the clock offsets as F15.12.
+    Requires NumPy, which can be installed with ``pip install hatanaka[numpy]``.
+
+    The arguments match the fields of :class:`ObsArrays`, so the output of
+    :func:`read_obs_arrays` can be passed in as ``write_obs_arrays(**arrays._asdict())``.
+
+    Parameters
+    ----------
+    time : array-like of datetime64, shape (n_epochs,)
+        Epoch times. Rounded to 100 ns.
+    satellites : list of str
+        Satellite IDs along the second axis of the observation arrays, e.g. 'G01'.
+    obs_types : list of str
+        Observation types along the third axis of the observation arrays, e.g. 'C1C'.
+        The SYS / # / OBS TYPES header records list the types with any data for the
+        satellites of each system.
+    values : array-like of float, shape (n_epochs, n_satellites, n_obs_types)
+        Observation values, NaN for blank fields. Rounded to three decimals.
+    lli : array-like of int, shape (n_epochs, n_satellites, n_obs_types), optional
+        Loss of lock indicators from 0 to 9, negative if blank. Blank by default.
+    ssi : array-like of int, shape (n_epochs, n_satellites, n_obs_types), optional
+        Signal strength indicators from 0 to 9, negative if blank. Blank by default.
+    flag : array-like of int, shape (n_epochs,), optional
+        Epoch flags, either 0 (default) or 1.
+    clock : array-like of float, shape (n_epochs,), optional
+        Receiver clock offsets in seconds, NaN if not given.
+    header : dict, optional
+        Additional header records by their label, e.g. ``{'MARKER NAME': 'ABCD'}``, in the
+        order they are written. The values are the contents of the first 60 columns as a
+        string or a list of strings for records spanning several lines.
+        'RINEX VERSION / TYPE' defaults to version 3.04, while 'SYS / # / OBS TYPES' and
+        'END OF HEADER' are always generated.
+    reinit_every_nth : int, optional
+        Initialize the compression operation at every # epochs, as in :func:`rnx2crx`.
+    compression : 'none' (default), 'gz', 'bz2' or 'Z'
+        Which compression (if any) to apply in addition to the Hatanaka compression.
+
+    Returns
+    -------
+    bytes
+        Compact RINEX file contents.
+
+    Raises
+    ------
+    ValueError
+        For inconsistent arguments or values that do not fit in the RINEX data fields.
+    ImportError
+        If NumPy is not installed.
+    """
+    np = _import_numpy('write_obs_arrays')
+    _check_compression(compression)
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 3 or values.shape[1:] != (len(satellites), len(obs_types)):
+        raise ValueError('values must have the shape (n_epochs, n_satellites, n_obs_types)')
+    n_epochs = values.shape[0]
+    time = np.asarray(time, dtype='datetime64[ns]')
+    if time.shape != (n_epochs,) or np.isnat(time).any():
+        raise ValueError('time must have a valid epoch time for each epoch')
+    flag = np.zeros(n_epochs, np.int64) if flag is None else np.asarray(flag, np.int64)
+    clock = np.full(n_epochs, np.nan) if clock is None else np.asarray(clock, np.float64)
+    if flag.shape != (n_epochs,) or clock.shape != (n_epochs,):
+        raise ValueError('flag and clock must have a value for each epoch')
+    if not np.isin(flag, (0, 1)).all():
+        raise ValueError('only epoch flags 0 and 1 are supported')
+    if len(set(satellites)) != len(satellites) or any(len(sat) != 3 for sat in satellites):
+        raise ValueError('satellites must be unique three-character IDs')
+    if any(not 1 <= len(t) <= 3 for t in obs_types):
+        raise ValueError('observation types must be three-character codes')
+    if not (np.isnan(clock) | (np.abs(clock) < 10)).all():
+        raise ValueError('receiver clock offsets do not fit in the RINEX epoch record')
+    lli = _flag_chars(np, lli, values.shape)
+    ssi = _flag_chars(np, ssi, values.shape)
+    missing = np.isnan(values)
+    if np.isinf(values).any():
+        raise ValueError('observation values must be finite or NaN')
+    ints = _to_thousandths(np, np.where(missing, 0, values))
+    if (ints[~missing] >= 10 ** 13).any() or (ints[~missing] <= -10 ** 12).any():
+        raise ValueError('observation values do not fit in the RINEX data fields')
+
+    # the data fields of each satellite, with the observation types of its system
+    has_data = ~missing | (lli != 32) | (ssi != 32)
+    systems = list(dict.fromkeys(sat[0] for sat in satellites))
+    system_types = {}
+    for system in systems:
+        sats = [i for i, sat in enumerate(satellites) if sat[0] == system]
+        system_types[system] = np.flatnonzero(has_data[:, sats].any(axis=(0, 1)))
+    systems = [system for system in systems if len(system_types[system])]
+    field_sat = np.concatenate([np.full(len(system_types[sat[0]]), i, np.intp)
+                                for i, sat in enumerate(satellites)] + [np.empty(0, np.intp)])
+    field_type = np.concatenate([system_types[sat[0]] for sat in satellites] +
+                                [np.empty(0, np.intp)])
+    bounds = np.cumsum([0] + [len(system_types[sat[0]]) for sat in satellites]).tolist()
+    present = has_data[:, field_sat, field_type]
+    sat_present = np.zeros((n_epochs, len(satellites)), bool)
+    np.logical_or.at(sat_present, (slice(None), field_sat), present)
+    missing = missing[:, field_sat, field_type]
+    ints = ints[:, field_sat, field_type]
+    # the upper digits of the values, which the detection of cycle slips is based on
+    upper = np.sign(ints) * (np.abs(ints) // 100000)
+    flags = np.stack([lli[:, field_sat, field_type], ssi[:, field_sat, field_type]], axis=-1)
+    flags = flags.reshape(n_epochs, -1)
+
+    lines = [_crx_header(header, systems, system_types, obs_types)]
+    n_fields = len(field_sat)
+    columns = np.arange(n_fields)
+    diffs = np.zeros((_ARC_ORDER + 1, n_fields), np.int64)
+    upper_diffs = np.zeros((_ARC_ORDER + 1, n_fields), np.int64)
+    orders = np.full(n_fields, -1)
+    prev_sats = {}
+    prev_flags = None
+    epoch_lines = _epoch_lines(np, time, flag)
+    old_line = '&'
+    clock_diffs = [0] * (_ARC_ORDER + 1)
+    clock_order = -1
+    for t in range(n_epochs):
+        if reinit_every_nth and reinit_every_nth > 0 and t > 0 and t % reinit_every_nth == 0:
+            old_line = '&'
+            clock_order = -1
+            prev_sats = {}
+            orders[:] = -1
+
+        # take the differences of all data fields up to the order of their arcs at once
+        new_diffs = np.empty_like(diffs)
+        new_upper_diffs = np.empty_like(upper_diffs)
+        new_diffs[0] = ints[t]
+        new_upper_diffs[0] = upper[t]
+        for k in range(_ARC_ORDER):
+            new_diffs[k + 1] = new_diffs[k] - diffs[k]
+            new_upper_diffs[k + 1] = new_upper_diffs[k] - upper_diffs[k]
+        init = orders < 0
+        orders = np.minimum(orders + 1, _ARC_ORDER)
+        # initialize the arc on large cycle slips
+        init |= np.abs(new_upper_diffs[orders, columns]) > 100000
+        orders[init] = 0
+        orders[missing[t]] = -1
+        out = new_diffs[orders, columns].tolist()
+        init = init.tolist()
+        blank = missing[t].tolist()
+        diffs, upper_diffs = new_diffs, new_upper_diffs
+
+        sats = np.flatnonzero(sat_present[t]).tolist()
+        new_line = f'{epoch_lines[t]}{len(sats):3d}'.ljust(41) + ''.join(satellites[i] for i in sats)
+        lines.append(_strdiff(old_line, new_line))
+        old_line = new_line
+        if np.isnan(clock[t]):
+            clock_order = -1
+            lines.append('\n')
+        else:
+            clock_order = min(clock_order + 1, _ARC_ORDER)
+            value = int(f'{clock[t]:.12f}'.replace('.', ''))
+            new_clock_diffs = [value]
+            for k in range(clock_order):
+                new_clock_diffs.append(new_clock_diffs[k] - clock_diffs[k])
+            clock_diffs = new_clock_diffs + [0] * (_ARC_ORDER - clock_order)
+            lines.append(('3&' if clock_order == 0 else '') + str(clock_diffs[clock_order]) + '\n')
+
+        epoch_flags = flags[t].tobytes().decode('ascii')
+        if prev_flags is not None:
+            flag_diffs = _flag_diffs(np, prev_flags, flags[t]).tobytes().decode('ascii')
+        for i in sats:
+            start, end = bounds[i], bounds[i + 1]
+            data = ' '.join('' if blank[k] else ('3&' if init[k] else '') + str(out[k])
+                            for k in range(start, end))
+            if i in prev_sats:
+                sat_flags = flag_diffs[2 * start:2 * end]
+            else:
+                sat_flags = epoch_flags[2 * start:2 * end].replace(' ', '&')
+            lines.append((data + ' ' + sat_flags).rstrip(' ') + '\n')
+        prev_sats = set(sats)
+        prev_flags = flags[t]
+
+    crx = ''.join(lines).encode('ascii')
+    return _compress_container(crx, compression)
+
+
+# order of the differences taken by rnx2crx
+_ARC_ORDER = 3
+
+
+def _import_numpy(func_name):
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(f'{func_name}() requires NumPy, '
+                          f'install it with "pip install hatanaka[numpy]"') from e
+    return numpy
+
+
+def _flag_chars(np, flags, shape):
+    """Convert LLI or SSI values into the ASCII codes of their characters."""
+    if flags is None:
+        return np.full(shape, 32, np.uint8)
+    flags = np.asarray(flags)
+    if flags.shape != shape:
+        raise ValueError('lli and ssi must have the same shape as values')
+    if (flags > 9).any():
+        raise ValueError('lli and ssi must be single digits')
+    return np.where(flags < 0, 32, flags + 48).astype(np.uint8)
+
+
+def _to_thousandths(np, values):
+    """Round values to integers in units of 0.001 the same way as formatting them as F14.3."""
+    scaled = values * 1000
+    ints = np.rint(scaled)
+    # the product may have been rounded across a rounding boundary
+    unsure = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    ints[unsure] = [int(f'{x:.3f}'.replace('.', '')) for x in values[unsure].tolist()]
+    return ints.astype(np.int64)
+
+
+def _epoch_lines(np, time, flag):
+    """Format the epoch records of RINEX 3 up to the epoch flag."""
+    ticks = (time.astype(np.int64) + 50) // 100 * 100
+    time = ticks.astype('datetime64[ns]')
+    days = time.astype('datetime64[D]')
+    months = time.astype('datetime64[M]')
+    year = time.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (days - months).astype(np.int64) + 1
+    ns = (time - days).astype(np.int64)
+    hour, ns = np.divmod(ns, 3600 * 10 ** 9)
+    minute, ns = np.divmod(ns, 60 * 10 ** 9)
+    second, ns = np.divmod(ns, 10 ** 9)
+    return [f'> {y:4d} {m:02d} {d:02d} {h:02d} {mi:02d}{s:3d}.{f // 100:07d}  {fl:d}'
+            for y, m, d, h, mi, s, f, fl in zip(year.tolist(), month.tolist(), day.tolist(),
+                                                 hour.tolist(), minute.tolist(),
+                                                 second.tolist(), ns.tolist(), flag.tolist())]
+
+
+def _crx_header(header, systems, system_types, obs_types):
+    records = []
+    header = dict(header or {})
+    if 'SYS / # / OBS TYPES' in header or 'END OF HEADER' in header:
+        raise ValueError("'SYS / # / OBS TYPES' and 'END OF HEADER' are generated "
+                         "from the observation types and cannot be given")
+    if 'RINEX VERSION / TYPE' not in header:
+        system = systems[0] if len(systems) == 1 else 'M'
+        header = {'RINEX VERSION / TYPE': f'{"3.04":>9}{"":11}{"OBSERVATION DATA":20}{system}',
+                  **header}
+    for label, contents in header.items():
+        for line in [contents] if isinstance(contents, str) else contents:
+            if len(line) > 60 or len(label) > 20:
+                raise ValueError(f'header record is too long: {line!r}')
+            records.append(line.ljust(60) + label)
+    version = records[0]
+    if (not version.endswith('RINEX VERSION / TYPE') or version[20:21] != 'O' or
+            int(float(version[:9])) not in (3, 4)):
+        raise ValueError('only RINEX 3 and 4 observation files are supported')
+    for system in systems:
+        types = [obs_types[j] for j in system_types[system].tolist()]
+        for i in range(0, max(len(types), 1), 13):
+            prefix = f'{system}  {len(types):3d}' if i == 0 else ' ' * 6
+            line = prefix + ''.join(f' {t:3}' for t in types[i:i + 13])
+            records.append(line.ljust(60) + 'SYS / # / OBS TYPES')
+    records.append(' ' * 60 + 'END OF HEADER')
+    prog = 'RNX2CRX ver.4.1.0'
+    date = datetime.now(timezone.utc).strftime('%d-%b-%y %H:%M')
+    lines = [f'{"3.0":20}{"COMPACT RINEX FORMAT":40}CRINEX VERS   / TYPE',
+             f'{prog:40}{date:20}CRINEX PROG / DATE']
+    lines += [x.rstrip(' ') for x in records]
+    return '\n'.join(lines) + '\n'
+
+
+def _strdiff(old, new):
+    """The changes of a line relative to the previous one as encoded by rnx2crx."""
+    diff = ''.join(' ' if a == b else '&' if b == ' ' else b for a, b in zip(old, new))
+    if len(old) > len(new):
+        diff += ''.join(' ' if c == ' ' else '&' for c in old[len(new):])
+    else:
+        diff += new[len(old):]
+    return diff.rstrip(' ') + '\n'
+
+
+def _flag_diffs(np, old, new):
+    """Vectorized _strdiff() of the LLI and SSI flags of all fields of an epoch."""
+    return np.where(old == new, 32, np.where(new == 32, ord('&'), new)).astype(np.uint8)
+
+
+# decoded epoch as passed to the epoch callback of _rnxcmp.crx2rnx_epochs()
+_Decoded = namedtuple('_Decoded', ['line', 'sat_list', 'ntype', 'values', 'flags', 'clock'])
+
+
+def _decode_epochs(stream, skip_strange_epochs):
+    """Decode Compact RINEX from a stream with the extension module.
+
+    Yields the lines of the header and the event records and a _Decoded tuple for each of
+    the other epochs, in the order they appear in the file.
+    """
+    items = queue.Queue(64)
+    cancelled = False
+    done = object()
+
+    def put(item):
+        if cancelled:
+            raise BrokenPipeError('the reader has been closed')
+        items.put(item)
+
+    def run():
+        result = error = None
+        try:
+            result = hatanaka._rnxcmp.crx2rnx_epochs(
+                stream.read, put, lambda *args: put(_Decoded(*args)),
+                skip_strange_epochs=skip_strange_epochs)
+        except BaseException as e:
+            error = e
+        items.put((done, result, error))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    item = None
+    try:
+        pending = b''
+        while True:
+            item = items.get()
+            if isinstance(item, _Decoded):
+                yield item
+            elif isinstance(item, tuple) and item[0] is done:
+                break
+            else:
+                lines = (pending + item).splitlines(keepends=True)
+                pending = lines.pop() if not lines[-1].endswith(b'\n') else b''
+                yield from lines
+        if pending:
+            yield pending
+        thread.join()
+        _, result, error = item
+        if error is not None:
+            raise error
+        _check('crx2rnx', *result)
+    finally:
+        if thread.is_alive():
+            cancelled = True
+            # unblock the decoder and wait for it to stop
+            while not (isinstance(item, tuple) and item[0] is done):
+                item = items.get()
+            thread.join()
+
+
+def _parse_epochs(items):
+    """Parse a RINEX observation file given as an iterator of lines and _Decoded epochs."""
+    line = next(items, b'')
+    if not line[60:].startswith(b'RINEX VERSION / TYPE'):
+        raise ValueError('not a valid RINEX file')
+    version = int(float(line[:9]))
+    header = []
+    for line in items:
+        if line[60:].startswith(b'END OF HEADER'):
+            break
+        header.append(line)
+    obs_types = _parse_obs_types(header, version, {})
+
+    for item in items:
+        if isinstance(item, _Decoded):
+            yield _decoded_epoch(item, version, obs_types)
+            continue
+        line = item.rstrip(b'\r\n')
+        if not line.strip():
+            continue
+        epoch = _parse_epoch_line(line, version)
+        if 2 <= epoch.flag <= 5:
+            n = _int(line[29:32] if version < 3 else line[32:35])
+            records = [next(items).rstrip(b'\r\n') for _ in range(n)]
+            obs_types = _parse_obs_types(records, version, obs_types)
+            epoch.records = [x.decode('ascii', errors='ignore') for x in records]
+        else:
+            _read_epoch_data(epoch, line, items, version, obs_types)
+        yield epoch
+
+
+def _parse_obs_types(lines, version, obs_types):
+    """Return a copy of the observation types by satellite system updated from header lines."""
+    obs_types = dict(obs_types)
+    system = None
+    for line in lines:
+        label = line[60:80].rstrip()
+        if version >= 3 and label == b'SYS / # / OBS TYPES':
+            if line[:1] != b' ':
+                system = line[:1].decode()
+                obs_types[system] = []
+            obs_types[system] = obs_types[system] + line[7:60].decode().split()
+        elif version < 3 and label == b'# / TYPES OF OBSERV':
+            if line[:6].strip():
+                obs_types[None] = []
+            obs_types[None] = obs_types[None] + line[6:60].decode().split()
+    return obs_types
+
+
+def _types_of(obs_types, sat):
+    return obs_types.get(sat[0] if None not in obs_types else None, [])
+
+
+def _parse_epoch_line(line, version):
+    if version < 3:
+        time_fields = [line[1:3], line[4:6], line[7:9], line[10:12], line[13:15], line[15:26]]
+        flag = line[28:29]
+    else:
+        time_fields = [line[2:6], line[7:9], line[10:12], line[13:15], line[16:18], line[18:29]]
+        flag = line[31:32]
+    if all(x.strip() for x in time_fields):
+        year, month, day, hour, minute = (int(x) for x in time_fields[:5])
+        if version < 3:
+            year += 2000 if year < 80 else 1900
+        time = datetime(year, month, day, hour, minute) + timedelta(seconds=float(time_fields[5]))
+    else:
+        time = None
+    return Epoch(time, _int(flag))
+
+
+def _read_epoch_data(epoch, line, items, version, obs_types):
+    if version < 3:
+        nsat = _int(line[29:32])
+        sat_list = line[32:68]
+        while len(sat_list) < 3 * nsat:
+            sat_list += next(items)[32:68].rstrip(b'\r\n')
+        epoch.clock = _float(line[68:80])
+    else:
+        nsat = _int(line[32:35])
+        sat_list = None
+        epoch.clock = _float(line[41:56])
+    lines = []
+    sats = []
+    for i in range(nsat):
+        if version < 3:
+            sat = sat_list[3 * i:3 * i + 3]
+            n_lines = max(1, (len(obs_types.get(None, [])) + 4) // 5)
+            data = b''.join(next(items).rstrip(b'\r\n').ljust(80)[:80] for _ in range(n_lines))
+        else:
+            data = next(items).rstrip(b'\r\n')
+            sat, data = data[:3], data[3:]
+        sat = _sat_id(sat)
+        sats.append(sat)
+        lines.append(data)
+    epoch.satellites = sats
+    epoch._obs_types = obs_types
+
+    def decode():
+        values = array('q')
+        flags = []
+        for sat, data in zip(sats, lines):
+            n = len(_types_of(obs_types, sat))
+            data = data.ljust(16 * n)
+            for j in range(n):
+                values.append(_value(data[16 * j:16 * j + 14]))
+                flags.append(data[16 * j + 14:16 * j + 16])
+        return values, b''.join(flags)
+
+    epoch._decode = decode
+
+
+def _decoded_epoch(item, version, obs_types):
+    epoch = _parse_epoch_line(item.line, version)
+    sat_list = item.sat_list
+    epoch.satellites = [_sat_id(sat_list[i:i + 3]) for i in range(0, len(sat_list), 3)]
+    if item.clock is not None:
+        epoch.clock = item.clock / (1e9 if version < 3 else 1e12)
+    epoch._obs_types = obs_types
+
+    def decode():
+        ntype = array('i', item.ntype)
+        values = array('q', item.values)
+        flags = item.flags
+        if all(n == len(_types_of(obs_types, sat)) for sat, n in zip(epoch.satellites, ntype)):
+            return values, flags
+        # align the decoded fields with the observation types of the header
+        aligned = array('q')
+        aligned_flags = []
+        pos = 0
+        for sat, n in zip(epoch.satellites, ntype):
+            m = len(_types_of(obs_types, sat))
+            k = min(n, m)
+            aligned.extend(values[pos:pos + k])
+            aligned.extend([_MISSING_VALUE] * (m - k))
+            aligned_flags.append(flags[2 * pos:2 * (pos + k)] + b'  ' * (m - k))
+            pos += n
+        return aligned, b''.join(aligned_flags)
+
+    epoch._decode = decode
+    return epoch
+
+
+def _sat_id(sat: bytes) -> str:
+    sat = sat.decode('ascii', errors='ignore')
+    # a blank system identifier stands for GPS in RINEX 2
+    return (sat[:1] if sat[:1] != ' ' else 'G') + sat[1:].replace(' ', '0')
+
+
+def _int(s: bytes, default=0) -> Optional[int]:
+    s = s.strip()
+    return int(s) if s.isdigit() else default
+
+
+def _float(s: bytes) -> Optional[float]:
+    s = s.strip()
+    return float(s) if s else None
+
+
+def _value(s: bytes) -> int:
+    """Parse an F14.3 data field into an integer in units of 0.001."""
+    s = s.strip()
+    if not s:
+        return _MISSING_VALUE
+    if s[-4:-3] == b'.':
+        return int(s.replace(b'.', b''))
+    return round(float(s) * 1000)
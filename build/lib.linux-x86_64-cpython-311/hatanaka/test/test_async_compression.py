@@ -0,0 +1,64 @@
+import asyncio
+import shutil
+
+import pytest
+
+from hatanaka import HatanakaException, acompress, adecompress, decompress, \
+    set_max_concurrent_conversions
+from .conftest import clean, compress_pairs, decompress_pairs, get_data_path
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+@pytest.mark.parametrize(
+    'input_suffix, expected_suffix',
+    decompress_pairs
+)
+def test_adecompress(tmp_path, rnx_bytes, input_suffix, expected_suffix):
+    # prepare
+    sample_path = tmp_path / ('sample' + input_suffix)
+    shutil.copy(get_data_path('sample' + input_suffix), sample_path)
+    # decompress
+    converted = asyncio.run(adecompress(sample_path))
+    # check
+    assert clean(converted) == clean(rnx_bytes)
+    converted = asyncio.run(adecompress(sample_path.read_bytes()))
+    assert clean(converted) == clean(rnx_bytes)
+
+
+@pytest.mark.parametrize(
+    'input_suffix, compression, expected_suffix',
+    compress_pairs
+)
+def test_acompress(tmp_path, rnx_bytes, input_suffix, compression, expected_suffix):
+    # prepare
+    sample_path = tmp_path / ('sample' + input_suffix)
+    shutil.copy(get_data_path('sample' + input_suffix), sample_path)
+    # compress
+    converted = asyncio.run(acompress(sample_path, compression=compression))
+    # check
+    assert clean(decompress(converted)) == clean(rnx_bytes)
+
+
+def test_async_concurrent(crx_bytes, rnx_bytes):
+    async def run():
+        return await asyncio.gather(*[adecompress(crx_bytes) for _ in range(8)])
+
+    set_max_concurrent_conversions(2)
+    try:
+        results = asyncio.run(run())
+    finally:
+        set_max_concurrent_conversions()
+    assert all(clean(x) == clean(rnx_bytes) for x in results)
+
+
+def test_async_errors(crx_bytes, rnx_bytes):
+    with pytest.raises(HatanakaException):
+        asyncio.run(adecompress(crx_bytes[:-10]))
+    with pytest.warns(UserWarning) as record:
+        asyncio.run(acompress(rnx_bytes + b'\0\0\0'))
+    assert record[0].message.args[0].startswith('rnx2crx: null characters')
+    with pytest.raises(ValueError):
+        asyncio.run(acompress(rnx_bytes, compression='xz'))
+    with pytest.raises(ValueError):
+        set_max_concurrent_conversions(0)
@@ -0,0 +1,207 @@
+import io
+import shutil
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+from hatanaka.cli import compress_cli, decompress, decompress_cli
+from .conftest import clean, compress_pairs, decompress_pairs, get_data_path
+
+
+@contextmanager
+def replace_stdin(content):
+    orig = sys.stdin
+    target = io.BytesIO()
+    target.write(content)
+    target.seek(0)
+    target.buffer = target
+    sys.stdin = target
+    yield
+    sys.stdin = orig
+
+
+@contextmanager
+def replace_stdout():
+    orig = sys.stdout
+    target = io.BytesIO()
+    sys.stdout = target
+    target.buffer = target
+    yield target
+    target.seek(0)
+    sys.stdout = orig
+
+
+@pytest.mark.parametrize(
+    'input_suffix, expected_suffix',
+    decompress_pairs
+)
+def test_decompress_cli(tmp_path, crx_sample, rnx_str, input_suffix, expected_suffix):
+    # prepare
+    in_file = 'sample' + input_suffix
+    sample_path = tmp_path / in_file
+    shutil.copy(get_data_path(in_file), sample_path)
+    # decompress
+    retcode = decompress_cli([str(sample_path)])
+    # check
+    assert retcode == 0
+    expected_path = tmp_path / ('sample' + expected_suffix)
+    assert sample_path.exists()
+    assert expected_path.exists()
+    assert clean(expected_path.read_text()) == clean(rnx_str)
+
+
+@pytest.mark.parametrize(
+    'input_suffix, compression, expected_suffix',
+    compress_pairs
+)
+def test_compress_cli(tmp_path, crx_sample, rnx_bytes, input_suffix, compression,
+                      expected_suffix):
+    # prepare
+    in_file = 'sample' + input_suffix
+    sample_path = tmp_path / in_file
+    shutil.copy(get_data_path(in_file), sample_path)
+    # compress
+    retcode = compress_cli([
+        str(sample_path),
+        '--compression', compression
+    ])
+    # check
+    assert retcode == 0
+    expected_path = tmp_path / ('sample' + expected_suffix)
+    assert sample_path.exists()
+    assert expected_path.exists()
+    assert clean(decompress(expected_path)) == clean(rnx_bytes)
+
+
+def test_decompress_cli_stdin(rnx_bytes):
+    in_data = get_data_path('sample.crx.gz').read_bytes()
+    with replace_stdin(in_data), replace_stdout() as stdout:
+        decompress_cli([])
+    assert clean(stdout.getvalue()) == clean(rnx_bytes)
+
+
+def test_compress_cli_stdin(rnx_bytes):
+    in_data = get_data_path('sample.rnx').read_bytes()
+    with replace_stdin(in_data), replace_stdout() as stdout:
+        compress_cli([])
+    result = stdout.getvalue()
+    assert clean(result) != clean(rnx_bytes)
+    assert clean(decompress(result)) == clean(rnx_bytes)
+
+
+def test_cli_delete(tmp_path, rnx_bytes):
+    # prepare
+    in_file = 'sample.rnx'
+    sample_path = tmp_path / in_file
+    shutil.copy(get_data_path(in_file), sample_path)
+    # compress
+    retcode = compress_cli([str(sample_path), '--delete'])
+    # check
+    assert retcode == 0
+    expected_path = tmp_path / 'sample.crx.gz'
+    assert not sample_path.exists()
+    assert expected_path.exists()
+    assert clean(decompress(expected_path)) == clean(rnx_bytes)
+
+
+def test_cli_no_delete_on_warnings(tmp_path, rnx_bytes):
+    # prepare
+    in_file = 'sample.rnx'
+    sample_path = tmp_path / in_file
+    txt = get_data_path(in_file).read_bytes()
+    sample_path.write_bytes(txt + b'\0\0\0')
+    # compress
+    with pytest.warns(UserWarning) as record:
+        retcode = compress_cli([str(sample_path), '--delete'])
+    # check
+    assert len(record) == 1
+    assert record[0].message.args[0].startswith('rnx2crx: null characters')
+    assert retcode == 2
+    expected_path = tmp_path / 'sample.crx.gz'
+    assert sample_path.exists()
+    assert expected_path.exists()
+    assert clean(decompress(expected_path)) == clean(rnx_bytes)
+
+
+def test_cli_no_delete_unchanged(tmp_path, rnx_str):
+    # prepare
+    in_file = 'sample.crx.gz'
+    sample_path = tmp_path / in_file
+    shutil.copy(get_data_path(in_file), sample_path)
+    # compress
+    retcode = compress_cli([str(sample_path), '--delete'])
+    # check
+    assert retcode == 0
+    expected_path = tmp_path / 'sample.crx.gz'
+    assert sample_path.exists()
+    assert expected_path == sample_path
+
+
+def test_compress_cli_level(tmp_path, rnx_bytes):
+    sample_path = tmp_path / 'sample.rnx'
+    sample_path.write_bytes(rnx_bytes)
+    assert compress_cli([str(sample_path), '-c', 'bz2', '-l', '1']) == 0
+    out_path = tmp_path / 'sample.crx.bz2'
+    assert out_path.read_bytes()[:4] == b'BZh1'
+    assert clean(decompress(out_path)) == clean(rnx_bytes)
+    with pytest.raises(SystemExit):
+        compress_cli([str(sample_path), '-l', '10'])
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_cli_jobs(tmp_path, rnx_bytes, jobs):
+    # prepare
+    paths = []
+    for i in range(3):
+        sample_path = tmp_path / f'sample{i}.crx.gz'
+        shutil.copy(get_data_path('sample.crx.gz'), sample_path)
+        paths.append(str(sample_path))
+    # decompress
+    retcode = decompress_cli(paths + ['--jobs', jobs])
+    # check
+    assert retcode == 0
+    for i in range(3):
+        assert clean((tmp_path / f'sample{i}.rnx').read_bytes()) == clean(rnx_bytes)
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_cli_jobs_exit_codes(tmp_path, rnx_bytes, jobs):
+    # prepare
+    bad_path = tmp_path / 'bad.rnx'
+    bad_path.write_bytes(rnx_bytes[:-100])
+    warn_path = tmp_path / 'warn.rnx'
+    warn_path.write_bytes(rnx_bytes + b'\0\0\0')
+    good_path = tmp_path / 'good.rnx'
+    good_path.write_bytes(rnx_bytes)
+    # compress
+    with pytest.warns(UserWarning):
+        retcode = compress_cli([str(warn_path), str(good_path), '-j', jobs])
+    assert retcode == 2
+    with pytest.warns(UserWarning):
+        retcode = compress_cli([str(bad_path), str(warn_path), str(good_path), '-j', jobs])
+    assert retcode == 1
+    assert (tmp_path / 'good.crx.gz').exists()
+
+
+def test_decompress_cli_epoch_selection(tmp_path, rnx_bytes):
+    sample_path = tmp_path / 'sample.crx'
+    shutil.copy(get_data_path('sample.crx'), sample_path)
+    assert decompress_cli([str(sample_path), '--interval', '60']) == 0
+    header = rnx_bytes[:rnx_bytes.index(b'END OF HEADER\n') + 14]
+    assert (tmp_path / 'sample.rnx').read_bytes() == header
+    with replace_stdin(get_data_path('sample.crx').read_bytes()), replace_stdout() as stdout:
+        assert decompress_cli(['--start', '2010-03-05T00:00:30', '--end', '2010-03-05T00:01']) == 0
+    assert stdout.read() == rnx_bytes
+
+
+def test_cli_projection(tmp_path):
+    sample_path = tmp_path / 'sample.crx'
+    shutil.copy(get_data_path('sample.crx'), sample_path)
+    assert decompress_cli([str(sample_path), '--systems', 'GS', '--obs-types', 'C1C,L1C']) == 0
+    expected = decompress(sample_path.read_bytes(), systems='GS', obs_types='C1C,L1C')
+    assert (tmp_path / 'sample.rnx').read_bytes() == expected
+    assert b'G    2 L1C C1C' in expected
+    with replace_stdin(expected), replace_stdout() as stdout:
+        assert compress_cli(['-c', 'none', '--satellites', 'G13']) == 0
+    assert decompress(stdout.read()) == decompress(expected, satellites='G13')
@@ -0,0 +1,168 @@
+import gzip
+import io
+import mmap
+import shutil
+
+import pytest
+
+from hatanaka import compress, compress_on_disk, crx2rnx, decompress, decompress_on_disk, \
+    general_compression
+from .conftest import clean, compress_pairs, decompress_pairs, get_data_path
+
+
+@pytest.mark.parametrize(
+    'input_suffix, expected_suffix',
+    decompress_pairs
+)
+def test_decompress(tmp_path, crx_sample, rnx_bytes, input_suffix, expected_suffix):
+    # prepare
+    sample_path = tmp_path / ('sample' + input_suffix)
+    in_file = 'sample' + input_suffix
+    shutil.copy(get_data_path(in_file), sample_path)
+    # decompress
+    converted = decompress(sample_path)
+    # check
+    assert clean(converted) == clean(rnx_bytes)
+    converted = decompress(sample_path.read_bytes())
+    assert clean(converted) == clean(rnx_bytes)
+
+
+def make_nav(txt):
+    return txt.replace(b'OBSERVATION', b'NAVIGATION ')
+
+
+@pytest.mark.parametrize(
+    'input_suffix',
+    ['.rnx', '.RNX', '.21n']
+)
+def test_decompress_non_obs(tmp_path, rnx_bytes, input_suffix):
+    # prepare
+    txt = make_nav(rnx_bytes)
+    sample_path = tmp_path / ('sample' + input_suffix + '.gz')
+    sample_path.write_bytes(gzip.compress(txt))
+    # decompress
+    out_path = decompress_on_disk(sample_path)
+    # check
+    assert out_path.exists()
+    assert out_path == tmp_path / ('sample' + input_suffix)
+    assert clean(out_path.read_bytes()) == clean(txt)
+
+
+@pytest.mark.parametrize(
+    'input_suffix, compression, expected_suffix',
+    compress_pairs
+)
+def test_compress(tmp_path, crx_sample, rnx_bytes, input_suffix, compression, expected_suffix):
+    # prepare
+    in_file = 'sample' + input_suffix
+    sample_path = tmp_path / in_file
+    shutil.copy(get_data_path(in_file), sample_path)
+    # compress
+    converted = compress(sample_path, compression=compression)
+    # check
+    assert clean(decompress(converted)) == clean(rnx_bytes)
+    converted = compress(sample_path.read_bytes(), compression=compression)
+    assert clean(decompress(converted)) == clean(rnx_bytes)
+
+
+@pytest.mark.parametrize(
+    'input_suffix',
+    ['.rnx', '.RNX', '.21n']
+)
+def test_compress_non_obs(tmp_path, rnx_bytes, input_suffix):
+    # prepare
+    txt = make_nav(rnx_bytes)
+    sample_path = tmp_path / ('sample' + input_suffix)
+    sample_path.write_bytes(txt)
+    # compress
+    out_path = compress_on_disk(sample_path)
+    # check
+    assert out_path.exists()
+    assert out_path == tmp_path / ('sample' + input_suffix + '.gz')
+    assert clean(decompress(out_path)) == clean(txt)
+
+
+@pytest.mark.parametrize(
+    'input_suffix, expected_suffix',
+    decompress_pairs
+)
+def test_decompress_buffers(tmp_path, monkeypatch, rnx_bytes, input_suffix, expected_suffix):
+    sample_path = get_data_path('sample' + input_suffix)
+    txt = sample_path.read_bytes()
+    for content in [bytearray(txt), memoryview(txt), memoryview(b'xx' + txt)[2:]]:
+        assert clean(decompress(content)) == clean(rnx_bytes)
+    with sample_path.open('rb') as f:
+        assert clean(decompress(f)) == clean(rnx_bytes)
+    # memory-mapped
+    monkeypatch.setattr(general_compression, '_MMAP_THRESHOLD', 0)
+    assert clean(decompress(sample_path)) == clean(rnx_bytes)
+    with sample_path.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        assert clean(decompress(m)) == clean(rnx_bytes)
+    with sample_path.open('rb') as f:
+        assert clean(decompress(f)) == clean(rnx_bytes)
+        assert f.read() == b''
+
+
+@pytest.mark.parametrize('compression', ['gz', 'bz2', 'Z', 'none'])
+def test_compress_buffers(tmp_path, monkeypatch, rnx_bytes, compression):
+    expected = clean(decompress(compress(rnx_bytes, compression=compression)))
+    assert clean(decompress(compress(bytearray(rnx_bytes), compression=compression))) == expected
+    assert clean(decompress(compress(io.BytesIO(rnx_bytes), compression=compression))) == expected
+    monkeypatch.setattr(general_compression, '_MMAP_THRESHOLD', 0)
+    sample_path = tmp_path / 'sample.rnx'
+    sample_path.write_bytes(rnx_bytes)
+    assert clean(decompress(compress(sample_path, compression=compression))) == expected
+    with sample_path.open('rb') as f:
+        assert clean(decompress(compress(f, compression=compression))) == expected
+
+
+@pytest.mark.parametrize('compression', ['gz', 'bz2'])
+def test_compress_parallel(monkeypatch, crx_bytes, compression):
+    monkeypatch.setattr(general_compression, '_GZ_BLOCK_SIZE', 5000)
+    # large enough for several bzip2 blocks at level 1
+    txt = crx_bytes * (300000 // len(crx_bytes))
+    results = [general_compression._compress_container(txt, compression, 1, threads)
+               for threads in [1, 4]]
+    # compare without the gzip timestamp
+    assert results[0][10:] == results[1][10:]
+    assert general_compression._decompress_container(results[1]) == txt
+    if compression == 'bz2':
+        assert results[0].count(b'BZh1') > 1
+    else:
+        assert len(general_compression._compress_container(txt, compression, 9)) < len(results[0])
+
+
+def test_invalid_input(crx_str, rnx_bytes):
+    with pytest.raises(ValueError):
+        decompress(io.StringIO(crx_str))
+    with pytest.raises(ValueError):
+        compress(io.StringIO(rnx_bytes.decode()))
+    with pytest.raises(ValueError):
+        decompress(None)
+    with pytest.raises(ValueError):
+        compress(1)
+
+
+def test_invalid_name(tmp_path, rnx_sample):
+    sample_path = tmp_path / 'sample'
+    shutil.copy(rnx_sample, sample_path)
+    with pytest.raises(ValueError) as excinfo:
+        decompress_on_disk(sample_path)
+    msg = excinfo.value.args[0]
+    assert msg.endswith('is not a valid RINEX file name')
+
+
+@pytest.mark.parametrize('input_suffix', ['.crx.gz', '.rnx'])
+def test_decompress_projection(tmp_path, crx_sample, rnx_bytes, input_suffix):
+    expected = crx2rnx(crx_sample.read_bytes(), systems='R', obs_types='C1C')
+    if input_suffix == '.crx.gz':
+        data = compress(rnx_bytes)
+    else:
+        data = rnx_bytes
+    assert decompress(data, systems='R', obs_types='C1C') == expected
+    assert decompress(compress(rnx_bytes, systems='R', obs_types='C1C')) == expected
+    if input_suffix != '.rnx':
+        path = tmp_path / ('sample' + input_suffix)
+        path.write_bytes(data)
+        out_path = decompress_on_disk(path, systems='R', obs_types='C1C')
+        assert out_path.read_bytes() == expected
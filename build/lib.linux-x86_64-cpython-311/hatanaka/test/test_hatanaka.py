@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hatanaka import HatanakaException, crx2rnx, rnx2crx
+from .conftest import clean
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+def test_rnx2crx_str(rnx_str, crx_str):
+    assert clean(rnx2crx(rnx_str)) == clean(crx_str)
+
+
+def test_rnx2crx_bytes(rnx_bytes, crx_bytes):
+    assert clean(rnx2crx(rnx_bytes)) == clean(crx_bytes)
+
+
+def test_crx2rnx_str(crx_str, rnx_str):
+    assert crx2rnx(crx_str) == rnx_str
+
+
+def test_crx2rnx_bytes(crx_bytes, rnx_bytes):
+    assert clean(crx2rnx(crx_bytes)) == clean(rnx_bytes)
+
+
+def test_rnx2crx_str_stream(rnx_str_stream, crx_str):
+    assert clean(rnx2crx(rnx_str_stream)) == clean(crx_str)
+
+
+def test_rnx2crx_bytes_stream(rnx_bytes_stream, crx_bytes):
+    assert clean(rnx2crx(rnx_bytes_stream)) == clean(crx_bytes)
+
+
+def test_crx2rnx_str_stream(crx_str_stream, rnx_str):
+    assert crx2rnx(crx_str_stream) == rnx_str
+
+
+def test_crx2rnx_bytes_stream(crx_bytes_stream, rnx_bytes):
+    assert clean(crx2rnx(crx_bytes_stream)) == clean(rnx_bytes)
+
+
+def test_invalid():
+    with pytest.raises(HatanakaException) as excinfo:
+        crx2rnx('blah')
+    msg = excinfo.value.args[0]
+    assert msg.startswith('The file seems to be truncated in the middle.')
+
+
+def test_warning(rnx_bytes, crx_bytes):
+    rnx_bytes += b'\0\0\0'
+    with pytest.warns(UserWarning) as record:
+        converted = rnx2crx(rnx_bytes)
+    assert clean(converted) == clean(crx_bytes)
+    assert len(record) == 1
+    assert record[0].message.args[0].startswith('rnx2crx: null characters')
+
+
+def test_rnx2crx_extra_args_good(rnx_str, crx_str):
+    converted = rnx2crx(rnx_str, reinit_every_nth=1, skip_strange_epochs=True)
+    assert clean(converted) == clean(crx_str)
+
+
+def test_rnx2crx_extra_args_warning(rnx_str, crx_str):
+    rnx_str = rnx_str.replace('R19 129262004.57708', 'G13 130321269.80108')
+    with pytest.warns(UserWarning) as record:
+        converted = rnx2crx(rnx_str, reinit_every_nth=1, skip_strange_epochs=True)
+    assert len(record) == 1
+    assert (record[0].message.args[0] ==
+            'rnx2crx: Duplicated satellite in one epoch at line 15. ... skip')
+    # Only the header remains
+    assert clean(crx_str).startswith(clean(converted))
+
+
+def test_crx2rnx_extra_args_good(rnx_str, crx_str):
+    converted = crx2rnx(crx_str, skip_strange_epochs=True)
+    assert clean(converted) == clean(rnx_str)
+
+
+def test_non_ascii_is_tolerated(rnx_bytes, crx_bytes):
+    def add_non_ascii(txt):
+        return txt.replace(
+            b'VERSION / TYPE',
+            b'VERSION / TYPE' + 'õäü'.encode().ljust(60) + b'COMMENT\n')
+
+    converted = crx2rnx(add_non_ascii(crx_bytes))
+    assert clean(converted) == clean(add_non_ascii(rnx_bytes))
+    converted = rnx2crx(add_non_ascii(rnx_bytes))
+    assert clean(converted) == clean(add_non_ascii(crx_bytes))
+
+
+def test_stderr_bad_encoding(crx_bytes):
+    """The errors and warnings can include cited garbage from invalid files
+    and we should handle that gracefully."""
+    with pytest.raises(HatanakaException) as excinfo:
+        crx2rnx(crx_bytes[:-1] + b'\xFF\0')
+    msg = excinfo.value.args[0]
+    assert msg.startswith('The file seems to be truncated')
+    assert msg.endswith('\\xff<end')
+
+
+def test_concurrent(crx_bytes, rnx_bytes):
+    with ThreadPoolExecutor(4) as executor:
+        decompressed = list(executor.map(crx2rnx, [crx_bytes] * 8))
+        compressed = list(executor.map(rnx2crx, [rnx_bytes] * 8))
+    assert all(clean(x) == clean(rnx_bytes) for x in decompressed)
+    assert all(clean(x) == clean(crx_bytes) for x in compressed)
+
+
+if __name__ == '__main__':
+    pytest.main()
+
+
+def test_projection(crx_bytes, rnx_bytes):
+    rnx = crx2rnx(crx_bytes, systems='GS', obs_types=['C1C', 'L1C', 'S1C'])
+    header, body = rnx.split(b'END OF HEADER\n')
+    assert b'G    2 L1C C1C' in header
+    assert b'S    3 L1C C1C S1C' in header
+    assert b'R    3' not in header
+    lines = body.splitlines()
+    assert lines[0] == b'> 2010 03 05 00 00 30.0000000  0  5'
+    assert lines[3] == b'G 7 133174968.81808  25342359.370 7'
+    assert len(lines) == 6
+    # the same projection applied while compressing
+    crx = rnx2crx(rnx_bytes, systems='GS', obs_types=['C1C', 'L1C', 'S1C'])
+    assert crx2rnx(crx) == rnx
+    # unchanged epochs are output as they are
+    assert crx2rnx(crx_bytes, systems='GRS') == crx2rnx(crx_bytes)
+
+
+def test_projection_satellites(crx_bytes):
+    rnx = crx2rnx(crx_bytes, satellites='G07, R19')
+    lines = rnx.split(b'END OF HEADER\n')[1].splitlines()
+    assert lines[0] == b'> 2010 03 05 00 00 30.0000000  0  2'
+    assert [line[:3] for line in lines[1:]] == [b'R19', b'G 7']
+    assert crx2rnx(crx_bytes, satellites=['G7', 'R19']) == rnx
+
+
+def test_projection_invalid(crx_bytes):
+    with pytest.raises(ValueError):
+        crx2rnx(crx_bytes, satellites='GPS01')
+    with pytest.raises(ValueError):
+        crx2rnx(crx_bytes, obs_types='C1C,L')
+    with pytest.raises(ValueError):
+        crx2rnx(crx_bytes, systems='G,E')
+
+
+def make_large_rinex(nsat, ntype, nepoch=3):
+    # RINEX 3 with more satellites and observation types than the former limits of 100 each
+    codes = [f'{"CLDS"[i // 100]}{i % 100:02d}' for i in range(ntype)]
+    sats = [f'{sys}{prn:02d}' for sys in 'GREC' for prn in range(1, 100)][:nsat]
+    lines = ['     3.04           OBSERVATION DATA    M                   RINEX VERSION / TYPE']
+    for sys in 'GREC':
+        for i in range(0, ntype, 13):
+            start = f'{sys}  {ntype:3d}' if i == 0 else ' ' * 6
+            lines.append((start + ''.join(f' {c}' for c in codes[i:i + 13])).ljust(60) + 'SYS / # / OBS TYPES')
+    lines.append(' ' * 60 + 'END OF HEADER')
+    for t in range(nepoch):
+        lines.append(f'> 2021 01 01 00 00{30 * t:3d}.0000000  0{nsat:3d}')
+        for k, sat in enumerate(sats):
+            lines.append(sat + ''.join(f'{12345 + 1000 * k + 7 * j + 0.125 * t:14.3f}{j % 9 + 1}{t % 3 + 5}'
+                                       for j in range(ntype)))
+    return '\n'.join(lines) + '\n'
+
+
+def test_many_satellites_and_types():
+    rnx = make_large_rinex(150, 200)
+    crx = rnx2crx(rnx)
+    assert crx2rnx(crx) == rnx
+    body = crx2rnx(crx, satellites='G01,R10', obs_types='C00 L99').split('END OF HEADER\n')[1]
+    assert body.splitlines()[:3] == [
+        '> 2021 01 01 00 00  0.0000000  0  2',
+        'G01     12345.00015     13738.00025',
+        'R10    120345.00015    121738.00025',
+    ]
+
+
+@pytest.mark.parametrize('clock', ['-.500000000000', '-1.000000000000', '-.000100000000',
+                                   '12.345678900000', '-.123456789012'])
+def test_receiver_clock_offset(clock):
+    # negative offsets with zeros in the last 8 digits used to be output off by one unit
+    rnx = make_large_rinex(2, 3).replace('0  2\n', f'0  2{clock:>21s}\n')
+    assert crx2rnx(rnx2crx(rnx)) == rnx
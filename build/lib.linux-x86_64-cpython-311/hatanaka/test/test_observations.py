@@ -0,0 +1,203 @@
+import io
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+from hatanaka import HatanakaException, Observation, compress, iter_epochs, read_obs_arrays, \
+    rnx2crx, write_obs_arrays
+from .conftest import decompress_pairs, get_data_path
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+def add_epochs(rnx_bytes):
+    # an event record with a comment and a copy of the epoch 30 s later
+    header, body = rnx_bytes.split(b'END OF HEADER\n')
+    event = b'>' + b' ' * 30 + b'4  1\n' + b'test comment'.ljust(60) + b'COMMENT\n'
+    body2 = body.replace(b'00 00 30.0000000', b'00 01 00.0000000')
+    return header + b'END OF HEADER\n' + body + event + body2
+
+
+def to_tuples(epochs):
+    return [(e.time, e.flag, e.satellites, e.clock, e.records, e.observations) for e in epochs]
+
+
+@pytest.mark.parametrize(
+    'input_suffix, expected_suffix',
+    decompress_pairs
+)
+def test_iter_epochs(input_suffix, expected_suffix):
+    epochs = list(iter_epochs(get_data_path('sample' + input_suffix)))
+    assert len(epochs) == 1
+    epoch = epochs[0]
+    assert epoch.time == datetime(2010, 3, 5, 0, 0, 30)
+    assert epoch.flag == 0
+    assert epoch.satellites == ['G13', 'R19', 'G32', 'G07', 'R23', 'G31', 'G20', 'R11']
+    assert epoch.clock is None
+    assert epoch.records == []
+    obs = epoch.observations
+    assert list(obs['R19']) == ['L1C', 'C1C', 'S1C']
+    assert obs['R19']['L1C'] == Observation(129262004.577, 0, 8)
+    assert obs['R19']['C1C'] == Observation(24597748.629, None, 7)
+    assert obs['R19']['S1C'] == Observation(47.0, None, None)
+    assert obs['G13']['S2P'] == Observation(80.0, None, None)
+
+
+def test_iter_epochs_events(rnx_bytes):
+    rnx = add_epochs(rnx_bytes)
+    epochs = list(iter_epochs(compress(rnx)))
+    assert [e.flag for e in epochs] == [0, 4, 0]
+    assert epochs[1].time is None
+    assert epochs[1].records == ['test comment'.ljust(60) + 'COMMENT']
+    assert epochs[2].time == datetime(2010, 3, 5, 0, 1, 0)
+    assert to_tuples(epochs) == to_tuples(iter_epochs(io.BytesIO(rnx)))
+
+
+def test_iter_epochs_close_early(rnx_bytes):
+    # large enough to fill the internal buffers
+    header, body = rnx_bytes.split(b'END OF HEADER\n')
+    crx = compress(header + b'END OF HEADER\n' + body * 500, compression='none')
+    n_threads = threading.active_count()
+    it = iter_epochs(crx)
+    assert next(it).flag == 0
+    it.close()
+    assert threading.active_count() == n_threads
+
+
+def test_iter_epochs_errors(crx_bytes, rnx_bytes):
+    with pytest.raises(HatanakaException):
+        list(iter_epochs(crx_bytes[:-10]))
+    with pytest.raises(ValueError):
+        list(iter_epochs(rnx_bytes.replace(b'OBSERVATION DATA', b'NAVIGATION DATA ')))
+
+
+def test_read_obs_arrays(crx_bytes):
+    np = pytest.importorskip('numpy')
+    arrays = read_obs_arrays(crx_bytes)
+    assert arrays.time.dtype == np.dtype('datetime64[ns]')
+    assert arrays.time.tolist() == [np.datetime64('2010-03-05T00:00:30', 'ns').astype(int)]
+    assert arrays.flag.tolist() == [0]
+    assert np.isnan(arrays.clock).all()
+    assert arrays.satellites == ['G07', 'G13', 'G20', 'G31', 'G32', 'R11', 'R19', 'R23']
+    assert arrays.values.shape == (1, 8, len(arrays.obs_types))
+    assert arrays.lli.shape == arrays.ssi.shape == arrays.values.shape
+    epoch = next(iter_epochs(crx_bytes))
+    for i, sat in enumerate(arrays.satellites):
+        for j, obs_type in enumerate(arrays.obs_types):
+            obs = epoch.observations[sat].get(obs_type, Observation(None, None, None))
+            value = arrays.values[0, i, j]
+            assert value == obs.value if obs.value is not None else np.isnan(value)
+            assert arrays.lli[0, i, j] == (obs.lli if obs.lli is not None else -1)
+            assert arrays.ssi[0, i, j] == (obs.ssi if obs.ssi is not None else -1)
+    j = arrays.obs_types.index('L1C')
+    assert arrays.values[0, arrays.satellites.index('R19'), j] == 129262004.577
+
+
+def test_read_obs_arrays_events(rnx_bytes):
+    np = pytest.importorskip('numpy')
+    arrays = read_obs_arrays(compress(add_epochs(rnx_bytes)))
+    assert arrays.flag.tolist() == [0, 0]
+    assert arrays.time[1] - arrays.time[0] == np.timedelta64(30, 's')
+    np.testing.assert_array_equal(arrays.values[0], arrays.values[1])
+    np.testing.assert_array_equal(arrays.lli[0], arrays.lli[1])
+
+
+def test_read_obs_arrays_no_numpy(crx_bytes, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    with pytest.raises(ImportError, match='hatanaka\\[numpy\\]'):
+        read_obs_arrays(crx_bytes)
+
+
+def make_arrays(np):
+    time = np.datetime64('2021-01-01T00:00:00') + np.arange(6) * np.timedelta64(30, 's')
+    satellites = ['E11', 'G01', 'G02']
+    obs_types = ['C1C', 'L1C', 'S1C']
+    values = np.full((6, 3, 3), np.nan)
+    values[:, 0, :2] = [[23456789.012 + 10 * i, -123456789.5 + 1e5 * i] for i in range(6)]
+    values[:, 1] = [[20000000.5 + i, 105000000.25 + i * i, 45.0] for i in range(6)]
+    values[3, 1, 1] += 2e9  # cycle slip
+    values[2, 2] = [21000000.125, np.nan, 38.5]
+    values[4:, 2, 0] = -0.5
+    lli = np.full(values.shape, -1, np.int8)
+    lli[1, 1, 1] = 1
+    ssi = np.where(np.isnan(values), -1, 7).astype(np.int8)
+    clock = np.array([0.000123456789, 0.000123456889, np.nan, -0.5 + 1e-12, -0.499999999999, 9.0])
+    return dict(time=time, satellites=satellites, obs_types=obs_types, values=values,
+                lli=lli, ssi=ssi, clock=clock, flag=np.array([0, 0, 1, 0, 0, 0]))
+
+
+def format_rinex3(np, time, satellites, obs_types, values, lli, ssi, clock, flag, types):
+    lines = []
+    for t in range(len(time)):
+        sat_lines = []
+        for i, sat in enumerate(satellites):
+            fields = ''
+            for j in types[sat[0]]:
+                value = values[t, i, j]
+                fields += ' ' * 14 if np.isnan(value) else f'{value:14.3f}'
+                fields += ''.join(' ' if x < 0 else str(x) for x in (lli[t, i, j], ssi[t, i, j]))
+            if fields.strip():
+                sat_lines.append((sat + fields).rstrip())
+        epoch = time[t].astype(datetime)
+        line = (f'> {epoch:%Y %m %d %H %M} {epoch.second:2d}.0000000  {flag[t]}'
+                f'{len(sat_lines):3d}')
+        if not np.isnan(clock[t]):
+            line += f'      {clock[t]:15.12f}'
+        lines += [line] + sat_lines
+    return lines
+
+
+def test_write_obs_arrays():
+    np = pytest.importorskip('numpy')
+    arrays = make_arrays(np)
+    crx = write_obs_arrays(**arrays, header={'MARKER NAME': 'TEST', 'COMMENT': ['a', 'b']})
+    header = crx.decode().split('END OF HEADER\n')[0].splitlines()[:-1]
+    assert header[3:] == [
+        'TEST'.ljust(60) + 'MARKER NAME',
+        'a'.ljust(60) + 'COMMENT',
+        'b'.ljust(60) + 'COMMENT',
+        'E    2 C1C L1C'.ljust(60) + 'SYS / # / OBS TYPES',
+        'G    3 C1C L1C S1C'.ljust(60) + 'SYS / # / OBS TYPES',
+    ]
+    types = {'E': [0, 1], 'G': [0, 1, 2]}
+    rnx = '\n'.join(header[2:] + [' ' * 60 + 'END OF HEADER'] +
+                    format_rinex3(np, types=types, **arrays)) + '\n'
+    for reinit_every_nth in [None, 2]:
+        crx = write_obs_arrays(**arrays, header={'MARKER NAME': 'TEST', 'COMMENT': ['a', 'b']},
+                               reinit_every_nth=reinit_every_nth)
+        expected = rnx2crx(rnx.encode(), reinit_every_nth=reinit_every_nth)
+        # skip the CRINEX PROG / DATE line
+        assert crx.split(b'\n', 2)[2] == expected.split(b'\n', 2)[2]
+        assert crx.split(b'\n')[0] == expected.split(b'\n')[0]
+
+
+def test_write_obs_arrays_round_trip(crx_bytes):
+    np = pytest.importorskip('numpy')
+    arrays = make_arrays(np)
+    result = read_obs_arrays(write_obs_arrays(**arrays, compression='gz'))
+    assert result.satellites == arrays['satellites']
+    assert result.obs_types == arrays['obs_types']
+    np.testing.assert_array_equal(result.time, arrays['time'])
+    np.testing.assert_array_equal(result.values, arrays['values'])
+    np.testing.assert_array_equal(result.lli, arrays['lli'])
+    np.testing.assert_array_equal(result.ssi, arrays['ssi'])
+    np.testing.assert_array_equal(result.clock, arrays['clock'])
+    arrays = read_obs_arrays(crx_bytes)
+    result = read_obs_arrays(write_obs_arrays(**arrays._asdict()))
+    np.testing.assert_array_equal(result.values, arrays.values)
+
+
+def test_write_obs_arrays_errors():
+    np = pytest.importorskip('numpy')
+    arrays = make_arrays(np)
+    for name, value in [('values', arrays['values'][:, :2]),
+                        ('values', arrays['values'] * 1e6),
+                        ('lli', arrays['lli'] + 20),
+                        ('flag', np.full(6, 4)),
+                        ('clock', np.full(6, 10.0)),
+                        ('satellites', ['E11', 'G01', 'G01']),
+                        ('header', {'END OF HEADER': ''})]:
+        with pytest.raises(ValueError):
+            write_obs_arrays(**{**arrays, name: value})
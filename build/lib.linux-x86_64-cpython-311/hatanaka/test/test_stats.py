@@ -0,0 +1,127 @@
+import shutil
+from datetime import datetime
+
+import pytest
+
+from hatanaka import ConversionStats, HatanakaException, compress, compress_many, \
+    compress_on_disk, decompress, decompress_many, decompress_on_disk, get_counters, \
+    reset_counters
+from hatanaka.cli import compress_cli, decompress_cli
+from .conftest import get_data_path
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+@pytest.fixture(autouse=True)
+def counters():
+    reset_counters()
+    yield
+    reset_counters()
+
+
+def test_decompress_stats(crx_sample, rnx_bytes):
+    content = compress(rnx_bytes, compression='bz2')
+    reset_counters()
+    stats = ConversionStats()
+    assert decompress(content, stats=stats) == rnx_bytes
+    assert stats.files == 1
+    assert stats.failures == 0
+    assert stats.bytes_in == len(content)
+    assert stats.bytes_out == len(rnx_bytes)
+    assert list(stats.stages) == ['container_decode', 'hatanaka']
+    container = stats.stages['container_decode']
+    assert container.bytes_in == len(content)
+    assert container.bytes_out == stats.stages['hatanaka'].bytes_in
+    assert stats.stages['hatanaka'].bytes_out == len(rnx_bytes)
+    assert stats.wall >= container.wall + stats.stages['hatanaka'].wall
+    counters = get_counters()
+    assert counters['files'] == 1
+    assert counters['bytes_in'] == len(content)
+    assert counters['bytes_out'] == len(rnx_bytes)
+
+
+def test_compress_stats(rnx_sample, rnx_bytes):
+    stats = ConversionStats()
+    content = compress(rnx_sample, stats=stats)
+    assert stats.bytes_in == len(rnx_bytes)
+    assert stats.bytes_out == len(content)
+    assert list(stats.stages) == ['read', 'hatanaka', 'container_encode']
+    assert stats.stages['read'].bytes_out == len(rnx_bytes)
+    assert stats.stages['container_encode'].bytes_out == len(content)
+
+
+def test_stats_callback(crx_sample):
+    results = []
+    decompress(crx_sample, stats=results.append)
+    assert len(results) == 1
+    assert results[0].files == 1
+    assert results[0].bytes_in == crx_sample.stat().st_size
+
+
+def test_stats_on_disk(tmp_path, rnx_bytes):
+    sample_path = tmp_path / 'sample.rnx'
+    sample_path.write_bytes(rnx_bytes)
+    stats = ConversionStats()
+    out_path = compress_on_disk(sample_path, compression='none', stats=stats)
+    assert stats.stages['write'].bytes_in == stats.bytes_out == out_path.stat().st_size
+    assert out_path.stat().st_size > 0
+    stats = ConversionStats()
+    decompress_on_disk(out_path, start=datetime(2000, 1, 1), stats=stats)
+    assert stats.bytes_in == out_path.stat().st_size
+    assert stats.bytes_out == sample_path.stat().st_size
+    assert list(stats.stages) == ['read', 'container_decode', 'hatanaka', 'write']
+    assert get_counters()['files'] == 2
+
+
+def test_stats_failures_and_warnings(rnx_bytes):
+    stats = ConversionStats()
+    with pytest.raises(HatanakaException):
+        compress(rnx_bytes[:-100], stats=stats)
+    with pytest.warns(UserWarning):
+        compress(rnx_bytes + b'\0\0\0', stats=stats)
+    assert stats.files == 2
+    assert stats.failures == 1
+    assert stats.warnings == 1
+    counters = get_counters()
+    assert counters['failures'] == 1
+    assert counters['warnings'] == 1
+    reset_counters()
+    assert get_counters()['files'] == 0
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_counters_many(tmp_path, rnx_bytes, workers):
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f'sample{i}.rnx')
+        paths[-1].write_bytes(rnx_bytes)
+    out_paths = compress_many(paths, workers=workers)
+    decompress_many(out_paths, workers=workers)
+    counters = get_counters()
+    assert counters['files'] == 6
+    assert counters['bytes_in'] == counters['bytes_out'] == \
+           3 * len(rnx_bytes) + sum(p.stat().st_size for p in out_paths)
+
+
+def test_summary():
+    stats = ConversionStats()
+    decompress(get_data_path('sample.crx.gz'), stats=stats)
+    stats += stats
+    assert stats.files == 2
+    lines = stats.summary().splitlines()
+    assert lines[0].startswith('2 files, 0 failed, 0 warnings')
+    assert [line.split()[0] for line in lines[1:]] == \
+           ['stage', 'read', 'container_decode', 'hatanaka']
+
+
+def test_cli_stats(tmp_path, capsys):
+    sample_path = tmp_path / 'sample.crx.gz'
+    shutil.copy(get_data_path('sample.crx.gz'), sample_path)
+    assert decompress_cli([str(sample_path), '--stats', '--progress']) == 0
+    err = capsys.readouterr().err.splitlines()
+    assert err[0].startswith(f'[1/1] {str(sample_path)}: ')
+    assert err[0].endswith(' MB/s)')
+    assert err[1].startswith('1 files, 0 failed, 0 warnings')
+    assert err[-1].startswith('write ')
+    assert compress_cli([str(tmp_path / 'sample.rnx'), '-c', 'none']) == 0
+    assert capsys.readouterr().err == ''
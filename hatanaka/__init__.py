@@ -1,5 +1,13 @@
+from .archives import *
+from .async_compression import *
+from .cache import *
 from .general_compression import *
 from .hatanaka import *
+from .index import *
+from .observations import *
+from .stats import *
+from .streaming import *
+from .transcoding import *
 
 __version__ = '2.8.1'
 rnxcmp_version = '4.1.0'
@@ -0,0 +1,732 @@
+/*
+ * Incremental LZW codec for the .Z format of the Unix compress utility.
+ *
+ * Compressor and Decompressor objects take the data in arbitrary chunks and
+ * return the output produced so far, like zlib.compressobj() and
+ * zlib.decompressobj(), so .Z files can be converted at constant memory.
+ * The output of the compressor is compatible with compress -b 16.
+ *
+ * The codes are packed LSB first with a width of 9 to 16 bits. compress
+ * writes them in groups of 8 codes (as many bytes as there are bits in a
+ * code) and pads the last group of each code width to its full size when
+ * the width changes or the table is cleared, which the decoder must skip.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include "pythread.h"
+
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define MAGIC_1 0x1f
+#define MAGIC_2 0x9d
+#define BIT_MASK 0x1f
+#define BLOCK_MODE 0x80
+#define INIT_BITS 9
+#define MAX_BITS 16
+#define CLEAR 256
+#define FIRST 257
+#define MAXCODE(n) ((1L << (n)) - 1)
+/* the compression ratio is checked this often once the table is full */
+#define CHECK_GAP 10000
+/* prime, about 5% larger than the table, as in compress */
+#define HSIZE 69001
+
+#define ACQUIRE_LOCK(obj) do { \
+    if (!PyThread_acquire_lock((obj)->lock, 0)) { \
+        Py_BEGIN_ALLOW_THREADS \
+        PyThread_acquire_lock((obj)->lock, 1); \
+        Py_END_ALLOW_THREADS \
+    } } while (0)
+#define RELEASE_LOCK(obj) PyThread_release_lock((obj)->lock)
+
+/* growable output buffer */
+typedef struct {
+    unsigned char *data;
+    size_t len;
+    size_t size;
+} out_buffer;
+
+static int
+out_reserve(out_buffer *out, size_t n)
+{
+    if (out->len + n > out->size) {
+        size_t new_size = out->size ? out->size : 1 << 16;
+        unsigned char *p;
+        while (new_size < out->len + n)
+            new_size *= 2;
+        if ((p = realloc(out->data, new_size)) == NULL)
+            return -1;
+        out->data = p;
+        out->size = new_size;
+    }
+    return 0;
+}
+
+static PyObject *
+out_finish(out_buffer *out)
+{
+    PyObject *result = PyBytes_FromStringAndSize((const char *)out->data, (Py_ssize_t)out->len);
+    free(out->data);
+    return result;
+}
+
+/* ---------------------------------------------------------------------- */
+/* Decompressor */
+
+typedef struct {
+    PyObject_HEAD
+    PyThread_type_lock lock;
+    unsigned char header[3];
+    int header_len;
+    int block_mode;
+    int maxbits;
+    long maxmaxcode;
+    int n_bits;
+    long maxcode;
+    long free_ent;
+    long oldcode;
+    int finchar;
+    uint64_t bitbuf;
+    int bitcnt;
+    long seg_codes;          /* codes read with the current width */
+    long skip_bits;          /* padding still to be skipped */
+    uint16_t *prefix;
+    unsigned char *suffix;
+    uint32_t *length;        /* length of the string of each code */
+} Decompressor;
+
+/* Decode the input into out. Returns an error message or NULL. */
+static const char *
+decompress_data(Decompressor *d, const unsigned char *in, size_t in_len, out_buffer *out)
+{
+    const unsigned char *end = in + in_len;
+    int n_bits = d->n_bits;
+    uint64_t bitbuf = d->bitbuf;
+    int bitcnt = d->bitcnt;
+    const char *error = NULL;
+
+    for (;;) {
+        long code, incode;
+        uint32_t len;
+        unsigned char *p;
+
+        if (d->skip_bits > 0) {
+            if (bitcnt >= d->skip_bits) {
+                bitbuf >>= d->skip_bits;
+                bitcnt -= (int)d->skip_bits;
+                d->skip_bits = 0;
+            } else {
+                /* the padding ends on a byte boundary */
+                size_t n;
+                d->skip_bits -= bitcnt;
+                bitbuf = 0;
+                bitcnt = 0;
+                n = (size_t)(d->skip_bits >> 3);
+                if (n > (size_t)(end - in))
+                    n = (size_t)(end - in);
+                in += n;
+                d->skip_bits -= (long)n << 3;
+                if (d->skip_bits > 0)
+                    break;
+            }
+        }
+        if (d->free_ent > d->maxcode) {
+            /* the encoder pads the last group of codes of each width */
+            d->skip_bits = ((8 - d->seg_codes % 8) % 8) * n_bits;
+            d->seg_codes = 0;
+            n_bits++;
+            d->maxcode = n_bits == d->maxbits ? d->maxmaxcode : MAXCODE(n_bits);
+            continue;
+        }
+        while (bitcnt < n_bits && in < end) {
+            bitbuf |= (uint64_t)*in++ << bitcnt;
+            bitcnt += 8;
+        }
+        if (bitcnt < n_bits)
+            break;
+        code = (long)(bitbuf & (uint64_t)MAXCODE(n_bits));
+        bitbuf >>= n_bits;
+        bitcnt -= n_bits;
+        d->seg_codes++;
+
+        if (d->oldcode == -1) {
+            if (code >= 256) {
+                error = "corrupt LZW data";
+                break;
+            }
+            if (out_reserve(out, 1) != 0) {
+                error = "";
+                break;
+            }
+            out->data[out->len++] = (unsigned char)code;
+            d->finchar = (int)code;
+            d->oldcode = code;
+            continue;
+        }
+        if (code == CLEAR && d->block_mode) {
+            d->free_ent = FIRST - 1;
+            d->skip_bits = ((8 - d->seg_codes % 8) % 8) * n_bits;
+            d->seg_codes = 0;
+            n_bits = INIT_BITS;
+            d->maxcode = MAXCODE(INIT_BITS);
+            continue;
+        }
+        incode = code;
+        if (code >= d->free_ent) {
+            /* the string of the previous code followed by its first character */
+            if (code > d->free_ent) {
+                error = "corrupt LZW data";
+                break;
+            }
+            code = d->oldcode;
+            len = d->length[code] + 1;
+            if (out_reserve(out, len) != 0) {
+                error = "";
+                break;
+            }
+            p = out->data + out->len + len - 1;
+            *p-- = (unsigned char)d->finchar;
+        } else {
+            len = d->length[code];
+            if (out_reserve(out, len) != 0) {
+                error = "";
+                break;
+            }
+            p = out->data + out->len + len - 1;
+        }
+        while (code >= 256) {
+            *p-- = d->suffix[code];
+            code = d->prefix[code];
+        }
+        *p = (unsigned char)code;
+        d->finchar = (int)code;
+        out->len += len;
+
+        if (d->free_ent < d->maxmaxcode) {
+            d->prefix[d->free_ent] = (uint16_t)d->oldcode;
+            d->suffix[d->free_ent] = (unsigned char)d->finchar;
+            d->length[d->free_ent] = d->length[d->oldcode] + 1;
+            d->free_ent++;
+        }
+        d->oldcode = incode;
+    }
+    d->n_bits = n_bits;
+    d->bitbuf = bitbuf;
+    d->bitcnt = bitcnt;
+    return error;
+}
+
+/* Parse the header from the start of the input. Returns the number of bytes used or -1. */
+static Py_ssize_t
+decompress_header(Decompressor *d, const unsigned char *in, Py_ssize_t len)
+{
+    Py_ssize_t n = 0;
+    int i;
+
+    while (d->header_len < 3 && n < len)
+        d->header[d->header_len++] = in[n++];
+    if (d->header_len < 3)
+        return n;
+    if (d->header[0] != MAGIC_1 || d->header[1] != MAGIC_2) {
+        PyErr_SetString(PyExc_ValueError, "not in LZW-compressed format");
+        return -1;
+    }
+    d->maxbits = d->header[2] & BIT_MASK;
+    d->block_mode = (d->header[2] & BLOCK_MODE) != 0;
+    if (d->maxbits > MAX_BITS) {
+        PyErr_Format(PyExc_ValueError, "LZW data compressed with %d bits, can only handle %d bits",
+                     d->maxbits, MAX_BITS);
+        return -1;
+    }
+    if (d->maxbits < INIT_BITS) {
+        PyErr_Format(PyExc_ValueError, "invalid number of bits %d in LZW header", d->maxbits);
+        return -1;
+    }
+    d->maxmaxcode = 1L << d->maxbits;
+    d->n_bits = INIT_BITS;
+    d->maxcode = MAXCODE(INIT_BITS);
+    d->free_ent = d->block_mode ? FIRST : 256;
+    for (i = 0; i < 256; i++) {
+        d->suffix[i] = (unsigned char)i;
+        d->length[i] = 1;
+    }
+    return n;
+}
+
+PyDoc_STRVAR(Decompressor_decompress_doc,
+"decompress(data)\n"
+"--\n\n"
+"Decompress data, returning the bytes decoded from it and any earlier input.");
+
+static PyObject *
+Decompressor_decompress(Decompressor *self, PyObject *arg)
+{
+    Py_buffer input;
+    out_buffer out = {NULL, 0, 0};
+    const unsigned char *in;
+    Py_ssize_t n;
+    const char *error;
+
+    if (PyObject_GetBuffer(arg, &input, PyBUF_SIMPLE) != 0)
+        return NULL;
+    ACQUIRE_LOCK(self);
+    in = (const unsigned char *)input.buf;
+    n = input.len;
+    if (self->header_len < 3) {
+        Py_ssize_t used = decompress_header(self, in, n);
+        if (used < 0) {
+            RELEASE_LOCK(self);
+            PyBuffer_Release(&input);
+            return NULL;
+        }
+        in += used;
+        n -= used;
+    }
+    /* about the typical compression ratio of RINEX files */
+    if (n > 0 && out_reserve(&out, (size_t)n * 4) != 0) {
+        RELEASE_LOCK(self);
+        PyBuffer_Release(&input);
+        return PyErr_NoMemory();
+    }
+    Py_BEGIN_ALLOW_THREADS
+    error = n > 0 ? decompress_data(self, in, (size_t)n, &out) : NULL;
+    Py_END_ALLOW_THREADS
+    RELEASE_LOCK(self);
+    PyBuffer_Release(&input);
+    if (error != NULL) {
+        free(out.data);
+        if (*error == '\0')
+            return PyErr_NoMemory();
+        PyErr_SetString(PyExc_ValueError, error);
+        return NULL;
+    }
+    return out_finish(&out);
+}
+
+PyDoc_STRVAR(Decompressor_flush_doc,
+"flush()\n"
+"--\n\n"
+"Check the end of the input. All output is returned by decompress() already,\n"
+"so this returns an empty bytes object or raises ValueError if the header is incomplete.");
+
+static PyObject *
+Decompressor_flush(Decompressor *self, PyObject *Py_UNUSED(ignored))
+{
+    if (self->header_len < 3) {
+        PyErr_SetString(PyExc_ValueError, "not in LZW-compressed format");
+        return NULL;
+    }
+    return PyBytes_FromStringAndSize(NULL, 0);
+}
+
+static int
+Decompressor_init(Decompressor *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, ":Decompressor", kwlist))
+        return -1;
+    self->header_len = 0;
+    self->oldcode = -1;
+    self->bitbuf = 0;
+    self->bitcnt = 0;
+    self->seg_codes = 0;
+    self->skip_bits = 0;
+    if (self->lock == NULL && (self->lock = PyThread_allocate_lock()) == NULL) {
+        PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+        return -1;
+    }
+    if (self->prefix == NULL) {
+        self->prefix = malloc(sizeof(uint16_t) << MAX_BITS);
+        self->suffix = malloc((size_t)1 << MAX_BITS);
+        self->length = malloc(sizeof(uint32_t) << MAX_BITS);
+        if (self->prefix == NULL || self->suffix == NULL || self->length == NULL) {
+            PyErr_NoMemory();
+            return -1;
+        }
+    }
+    return 0;
+}
+
+static void
+Decompressor_dealloc(Decompressor *self)
+{
+    if (self->lock != NULL)
+        PyThread_free_lock(self->lock);
+    free(self->prefix);
+    free(self->suffix);
+    free(self->length);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static PyMethodDef Decompressor_methods[] = {
+    {"decompress", (PyCFunction)Decompressor_decompress, METH_O, Decompressor_decompress_doc},
+    {"flush", (PyCFunction)Decompressor_flush, METH_NOARGS, Decompressor_flush_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+PyDoc_STRVAR(Decompressor_doc,
+"Decompressor()\n"
+"--\n\n"
+"Incremental decoder of .Z data. Objects can not be shared by concurrent threads.");
+
+static PyTypeObject DecompressorType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "hatanaka._lzw.Decompressor",
+    .tp_basicsize = sizeof(Decompressor),
+    .tp_dealloc = (destructor)Decompressor_dealloc,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = Decompressor_doc,
+    .tp_methods = Decompressor_methods,
+    .tp_init = (initproc)Decompressor_init,
+    .tp_new = PyType_GenericNew,
+};
+
+/* ---------------------------------------------------------------------- */
+/* Compressor */
+
+typedef struct {
+    PyObject_HEAD
+    PyThread_type_lock lock;
+    int header_done;
+    int flushed;
+    int n_bits;
+    long maxcode;
+    long free_ent;
+    long ent;                /* code of the current prefix, -1 before the first byte */
+    int clear_flg;
+    long long in_count;
+    long long bytes_out;
+    long long checkpoint;
+    long ratio;
+    uint64_t bitbuf;
+    int bitcnt;
+    int group_codes;         /* codes in the current group */
+    int group_bytes;         /* bytes written of the current group */
+    int32_t *htab;           /* (character << MAX_BITS) + prefix code, or -1 */
+    uint16_t *codetab;
+} Compressor;
+
+static void
+clear_hash(Compressor *c)
+{
+    memset(c->htab, 0xff, sizeof(int32_t) * HSIZE);
+}
+
+static void
+put_byte(Compressor *c, out_buffer *out, unsigned char b)
+{
+    out->data[out->len++] = b;
+    c->bytes_out++;
+    c->group_bytes++;
+}
+
+/* Write a code. out must have room for at least MAX_BITS + 2 bytes. */
+static void
+output(Compressor *c, out_buffer *out, long code)
+{
+    c->bitbuf |= (uint64_t)code << c->bitcnt;
+    c->bitcnt += c->n_bits;
+    while (c->bitcnt >= 8) {
+        put_byte(c, out, (unsigned char)c->bitbuf);
+        c->bitbuf >>= 8;
+        c->bitcnt -= 8;
+    }
+    if (++c->group_codes == 8) {
+        c->group_codes = 0;
+        c->group_bytes = 0;
+    }
+    if (c->free_ent > c->maxcode || c->clear_flg) {
+        /* pad the group, since the decoder only notices the change after reading it */
+        if (c->group_codes > 0) {
+            if (c->bitcnt > 0)
+                put_byte(c, out, (unsigned char)c->bitbuf);
+            while (c->group_bytes < c->n_bits)
+                put_byte(c, out, 0);
+        }
+        c->bitbuf = 0;
+        c->bitcnt = 0;
+        c->group_codes = 0;
+        c->group_bytes = 0;
+        if (c->clear_flg) {
+            c->n_bits = INIT_BITS;
+            c->clear_flg = 0;
+        } else {
+            c->n_bits++;
+        }
+        c->maxcode = c->n_bits == MAX_BITS ? 1L << MAX_BITS : MAXCODE(c->n_bits);
+    }
+}
+
+/* Clear the table if the compression ratio has started to decrease. */
+static void
+clear_block(Compressor *c, out_buffer *out)
+{
+    long rat;
+
+    c->checkpoint = c->in_count + CHECK_GAP;
+    if (c->in_count > 0x007fffff) {
+        long long r = c->bytes_out >> 8;
+        rat = r == 0 ? 0x7fffffff : (long)(c->in_count / r);
+    } else {
+        rat = (long)((c->in_count << 8) / c->bytes_out);
+    }
+    if (rat >= c->ratio) {
+        c->ratio = rat;
+    } else {
+        c->ratio = 0;
+        clear_hash(c);
+        c->free_ent = FIRST;
+        c->clear_flg = 1;
+        output(c, out, CLEAR);
+    }
+}
+
+static int
+compress_data(Compressor *c, const unsigned char *in, size_t in_len, out_buffer *out)
+{
+    /* the state used for every byte is kept in local variables, which the compiler
+       could not keep in registers otherwise because of the writes to the output */
+    const unsigned char *end = in + in_len;
+    const int32_t *htab = c->htab;
+    const uint16_t *codetab = c->codetab;
+    long ent = c->ent;
+    long long in_count = c->in_count;
+
+    if (in == end)
+        return 0;
+    if (ent == -1) {
+        ent = *in++;
+        in_count = 1;
+    }
+    while (in < end) {
+        int ch = *in++;
+        int32_t fcode = (int32_t)(((long)ch << MAX_BITS) + ent);
+        long i = ((long)ch << 8) ^ ent;
+
+        in_count++;
+        if (htab[i] == fcode) {
+            ent = codetab[i];
+            continue;
+        }
+        if (htab[i] >= 0) {
+            long disp = i == 0 ? 1 : HSIZE - i;
+            for (;;) {
+                if ((i -= disp) < 0)
+                    i += HSIZE;
+                if (htab[i] == fcode || htab[i] < 0)
+                    break;
+            }
+            if (htab[i] == fcode) {
+                ent = codetab[i];
+                continue;
+            }
+        }
+        /* a code, a possible padded group and a clear code with its padding */
+        if (out_reserve(out, 3 * (MAX_BITS + 2)) != 0) {
+            c->ent = ent;
+            c->in_count = in_count;
+            return -1;
+        }
+        output(c, out, ent);
+        ent = ch;
+        if (c->free_ent < 1L << MAX_BITS) {
+            c->codetab[i] = (uint16_t)c->free_ent++;
+            c->htab[i] = fcode;
+        }
+        /* as in ncompress, also checked right after the last code has been assigned */
+        if (c->free_ent >= 1L << MAX_BITS && in_count >= c->checkpoint) {
+            c->in_count = in_count;
+            clear_block(c, out);
+        }
+    }
+    c->ent = ent;
+    c->in_count = in_count;
+    return 0;
+}
+
+static int
+compress_header(Compressor *c, out_buffer *out)
+{
+    if (c->header_done)
+        return 0;
+    if (out_reserve(out, 3) != 0)
+        return -1;
+    out->data[out->len++] = MAGIC_1;
+    out->data[out->len++] = MAGIC_2;
+    out->data[out->len++] = MAX_BITS | BLOCK_MODE;
+    c->bytes_out = 3;
+    c->header_done = 1;
+    return 0;
+}
+
+PyDoc_STRVAR(Compressor_compress_doc,
+"compress(data)\n"
+"--\n\n"
+"Compress data, returning the part of the output that is complete so far.");
+
+static PyObject *
+Compressor_compress(Compressor *self, PyObject *arg)
+{
+    Py_buffer input;
+    out_buffer out = {NULL, 0, 0};
+    int err;
+
+    if (PyObject_GetBuffer(arg, &input, PyBUF_SIMPLE) != 0)
+        return NULL;
+    ACQUIRE_LOCK(self);
+    if (self->flushed) {
+        RELEASE_LOCK(self);
+        PyBuffer_Release(&input);
+        PyErr_SetString(PyExc_ValueError, "compress() called after flush()");
+        return NULL;
+    }
+    err = compress_header(self, &out) != 0 ||
+          (input.len > 0 && out_reserve(&out, (size_t)input.len / 2 + 64) != 0);
+    if (!err) {
+        Py_BEGIN_ALLOW_THREADS
+        err = compress_data(self, (const unsigned char *)input.buf, (size_t)input.len, &out);
+        Py_END_ALLOW_THREADS
+    }
+    RELEASE_LOCK(self);
+    PyBuffer_Release(&input);
+    if (err) {
+        free(out.data);
+        return PyErr_NoMemory();
+    }
+    return out_finish(&out);
+}
+
+PyDoc_STRVAR(Compressor_flush_doc,
+"flush()\n"
+"--\n\n"
+"Finish the compressed stream and return the rest of the output.\n"
+"The compressor can not be used after this.");
+
+static PyObject *
+Compressor_flush(Compressor *self, PyObject *Py_UNUSED(ignored))
+{
+    out_buffer out = {NULL, 0, 0};
+
+    ACQUIRE_LOCK(self);
+    if (compress_header(self, &out) != 0 || out_reserve(&out, 2 * (MAX_BITS + 2)) != 0) {
+        RELEASE_LOCK(self);
+        free(out.data);
+        return PyErr_NoMemory();
+    }
+    if (!self->flushed) {
+        if (self->ent != -1)
+            output(self, &out, self->ent);
+        if (self->bitcnt > 0)
+            put_byte(self, &out, (unsigned char)self->bitbuf);
+        self->flushed = 1;
+    }
+    RELEASE_LOCK(self);
+    return out_finish(&out);
+}
+
+static int
+Compressor_init(Compressor *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, ":Compressor", kwlist))
+        return -1;
+    self->header_done = 0;
+    self->flushed = 0;
+    self->n_bits = INIT_BITS;
+    self->maxcode = MAXCODE(INIT_BITS);
+    self->free_ent = FIRST;
+    self->ent = -1;
+    self->clear_flg = 0;
+    self->in_count = 0;
+    self->bytes_out = 0;
+    self->checkpoint = CHECK_GAP;
+    self->ratio = 0;
+    self->bitbuf = 0;
+    self->bitcnt = 0;
+    self->group_codes = 0;
+    self->group_bytes = 0;
+    if (self->lock == NULL && (self->lock = PyThread_allocate_lock()) == NULL) {
+        PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+        return -1;
+    }
+    if (self->htab == NULL) {
+        self->htab = malloc(sizeof(int32_t) * HSIZE);
+        self->codetab = malloc(sizeof(uint16_t) * HSIZE);
+        if (self->htab == NULL || self->codetab == NULL) {
+            PyErr_NoMemory();
+            return -1;
+        }
+    }
+    clear_hash(self);
+    return 0;
+}
+
+static void
+Compressor_dealloc(Compressor *self)
+{
+    if (self->lock != NULL)
+        PyThread_free_lock(self->lock);
+    free(self->htab);
+    free(self->codetab);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static PyMethodDef Compressor_methods[] = {
+    {"compress", (PyCFunction)Compressor_compress, METH_O, Compressor_compress_doc},
+    {"flush", (PyCFunction)Compressor_flush, METH_NOARGS, Compressor_flush_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+PyDoc_STRVAR(Compressor_doc,
+"Compressor()\n"
+"--\n\n"
+"Incremental encoder of .Z data with 16-bit codes. Objects can not be shared by\n"
+"concurrent threads.");
+
+static PyTypeObject CompressorType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "hatanaka._lzw.Compressor",
+    .tp_basicsize = sizeof(Compressor),
+    .tp_dealloc = (destructor)Compressor_dealloc,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = Compressor_doc,
+    .tp_methods = Compressor_methods,
+    .tp_init = (initproc)Compressor_init,
+    .tp_new = PyType_GenericNew,
+};
+
+static struct PyModuleDef lzw_module = {
+    PyModuleDef_HEAD_INIT,
+    "_lzw",
+    "Incremental LZW (.Z) compression and decompression.",
+    -1,
+    NULL
+};
+
+PyMODINIT_FUNC
+PyInit__lzw(void)
+{
+    PyObject *m;
+
+    if (PyType_Ready(&DecompressorType) < 0 || PyType_Ready(&CompressorType) < 0)
+        return NULL;
+    if ((m = PyModule_Create(&lzw_module)) == NULL)
+        return NULL;
+    Py_INCREF(&DecompressorType);
+    if (PyModule_AddObject(m, "Decompressor", (PyObject *)&DecompressorType) < 0) {
+        Py_DECREF(&DecompressorType);
+        Py_DECREF(m);
+        return NULL;
+    }
+    Py_INCREF(&CompressorType);
+    if (PyModule_AddObject(m, "Compressor", (PyObject *)&CompressorType) < 0) {
+        Py_DECREF(&CompressorType);
+        Py_DECREF(m);
+        return NULL;
+    }
+    return m;
+}
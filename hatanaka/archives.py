@@ -0,0 +1,242 @@
+import io
+import os
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path, PurePosixPath
+from typing import List, Union
+
+from .cache import DecompressionCache
+from .general_compression import _count_output, _decompress_cached, _projection, _raise_many, \
+    _run_on_disk, _to_timedelta, _using_zstd_dict, _write_file, get_decompressed_path
+from .stats import _add_to_counters, _conversion
+
+__all__ = ['decompress_archive', 'is_archive']
+
+
+def decompress_archive(path: Union[Path, str], out_dir: Union[Path, str] = None, *,
+                       out_archive: Union[Path, str] = None, workers: int = None,
+                       delete: bool = False, skip_strange_epochs: bool = False,
+                       strict: bool = False, threads: int = None,
+                       cache: DecompressionCache = None,
+                       zstd_dict: Union[bytes, Path, str] = None) -> List[Path]:
+    """Decompress all compressed RINEX files in a tar or zip archive.
+
+    The members are read from the archive one after another, without extracting them to disk,
+    and decompressed by a pool of worker processes. The decompressed files are either written to
+    a directory or packed into a new archive.
+
+    Parameters
+    ----------
+    path : Path or str
+        Path to a tar archive, optionally compressed with gzip, bzip2 or xz, or a zip archive.
+    out_dir : Path or str, optional
+        Directory to write the decompressed files to, keeping the directory structure of the
+        archive. Defaults to the directory of the archive.
+    out_archive : Path or str, optional
+        Write the decompressed files to this archive instead of a directory, in the same order
+        and with the same modification times as in the input archive. A zip archive is written
+        if the name ends with .zip, otherwise a tar archive, compressed according to the suffix
+        (.tar.gz, .tgz, .tar.bz2, .tar.xz or .tar).
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, the files are processed sequentially in the current process.
+    delete : bool, default False
+        Delete the archive if all files were decompressed without any errors or warnings.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+    strict : bool, default False
+        If True, a ValueError is raised for files in the archive that are not RINEX.
+    threads : int, optional
+        Number of threads for Hatanaka decompression of each file.
+        Defaults to 1 if there are several worker processes, otherwise to the number of CPUs.
+    cache : DecompressionCache, optional
+        Get the results from this cache if available and add them otherwise.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for compressing the files, as returned by
+        :func:`train_zstd_dictionary`, or the path to a file containing it.
+
+    Returns
+    -------
+    list of Path
+        Paths to the decompressed RINEX files, in the order of the archive.
+        If out_archive is given, these are the names of the files in it.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression.
+    ValueError
+        For invalid file contents or file names.
+        If several files fail, the first error is raised after all other files have been processed.
+
+    Warns
+    -----
+    Warnings for the individual files are re-raised in the calling process.
+    """
+    path = Path(path)
+    warnings_or_errors = []
+
+    def results():
+        for result in _run_archive(path, out_dir, out_archive, workers,
+                                   skip_strange_epochs=skip_strange_epochs, strict=strict,
+                                   threads=threads, cache=cache, zstd_dict=zstd_dict):
+            warnings_or_errors.append(result[2] or result[3] is not None)
+            yield result
+
+    out_paths = _raise_many(results())
+    if delete and not any(warnings_or_errors):
+        path.unlink()
+    return out_paths
+
+
+def is_archive(path: Union[Path, str]) -> bool:
+    """Check whether a file is an archive to be decompressed with :func:`decompress_archive`.
+
+    Parameters
+    ----------
+    path : Path or str
+        Path to the file.
+
+    Returns
+    -------
+    bool
+        True for tar archives and for zip archives with more than one file.
+        Zip archives of a single file are handled by :func:`decompress` as well.
+    """
+    try:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as z:
+                return sum(not info.is_dir() for info in z.infolist()) > 1
+        return tarfile.is_tarfile(path)
+    except OSError:
+        return False
+
+
+def _run_archive(path, out_dir, out_archive, workers, **kwargs):
+    """Decompress the members of an archive using a pool of worker processes.
+
+    Yields (name, out_path, warnings, error, stats) tuples in the order of the archive, like
+    _run_many(). Only a few members per worker are read ahead, which bounds the memory usage.
+    """
+    if out_dir is not None and out_archive is not None:
+        raise ValueError('only one of out_dir and out_archive can be given')
+    if out_archive is None:
+        out_dir = Path(path).parent if out_dir is None else Path(out_dir)
+        kwargs['out_dir'] = out_dir
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+    if kwargs.get('threads') is None and workers > 1:
+        # the worker processes already keep the CPUs busy
+        kwargs['threads'] = 1
+    with ExitStack() as stack:
+        members = _iter_members(path, stack)
+        add = _open_archive_writer(out_archive, stack) if out_archive is not None else None
+        if workers <= 1:
+            results = ((name, mtime, _run_on_disk(_decompress_member, (name, data), kwargs))
+                       for name, mtime, data in members)
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            results = _map_ahead(executor, members, kwargs, 2 * workers)
+        for name, mtime, (out_path, warning_list, error, stats) in results:
+            if workers > 1:
+                _add_to_counters(stats)
+            if add is not None and error is None:
+                out_path, txt = out_path
+                add(str(out_path), txt, mtime)
+            yield Path(name), out_path, warning_list, error, stats
+
+
+def _map_ahead(executor, members, kwargs, n_ahead):
+    pending = deque()
+    for name, mtime, data in members:
+        pending.append((name, mtime,
+                        executor.submit(_run_on_disk, _decompress_member, (name, data), kwargs)))
+        if len(pending) >= n_ahead:
+            name, mtime, future = pending.popleft()
+            yield name, mtime, future.result()
+    while pending:
+        name, mtime, future = pending.popleft()
+        yield name, mtime, future.result()
+
+
+def _decompress_member(member, *, out_dir=None, skip_strange_epochs=False, strict=False,
+                       start=None, end=None, interval=None, threads=None, systems=None,
+                       satellites=None, obs_types=None, cache=None, zstd_dict=None, stats=None):
+    """Decompress an archive member given as a (name, data) tuple.
+
+    Writes the result to out_dir and returns its path or, if out_dir is None, returns the
+    relative path and the decompressed data.
+    """
+    name, data = member
+    projection = _projection(systems, satellites, obs_types)
+    with _conversion(stats), _using_zstd_dict(zstd_dict), ExitStack() as stack:
+        out_name = _member_path(name)
+        txt = _decompress_cached(stack, data, cache, skip_strange_epochs, strict, start, end,
+                                 _to_timedelta(interval), threads, projection)
+        out_name = get_decompressed_path(out_name)
+        if out_dir is None:
+            txt = bytes(txt)
+            _count_output(txt)
+            return out_name, txt
+        out_path = out_dir / out_name
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_file(out_path, txt)
+        return out_path
+
+
+def _member_path(name: str) -> Path:
+    path = PurePosixPath(name)
+    if path.is_absolute() or '..' in path.parts or path.name in ('', '.'):
+        raise ValueError(f"unsafe file name '{name}' in archive")
+    return Path(*path.parts)
+
+
+def _iter_members(path, stack):
+    """Yield the (name, modification time, contents) of the files in an archive in the order
+    they are stored. Tar archives are read sequentially as a stream."""
+    if zipfile.is_zipfile(path):
+        z = stack.enter_context(zipfile.ZipFile(path))
+        for info in z.infolist():
+            if not info.is_dir():
+                yield info.filename, time.mktime(info.date_time + (0, 0, -1)), z.read(info)
+        return
+    tar = stack.enter_context(tarfile.open(path, 'r|*'))
+    for info in tar:
+        if info.isfile():
+            yield info.name, info.mtime, tar.extractfile(info).read()
+
+
+def _open_archive_writer(path, stack):
+    """Open an archive for writing and return a function for adding files to it."""
+    path = Path(path)
+    name = path.name.lower()
+    if name.endswith('.zip'):
+        z = stack.enter_context(zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED))
+
+        def add(member, data, mtime):
+            # zip archives can not store times before 1980
+            date_time = time.localtime(max(mtime, 315532800))[:6]
+            z.writestr(zipfile.ZipInfo(member, date_time), data, zipfile.ZIP_DEFLATED)
+        return add
+
+    for suffixes, mode in [(('.tar.gz', '.tgz'), 'gz'), (('.tar.bz2', '.tbz2'), 'bz2'),
+                           (('.tar.xz', '.txz'), 'xz'), (('.tar',), '')]:
+        if name.endswith(suffixes):
+            break
+    else:
+        raise ValueError(f"unsupported archive format of '{str(path)}', "
+                         "expected .zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz")
+    tar = stack.enter_context(tarfile.open(path, 'w|' + mode))
+
+    def add(member, data, mtime):
+        info = tarfile.TarInfo(member)
+        info.size = len(data)
+        info.mtime = int(mtime)
+        info.mode = 0o644
+        tar.addfile(info, io.BytesIO(data))
+    return add
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+__all__ = ['DecompressionCache']
+
+
+class DecompressionCache:
+    """A size-bounded on-disk cache of decompressed RINEX files.
+
+    Pass an instance as the ``cache`` argument of :func:`decompress`, :func:`decompress_on_disk`
+    or :func:`decompress_many` to reuse the results of earlier decompressions of the same data.
+    The entries are addressed by a hash of the input contents and of the options affecting the
+    output, so renamed or copied files are recognized as well and changed files are not.
+
+    The cache directory can be shared by any number of threads and processes. The entries are
+    written to temporary files that are renamed into place once complete, and the least recently
+    used entries are deleted once the total size exceeds max_size.
+
+    Parameters
+    ----------
+    directory : Path or str
+        Directory to store the decompressed files in. Created if it does not exist.
+    max_size : int, default 1 GiB
+        Maximum total size of the cached files in bytes.
+    """
+
+    def __init__(self, directory: Union[Path, str], max_size: int = 2 ** 30):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def __repr__(self):
+        return f'DecompressionCache({str(self.directory)!r}, max_size={self.max_size})'
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached files in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """Delete all cached files."""
+        for path, _, _ in self._entries():
+            _unlink(path)
+
+    def _key(self, data, **options) -> str:
+        from . import __version__, rnxcmp_version
+        h = hashlib.blake2b(digest_size=20)
+        # a new version may produce different output
+        h.update(json.dumps([__version__, rnxcmp_version, options], sort_keys=True,
+                            default=str).encode())
+        h.update(data)
+        return h.hexdigest()
+
+    def _load(self, key: str) -> Optional[bytes]:
+        path = self.directory / (key + _SUFFIX)
+        try:
+            txt = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            # the modification time orders the entries by their last use
+            os.utime(path)
+        except OSError:
+            pass
+        return txt
+
+    def _store(self, key: str, txt):
+        """Add an entry and evict the least recently used ones. Errors are ignored, since
+        the cache is only an optimization."""
+        size = memoryview(txt).nbytes
+        if size > self.max_size:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(_TMP_SUFFIX, dir=self.directory)
+        except OSError:
+            return
+        try:
+            with open(fd, 'wb') as f:
+                f.write(txt)
+            os.replace(tmp_path, self.directory / (key + _SUFFIX))
+        except OSError:
+            _unlink(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            _unlink(path)
+            total -= size
+        # left behind by processes that were killed while writing
+        now = time.time()
+        for path in self.directory.glob('*' + _TMP_SUFFIX):
+            try:
+                if path.stat().st_mtime < now - _TMP_MAX_AGE:
+                    _unlink(path)
+            except OSError:
+                pass
+
+    def _entries(self):
+        """The (path, size, time of last use) of all cached files."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(_SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            # deleted by another process
+                            continue
+                        entries.append((Path(entry.path), stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return entries
+
+
+_SUFFIX = '.rnx'
+_TMP_SUFFIX = '.tmp'
+# seconds after which temporary files are considered abandoned
+_TMP_MAX_AGE = 3600
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        # already deleted or still open on Windows
+        pass
@@ -1,15 +1,21 @@
 import argparse
 import os
 import sys
+import tarfile
+import warnings
+import zipfile
+from datetime import datetime
 from pathlib import Path
 from typing import List
 
-from hatanaka import __version__, compress, compress_on_disk, decompress, decompress_on_disk, \
-    rnxcmp_version
-from hatanaka.general_compression import _record_warnings
+from hatanaka import ConversionStats, DecompressionCache, __version__, compress, \
+    compress_on_disk, decompress, decompress_on_disk, is_archive, rnxcmp_version, transcode, \
+    transcode_on_disk
+from hatanaka.archives import _run_archive
+from hatanaka.general_compression import _record_warnings, _run_many
 from hatanaka.hatanaka import _popen
 
-__all__ = ['decompress_cli', 'compress_cli']
+__all__ = ['decompress_cli', 'compress_cli', 'transcode_cli']
 
 
 def decompress_cli(args: List[str] = None) -> int:
@@ -19,7 +25,8 @@ def decompress_cli(args: List[str] = None) -> int:
     parser = argparse.ArgumentParser(
         description='Decompress compressed RINEX files.',
         epilog='This program will decompress any RINEX files compressed with Hatanaka compression'
-               '(.crx|.##d) and/or with a conventional compression format (.gz|.Z|.zip|.bz2) to '
+               '(.crx|.##d) and/or with a conventional compression format '
+               '(.gz|.Z|.zip|.bz2|.zst|.xz|.lz4) to '
                'their plain RINEX counterpart. Already decompressed files are ignored. '
                'Exit codes: 0 - success, 1 - error, 2 - warning.'
     )
@@ -34,9 +41,34 @@ def decompress_cli(args: List[str] = None) -> int:
              'Combination with use of -e option of RNX2CRX may be effective.\n'
              'Caution: It is assumed that no change in the list of data types '
              'happens in the lost part of the data.')
+    parser.add_argument('--start', type=datetime.fromisoformat, metavar='TIME',
+                        help='only output the epochs from this time onwards, '
+                             'e.g. 2021-01-01T12:00:00')
+    parser.add_argument('--end', type=datetime.fromisoformat, metavar='TIME',
+                        help='only output the epochs before this time')
+    parser.add_argument('--interval', type=float, metavar='SECONDS',
+                        help='only output the epochs whose time is a multiple of this interval')
+    _add_projection_args(parser)
+    parser.add_argument('--cache', type=Path, metavar='DIR',
+                        help='reuse the decompressed files stored in this directory for identical '
+                             'inputs and store the new ones there')
+    parser.add_argument('--cache-size', type=float, default=1024, metavar='MiB',
+                        help='maximum total size of the cached files (default: 1024)')
+    parser.add_argument('--out-archive', type=Path, metavar='FILE',
+                        help='with a single input archive, write the decompressed files to this '
+                             '.zip, .tar, .tar.gz, .tar.bz2 or .tar.xz archive instead')
+    _add_zstd_dict_arg(parser)
     _add_common_args(parser)
     args = parser.parse_args(args)
-    return _run(decompress, decompress_on_disk, args, skip_strange_epochs=args.skip_strange_epochs)
+    cache = None
+    if args.cache is not None:
+        cache = DecompressionCache(args.cache, max_size=int(args.cache_size * 2 ** 20))
+    return _run(decompress, decompress_on_disk, args, archives=True, out_archive=args.out_archive,
+                skip_strange_epochs=args.skip_strange_epochs,
+                start=args.start, end=args.end, interval=args.interval,
+                threads=1 if args.jobs != 1 and len(args.files) > 1 else None,
+                systems=args.systems, satellites=args.satellites, obs_types=args.obs_types,
+                cache=cache, zstd_dict=args.zstd_dict)
 
 
 def compress_cli(args: List[str] = None) -> int:
@@ -53,9 +85,8 @@ def compress_cli(args: List[str] = None) -> int:
     parser.add_argument('files', type=Path, nargs='*',
                         help='RINEX files. '
                              'stdin and stdout are used if no input files are provided.')
-    parser.add_argument('-c', '--compression', default='gz', choices=['gz', 'bz2', 'Z', 'none'],
-                        help='which compression to apply in addition to Hatanaka compression '
-                             '(default: gz)')
+    _add_compression_args(parser, 'which compression to apply in addition to Hatanaka compression '
+                                  '(default: gz)')
     parser.add_argument(
         '-s', '--skip-strange-epochs', action='store_true',
         help='warn and skip strange epochs instead of raising an exception')
@@ -67,45 +98,188 @@ def compress_cli(args: List[str] = None) -> int:
              'This option may be used to increase chances to recover parts of data by using '
              'the --skip-strange-epochs option of rinex-decompress at the cost of '
              'increasing the file size.')
+    _add_projection_args(parser)
+    _add_zstd_dict_arg(parser)
     _add_common_args(parser)
     args = parser.parse_args(args)
+    _check_level(parser, args)
     return _run(compress, compress_on_disk, args,
                 compression=args.compression,
                 skip_strange_epochs=args.skip_strange_epochs,
-                reinit_every_nth=args.reinit_every_nth)
+                reinit_every_nth=args.reinit_every_nth,
+                compresslevel=args.level,
+                threads=1 if args.jobs != 1 and len(args.files) > 1 else None,
+                systems=args.systems, satellites=args.satellites, obs_types=args.obs_types,
+                zstd_dict=args.zstd_dict)
+
+
+def transcode_cli(args: List[str] = None) -> int:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        description='Change the conventional compression of RINEX files.',
+        epilog='This program replaces the conventional compression of any provided RINEX files, '
+               'e.g. .crx.Z by .crx.zst, without Hatanaka decompression and compression. '
+               'The Compact RINEX contents are kept as they are. '
+               'Files that already have the requested compression are ignored. '
+               'Exit codes: 0 - success, 1 - error, 2 - warning.'
+    )
+    parser.add_argument('files', type=Path, nargs='*',
+                        help='Compressed RINEX files. '
+                             'stdin and stdout are used if no input files are provided.')
+    _add_compression_args(parser, 'the new compression (default: gz)')
+    _add_zstd_dict_arg(parser)
+    _add_common_args(parser)
+    args = parser.parse_args(args)
+    _check_level(parser, args)
+    return _run(transcode, transcode_on_disk, args,
+                compression=args.compression,
+                compresslevel=args.level,
+                threads=1 if args.jobs != 1 and len(args.files) > 1 else None,
+                zstd_dict=args.zstd_dict)
+
+
+# valid compression levels by compression, 1-9 for the others
+_LEVELS = {
+    'zst': range(1, 23),
+    'xz': range(0, 10),
+    'lz4': range(0, 17),
+}
 
 
-def _run(func, func_on_disk, args, **kwargs):
+def _run(func, func_on_disk, args, archives=False, out_archive=None, **kwargs):
     missing_files = [x for x in args.files if not x.exists()]
     if missing_files:
         for f in missing_files:
             print(f"Error: '{str(f)}' was not found", file=sys.stderr)
             exit(1)
 
-    for in_file in args.files:
-        with _record_warnings() as warning_list:
-            out_file = func_on_disk(in_file, delete=args.delete, **kwargs)
+    files = args.files
+    archive_files = []
+    if archives:
+        # tar and multi-file zip archives are unpacked and their contents decompressed
+        archive_files = [x for x in files if is_archive(x)]
+        files = [x for x in files if x not in archive_files]
+    if out_archive is not None and (len(args.files) != 1 or len(archive_files) != 1):
+        print('Error: --out-archive requires a single input archive', file=sys.stderr)
+        return 1
+
+    n_errors = 0
+    n_warnings = 0
+    total = ConversionStats()
+
+    def report(prefix, name, warning_list, error, stats):
+        nonlocal n_errors, n_warnings, total
+        for category, message in warning_list:
+            warnings.warn(message, category)
+        n_warnings += len(warning_list)
+        total += stats
+        if args.progress:
+            print(f'{prefix} {name}: {_format_stats(stats)}', file=sys.stderr)
+        if error is not None:
+            print(f"Error: failed to {func.__name__} '{name}': {error}", file=sys.stderr)
+            n_errors += 1
+            return False
+        return True
+
+    results = _run_many(func_on_disk, files, args.jobs, delete=args.delete, **kwargs)
+    for i, (in_file, out_file, warning_list, error, stats) in enumerate(results, 1):
+        if not report(f'[{i}/{len(files)}]', str(in_file), warning_list, error, stats):
+            continue
         if out_file == in_file:
-            print(f'{str(in_file)} is already {func.__name__}ed')
+            print(f'{str(in_file)} is already {func.__name__.rstrip("e")}ed')
         else:
             print(f'Created {str(out_file)}')
         if args.delete and not in_file.exists():
             print(f'Deleted {str(in_file)}')
 
+    for archive in archive_files:
+        success = True
+        results = _run_archive(archive, None, out_archive, args.jobs, **kwargs)
+        try:
+            for i, (member, out_file, warning_list, error, stats) in enumerate(results, 1):
+                name = f'{str(archive)}:{member.as_posix()}'
+                success &= not warning_list and error is None
+                if not report(f'[{i}]', name, warning_list, error, stats):
+                    continue
+                if out_archive is None:
+                    print(f'Created {str(out_file)}')
+                else:
+                    print(f'Added {out_file.as_posix()} to {str(out_archive)}')
+        except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            print(f"Error: failed to read '{str(archive)}': {e}", file=sys.stderr)
+            n_errors += 1
+            success = False
+        if args.delete and success:
+            archive.unlink()
+            print(f'Deleted {str(archive)}')
+
     if len(args.files) == 0:
         with _record_warnings() as warning_list:
-            converted = func(sys.stdin.buffer.read(), **kwargs)
+            converted = func(sys.stdin.buffer.read(), stats=total, **kwargs)
             sys.stdout.buffer.write(converted)
+        n_warnings += len(warning_list)
+        if args.progress:
+            print(f'<stdin>: {_format_stats(total)}', file=sys.stderr)
+
+    if args.stats:
+        print(total.summary(), file=sys.stderr)
 
-    if len(warning_list) > 0:
+    if n_errors > 0:
+        return 1
+    if n_warnings > 0:
         return 2
     return 0
 
 
+def _format_stats(stats):
+    speed = max(stats.bytes_in, stats.bytes_out) / 1e6 / stats.wall if stats.wall > 0 else 0
+    return (f'{stats.bytes_in / 1e6:.2f} MB -> {stats.bytes_out / 1e6:.2f} MB '
+            f'in {stats.wall:.3f} s ({speed:.1f} MB/s)')
+
+
+def _add_projection_args(parser):
+    parser.add_argument('--systems', metavar='GNSS',
+                        help='only keep the observations of these GNSS systems, e.g. GE')
+    parser.add_argument('--satellites', metavar='PRNS',
+                        help='only keep the observations of these satellites, e.g. G01,G05,E11')
+    parser.add_argument('--obs-types', metavar='TYPES',
+                        help='only keep these observation types, e.g. C1C,L1C,C5Q,L5Q')
+
+
+def _add_compression_args(parser, help):
+    parser.add_argument('-c', '--compression', default='gz',
+                        choices=['gz', 'bz2', 'Z', 'zst', 'xz', 'lz4', 'none'], help=help)
+    parser.add_argument('-l', '--level', type=int, metavar='LEVEL',
+                        help='compression level from the fastest to the smallest: '
+                             'gz, bz2: 1-9 (default: 9), zst: 1-22 (default: 12), '
+                             'xz: 0-9 (default: 6), lz4: 0-16 (default: 0)')
+
+
+def _check_level(parser, args):
+    if args.level is not None and args.level not in _LEVELS.get(args.compression, range(1, 10)):
+        parser.error(f'invalid compression level {args.level} for {args.compression}')
+
+
+def _add_zstd_dict_arg(parser):
+    parser.add_argument('--zstd-dict', type=Path, metavar='FILE',
+                        help='zstd dictionary for .zst files, '
+                             'as created by hatanaka.train_zstd_dictionary()')
+
+
 def _add_common_args(parser):
     parser.add_argument('-d', '--delete', action='store_true',
                         help='delete the input file if conversion '
                              'finishes without any errors and warnings')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                        help='number of files to process in parallel '
+                             '(default: 1, 0: number of CPUs)')
+    parser.add_argument('--progress', action='store_true',
+                        help='print the size and speed of each file to stderr once it is done')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the total sizes, timings and speeds of the conversion stages '
+                             'to stderr at the end')
     parser.add_argument('--version', action='version', version=__version__)
     parser.add_argument('--rnxcmp-version', action='version', version=rnxcmp_version)
 
@@ -1,37 +1,62 @@
 import bz2
 import gzip
+import io
+import lzma
+import mmap
+import os
 import re
+import struct
 import warnings
 import zipfile
-from contextlib import contextmanager
-from io import BytesIO
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Union
+from typing import BinaryIO, Iterable, List, Optional, Union
 
 import ncompress as lzw
 
+from .cache import DecompressionCache
 from .hatanaka import crx2rnx, rnx2crx
+from .stats import ConversionStats, StatsArg, _add_to_counters, _conversion, _count_input, \
+    _count_output, _nbytes, _stage, _timed, _warning_count
+
+try:
+    from hatanaka import _lzw
+except ImportError:  # pragma: no cover
+    _lzw = None
 
 __all__ = [
-    'decompress', 'decompress_on_disk', 'get_decompressed_path',
-    'compress', 'compress_on_disk', 'get_compressed_path'
+    'decompress', 'decompress_on_disk', 'decompress_many', 'get_decompressed_path',
+    'compress', 'compress_on_disk', 'compress_many', 'get_compressed_path',
+    'train_zstd_dictionary'
 ]
 
 
-def decompress(content: Union[Path, str, bytes], *,
-               skip_strange_epochs: bool = False, strict: bool = False) -> bytes:
+def decompress(content: Union[Path, str, bytes, memoryview, BinaryIO], *,
+               skip_strange_epochs: bool = False, strict: bool = False,
+               start: datetime = None, end: datetime = None,
+               interval: Union[float, timedelta] = None, threads: int = None,
+               systems: Iterable[str] = None, satellites: Iterable[str] = None,
+               obs_types: Iterable[str] = None, cache: DecompressionCache = None,
+               zstd_dict: Union[bytes, Path, str] = None, stats: StatsArg = None) -> bytes:
     """Decompress compressed RINEX files.
 
     Any RINEX files compressed with Hatanaka compression (.crx|.##d) and/or with a conventional
-    compression format (.gz|.Z|.zip|.bz2) are decompressed to their plain RINEX counterpart.
+    compression format (.gz|.Z|.zip|.bz2|.zst|.xz|.lz4) are decompressed to their plain RINEX
+    counterpart.
     Already decompressed files are returned as is.
 
     Compression type is deduced automatically from the file contents.
 
     Parameters
     ----------
-    content : Path or str or bytes
-        Path to a compressed RINEX file or file contents as a bytes object.
+    content : Path or str or bytes-like or binary file object
+        Path to a compressed RINEX file or file contents as a bytes-like object
+        (bytes, bytearray, memoryview, mmap, ...) or as a binary file object.
+        Bytes-like objects are used without copying and large files are memory-mapped.
     skip_strange_epochs : bool, default False
         For Hatanaka decompression.
         Warn and skip strange epochs instead of raising an exception.
@@ -43,6 +68,39 @@ def decompress(content: Union[Path, str, bytes], *,
         lost part of the data.
     strict : bool, default False
         If True, a ValueError is raised if the decoded file is not RINEX.
+    start : datetime.datetime, optional
+        Only return the epochs from this time onwards (in the time system of the file).
+    end : datetime.datetime, optional
+        Only return the epochs before this time.
+        When start or end are given for a Compact RINEX file, only the part of the file
+        from the preceding epoch where all data arcs are initialized (see reinit_every_nth
+        of :func:`compress`) is decoded. An index built with :func:`build_index` is used
+        to also skip reading and decompressing the rest of the file, if available.
+    interval : float or datetime.timedelta, optional
+        Only return the epochs whose time is a multiple of this interval, in seconds.
+        Event records are kept. The epochs are selected by the Hatanaka decoder, which
+        skips the formatting of the others.
+    threads : int, optional
+        Number of threads for Hatanaka decompression. Defaults to the number of CPUs.
+        Large Compact RINEX files are split at the epochs where all data arcs are initialized
+        (see reinit_every_nth of :func:`compress`) and the parts are decoded in parallel.
+    systems : str or iterable of str, optional
+        Only return the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        Only return the observations of these satellites, e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        Only return these observation types, e.g. ['C1C', 'L1C'] (RINEX 3/4) or ['C1', 'L1'] (RINEX 2).
+        The unwanted data fields are dropped by the Hatanaka decoder without being formatted
+        and the observation type records of the header are rewritten to match.
+    cache : DecompressionCache, optional
+        Get the result from this cache if the same data has been decompressed with the same
+        options before and add it otherwise. Results with warnings are not cached.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for compressing the file, as returned by
+        :func:`train_zstd_dictionary`, or the path to a file containing it.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
 
     Returns
     -------
@@ -56,19 +114,27 @@ def decompress(content: Union[Path, str, bytes], *,
     ValueError
         For invalid file contents.
     """
-    if isinstance(content, (Path, str)):
-        content = _decompress(Path(content).read_bytes(), skip_strange_epochs, strict)[1]
-    elif not isinstance(content, bytes):
-        raise ValueError('input must be either a path or a binary string')
-    return _decompress(content, skip_strange_epochs, strict)[1]
+    projection = _projection(systems, satellites, obs_types)
+    with _conversion(stats), _using_zstd_dict(zstd_dict), ExitStack() as stack:
+        txt = bytes(_decompress_cached(stack, content, cache, skip_strange_epochs, strict, start,
+                                       end, _to_timedelta(interval), threads, projection))
+        _count_output(txt)
+    return txt
 
 
 def decompress_on_disk(path: Union[Path, str], *, delete: bool = False,
-                       skip_strange_epochs: bool = False, strict: bool = False) -> Path:
+                       skip_strange_epochs: bool = False, strict: bool = False,
+                       start: datetime = None, end: datetime = None,
+                       interval: Union[float, timedelta] = None, threads: int = None,
+                       systems: Iterable[str] = None, satellites: Iterable[str] = None,
+                       obs_types: Iterable[str] = None, cache: DecompressionCache = None,
+                       zstd_dict: Union[bytes, Path, str] = None,
+                       stats: StatsArg = None) -> Path:
     """Decompress compressed RINEX files and write the resulting file to disk.
 
     Any RINEX files compressed with Hatanaka compression (.crx|.##d) and/or with a conventional
-    compression format (.gz|.Z|.zip|.bz2) are decompressed to their plain RINEX counterpart.
+    compression format (.gz|.Z|.zip|.bz2|.zst|.xz|.lz4) are decompressed to their plain RINEX
+    counterpart.
     Already decompressed files are ignored.
 
     Compression type is deduced automatically from the file contents.
@@ -90,6 +156,33 @@ def decompress_on_disk(path: Union[Path, str], *, delete: bool = False,
         lost part of the data.
     strict : bool, default False
         If True, a ValueError is raised if the decoded file is not RINEX.
+    start : datetime.datetime, optional
+        Only keep the epochs from this time onwards.
+    end : datetime.datetime, optional
+        Only keep the epochs before this time.
+    interval : float or datetime.timedelta, optional
+        Only keep the epochs whose time is a multiple of this interval, in seconds.
+    threads : int, optional
+        Number of threads for Hatanaka decompression. Defaults to the number of CPUs.
+        Large Compact RINEX files are split at the epochs where all data arcs are initialized
+        (see reinit_every_nth of :func:`compress`) and the parts are decoded in parallel.
+    systems : str or iterable of str, optional
+        Only keep the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        Only keep the observations of these satellites, e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        Only keep these observation types, e.g. ['C1C', 'L1C'] (RINEX 3/4) or ['C1', 'L1'] (RINEX 2).
+        The unwanted data fields are dropped by the Hatanaka decoder without being formatted
+        and the observation type records of the header are rewritten to match.
+    cache : DecompressionCache, optional
+        Get the result from this cache if the same data has been decompressed with the same
+        options before and add it otherwise. Results with warnings are not cached.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for compressing the file, as returned by
+        :func:`train_zstd_dictionary`, or the path to a file containing it.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
 
     Returns
     -------
@@ -104,14 +197,16 @@ def decompress_on_disk(path: Union[Path, str], *, delete: bool = False,
         For invalid file contents.
     """
     path = Path(path)
-    with _record_warnings() as warning_list:
-        is_obs, txt = _decompress(path.read_bytes(), skip_strange_epochs, strict)
-    out_path = get_decompressed_path(path)
-    if out_path == path:
-        # file does not need decompressing
-        return out_path
-    with out_path.open('wb') as f_out:
-        f_out.write(txt)
+    projection = _projection(systems, satellites, obs_types)
+    with _conversion(stats), _record_warnings() as warning_list, \
+            _using_zstd_dict(zstd_dict), ExitStack() as stack:
+        txt = _decompress_cached(stack, path, cache, skip_strange_epochs, strict, start, end,
+                                 _to_timedelta(interval), threads, projection)
+        out_path = get_decompressed_path(path)
+        if out_path == path:
+            # file does not need decompressing
+            return out_path
+        _write_file(out_path, txt)
     assert out_path.exists()
     if delete:
         if len(warning_list) == 0 and out_path != path:
@@ -119,6 +214,67 @@ def decompress_on_disk(path: Union[Path, str], *, delete: bool = False,
     return out_path
 
 
+def decompress_many(paths: Iterable[Union[Path, str]], *, workers: int = None,
+                    delete: bool = False, skip_strange_epochs: bool = False,
+                    strict: bool = False, threads: int = None,
+                    cache: DecompressionCache = None,
+                    zstd_dict: Union[bytes, Path, str] = None) -> List[Path]:
+    """Decompress several compressed RINEX files on disk in parallel.
+
+    Same as calling :func:`decompress_on_disk` for each file, but the files are processed
+    by a pool of worker processes.
+
+    Parameters
+    ----------
+    paths : iterable of Path or str
+        Paths to compressed RINEX files.
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, the files are processed sequentially in the current process.
+    delete : bool, default False
+        Delete each source file after successful decompression if no errors or warnings were
+        raised for it.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+    strict : bool, default False
+        If True, a ValueError is raised if the decoded file is not RINEX.
+    threads : int, optional
+        Number of threads for Hatanaka decompression of each file.
+        Defaults to 1 if there are several worker processes, otherwise to the number of CPUs.
+    cache : DecompressionCache, optional
+        Get the results from this cache if available and add them otherwise.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for compressing the file, as returned by
+        :func:`train_zstd_dictionary`, or the path to a file containing it.
+
+    Returns
+    -------
+    list of Path
+        Paths to the decompressed RINEX files, in the same order as the input paths.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression.
+    ValueError
+        For invalid file contents.
+        If several files fail, the first error is raised after all other files have been processed.
+
+    Warns
+    -----
+    Warnings for the individual files are re-raised in the calling process.
+    """
+    paths = list(paths)
+    if threads is None and workers != 1 and len(paths) > 1:
+        # the worker processes already keep the CPUs busy
+        threads = 1
+    return _raise_many(_run_many(
+        decompress_on_disk, paths, workers,
+        delete=delete, skip_strange_epochs=skip_strange_epochs, strict=strict, threads=threads,
+        cache=cache, zstd_dict=zstd_dict))
+
+
 def get_decompressed_path(path: Union[Path, str]) -> Path:
     """Get the decompressed path corresponding to a compressed RINEX file after decompression.
 
@@ -136,7 +292,7 @@ def get_decompressed_path(path: Union[Path, str]) -> Path:
     parts = path.name.split('.')
     if len(parts) <= 1:
         raise ValueError(f"'{str(path)}' is not a valid RINEX file name")
-    if parts[-1].lower() in ['z', 'gz', 'bz2', 'zip']:
+    if '.' + parts[-1].lower() in _CONTAINER_SUFFIXES:
         parts.pop()
     suffix = parts[-1]
     if len(parts) == 1:
@@ -153,9 +309,13 @@ def get_decompressed_path(path: Union[Path, str]) -> Path:
     return out_path
 
 
-def compress(content: Union[Path, str, bytes], *, compression: str = 'gz',
-             skip_strange_epochs: bool = False,
-             reinit_every_nth: int = None) -> bytes:
+def compress(content: Union[Path, str, bytes, memoryview, BinaryIO], *,
+             compression: str = 'gz', skip_strange_epochs: bool = False,
+             reinit_every_nth: int = None, compresslevel: int = None,
+             threads: int = None, workers: int = None, systems: Iterable[str] = None,
+             satellites: Iterable[str] = None, obs_types: Iterable[str] = None,
+             date: Union[datetime, float] = None, zstd_dict: Union[bytes, Path, str] = None,
+             stats: StatsArg = None) -> bytes:
     """Compress RINEX files.
 
     Applies Hatanaka (if observation data) and optionally a conventional compression (gzip by default)
@@ -163,9 +323,11 @@ def compress(content: Union[Path, str, bytes], *, compression: str = 'gz',
 
     Parameters
     ----------
-    content : Path or str or bytes
-        Path to a RINEX file or file contents as a bytes object.
-    compression : 'gz' (default), 'bz2', 'Z' or 'none'
+    content : Path or str or bytes-like or binary file object
+        Path to a RINEX file or file contents as a bytes-like object
+        (bytes, bytearray, memoryview, mmap, ...) or as a binary file object.
+        Bytes-like objects are used without copying and large files are memory-mapped.
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
         Which compression (if any) to apply in addition to the Hatanaka compression.
     skip_strange_epochs : bool, default False
         For Hatanaka compression. Warn and skip strange epochs instead of raising an exception.
@@ -175,6 +337,38 @@ def compress(content: Union[Path, str, bytes], *, compression: str = 'gz',
         thereafter until all the data arc are initialized for differential operation.
         This option may be used to increase chances to recover parts of data by using the
         skip_strange option of crx2rnx at the cost of increasing the file size.
+    compresslevel : int, optional
+        Compression level of gzip and bzip2 from 1 (fastest) to 9 (smallest, default),
+        of zstd from 1 to 22 (default 12), of xz from 0 to 9 (default 6)
+        and of lz4 from 0 to 16 (default 0).
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression. Defaults to the number of CPUs.
+        Large files are compressed in independent blocks, the output does not depend on
+        the number of threads.
+    workers : int, optional
+        For Hatanaka compression. Split large files into up to this many parts at epoch
+        boundaries and compress them in parallel threads. The parts are joined into a single
+        Compact RINEX file in which all data arcs are initialized at the first epoch of each part,
+        as with reinit_every_nth. By default, the file is compressed in one go.
+    systems : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these satellites,
+        e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        For Hatanaka compression. Only keep these observation types, e.g. ['C1C', 'L1C'].
+        The observation type records of the header are rewritten to match.
+    date : datetime.datetime or float, optional
+        For Hatanaka compression. Time written to the CRINEX PROG / DATE line of the header,
+        as a datetime (UTC if naive) or in seconds since 1970-01-01. Defaults to the
+        SOURCE_DATE_EPOCH environment variable, if set, or the current time.
+        The output is reproducible if it is set, since the gzip header does not include a time.
+    zstd_dict : bytes or Path or str, optional
+        For zstd compression. A dictionary returned by :func:`train_zstd_dictionary`, or the path
+        to a file containing it. The same dictionary is needed for decompression.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
 
     Returns
     -------
@@ -188,16 +382,21 @@ def compress(content: Union[Path, str, bytes], *, compression: str = 'gz',
     ValueError
         For invalid file contents.
     """
-    if isinstance(content, (Path, str)):
-        content = Path(content).read_bytes()
-    elif not isinstance(content, bytes):
-        raise ValueError('input must be either a path or a binary string')
-    return _compress(content, compression, skip_strange_epochs, reinit_every_nth)[1]
+    projection = _projection(systems, satellites, obs_types)
+    with _conversion(stats), _using_zstd_dict(zstd_dict), _open_input(content) as txt:
+        txt = bytes(_compress(txt, compression, skip_strange_epochs, reinit_every_nth,
+                              compresslevel, threads, workers, projection, date)[1])
+        _count_output(txt)
+    return txt
 
 
 def compress_on_disk(path: Union[Path, str], *, compression: str = 'gz', delete: bool = False,
                      skip_strange_epochs: bool = False,
-                     reinit_every_nth: int = None) -> Path:
+                     reinit_every_nth: int = None, compresslevel: int = None,
+                     threads: int = None, workers: int = None, systems: Iterable[str] = None,
+                     satellites: Iterable[str] = None, obs_types: Iterable[str] = None,
+                     date: Union[datetime, float] = None,
+                     zstd_dict: Union[bytes, Path, str] = None, stats: StatsArg = None) -> Path:
     """Compress RINEX files.
 
     Applies Hatanaka (if observation data) and optionally a conventional compression (gzip by default)
@@ -207,7 +406,7 @@ def compress_on_disk(path: Union[Path, str], *, compression: str = 'gz', delete:
     ----------
     path : Path or str
         Path to a RINEX file.
-    compression : 'gz' (default), 'bz2', 'Z', or 'none'
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
         Which compression (if any) to apply in addition to the Hatanaka compression.
     delete : bool, default False
         Delete the source file after successful compression if no errors or warnings were raised.
@@ -219,6 +418,38 @@ def compress_on_disk(path: Union[Path, str], *, compression: str = 'gz', delete:
         thereafter until all the data arc are initialized for differential operation.
         This option may be used to increase chances to recover parts of data by using the
         skip_strange option of crx2rnx at the cost of increasing the file size.
+    compresslevel : int, optional
+        Compression level of gzip and bzip2 from 1 (fastest) to 9 (smallest, default),
+        of zstd from 1 to 22 (default 12), of xz from 0 to 9 (default 6)
+        and of lz4 from 0 to 16 (default 0).
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression. Defaults to the number of CPUs.
+        Large files are compressed in independent blocks, the output does not depend on
+        the number of threads.
+    workers : int, optional
+        For Hatanaka compression. Split large files into up to this many parts at epoch
+        boundaries and compress them in parallel threads. The parts are joined into a single
+        Compact RINEX file in which all data arcs are initialized at the first epoch of each part,
+        as with reinit_every_nth. By default, the file is compressed in one go.
+    systems : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        For Hatanaka compression. Only keep the observations of these satellites,
+        e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        For Hatanaka compression. Only keep these observation types, e.g. ['C1C', 'L1C'].
+        The observation type records of the header are rewritten to match.
+    date : datetime.datetime or float, optional
+        For Hatanaka compression. Time written to the CRINEX PROG / DATE line of the header,
+        as a datetime (UTC if naive) or in seconds since 1970-01-01. Defaults to the
+        SOURCE_DATE_EPOCH environment variable, if set, or the current time.
+        The output is reproducible if it is set, since the gzip header does not include a time.
+    zstd_dict : bytes or Path or str, optional
+        For zstd compression. A dictionary returned by :func:`train_zstd_dictionary`, or the path
+        to a file containing it. The same dictionary is needed for decompression.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
 
     Returns
     -------
@@ -233,17 +464,22 @@ def compress_on_disk(path: Union[Path, str], *, compression: str = 'gz', delete:
         For invalid file contents.
     """
     path = Path(path)
-    if path.name.lower().endswith(('.gz', '.bz2', '.z', '.zip')):
+    if path.name.lower().endswith(_CONTAINER_SUFFIXES):
         # already compressed
         return path
-    with _record_warnings() as warning_list:
-        is_obs, txt = _compress(path.read_bytes(), compression=compression,
+    with _conversion(stats), _record_warnings() as warning_list, _using_zstd_dict(zstd_dict), \
+            _open_input(path) as txt:
+        is_obs, txt = _compress(txt, compression=compression,
                                 skip_strange_epochs=skip_strange_epochs,
-                                reinit_every_nth=reinit_every_nth)
-    out_path = get_compressed_path(path, is_obs, compression)
-    if out_path == path:
-        return out_path
-    out_path.write_bytes(txt)
+                                reinit_every_nth=reinit_every_nth,
+                                compresslevel=compresslevel, threads=threads,
+                                workers=workers,
+                                projection=_projection(systems, satellites, obs_types),
+                                date=date)
+        out_path = get_compressed_path(path, is_obs, compression)
+        if out_path == path:
+            return out_path
+        _write_file(out_path, txt)
     assert out_path.exists()
     if delete:
         if len(warning_list) == 0:
@@ -251,6 +487,74 @@ def compress_on_disk(path: Union[Path, str], *, compression: str = 'gz', delete:
     return out_path
 
 
+def compress_many(paths: Iterable[Union[Path, str]], *, workers: int = None,
+                  compression: str = 'gz', delete: bool = False,
+                  skip_strange_epochs: bool = False,
+                  reinit_every_nth: int = None, compresslevel: int = None,
+                  threads: int = None, date: Union[datetime, float] = None,
+                  zstd_dict: Union[bytes, Path, str] = None) -> List[Path]:
+    """Compress several RINEX files on disk in parallel.
+
+    Same as calling :func:`compress_on_disk` for each file, but the files are processed
+    by a pool of worker processes.
+
+    Parameters
+    ----------
+    paths : iterable of Path or str
+        Paths to RINEX files.
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, the files are processed sequentially in the current process.
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
+        Which compression (if any) to apply in addition to the Hatanaka compression.
+    delete : bool, default False
+        Delete each source file after successful compression if no errors or warnings were
+        raised for it.
+    skip_strange_epochs : bool, default False
+        For Hatanaka compression. Warn and skip strange epochs instead of raising an exception.
+    reinit_every_nth : int, optional
+        For Hatanaka compression. Initialize the compression operation at every # epochs.
+    compresslevel : int, optional
+        Compression level of gzip and bzip2 from 1 (fastest) to 9 (smallest, default),
+        of zstd from 1 to 22 (default 12), of xz from 0 to 9 (default 6)
+        and of lz4 from 0 to 16 (default 0).
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression of each file.
+        Defaults to 1 if several worker processes are used, otherwise to the number of CPUs.
+    date : datetime.datetime or float, optional
+        For Hatanaka compression. Time written to the CRINEX PROG / DATE line of the headers.
+    zstd_dict : bytes or Path or str, optional
+        For zstd compression. A dictionary returned by :func:`train_zstd_dictionary`, or the path
+        to a file containing it. The same dictionary is needed for decompression.
+
+    Returns
+    -------
+    list of Path
+        Paths to the compressed RINEX files, in the same order as the input paths.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka compression.
+    ValueError
+        For invalid file contents.
+        If several files fail, the first error is raised after all other files have been processed.
+
+    Warns
+    -----
+    Warnings for the individual files are re-raised in the calling process.
+    """
+    paths = list(paths)
+    if threads is None and workers != 1 and len(paths) > 1:
+        # the worker processes already keep the CPUs busy
+        threads = 1
+    return _raise_many(_run_many(
+        compress_on_disk, paths, workers,
+        compression=compression, delete=delete, skip_strange_epochs=skip_strange_epochs,
+        reinit_every_nth=reinit_every_nth, compresslevel=compresslevel, threads=threads,
+        date=date, zstd_dict=zstd_dict))
+
+
 def get_compressed_path(path, is_obs=None, compression='gz'):
     """Get the compressed path corresponding to a RINEX file after compression.
 
@@ -262,7 +566,7 @@ def get_compressed_path(path, is_obs=None, compression='gz'):
         Whether the RINEX file contains observation data.
         Needed for correct renaming of files with .rnx suffix,
         which will be Hatanaka-compressed if they contain observation data.
-    compression : 'gz' (default), 'bz2', 'Z', or 'none'
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
         Compression (if any) applied in addition to the Hatanaka compression.
 
     Returns
@@ -296,87 +600,572 @@ def get_compressed_path(path, is_obs=None, compression='gz'):
 
 
 def _is_lzw(magic_bytes: bytes) -> bool:
-    return magic_bytes == b'\x1F\x9D'
+    return magic_bytes[:2] == b'\x1F\x9D'
 
 
 def _is_gz(magic_bytes: bytes) -> bool:
-    return magic_bytes == b'\x1F\x8B'
+    return magic_bytes[:2] == b'\x1F\x8B'
 
 
 def _is_zip(magic_bytes: bytes) -> bool:
-    return magic_bytes == b'\x50\x4B'
+    return magic_bytes[:2] == b'\x50\x4B'
 
 
 def _is_bz2(magic_bytes: bytes) -> bool:
-    return magic_bytes == b'\x42\x5A'
+    return magic_bytes[:2] == b'\x42\x5A'
+
+
+def _is_zst(magic_bytes: bytes) -> bool:
+    return magic_bytes[:4] == b'\x28\xB5\x2F\xFD'
+
+
+def _is_xz(magic_bytes: bytes) -> bool:
+    return magic_bytes[:6] == b'\xFD\x37\x7A\x58\x5A\x00'
+
+
+def _is_lz4(magic_bytes: bytes) -> bool:
+    return magic_bytes[:4] == b'\x04\x22\x4D\x18'
+
+
+# number of leading bytes needed by the _is_*() functions
+_MAGIC_SIZE = 6
+
+# suffixes of the files compressed with one of the supported containers, in lower case
+_CONTAINER_SUFFIXES = ('.gz', '.bz2', '.z', '.zip', '.zst', '.xz', '.lz4')
+
+
+# files larger than this are memory-mapped instead of being read into memory
+_MMAP_THRESHOLD = 2 ** 20
+
+
+@contextmanager
+def _open_input(content):
+    """Provide the input of decompress() or compress() as a bytes-like object.
+
+    Paths and binary file objects are read or memory-mapped and buffer objects are passed through
+    without copying. The memory map, if any, is closed on exit.
+    """
+    if isinstance(content, (Path, str)):
+        with open(content, 'rb') as f, _read_file(f) as txt:
+            yield txt
+    elif isinstance(content, bytes):
+        _count_input(content)
+        yield content
+    elif isinstance(content, io.IOBase) or (hasattr(content, 'read') and not _is_buffer(content)):
+        with _read_file(content) as txt:
+            yield txt
+    else:
+        txt = _as_buffer(content)
+        _count_input(txt)
+        yield txt
+
+
+def _is_buffer(content) -> bool:
+    try:
+        memoryview(content).release()
+        return True
+    except TypeError:
+        return False
+
+
+def _as_buffer(content):
+    try:
+        return memoryview(content).cast('B')
+    except TypeError:
+        raise ValueError('input must be a path, a bytes-like object or a binary file object') from None
+
+
+@contextmanager
+def _read_file(f: BinaryIO):
+    if not isinstance(f.read(0), bytes):
+        raise ValueError('file object must be opened in binary mode')
+    try:
+        fileno = f.fileno()
+        pos = f.tell()
+        size = os.fstat(fileno).st_size - pos
+    except (AttributeError, OSError):
+        size = 0
+    if size <= 0 or size < _MMAP_THRESHOLD:
+        with _timed('read') as done:
+            txt = f.read()
+            done(len(txt))
+        yield txt
+        return
+    with _timed('read') as done:
+        # the pages are only read when accessed
+        m = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        done(size)
+    try:
+        yield memoryview(m)[pos:]
+        f.seek(0, io.SEEK_END)
+    finally:
+        try:
+            m.close()
+        except BufferError:
+            # a view of it is still referenced, e.g. from an exception traceback
+            pass
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable binary stream over a bytes-like object for the readers not accepting one directly."""
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._buffer[self._pos:self._pos + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def _write_file(path: Path, txt):
+    with _timed('write') as done, path.open('wb') as f:
+        f.write(txt)
+        done(_nbytes(txt))
 
 
-def _decompress(txt: bytes, skip_strange_epochs: bool, strict: bool) -> (bool, bytes):
+def _as_stream(txt):
+    return txt if isinstance(txt, bytes) else _BufferReader(txt)
+
+
+def _to_timedelta(seconds: Union[float, timedelta, None]) -> Optional[timedelta]:
+    if seconds is None or isinstance(seconds, timedelta):
+        return seconds
+    return timedelta(seconds=seconds)
+
+
+def _projection(systems, satellites, obs_types) -> dict:
+    return {k: v for k, v in dict(systems=systems, satellites=satellites,
+                                  obs_types=obs_types).items() if v is not None}
+
+
+def _project_rinex(txt: bytes, projection: dict) -> bytes:
+    """Apply a projection to plain RINEX observation data by passing it through the codec."""
+    if not projection:
+        return txt
+    return crx2rnx(rnx2crx(txt, **projection))
+
+
+def _decompress_cached(stack, content, cache, skip_strange_epochs, strict, start, end, interval,
+                       threads, projection):
+    """Decompress the content, opened in the given ExitStack, or get the result from the cache."""
+    is_range = start is not None or end is not None or interval is not None
+    if cache is None and is_range:
+        from .index import _decompress_range
+        return _decompress_range(content, start, end, interval, skip_strange_epochs, threads,
+                                 projection)
+    data = stack.enter_context(_open_input(content))
+    if cache is not None:
+        key = cache._key(data, skip_strange_epochs=skip_strange_epochs, strict=strict,
+                         start=start, end=end, interval=interval, **projection)
+        txt = cache._load(key)
+        if txt is not None:
+            return txt
+    n_warnings = _warning_count()
+    if is_range:
+        from .index import _decompress_range_data
+        txt = _decompress_range_data(data, start, end, interval, skip_strange_epochs, threads,
+                                     projection)
+    else:
+        txt = _decompress(data, skip_strange_epochs, strict, threads, projection)[1]
+    # already decompressed files are not worth caching
+    if cache is not None and txt is not data and _warning_count() == n_warnings:
+        cache._store(key, txt)
+    return txt
+
+
+def _decompress(txt: bytes, skip_strange_epochs: bool, strict: bool,
+                threads: int = None, projection: dict = None) -> (bool, bytes):
+    return _decompress_hatanaka(_decompress_container(txt), skip_strange_epochs, strict, threads,
+                                projection)
+
+
+@_stage('container_decode')
+def _decompress_container(txt: bytes) -> bytes:
     if len(txt) < 2:
         raise ValueError('empty file')
-    magic_bytes = txt[:2]
+    magic_bytes = bytes(txt[:_MAGIC_SIZE])
 
     if _is_gz(magic_bytes):
-        return _decompress_hatanaka(gzip.decompress(txt), skip_strange_epochs, strict)
+        return gzip.decompress(txt)
     if _is_bz2(magic_bytes):
-        return _decompress_hatanaka(bz2.decompress(txt), skip_strange_epochs, strict)
+        return bz2.decompress(txt)
     elif _is_zip(magic_bytes):
-        with zipfile.ZipFile(BytesIO(txt), 'r') as z:
+        with zipfile.ZipFile(_BufferReader(txt), 'r') as z:
             flist = z.namelist()
             if len(flist) == 0:
                 raise ValueError('zip archive is empty')
             elif len(flist) > 1:
-                raise ValueError('more than one file in zip archive')
+                raise ValueError('more than one file in zip archive, '
+                                 'use decompress_archive() instead')
             with z.open(flist[0], 'r') as f:
-                return _decompress_hatanaka(f.read(), skip_strange_epochs, strict)
+                return f.read()
     elif _is_lzw(magic_bytes):
-        return _decompress_hatanaka(lzw.decompress(txt), skip_strange_epochs, strict)
+        return _decompress_lzw(txt)
+    elif _is_zst(magic_bytes):
+        return _decompress_zst(txt)
+    elif _is_xz(magic_bytes):
+        try:
+            return lzma.decompress(txt)
+        except lzma.LZMAError as e:
+            raise ValueError(f'invalid xz data: {e}') from e
+    elif _is_lz4(magic_bytes):
+        lz4_frame = _import_lz4('decompress')
+        try:
+            return lz4_frame.decompress(txt)
+        except RuntimeError as e:
+            raise ValueError(f'invalid lz4 data: {e}') from e
     else:
-        return _decompress_hatanaka(txt, skip_strange_epochs, strict)
+        return txt
+
+
+def _decompress_lzw(txt):
+    if _lzw is None:
+        return lzw.decompress(_as_stream(txt))
+    decompressor = _lzw.Decompressor()
+    return decompressor.decompress(txt) + decompressor.flush()
+
+
+def _decompress_zst(txt):
+    zstandard = _import_zstd('decompress')
+    zstd_dict = _zstd_dict.get()
+    dctx = zstandard.ZstdDecompressor(dict_data=zstd_dict)
+    try:
+        # the frames written by streaming compressors do not store the content size
+        with dctx.stream_reader(memoryview(txt).cast('B'), read_across_frames=True) as f:
+            return f.readall()
+    except zstandard.ZstdError as e:
+        try:
+            dict_id = zstandard.get_frame_parameters(bytes(txt[:18])).dict_id
+        except zstandard.ZstdError:
+            dict_id = 0
+        if dict_id and (zstd_dict is None or zstd_dict.dict_id() != dict_id):
+            raise ValueError(f'the file was compressed with the zstd dictionary {dict_id}, '
+                             'pass it with the zstd_dict argument') from e
+        raise ValueError(f'invalid zstd data: {e}') from e
 
 
-def _decompress_hatanaka(txt: bytes, skip_strange_epochs, strict) -> (bool, bytes):
+@_stage('hatanaka')
+def _decompress_hatanaka(txt: bytes, skip_strange_epochs, strict, threads=None,
+                         projection=None) -> (bool, bytes):
     if len(txt) < 80:
         raise ValueError('file is too short to be a valid RINEX file')
-    header = txt[:80]
+    projection = projection or {}
+    header = bytes(txt[:80])
     is_crinex = b'COMPACT RINEX' in header
     if is_crinex:
-        txt = crx2rnx(txt, skip_strange_epochs=skip_strange_epochs)
+        txt = crx2rnx(txt, skip_strange_epochs=skip_strange_epochs, threads=threads, **projection)
     elif strict and not header.endswith(b'RINEX VERSION / TYPE'):
         raise ValueError('not a valid RINEX file')
-    is_obs = b'OBSERVATION DATA' in txt[:80]
+    is_obs = b'OBSERVATION DATA' in bytes(txt[:80])
+    if is_obs and not is_crinex:
+        txt = _project_rinex(txt, projection)
     return is_obs, txt
 
 
-def _compress(txt: bytes, compression, skip_strange_epochs, reinit_every_nth) -> (bool, bytes):
-    is_obs, txt = _compress_hatanaka(txt, skip_strange_epochs, reinit_every_nth)
-    if compression == 'gz':
-        return is_obs, gzip.compress(txt)
-    elif compression == 'bz2':
-        return is_obs, bz2.compress(txt)
-    elif compression == 'Z':
-        return is_obs, lzw.compress(txt)
-    elif compression == 'zip':
+def _compress(txt: bytes, compression, skip_strange_epochs, reinit_every_nth,
+              compresslevel=None, threads=None, workers=None, projection=None,
+              date=None) -> (bool, bytes):
+    _check_compression(compression)
+    is_obs, txt = _compress_hatanaka(txt, skip_strange_epochs, reinit_every_nth, workers,
+                                     projection, date)
+    return is_obs, _compress_container(txt, compression, compresslevel, threads)
+
+
+def _check_compression(compression):
+    if compression == 'zip':
         raise NotImplementedError('zip compression is not supported')
-    elif compression == 'none':
-        return is_obs, txt
-    else:
+    elif compression not in _compressors:
         raise ValueError(f"invalid compression '{compression}'")
 
 
-def _compress_hatanaka(txt: bytes, skip_strange_epochs, reinit_every_nth) -> (bool, bytes):
+@_stage('container_encode')
+def _compress_container(txt: bytes, compression, compresslevel=None, threads=None) -> bytes:
+    if threads is None or threads <= 0:
+        threads = os.cpu_count() or 1
+    return _compressors[compression](txt, compresslevel, threads)
+
+
+# uncompressed size of the blocks compressed in parallel by _compress_gz()
+_GZ_BLOCK_SIZE = 2 ** 17
+# the largest back-reference distance of deflate
+_GZ_WINDOW_SIZE = 2 ** 15
+
+
+def _compress_gz(txt, compresslevel, threads):
+    """Compress to the gzip format in independent blocks like pigz.
+
+    Each block is deflated separately, primed with the preceding 32 kB of the input as a dictionary,
+    and ended on a byte boundary with a sync flush. The concatenated blocks form a single standard
+    deflate stream. The result does not depend on the number of threads. Like gzip -n, no file
+    name or modification time is stored, so that the output only depends on the input.
+    """
+    if compresslevel is None:
+        compresslevel = 9
+    view = memoryview(txt).cast('B')
+
+    def deflate(start):
+        c = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+                             **({'zdict': view[start - _GZ_WINDOW_SIZE:start]} if start else {}))
+        end = start + _GZ_BLOCK_SIZE
+        last = end >= len(view)
+        return c.compress(view[start:end]) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    xfl = {9: 2, 1: 4}.get(compresslevel, 0)
+    header = struct.pack('<4sLBB', b'\x1f\x8b\x08\x00', 0, xfl, 255)
+    starts = range(0, max(len(view), 1), _GZ_BLOCK_SIZE)
+    blocks = _map_threads(deflate, starts, min(threads, len(starts)))
+    trailer = struct.pack('<LL', zlib.crc32(view), len(view) & 0xffffffff)
+    return b''.join([header, *blocks, trailer])
+
+
+def _compress_bz2(txt, compresslevel, threads):
+    """Compress to the bzip2 format in independent streams like pbzip2.
+
+    Each bzip2 block is compressed as a separate stream. Multi-stream files are supported by
+    bzip2 itself and all common decompressors. The result does not depend on the number of threads.
+    """
+    if compresslevel is None:
+        compresslevel = 9
+    block_size = compresslevel * 100000
+    if len(txt) <= block_size:
+        return bz2.compress(txt, compresslevel)
+    view = memoryview(txt).cast('B')
+    blocks = _map_threads(lambda start: bz2.compress(view[start:start + block_size], compresslevel),
+                          range(0, len(view), block_size), threads)
+    return b''.join(blocks)
+
+
+def _compress_lzw(txt, compresslevel, threads):
+    if _lzw is None:
+        return lzw.compress(_as_stream(txt))
+    # releases the GIL and reads the buffer in place
+    compressor = _lzw.Compressor()
+    return compressor.compress(txt) + compressor.flush()
+
+
+def _compress_zst(txt, compresslevel, threads):
+    zstandard = _import_zstd('compress')
+    if compresslevel is None:
+        compresslevel = 12
+    # single-threaded, so that the output does not depend on the number of threads
+    cctx = zstandard.ZstdCompressor(level=compresslevel, dict_data=_zstd_dict.get(),
+                                    write_checksum=True)
+    return cctx.compress(txt)
+
+
+def _compress_xz(txt, compresslevel, threads):
+    if compresslevel is None:
+        compresslevel = 6
+    return lzma.compress(txt, preset=compresslevel)
+
+
+def _compress_lz4(txt, compresslevel, threads):
+    lz4_frame = _import_lz4('compress')
+    if compresslevel is None:
+        compresslevel = 0
+    return lz4_frame.compress(txt, compression_level=compresslevel, content_checksum=True)
+
+
+def _compress_none(txt, compresslevel, threads):
+    return txt
+
+
+def _map_threads(func, items, threads):
+    # zlib and bz2 release the GIL while compressing
+    if threads <= 1:
+        return [func(x) for x in items]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(func, items))
+
+
+# Compression backends by compression name.
+# Each is called with the data, the compression level (None for default) and the number of threads.
+_compressors = {
+    'gz': _compress_gz,
+    'bz2': _compress_bz2,
+    'Z': _compress_lzw,
+    'zst': _compress_zst,
+    'xz': _compress_xz,
+    'lz4': _compress_lz4,
+    'none': _compress_none,
+}
+
+
+def _import_zstd(func_name):
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(f'zstd compression in {func_name}() requires zstandard, '
+                          f'install it with "pip install hatanaka[zstd]"') from e
+    return zstandard
+
+
+def _import_lz4(func_name):
+    try:
+        import lz4.frame
+    except ImportError as e:
+        raise ImportError(f'lz4 compression in {func_name}() requires lz4, '
+                          f'install it with "pip install hatanaka[lz4]"') from e
+    return lz4.frame
+
+
+# the zstd dictionary of the current conversion, set by _using_zstd_dict()
+_zstd_dict = ContextVar('zstd_dict', default=None)
+
+
+def _load_zstd_dict(zstd_dict):
+    """Load a zstd dictionary given as bytes or as the path to a file containing it."""
+    if zstd_dict is None:
+        return None
+    zstandard = _import_zstd('zstd_dict')
+    if isinstance(zstd_dict, zstandard.ZstdCompressionDict):
+        return zstd_dict
+    if not _is_buffer(zstd_dict):
+        zstd_dict = Path(zstd_dict).read_bytes()
+    return zstandard.ZstdCompressionDict(bytes(zstd_dict))
+
+
+@contextmanager
+def _using_zstd_dict(zstd_dict):
+    token = _zstd_dict.set(_load_zstd_dict(zstd_dict))
+    try:
+        yield
+    finally:
+        _zstd_dict.reset(token)
+
+
+def train_zstd_dictionary(samples: Iterable[Union[Path, str, bytes, memoryview, BinaryIO]],
+                          size: int = 2 ** 16) -> bytes:
+    """Train a Zstandard dictionary on Compact RINEX files.
+
+    Small files with similar headers, such as hourly or high-rate files of a network of stations,
+    compress considerably better with a dictionary trained on similar files.
+    The dictionary is needed for both compression and decompression,
+    see the zstd_dict argument of :func:`compress` and :func:`decompress`.
+
+    Parameters
+    ----------
+    samples : iterable of Path or str or bytes-like or binary file object
+        RINEX files to train on, optionally Hatanaka-compressed and in any supported container.
+        Observation files are Hatanaka-compressed before training.
+    size : int, default 65536
+        Maximum size of the dictionary in bytes.
+
+    Returns
+    -------
+    bytes
+        The dictionary, to be saved to a file or passed as zstd_dict.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka compression.
+    ValueError
+        For invalid file contents or if the samples are not sufficient for training.
+    """
+    zstandard = _import_zstd('train_zstd_dictionary')
+    crx_samples = []
+    for sample in samples:
+        with _open_input(sample) as txt:
+            txt = _decompress_container(txt)
+            crx_samples.append(bytes(_compress_hatanaka(txt, False, None)[1]))
+    try:
+        return zstandard.train_dictionary(size, crx_samples).as_bytes()
+    except zstandard.ZstdError as e:
+        raise ValueError(f'could not train a zstd dictionary: {e}') from e
+
+
+@_stage('hatanaka')
+def _compress_hatanaka(txt: bytes, skip_strange_epochs, reinit_every_nth,
+                       workers=None, projection=None, date=None) -> (bool, bytes):
     if len(txt) < 80:
         raise ValueError('file is too short to be a valid RINEX file')
 
-    is_obs = b'OBSERVATION DATA' in txt[:80]
+    header = bytes(txt[:80])
+    is_obs = b'OBSERVATION DATA' in header
     if is_obs:
         return is_obs, rnx2crx(txt, skip_strange_epochs=skip_strange_epochs,
-                               reinit_every_nth=reinit_every_nth)
+                               reinit_every_nth=reinit_every_nth, workers=workers,
+                               date=date, **(projection or {}))
     else:
-        is_obs = b'COMPACT RINEX' in txt[:80]
+        is_obs = b'COMPACT RINEX' in header
         return is_obs, txt
 
 
+def _run_on_disk(func_on_disk, path, kwargs):
+    """Run func_on_disk and return its result and warnings, or the exception raised by it,
+    and its ConversionStats."""
+    stats = ConversionStats()
+    with warnings.catch_warnings(record=True) as warning_list:
+        warnings.simplefilter('always')
+        try:
+            out_path = func_on_disk(path, stats=stats, **kwargs)
+            error = None
+        except Exception as e:
+            out_path = None
+            error = e
+    warning_list = [(w.category, str(w.message)) for w in warning_list]
+    return out_path, warning_list, error, stats
+
+
+def _run_many(func_on_disk, paths, workers, **kwargs):
+    """Apply func_on_disk to each path using a pool of worker processes.
+
+    Yields (path, out_path, warnings, error, stats) tuples in the order of the input paths.
+    The warnings are (category, message) tuples, which are left for the caller to report.
+    The stats of the files converted by the worker processes are added to the process-wide
+    counters of the calling process.
+    """
+    paths = [Path(p) for p in paths]
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        for path in paths:
+            yield (path,) + _run_on_disk(func_on_disk, path, kwargs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_on_disk, func_on_disk, path, kwargs) for path in paths]
+        for path, future in zip(paths, futures):
+            result = future.result()
+            _add_to_counters(result[-1])
+            yield (path,) + result
+
+
+def _raise_many(results):
+    out_paths = []
+    first_error = None
+    for path, out_path, warning_list, error, _ in results:
+        for category, message in warning_list:
+            warnings.warn(message, category)
+        if error is not None and first_error is None:
+            first_error = error
+        out_paths.append(out_path)
+    if first_error is not None:
+        raise first_error
+    return out_paths
+
+
 @contextmanager
 def _record_warnings():
     with warnings.catch_warnings(record=True) as warning_list:
@@ -1,20 +1,34 @@
+import asyncio
+import functools
+import os
 import platform
 import re
 import subprocess
+import threading
+import time
+from datetime import datetime, timezone
 from io import IOBase
 from subprocess import PIPE
-from typing import AnyStr, IO, Union
+from typing import AnyStr, IO, Iterable, Union
 from warnings import warn
 
 import importlib_resources
 
 import hatanaka.bin
+from .stats import _count_warning
+
+try:
+    from hatanaka import _rnxcmp
+except ImportError:  # pragma: no cover
+    _rnxcmp = None
 
 __all__ = ['rnx2crx', 'crx2rnx', 'HatanakaException']
 
 
 def rnx2crx(rnx_content: Union[AnyStr, IO], *, reinit_every_nth: int = None,
-            skip_strange_epochs: bool = False) -> AnyStr:
+            skip_strange_epochs: bool = False, workers: int = None,
+            systems: Iterable[str] = None, satellites: Iterable[str] = None,
+            obs_types: Iterable[str] = None, date: Union[datetime, float] = None) -> AnyStr:
     """Compress a RINEX observation file into the Compact RINEX format.
 
     Parameters
@@ -29,6 +43,21 @@ def rnx2crx(rnx_content: Union[AnyStr, IO], *, reinit_every_nth: int = None,
         skip_strange option of crx2rnx at the cost of increasing the file size.
     skip_strange_epochs : bool, default False
         Warn and skip strange epochs instead of raising an exception.
+    workers : int, optional
+        Split large bytes-like inputs into up to this many parts at epoch boundaries and compress
+        them in parallel threads. Each part starts with initialized data arcs, as if
+        reinit_every_nth had been used at the first epoch of the part.
+    systems : str or iterable of str, optional
+        Only keep the data of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        Only keep the data of these satellites, e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        Only keep these observation types, e.g. ['C1C', 'L1C'] (RINEX 3/4) or ['C1', 'L1'] (RINEX 2).
+        The observation type records of the header are rewritten to match.
+    date : datetime.datetime or float, optional
+        Time written to the CRINEX PROG / DATE line of the header, as a datetime (UTC if naive)
+        or in seconds since 1970-01-01. Defaults to the SOURCE_DATE_EPOCH environment variable,
+        if set, or the current time. A fixed date makes the output reproducible.
 
     Returns
     -------
@@ -44,16 +73,25 @@ def rnx2crx(rnx_content: Union[AnyStr, IO], *, reinit_every_nth: int = None,
     -----
     Any non-critical problems during compression will be raised as warnings.
     """
-    extra_args = []
     if reinit_every_nth is not None and reinit_every_nth > 0:
         assert isinstance(reinit_every_nth, int)
-        extra_args += ['-e', '{:d}'.format(reinit_every_nth)]
-    if skip_strange_epochs:
-        extra_args += ['-s']
-    return _run('rnx2crx', rnx_content, extra_args)
+    else:
+        reinit_every_nth = 0
+    options = dict(_projection_options(systems, satellites, obs_types), **_date_option(date))
+    if workers is not None and workers > 1 and not isinstance(rnx_content, (str, IOBase)):
+        from .index import _rnx2crx_parallel
+        crx_content = _rnx2crx_parallel(rnx_content, skip_strange_epochs, reinit_every_nth,
+                                        workers, **options)
+        if crx_content is not None:
+            return crx_content
+    return _run('rnx2crx', rnx_content,
+                reinit_every_nth=reinit_every_nth, skip_strange_epochs=skip_strange_epochs,
+                **options)
 
 
-def crx2rnx(crx_content: Union[AnyStr, IO], *, skip_strange_epochs: bool = False) -> AnyStr:
+def crx2rnx(crx_content: Union[AnyStr, IO], *, skip_strange_epochs: bool = False,
+            threads: int = None, systems: Iterable[str] = None,
+            satellites: Iterable[str] = None, obs_types: Iterable[str] = None) -> AnyStr:
     """Restore the original RINEX observation file from a Compact RINEX file.
 
     Parameters
@@ -68,6 +106,19 @@ def crx2rnx(crx_content: Union[AnyStr, IO], *, skip_strange_epochs: bool = False
         Using this together with of reinit_every_nth option of rnx2crx may be effective.
         Caution: It is assumed that no change in the list of data types happens in the
         lost part of the data.
+    threads : int, optional
+        Number of threads for decoding large bytes-like inputs. Defaults to the number of CPUs.
+        The file is split at the epochs where all data arcs are initialized (see
+        reinit_every_nth of rnx2crx) and the parts are decoded in parallel.
+        The result is the same as for serial decoding.
+    systems : str or iterable of str, optional
+        Only output the data of these GNSS systems, e.g. 'GE'.
+    satellites : str or iterable of str, optional
+        Only output the data of these satellites, e.g. ['G01', 'E11'].
+    obs_types : str or iterable of str, optional
+        Only output these observation types, e.g. ['C1C', 'L1C'] (RINEX 3/4) or ['C1', 'L1'] (RINEX 2).
+        The other data fields are decoded without being formatted and the observation type
+        records of the header are rewritten to match.
 
     Returns
     -------
@@ -83,21 +134,133 @@ def crx2rnx(crx_content: Union[AnyStr, IO], *, skip_strange_epochs: bool = False
     -----
     Any non-critical problems during decompression will be raised as warnings.
     """
-    extra_args = []
-    if skip_strange_epochs:
-        extra_args = ['-s']
-    return _run('crx2rnx', crx_content, extra_args)
+    projection = _projection_options(systems, satellites, obs_types)
+    if threads != 1 and not isinstance(crx_content, (str, IOBase)):
+        from .index import _crx2rnx_parallel
+        rnx_content = _crx2rnx_parallel(crx_content, threads,
+                                        skip_strange_epochs=skip_strange_epochs, **projection)
+        if rnx_content is not None:
+            return rnx_content
+    return _run('crx2rnx', crx_content, skip_strange_epochs=skip_strange_epochs, **projection)
 
 
 class HatanakaException(RuntimeError):
     pass
 
 
+def _has_extension() -> bool:
+    return _rnxcmp is not None
+
+
+def _projection_options(systems=None, satellites=None, obs_types=None) -> dict:
+    """Check the selected systems, satellites and observation types and convert them
+    to the options of the converters."""
+    options = {}
+    if systems is not None:
+        options['systems'] = ''.join(systems).upper()
+        if not re.fullmatch('[A-Z]*', options['systems']):
+            raise ValueError(f'invalid GNSS systems: {systems!r}')
+    if satellites is not None:
+        if isinstance(satellites, str):
+            satellites = satellites.replace(',', ' ').split()
+        ids = []
+        for sat in satellites:
+            m = re.fullmatch(r'([A-Z]?) ?(\d{1,2})', sat.strip().upper())
+            if m is None:
+                raise ValueError(f'invalid satellite: {sat!r}')
+            # a missing system means GPS, as in RINEX 2
+            ids.append(f'{m[1] or "G"}{int(m[2]):02d}')
+        options['satellites'] = ''.join(ids)
+    if obs_types is not None:
+        if isinstance(obs_types, str):
+            obs_types = obs_types.replace(',', ' ').split()
+        obs_types = [t.upper() for t in obs_types]
+        for t in obs_types:
+            if not re.fullmatch('[A-Z][A-Z0-9]{1,2}', t):
+                raise ValueError(f'invalid observation type: {t!r}')
+        options['obs_types'] = ' '.join(obs_types)
+    return options
+
+
+def _date_option(date) -> dict:
+    """Convert the date argument of rnx2crx() to the option of the converter."""
+    if date is None:
+        return {}
+    if isinstance(date, datetime):
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        date = date.timestamp()
+    return {'date': int(date)}
+
+
+def _crinex_date(date=None) -> str:
+    """The date of the CRINEX PROG / DATE line as written by rnx2crx."""
+    seconds = _date_option(date).get('date')
+    if seconds is None:
+        seconds = int(os.environ.get('SOURCE_DATE_EPOCH') or time.time())
+    # strftime('%b') would depend on the locale
+    t = datetime.fromtimestamp(seconds, timezone.utc)
+    month = 'Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec'.split()[t.month - 1]
+    return f'{t.day:02d}-{month}-{t.year % 100:02d} {t.hour:02d}:{t.minute:02d}'
+
+
 def _is_binary(f: IO) -> bool:
     return isinstance(f.read(0), bytes)
 
 
-def _run(program, content, extra_args=[]):
+def _run(program, content, **options):
+    """Run rnx2crx or crx2rnx in-process if the extension module is available,
+    otherwise as a subprocess."""
+    if _rnxcmp is None:
+        return _run_subprocess(program, content, _to_args(**options))
+    return _run_extension(program, content, **options)
+
+
+def _to_args(reinit_every_nth=0, skip_strange_epochs=False,
+             systems=None, satellites=None, obs_types=None, date=None):
+    args = []
+    if reinit_every_nth > 0:
+        args += ['-e', '{:d}'.format(reinit_every_nth)]
+    if skip_strange_epochs:
+        args += ['-s']
+    for name, value in [('systems', systems), ('satellites', satellites),
+                        ('obs_types', obs_types)]:
+        if value is not None:
+            args += ['--' + name, value]
+    if date is not None:
+        args += ['--date', str(date)]
+    return args
+
+
+def _convert(program, content: bytes, **options):
+    """Run rnx2crx or crx2rnx on binary content and return the exit code, the output and
+    the error output without checking them."""
+    if _rnxcmp is not None:
+        return getattr(_rnxcmp, program)(content, **options)
+    proc = _popen(program, ['-'] + _to_args(**options), stdout=PIPE, stderr=PIPE, stdin=PIPE)
+    stdout, stderr = proc.communicate(content)
+    return proc.poll(), stdout, stderr
+
+
+def _run_extension(program, content, **options):
+    is_text = False
+    if isinstance(content, IOBase):
+        is_text = not _is_binary(content)
+        content = content.read()
+    if isinstance(content, str):
+        is_text = True
+        # let's be relaxed about non-ascii symbols as long as it decodes successfully
+        content = content.encode('ascii', errors='ignore')
+    retcode, stdout, stderr = getattr(_rnxcmp, program)(content, **options)
+
+    _check(program, retcode, stderr)
+    if is_text:
+        # same as reading the output of the subprocess in text mode with universal newlines
+        stdout = stdout.decode('ascii', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+    return stdout
+
+
+def _run_subprocess(program, content, extra_args=[]):
     encoding = None
     errors = None
     if isinstance(content, IOBase):
@@ -121,6 +284,85 @@ def _run(program, content, extra_args=[]):
     return stdout
 
 
+def _run_stream(program, read, write, **options):
+    """Run rnx2crx or crx2rnx on input from read(size) and pass the output to write(data)
+    in chunks as it becomes available.
+
+    Returns the exit code and the error output of the program, which are left for the caller
+    to _check().
+    """
+    if _rnxcmp is not None:
+        return getattr(_rnxcmp, program + '_stream')(read, write, **options)
+
+    proc = _popen(program, ['-'] + _to_args(**options), stdout=PIPE, stderr=PIPE, stdin=PIPE)
+    errors = []
+    stderr = []
+
+    def feed():
+        try:
+            with proc.stdin:
+                while True:
+                    chunk = read(2 ** 16)
+                    if not chunk:
+                        break
+                    proc.stdin.write(chunk)
+        except BrokenPipeError:
+            # the program exited early, the reason is reported via its exit code
+            pass
+        except BaseException as e:
+            errors.append(e)
+            proc.kill()
+
+    threads = [threading.Thread(target=feed, daemon=True),
+               threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)]
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            chunk = proc.stdout.read1(2 ** 16)
+            if not chunk:
+                break
+            write(chunk)
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        for t in threads:
+            t.join()
+        proc.stdout.close()
+        proc.stderr.close()
+        retcode = proc.wait()
+    if errors:
+        raise errors[0]
+    return retcode, stderr[0]
+
+
+async def _arun(program, content: bytes, executor=None, **options) -> bytes:
+    """Run rnx2crx or crx2rnx without blocking the event loop.
+
+    The extension module is run in the executor, since it releases the GIL during the conversion.
+    Otherwise, the executable is run as an asyncio subprocess.
+    """
+    if _rnxcmp is not None:
+        func = functools.partial(getattr(_rnxcmp, program), content, **options)
+        retcode, stdout, stderr = await asyncio.get_running_loop().run_in_executor(executor, func)
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            _get_executable(program), '-', *_to_args(**options),
+            stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        try:
+            stdout, stderr = await proc.communicate(content)
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+        retcode = proc.returncode
+
+    _check(program, retcode, stderr)
+    return stdout
+
+
 def _check(program, retcode, stderr):
     """Raise HatanakaException on errors and report warnings"""
     if isinstance(stderr, bytes):
@@ -130,6 +372,8 @@ def _check(program, retcode, stderr):
         stderr = re.sub('\n(?!WARNING|ERROR)', ' ', stderr)
         stderr = re.sub('^ERROR *: *', '', stderr, flags=re.M)
         raise HatanakaException(stderr)
+    if retcode == 2 or stderr:
+        _count_warning()
     if retcode == 2 and not stderr:
         warn(f'{program}: exited with an unspecified warning')
     if stderr:
@@ -143,8 +387,11 @@ def _check(program, retcode, stderr):
 executables = importlib_resources.files(hatanaka.bin)
 
 
-def _popen(program, args, **kwargs):
+def _get_executable(program):
     if platform.system() == 'Windows':
         program += '.exe'
-    executable = executables.joinpath(program)
-    return subprocess.Popen([str(executable)] + args, **kwargs)
+    return str(executables.joinpath(program))
+
+
+def _popen(program, args, **kwargs):
+    return subprocess.Popen([_get_executable(program)] + args, **kwargs)
@@ -0,0 +1,641 @@
+import bisect
+import bz2
+import io
+import json
+import os
+import re
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple, Union
+from warnings import warn
+
+from .general_compression import _GZ_WINDOW_SIZE, _decompress_container, _is_bz2, _is_gz, \
+    _map_threads, _open_input, _project_rinex
+from .hatanaka import _convert, _has_extension, _projection_options, _run, crx2rnx
+from .observations import _parse_epoch_line, _parse_obs_types
+from .stats import _stage, _timed
+
+__all__ = ['build_index', 'get_index_path']
+
+_INDEX_MAGIC = b'HATANAKA INDEX 1\n'
+_CHUNK_SIZE = 2 ** 20
+# minimum size of the parts of a Compact RINEX file that are decoded in parallel
+_MIN_PART_SIZE = 2 ** 22
+_UNIX_EPOCH = datetime(1970, 1, 1)
+# epoch line of RINEX 2: (1X,I2.2,4(1X,I2),F11.7,2X,I1,I3)
+_V2_EPOCH_LINE = re.compile(rb' [ \d]\d [ \d]\d [ \d]\d [ \d]\d [ \d]\d [ \d]\d\.\d{7}  \d[ \d]{2}\d')
+# marker of the empty stored block written by a sync or full flush of deflate
+_FLUSH_MARKER = b'\x00\x00\xff\xff'
+
+# Random access index of a Compact RINEX file.
+# points: (epoch time, offset) of the epochs in the Compact RINEX data where all data arcs are
+#   initialized and decoding can be started from.
+# checkpoints: (compressed offset, decompressed offset, window) of the positions in the compressed
+#   file where decompression can be started from. The window is the preceding 32 kB of
+#   decompressed data for positions inside a deflate stream, None at the start of a gzip member
+#   or a bzip2 stream.
+_Index = namedtuple('_Index', ['container', 'header_end', 'points', 'checkpoints'])
+
+
+def get_index_path(path: Union[Path, str]) -> Path:
+    """Return the path of the index file created by :func:`build_index` for a file."""
+    path = Path(path)
+    return path.with_name(path.name + '.idx')
+
+
+def build_index(path: Union[Path, str], *, spacing: int = 2 ** 20) -> Path:
+    """Build an index for random access by epoch time to a Compact RINEX file.
+
+    The index is written next to the file, as the file name with an additional .idx suffix.
+    :func:`decompress` uses it when ``start`` or ``end`` are given to skip straight to the
+    part of the file that is needed. It records the epochs at which all data arcs are
+    initialized, as in files compressed with ``reinit_every_nth``, and for gzip and bzip2
+    compressed files the positions that decompression can be resumed from. These are the
+    block boundaries of gzip files written by :func:`compress` (or other parallel compressors
+    like pigz), where the preceding 32 kB of decompressed data is saved in the index, and the
+    boundaries of gzip members and bzip2 streams.
+
+    The index is ignored if the file has been modified after it was built.
+
+    Parameters
+    ----------
+    path : Path or str
+        Path to a Compact RINEX file, optionally compressed with .gz|.Z|.zip|.bz2|.zst|.xz|.lz4.
+    spacing : int, default 1 MiB
+        Minimum distance of the decompression checkpoints in bytes of decompressed data.
+
+    Returns
+    -------
+    Path
+        Path of the index file.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a Compact RINEX file.
+    """
+    path = Path(path)
+    stat = path.stat()
+    with _open_input(path) as data:
+        index = _scan(data, spacing)
+    meta = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'container': index.container,
+        'header_end': index.header_end,
+        'points': [[t.isoformat(), offset] for t, offset in index.points],
+        'checkpoints': [[c, u, -1 if window is None else len(window)]
+                        for c, u, window in index.checkpoints],
+    }
+    windows = zlib.compress(b''.join(w for _, _, w in index.checkpoints if w is not None))
+    index_path = get_index_path(path)
+    index_path.write_bytes(_INDEX_MAGIC + json.dumps(meta).encode() + b'\n' + windows)
+    return index_path
+
+
+def _load_index(path) -> Optional[_Index]:
+    """Load the index of a file, if there is an up-to-date one."""
+    index_path = get_index_path(path)
+    if not index_path.is_file():
+        return None
+    content = index_path.read_bytes()
+    if not content.startswith(_INDEX_MAGIC):
+        warn(f'ignoring {index_path}, it is not a valid index file')
+        return None
+    meta, _, windows = content[len(_INDEX_MAGIC):].partition(b'\n')
+    meta = json.loads(meta)
+    stat = Path(path).stat()
+    if meta['size'] != stat.st_size or meta['mtime_ns'] != stat.st_mtime_ns:
+        warn(f'ignoring {index_path}, the file has been modified after the index was built')
+        return None
+    windows = zlib.decompress(windows)
+    checkpoints = []
+    pos = 0
+    for c, u, size in meta['checkpoints']:
+        checkpoints.append((c, u, None if size < 0 else windows[pos:pos + size]))
+        pos += max(size, 0)
+    points = [(datetime.fromisoformat(t), offset) for t, offset in meta['points']]
+    return _Index(meta['container'], meta['header_end'], points, checkpoints)
+
+
+def _scan(data, spacing) -> _Index:
+    """Build the index of a Compact RINEX file given as a buffer."""
+    scanner = _CrinexScanner()
+    magic = bytes(data[:2])
+    if _is_gz(magic):
+        container = 'gz'
+        checkpoints = _scan_gz(data, scanner.feed, spacing)
+    elif _is_bz2(magic):
+        container = 'bz2'
+        checkpoints = _scan_bz2(data, scanner.feed, spacing)
+    else:
+        txt = _decompress_container(data)
+        container = 'none' if txt is data else 'other'
+        scanner.feed(bytes(txt))
+        checkpoints = [(0, 0, None)]
+    if scanner.header_end is None:
+        raise ValueError('not a Compact RINEX file')
+    return _Index(container, scanner.header_end, scanner.points, checkpoints)
+
+
+def _scan_gz(data, feed, spacing) -> List[Tuple[int, int, Optional[bytes]]]:
+    """Decompress gzip data and find the positions decompression can be resumed from."""
+    checkpoints = [(0, 0, None)]
+    pos = 0
+    total = 0
+    window = b''
+    while pos < len(data) and bytes(data[pos:pos + 2]) == b'\x1f\x8b':
+        if total - checkpoints[-1][1] >= spacing:
+            checkpoints.append((pos, total, None))
+        d = zlib.decompressobj(31)
+        while not d.eof and pos < len(data):
+            chunk = bytes(data[pos:pos + _CHUNK_SIZE])
+            i = 0
+            while i < len(chunk) and not d.eof:
+                k = chunk.find(_FLUSH_MARKER, i)
+                cut = len(chunk) if k < 0 else k + len(_FLUSH_MARKER)
+                out = d.decompress(chunk[i:cut])
+                if out:
+                    feed(out)
+                    total += len(out)
+                    window = (window + out)[-_GZ_WINDOW_SIZE:]
+                i = cut
+                if (k >= 0 and not d.eof and total - checkpoints[-1][1] >= spacing and
+                        _is_flush_point(d, data, pos + cut, window)):
+                    checkpoints.append((pos + cut, total, window))
+            pos += i
+        pos -= len(d.unused_data)
+    return checkpoints
+
+
+def _is_flush_point(d, data, pos, window) -> bool:
+    """Check that decompression can be resumed at pos with the window as the dictionary,
+    by comparing with the state of the decompressor d up to pos."""
+    probe = bytes(data[pos:pos + 2 ** 12])
+    try:
+        expected = d.copy().decompress(probe)
+        actual = zlib.decompressobj(-zlib.MAX_WBITS, zdict=window).decompress(probe)
+    except zlib.error:
+        return False
+    return actual == expected
+
+
+def _scan_bz2(data, feed, spacing) -> List[Tuple[int, int, Optional[bytes]]]:
+    checkpoints = [(0, 0, None)]
+    pos = 0
+    total = 0
+    while pos < len(data) and bytes(data[pos:pos + 3]) == b'BZh':
+        if total - checkpoints[-1][1] >= spacing:
+            checkpoints.append((pos, total, None))
+        d = bz2.BZ2Decompressor()
+        while not d.eof and pos < len(data):
+            out = d.decompress(data[pos:pos + _CHUNK_SIZE])
+            pos += min(_CHUNK_SIZE, len(data) - pos)
+            feed(out)
+            total += len(out)
+        pos -= len(d.unused_data)
+    return checkpoints
+
+
+class _CrinexScanner:
+    """Find the epochs in Compact RINEX data where decoding can be started from.
+
+    Only the epoch lines are parsed, the clock offset and data lines are skipped over.
+    """
+
+    def __init__(self):
+        self.header_end = None
+        self.points = []
+        self._offset = 0
+        self._pending = b''
+        self._n_header_lines = 0
+        self._version = None
+        self._skip = 0
+        self._records = 0
+        self._nsat = b''
+        # the observation types changed in the middle of the file
+        self._types_changed = False
+        self._done = False
+
+    def feed(self, chunk):
+        buf = self._pending + chunk
+        pos = 0
+        while not self._done:
+            end = buf.find(b'\n', pos)
+            if end < 0:
+                break
+            if self._skip:
+                self._skip -= 1
+            else:
+                self._line(buf[pos:end].rstrip(b'\r'), self._offset + pos, self._offset + end + 1)
+            pos = end + 1
+        self._pending = buf[pos:]
+        self._offset += pos
+
+    def _line(self, line, offset, next_offset):
+        if self.header_end is None:
+            self._header_line(line, next_offset)
+        elif self._records:
+            # special records of an event
+            self._records -= 1
+            if line[60:].rstrip() in (b'# / TYPES OF OBSERV', b'SYS / # / OBS TYPES'):
+                self._types_changed = True
+        elif line[:1] == self._init_char:
+            if line[self._flag_col:self._flag_col + 1] not in (b'0', b'1'):
+                self._records = _count(line[self._nsat_col:self._nsat_col + 3])
+                return
+            self._nsat = line[self._nsat_col:self._nsat_col + 3].replace(b'&', b' ')
+            if not self._types_changed:
+                try:
+                    time = _parse_epoch_line(line, self._version).time
+                except ValueError:
+                    time = None
+                if time is not None:
+                    self.points.append((time, offset))
+            self._skip = 1 + _count(self._nsat)
+        elif line[:1] == b'&':
+            # an escape line of CRINEX 3
+            pass
+        elif line[:1] == b'\x1a':
+            self._done = True
+        else:
+            # apply the changes to the number of satellites only
+            diff = line[self._nsat_col:self._nsat_col + 3]
+            self._nsat = bytes(old if new == 32 else 32 if new == 38 else new
+                               for old, new in zip(self._nsat.ljust(3), diff.ljust(3)))
+            self._skip = 1 + _count(self._nsat)
+
+    def _header_line(self, line, next_offset):
+        n = self._n_header_lines
+        self._n_header_lines += 1
+        if n == 2:
+            self._version = int(float(line[:9] or 0))
+            if self._version < 3:
+                self._init_char, self._flag_col, self._nsat_col = b'&', 28, 29
+            else:
+                self._init_char, self._flag_col, self._nsat_col = b'>', 31, 32
+        elif n == 0 and not line[60:].startswith(b'CRINEX VERS'):
+            self._done = True
+        elif line[60:].startswith(b'END OF HEADER') and self._version is not None:
+            self.header_end = next_offset
+
+
+def _count(s: bytes) -> int:
+    s = s.strip()
+    return int(s) if s.isdigit() else 0
+
+
+def _crx2rnx_parallel(crx, threads, **options) -> Optional[bytes]:
+    """Decode Compact RINEX data in parts on a pool of threads.
+
+    The data is split at epochs where all data arcs are initialized and each part is decoded
+    separately, preceded by the header. Returns None if the data can not be split or if CRX2RNX
+    reports any problems, in which case the data should be decoded serially instead to get the
+    warnings and errors with the correct line numbers and the same handling of strange epochs.
+    The options are passed on to the converter.
+    """
+    if threads is None or threads <= 0:
+        threads = os.cpu_count() or 1
+    view = memoryview(crx)
+    if threads <= 1 or len(view) < 2 * _MIN_PART_SIZE:
+        return None
+    part_size = max(_MIN_PART_SIZE, len(view) // (4 * threads))
+    scanner = _CrinexScanner()
+    scanner.feed(bytes(view[:_CHUNK_SIZE]))
+    if scanner.header_end is None:
+        return None
+    # Most files are only initialized at the first epoch. Look for any other initialized epoch
+    # line far enough into the data to split at before scanning the data line by line, which
+    # costs a good part of the decoding time.
+    txt = crx if hasattr(crx, 'find') else bytes(view)
+    if txt.find(b'\n' + scanner._init_char, scanner.header_end + part_size - 1,
+                len(view) - _MIN_PART_SIZE // 2 + 1) < 0:
+        return None
+    for pos in range(_CHUNK_SIZE, len(view), _CHUNK_SIZE):
+        scanner.feed(bytes(view[pos:pos + _CHUNK_SIZE]))
+    bounds = [scanner.header_end]
+    for _, offset in scanner.points:
+        if offset - bounds[-1] >= part_size and len(view) - offset >= _MIN_PART_SIZE // 2:
+            bounds.append(offset)
+    if len(bounds) == 1:
+        return None
+    bounds.append(len(view))
+    header = bytes(view[:scanner.header_end])
+
+    def decode(part):
+        return _convert('crx2rnx', header + view[part[0]:part[1]], **options)
+
+    results = _map_threads(decode, [(scanner.header_end, scanner.header_end)] +
+                           list(zip(bounds, bounds[1:])), threads)
+    rnx_header = results[0][1]
+    if any(retcode != 0 or stderr or not stdout.startswith(rnx_header)
+           for retcode, stdout, stderr in results):
+        return None
+    return rnx_header + b''.join(stdout[len(rnx_header):] for _, stdout, _ in results[1:])
+
+
+def _rnx2crx_parallel(rnx, skip_strange_epochs, reinit_every_nth, workers,
+                     **projection) -> Optional[bytes]:
+    """Compress RINEX observation data in parts on a pool of threads.
+
+    The data is split into at most the given number of parts of about equal size at epoch
+    boundaries, which are compressed separately, preceded by the header, and concatenated.
+    Every part starts with initialized data arcs, so the result is the same as if the compression
+    had been re-initialized at the first epoch of each part. Returns None if the data can not be
+    split or if RNX2CRX reports any problems, in which case the data should be compressed
+    serially instead. The projection options are passed on to the converter.
+    """
+    txt = rnx if hasattr(rnx, 'find') else bytes(rnx)
+    n = min(workers, len(txt) // _MIN_PART_SIZE)
+    if n <= 1:
+        return None
+    try:
+        version, header_end, obs_types = _parse_header(txt)
+    except ValueError:
+        return None
+    bounds = [header_end] + _split_records(txt, header_end, version, obs_types, n) + [len(txt)]
+    if len(bounds) == 2:
+        return None
+    header = bytes(txt[:header_end])
+
+    def compress(part):
+        return _convert('rnx2crx', header + txt[part[0]:part[1]],
+                        reinit_every_nth=reinit_every_nth, skip_strange_epochs=skip_strange_epochs,
+                        **projection)
+
+    results = _map_threads(compress, list(zip(bounds, bounds[1:])), n)
+    if any(retcode != 0 or stderr for retcode, _, stderr in results):
+        return None
+    return results[0][1] + b''.join(stdout[_line_end(stdout, stdout.find(b'END OF HEADER')):]
+                                    for _, stdout, _ in results[1:])
+
+
+def _split_records(txt, header_end, version, obs_types, n) -> List[int]:
+    """Find the offsets of epochs that split the records of a RINEX observation file into n parts
+    of about equal size. Only the epochs before any changes of the observation types are used."""
+    limit = len(txt)
+    for label in (b'# / TYPES OF OBSERV', b'SYS / # / OBS TYPES'):
+        pos = txt.find(label, header_end)
+        if pos >= 0:
+            limit = min(limit, pos)
+    bounds = []
+    for k in range(1, n):
+        pos = _find_epoch(txt, header_end + (len(txt) - header_end) * k // n, version, obs_types)
+        if pos is not None and (bounds[-1] if bounds else header_end) < pos < limit:
+            bounds.append(pos)
+    return bounds
+
+
+def _find_epoch(txt, pos, version, obs_types) -> Optional[int]:
+    """Find the first epoch with flag 0 or 1 at or after offset pos."""
+    if pos > 0 and txt[pos - 1:pos] != b'\n':
+        pos = _line_end(txt, pos)
+    while pos < len(txt):
+        line_end = _line_end(txt, pos)
+        line = txt[pos:line_end]
+        is_epoch_line = line[:1] == b'>' if version >= 3 else _V2_EPOCH_LINE.match(line)
+        if is_epoch_line and _is_epoch_start(txt, pos, version, obs_types):
+            return pos
+        pos = line_end
+    return None
+
+
+def _is_epoch_start(txt, pos, version, obs_types) -> bool:
+    """Check that a few valid records can be read from offset pos on, starting with an epoch
+    with flag 0 or 1, to rule out lines in special records that only look like epoch lines."""
+    try:
+        records = _iter_records(txt, pos, version, obs_types)
+        for i, (_, _, epoch) in zip(range(3), records):
+            if not (0 <= epoch.flag <= (1 if i == 0 else 6)):
+                return False
+            if epoch.flag <= 1 and epoch.time is None:
+                return False
+    except ValueError:
+        return False
+    return True
+
+
+def _iter_decompressed(f: BinaryIO, container, checkpoint):
+    """Decompress a gzip or bzip2 file from a checkpoint onwards in chunks."""
+    c, u, window = checkpoint
+    f.seek(c)
+    data = b''
+    d = None
+    raw = False
+    while True:
+        if d is None:
+            if len(data) < 3:
+                data += f.read(_CHUNK_SIZE)
+            if container == 'gz' and data[:2] == b'\x1f\x8b' and window is None:
+                d = zlib.decompressobj(31)
+            elif container == 'gz' and window is not None:
+                d = zlib.decompressobj(-zlib.MAX_WBITS, zdict=window)
+                raw = True
+                window = None
+            elif container == 'bz2' and data[:3] == b'BZh':
+                d = bz2.BZ2Decompressor()
+            else:
+                return
+        if not data:
+            data = f.read(_CHUNK_SIZE)
+            if not data:
+                return
+        out = d.decompress(data)
+        data = b''
+        if out:
+            yield out
+        if d.eof:
+            data = d.unused_data
+            if raw:
+                # skip the CRC and size at the end of the gzip member
+                while len(data) < 8:
+                    more = f.read(_CHUNK_SIZE)
+                    if not more:
+                        return
+                    data += more
+                data = data[8:]
+                raw = False
+            d = None
+
+
+def _read_range(f: BinaryIO, index: _Index, start: int, end: Optional[int]) -> bytes:
+    """Read the decompressed data from offset start to end, or to the end of the file."""
+    if index.container == 'none':
+        f.seek(start)
+        return f.read(-1 if end is None else end - start)
+    if index.container == 'other':
+        f.seek(0)
+        return bytes(_decompress_container(f.read())[start:end])
+    i = bisect.bisect_right([u for _, u, _ in index.checkpoints], start) - 1
+    checkpoint = index.checkpoints[i]
+    pos = checkpoint[1]
+    out = []
+    for chunk in _iter_decompressed(f, index.container, checkpoint):
+        a = max(start - pos, 0)
+        b = len(chunk) if end is None else min(end - pos, len(chunk))
+        if a < b:
+            out.append(chunk[a:b])
+        pos += len(chunk)
+        if end is not None and pos >= end:
+            break
+    return b''.join(out)
+
+
+def _read_crinex(f: BinaryIO, index: _Index, start: Optional[datetime],
+                 end: Optional[datetime]) -> bytes:
+    """Read the header and the part of a Compact RINEX file that covers the epochs from start
+    to end, beginning at an epoch where all data arcs are initialized."""
+    times = [t for t, _ in index.points]
+    begin = index.header_end
+    stop = None
+    if all(a <= b for a, b in zip(times, times[1:])):
+        if start is not None:
+            i = bisect.bisect_right(times, start) - 1
+            if i >= 0:
+                begin = index.points[i][1]
+        if end is not None:
+            j = bisect.bisect_left(times, end)
+            if j < len(times) and index.points[j][1] > begin:
+                stop = index.points[j][1]
+    return _read_range(f, index, 0, index.header_end) + _read_range(f, index, begin, stop)
+
+
+def _decompress_range(content, start, end, interval, skip_strange_epochs, threads,
+                      projection=None) -> bytes:
+    """decompress() restricted to the epochs selected by start, end and interval."""
+    projection = projection or {}
+    index = _load_index(content) if isinstance(content, (Path, str)) else None
+    if index is not None:
+        with _timed('read') as done, open(content, 'rb') as f:
+            crx = _read_crinex(f, index, start, end)
+            done(len(crx))
+        return _crx2rnx_select(crx, skip_strange_epochs, threads, start, end, interval,
+                               projection)
+    with _open_input(content) as data:
+        return _decompress_range_data(data, start, end, interval, skip_strange_epochs, threads,
+                                      projection)
+
+
+def _decompress_range_data(data, start, end, interval, skip_strange_epochs, threads,
+                           projection=None) -> bytes:
+    """_decompress_range() for the contents of a file as a bytes-like object."""
+    projection = projection or {}
+    txt = _decompress_container(data)
+    if b'COMPACT RINEX' in bytes(txt[:80]):
+        if start is not None or end is not None:
+            scanner = _CrinexScanner()
+            scanner.feed(bytes(txt))
+            if scanner.header_end is not None:
+                index = _Index('none', scanner.header_end, scanner.points, [(0, 0, None)])
+                txt = _read_crinex(io.BytesIO(txt), index, start, end)
+        return _crx2rnx_select(txt, skip_strange_epochs, threads, start, end, interval,
+                               projection)
+    txt = bytes(txt)
+    if txt[60:80] != b'RINEX VERSION / TYPE' or b'OBSERVATION DATA' not in txt[:80]:
+        raise ValueError('start, end and interval can only be used with RINEX observation files')
+    return _project_rinex(_select_epochs(txt, start, end, interval), projection)
+
+
+@_stage('hatanaka')
+def _crx2rnx_select(crx, skip_strange_epochs, threads, start, end, interval,
+                    projection=None) -> bytes:
+    """Decode Compact RINEX data into the epochs selected by start, end and interval.
+
+    The extension module selects the epochs while decoding and only keeps track of the data
+    arcs in the others, without formatting them. The executables decode all epochs.
+    """
+    projection = projection or {}
+    if not _has_extension():
+        rnx = crx2rnx(crx, skip_strange_epochs=skip_strange_epochs, threads=threads, **projection)
+        return _select_epochs(rnx, start, end, interval)
+    options = dict(skip_strange_epochs=skip_strange_epochs, start=_ticks(start), end=_ticks(end),
+                   interval=None if interval is None else interval // timedelta(microseconds=1) * 10,
+                   **_projection_options(**projection))
+    rnx = None
+    if threads != 1:
+        rnx = _crx2rnx_parallel(crx, threads, **options)
+    if rnx is None:
+        rnx = _run('crx2rnx', crx, **options)
+    return rnx
+
+
+def _ticks(time: Optional[datetime]) -> Optional[int]:
+    """Time in units of 100 ns since 1970-01-01, as used by the epoch selection of CRX2RNX."""
+    if time is None:
+        return None
+    return (time - _UNIX_EPOCH) // timedelta(microseconds=1) * 10
+
+
+def _select_epochs(txt: bytes, start: Optional[datetime], end: Optional[datetime],
+                   interval: Optional[timedelta] = None) -> bytes:
+    """Return the header and the records from start (inclusive) to end (exclusive) of a RINEX
+    observation file, in the same way as the epoch selection of CRX2RNX.
+
+    Event records without a time go along with the preceding record. If interval is given, only
+    the epochs with flag 0 or 1 whose time is a multiple of it are kept. Stops at the first
+    record at or after end.
+    """
+    version, header_end, obs_types = _parse_header(txt)
+    out = [txt[:header_end]]
+    time = None
+    for pos, record_end, epoch in _iter_records(txt, header_end, version, obs_types):
+        if epoch.time is not None:
+            time = epoch.time
+        if end is not None and time is not None and time >= end:
+            break
+        if start is not None and (time is None or time < start):
+            continue
+        if (interval is not None and epoch.flag <= 1 and
+                (time is None or (time - _UNIX_EPOCH) % interval)):
+            continue
+        out.append(txt[pos:record_end])
+    return b''.join(out)
+
+
+def _parse_header(txt: bytes):
+    """Return the version, the end offset of the header and the observation types of a RINEX
+    observation file."""
+    version = int(float(txt[:9]))
+    header_end = txt.find(b'END OF HEADER')
+    header_end = len(txt) if header_end < 0 else txt.find(b'\n', header_end) + 1 or len(txt)
+    obs_types = _parse_obs_types(txt[:header_end].splitlines(), version, {})
+    return version, header_end, obs_types
+
+
+def _iter_records(txt: bytes, pos: int, version: int, obs_types):
+    """Iterate over the epoch and event records of a RINEX observation file, starting from
+    offset pos at the start of a record. Yields the start and end offsets and the parsed
+    epoch line of each record."""
+    while pos < len(txt):
+        line_end = _line_end(txt, pos)
+        line = txt[pos:line_end].rstrip(b'\r\n')
+        if not line.strip():
+            pos = line_end
+            continue
+        epoch = _parse_epoch_line(line, version)
+        start = pos
+        pos = line_end
+        n = _count(line[29:32] if version < 3 else line[32:35])
+        if 2 <= epoch.flag <= 5:
+            records = []
+            for _ in range(n):
+                line_end = _line_end(txt, pos)
+                records.append(txt[pos:line_end].rstrip(b'\r\n'))
+                pos = line_end
+            obs_types = _parse_obs_types(records, version, obs_types)
+        else:
+            if version < 3:
+                n_lines = (n - 1) // 12 if n > 12 else 0
+                n_lines += n * max(1, (len(obs_types.get(None, [])) + 4) // 5)
+            else:
+                n_lines = n
+            for _ in range(n_lines):
+                pos = _line_end(txt, pos)
+        yield start, pos, epoch
+
+
+def _line_end(txt: bytes, pos: int) -> int:
+    line_end = txt.find(b'\n', pos)
+    return len(txt) if line_end < 0 else line_end + 1
@@ -0,0 +1,276 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Union
+
+__all__ = ['ConversionStats', 'StageStats', 'get_counters', 'reset_counters']
+
+# the stages of compress() and decompress() in the order they are run
+STAGES = ('read', 'container_decode', 'hatanaka', 'container_encode', 'write')
+
+
+class StageStats:
+    """Sizes and timings of one stage of a conversion.
+
+    Attributes
+    ----------
+    bytes_in : int
+        Size of the input of the stage.
+    bytes_out : int
+        Size of the output of the stage.
+    wall : float
+        Elapsed time in seconds.
+    cpu : float
+        CPU time of the whole process in seconds, including any other threads working at the same time.
+    """
+    __slots__ = ('bytes_in', 'bytes_out', 'wall', 'cpu')
+
+    def __init__(self, bytes_in=0, bytes_out=0, wall=0.0, cpu=0.0):
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.wall = wall
+        self.cpu = cpu
+
+    def __iadd__(self, other):
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.wall += other.wall
+        self.cpu += other.cpu
+        return self
+
+    def __repr__(self):
+        return (f'StageStats(bytes_in={self.bytes_in}, bytes_out={self.bytes_out}, '
+                f'wall={self.wall:.6f}, cpu={self.cpu:.6f})')
+
+
+class ConversionStats:
+    """Sizes and timings of the stages of a :func:`decompress` or :func:`compress` call.
+
+    Pass an instance as the ``stats`` argument of :func:`decompress`, :func:`compress` or their
+    on-disk variants to have it filled in. Instances can be added up with ``+=`` to get the totals
+    of several conversions.
+
+    The stages are 'read', 'container_decode', 'hatanaka', 'container_encode' and 'write', of which
+    only the ones that were run are present. Files larger than 1 MiB are memory-mapped and read lazily,
+    so most of their reading time falls in the following stages.
+
+    Attributes
+    ----------
+    files : int
+        Number of conversions, 1 unless several are added up.
+    failures : int
+        Number of conversions that raised an exception.
+    warnings : int
+        Number of warnings from the Hatanaka conversion.
+    bytes_in : int
+        Size of the input.
+    bytes_out : int
+        Size of the output.
+    wall : float
+        Elapsed time in seconds.
+    cpu : float
+        CPU time of the whole process in seconds.
+    stages : dict of str to StageStats
+        The sizes and timings of each stage.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.failures = 0
+        self.warnings = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.stages: Dict[str, StageStats] = {}
+
+    def __iadd__(self, other):
+        self.files += other.files
+        self.failures += other.failures
+        self.warnings += other.warnings
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.wall += other.wall
+        self.cpu += other.cpu
+        for name, stage in other.stages.items():
+            self.stages.setdefault(name, StageStats()).__iadd__(stage)
+        return self
+
+    def summary(self) -> str:
+        """A human-readable table of the sizes, timings and throughput of each stage."""
+        lines = [f'{self.files} files, {self.failures} failed, {self.warnings} warnings, '
+                 f'{_mb(self.bytes_in)} -> {_mb(self.bytes_out)} in {self.wall:.3f} s '
+                 f'({_rate(max(self.bytes_in, self.bytes_out), self.wall)})',
+                 f'{"stage":17s}{"in":>12s}{"out":>12s}{"wall":>10s}{"cpu":>10s}{"speed":>13s}']
+        for name in sorted(self.stages, key=_stage_order):
+            s = self.stages[name]
+            lines.append(f'{name:17s}{_mb(s.bytes_in):>12s}{_mb(s.bytes_out):>12s}'
+                         f'{s.wall:9.3f}s{s.cpu:9.3f}s{_rate(max(s.bytes_in, s.bytes_out), s.wall):>13s}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (f'ConversionStats(files={self.files}, failures={self.failures}, '
+                f'warnings={self.warnings}, bytes_in={self.bytes_in}, bytes_out={self.bytes_out}, '
+                f'wall={self.wall:.6f}, cpu={self.cpu:.6f}, stages={self.stages})')
+
+
+def get_counters() -> dict:
+    """Get the process-wide totals of all conversions so far.
+
+    The counters cover every call of :func:`decompress`, :func:`compress` and their on-disk variants,
+    including the files converted in worker processes by :func:`decompress_many` and
+    :func:`compress_many`. They are meant to be scraped periodically by long-running services.
+
+    Returns
+    -------
+    dict
+        'files', 'failures', 'warnings', 'bytes_in' and 'bytes_out' as ints
+        and the total 'wall' and 'cpu' time in seconds.
+    """
+    with _lock:
+        return dict(files=_totals.files, failures=_totals.failures, warnings=_totals.warnings,
+                    bytes_in=_totals.bytes_in, bytes_out=_totals.bytes_out,
+                    wall=_totals.wall, cpu=_totals.cpu)
+
+
+def reset_counters():
+    """Reset the counters returned by :func:`get_counters` to zero."""
+    global _totals
+    with _lock:
+        _totals = ConversionStats()
+
+
+_lock = threading.Lock()
+_totals = ConversionStats()
+# the conversion being run in the current thread or task
+_current: ContextVar[Optional[ConversionStats]] = ContextVar('_current', default=None)
+
+StatsArg = Union[ConversionStats, Callable[[ConversionStats], None], None]
+
+
+@contextmanager
+def _conversion(stats: StatsArg = None):
+    """Time a conversion and add it to the process-wide counters.
+
+    The results are added to stats if it is a ConversionStats object, or passed to it if it is
+    a function.
+    """
+    s = ConversionStats()
+    token = _current.set(s)
+    wall, cpu = time.perf_counter(), time.process_time()
+    s.files = 1
+    try:
+        yield s
+    except BaseException:
+        s.failures = 1
+        raise
+    finally:
+        s.wall = time.perf_counter() - wall
+        s.cpu = time.process_time() - cpu
+        _current.reset(token)
+        _add_to_counters(s)
+        if isinstance(stats, ConversionStats):
+            stats += s
+        elif stats is not None:
+            stats(s)
+
+
+def _add_to_counters(stats: ConversionStats):
+    with _lock:
+        _totals.__iadd__(stats)
+
+
+def _stage(name: str):
+    """Decorator recording the sizes and timings of a stage of the current conversion.
+
+    The first argument is taken as the input and the return value, or its last item for tuples,
+    as the output of the stage.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(data, *args, **kwargs):
+            stats = _current.get()
+            if stats is None:
+                return func(data, *args, **kwargs)
+            wall, cpu = time.perf_counter(), time.process_time()
+            result = func(data, *args, **kwargs)
+            _record(stats, name, _nbytes(data), _nbytes(result),
+                    time.perf_counter() - wall, time.process_time() - cpu)
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def _timed(name: str):
+    """Record the timing of the 'read' or 'write' stage run in a with block.
+
+    Yields a function to be called with the number of bytes read or written, which are also
+    counted as the input or the output of the conversion.
+    """
+    stats = _current.get()
+    size = [0]
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield lambda n: size.__setitem__(0, n)
+    if stats is None:
+        return
+    _record(stats, name, size[0], size[0], time.perf_counter() - wall, time.process_time() - cpu)
+    if name == 'read':
+        stats.bytes_in += size[0]
+    else:
+        stats.bytes_out += size[0]
+
+
+def _record(stats, name, bytes_in, bytes_out, wall, cpu):
+    stats.stages.setdefault(name, StageStats()).__iadd__(StageStats(bytes_in, bytes_out, wall, cpu))
+
+
+def _count_input(data):
+    """Count an in-memory input of the current conversion."""
+    stats = _current.get()
+    if stats is not None:
+        stats.bytes_in += _nbytes(data)
+
+
+def _count_output(data):
+    """Count an in-memory output of the current conversion."""
+    stats = _current.get()
+    if stats is not None:
+        stats.bytes_out += _nbytes(data)
+
+
+def _warning_count() -> int:
+    """The number of warnings of the current conversion so far."""
+    stats = _current.get()
+    return 0 if stats is None else stats.warnings
+
+
+def _count_warning():
+    stats = _current.get()
+    if stats is not None:
+        stats.warnings += 1
+
+
+def _nbytes(data) -> int:
+    if isinstance(data, tuple):
+        data = data[-1]
+    if isinstance(data, str):
+        return len(data)
+    try:
+        return memoryview(data).nbytes
+    except TypeError:
+        return 0
+
+
+def _stage_order(name):
+    return STAGES.index(name) if name in STAGES else len(STAGES)
+
+
+def _mb(size):
+    return f'{size / 1e6:.2f} MB'
+
+
+def _rate(size, seconds):
+    return f'{size / 1e6 / seconds:.1f} MB/s' if seconds > 0 else '-'
@@ -0,0 +1,569 @@
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import shutil
+import threading
+import zipfile
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Union
+
+import ncompress as lzw
+
+from .general_compression import _MAGIC_SIZE, _import_lz4, _import_zstd, _is_bz2, _is_gz, \
+    _is_lz4, _is_lzw, _is_xz, _is_zip, _is_zst, _load_zstd_dict, _lzw
+from .hatanaka import _check, _date_option, _is_binary, _run_stream
+
+__all__ = ['open_decompressed', 'open_compressed']
+
+_CHUNK_SIZE = 2 ** 16
+
+
+def open_decompressed(file: Union[Path, str, BinaryIO], *,
+                      skip_strange_epochs: bool = False, strict: bool = False,
+                      zstd_dict: Union[bytes, Path, str] = None) -> BinaryIO:
+    """Open a compressed RINEX file for reading its decompressed contents incrementally.
+
+    Works like :func:`decompress`, except that the conventional decompression
+    (.gz|.Z|.zip|.bz2|.zst|.xz|.lz4) and Hatanaka decompression are chained together and carried out
+    in a background thread while the output is being read, which keeps the memory usage
+    bounded regardless of the file size.
+
+    Parameters
+    ----------
+    file : Path or str or binary file-like
+        Path to a compressed RINEX file or a file object opened in binary mode.
+    skip_strange_epochs : bool, default False
+        For Hatanaka decompression.
+        Warn and skip strange epochs instead of raising an exception.
+    strict : bool, default False
+        If True, a ValueError is raised if the decoded file is not RINEX.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for compressing the file, as returned by
+        :func:`train_zstd_dictionary`, or the path to a file containing it.
+
+    Returns
+    -------
+    binary file-like
+        A read-only buffered binary stream of the decompressed RINEX file. Iterating over it
+        yields the lines of the file. Closing it stops the decompression.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka decompression. Raised when the erroneous part of the file
+        is reached while reading, and likewise for any warnings.
+    ValueError
+        For invalid file contents.
+    """
+    stack = ExitStack()
+    try:
+        header, stream = _open_rinex(file, stack, zstd_dict)
+        if b'COMPACT RINEX' in header:
+            stream = _decode_crinex(stream, skip_strange_epochs)
+        elif strict and not header.endswith(b'RINEX VERSION / TYPE'):
+            raise ValueError('not a valid RINEX file')
+        stream.closers = stack.pop_all()
+        return io.BufferedReader(stream, _CHUNK_SIZE)
+    except BaseException:
+        stack.close()
+        raise
+
+
+def open_compressed(file: Union[Path, str, BinaryIO], compression: str = 'gz', *,
+                    skip_strange_epochs: bool = False,
+                    reinit_every_nth: int = None, compresslevel: int = None,
+                    date: Union[datetime, float] = None,
+                    zstd_dict: Union[bytes, Path, str] = None) -> BinaryIO:
+    """Open a file for writing RINEX contents that are compressed on the fly.
+
+    Works like :func:`compress`, except that the data can be written incrementally,
+    e.g. one epoch at a time. Hatanaka compression (if observation data) and the conventional
+    compression are carried out in a background thread, which keeps the memory usage bounded.
+    Calling ``flush()`` on the returned stream pushes the epochs written so far through both
+    compression steps to the destination, as far as the compression format allows
+    (gzip and no compression). This requires the ``hatanaka._rnxcmp`` extension module.
+
+    Parameters
+    ----------
+    file : Path or str or binary file-like
+        Path to the output file or a writable binary file object.
+        The file is written as is, no file name suffixes are added.
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
+        Which compression (if any) to apply in addition to the Hatanaka compression.
+    skip_strange_epochs : bool, default False
+        For Hatanaka compression. Warn and skip strange epochs instead of raising an exception.
+    reinit_every_nth : int, optional
+        For Hatanaka compression. Initialize the compression operation at every # epochs.
+        When some part of the Compact RINEX file is lost, the data can not be recovered
+        thereafter until all the data arc are initialized for differential operation.
+        This option may be used to increase chances to recover parts of data by using the
+        skip_strange option of crx2rnx at the cost of increasing the file size.
+    compresslevel : int, optional
+        Compression level, as in :func:`compress`.
+    date : datetime.datetime or float, optional
+        For Hatanaka compression. Time written to the CRINEX PROG / DATE line, as in :func:`compress`.
+    zstd_dict : bytes or Path or str, optional
+        For zstd compression. A dictionary returned by :func:`train_zstd_dictionary`, or the path
+        to a file containing it.
+
+    Returns
+    -------
+    binary file-like
+        A write-only buffered binary stream. The compression is finalized when it is closed.
+
+    Raises
+    ------
+    HatanakaException
+        On any errors during Hatanaka compression. Raised by the write(), flush() or close()
+        call following the error. Warnings are reported when the stream is closed.
+    ValueError
+        For invalid file contents.
+    """
+    if reinit_every_nth is not None and reinit_every_nth > 0:
+        assert isinstance(reinit_every_nth, int)
+    else:
+        reinit_every_nth = 0
+    stack = ExitStack()
+    try:
+        if isinstance(file, (Path, str)):
+            f = stack.enter_context(open(file, 'wb'))
+        elif hasattr(file, 'write'):
+            f = file
+        else:
+            raise ValueError('output must be either a path or a binary file object')
+        encoder = _open_encoder(f, compression, stack, compresslevel, zstd_dict)
+
+        def convert(read):
+            src = _Reader(read)
+            header = _read_at_least(src, 80)
+            if len(header) < 80:
+                raise ValueError('file is too short to be a valid RINEX file')
+            src = _Prefixed(header, src)
+            if b'OBSERVATION DATA' in header:
+                return _run_stream('rnx2crx', src.read, encoder.write,
+                                   reinit_every_nth=reinit_every_nth,
+                                   skip_strange_epochs=skip_strange_epochs, **_date_option(date))
+            shutil.copyfileobj(src, encoder, _CHUNK_SIZE)
+
+        def on_close(result):
+            if result is not None:
+                _check('rnx2crx', *result)
+
+        stream = _Consumer(convert, on_flush=encoder.flush, on_close=on_close)
+        stream.closers = stack.pop_all()
+        return _BufferedWriter(stream, _CHUNK_SIZE)
+    except BaseException:
+        stack.close()
+        raise
+
+
+def _open_rinex(file, stack, zstd_dict=None):
+    """Open a possibly compressed RINEX file for reading.
+
+    Returns the first 80 bytes of the file after the conventional decompression (if any)
+    and a stream of the whole file, including these bytes.
+    """
+    if isinstance(file, (Path, str)):
+        f = stack.enter_context(open(file, 'rb'))
+    elif isinstance(file, (bytes, bytearray, memoryview)):
+        f = io.BytesIO(file)
+    elif isinstance(file, io.IOBase) or hasattr(file, 'read'):
+        if not _is_binary(file):
+            raise ValueError('the file object must be opened in binary mode')
+        f = file
+    else:
+        raise ValueError('input must be either a path or a binary file object')
+
+    stream = _open_container(f, stack, zstd_dict)
+    header = _read_at_least(stream, 80)
+    if len(header) < 80:
+        raise ValueError('file is too short to be a valid RINEX file')
+    return header, _Prefixed(header, stream)
+
+
+def _decode_crinex(stream, skip_strange_epochs):
+    """Readable stream of the RINEX file decoded from a Compact RINEX stream."""
+
+    def convert(write):
+        return _run_stream('crx2rnx', stream.read, write, skip_strange_epochs=skip_strange_epochs)
+
+    return _Producer(convert, lambda result: _check('crx2rnx', *result))
+
+
+def _open_encoder(f, compression, stack, compresslevel=None, zstd_dict=None):
+    """Wrap a binary file in an encoder for the given compression format."""
+    if compresslevel is None:
+        compresslevel = {'zst': 12, 'xz': 6, 'lz4': 0}.get(compression, 9)
+    if compression == 'gz':
+        # no file name or time in the header, same as compress()
+        return stack.enter_context(gzip.GzipFile(filename='', fileobj=f, mode='wb',
+                                                 compresslevel=compresslevel, mtime=0))
+    elif compression == 'bz2':
+        return stack.enter_context(bz2.BZ2File(f, 'wb', compresslevel=compresslevel))
+    elif compression == 'Z':
+        if _lzw is None:
+            return stack.enter_context(_Consumer(lambda read: lzw.compress(_Reader(read), f)))
+        return stack.enter_context(_Encoding(f, _lzw.Compressor()))
+    elif compression == 'zst':
+        zstandard = _import_zstd('open_compressed')
+        cctx = zstandard.ZstdCompressor(level=compresslevel, dict_data=_load_zstd_dict(zstd_dict),
+                                        write_checksum=True)
+        return stack.enter_context(cctx.stream_writer(f, closefd=False))
+    elif compression == 'xz':
+        return stack.enter_context(lzma.LZMAFile(f, 'wb', preset=compresslevel))
+    elif compression == 'lz4':
+        lz4_frame = _import_lz4('open_compressed')
+        return stack.enter_context(lz4_frame.LZ4FrameFile(f, 'wb', compression_level=compresslevel,
+                                                          content_checksum=True))
+    elif compression == 'zip':
+        raise NotImplementedError('zip compression is not supported')
+    elif compression == 'none':
+        return f
+    else:
+        raise ValueError(f"invalid compression '{compression}'")
+
+
+def _open_container(f, stack, zstd_dict=None):
+    """Wrap a binary file in a decoder for its compression format, if any."""
+    magic_bytes = _read_at_least(f, _MAGIC_SIZE)
+    if len(magic_bytes) < 2:
+        raise ValueError('empty file')
+    if _is_gz(magic_bytes):
+        return stack.enter_context(gzip.GzipFile(fileobj=_Prefixed(magic_bytes, f), mode='rb'))
+    elif _is_bz2(magic_bytes):
+        return stack.enter_context(bz2.BZ2File(_Prefixed(magic_bytes, f), 'rb'))
+    elif _is_zip(magic_bytes):
+        if getattr(f, 'seekable', lambda: False)():
+            f.seek(-len(magic_bytes), io.SEEK_CUR)
+        else:
+            # the zip directory is at the end of the archive, so this can't be streamed
+            f = io.BytesIO(magic_bytes + f.read())
+        z = stack.enter_context(zipfile.ZipFile(f, 'r'))
+        flist = z.namelist()
+        if len(flist) == 0:
+            raise ValueError('zip archive is empty')
+        elif len(flist) > 1:
+            raise ValueError('more than one file in zip archive, '
+                             'use decompress_archive() instead')
+        return stack.enter_context(z.open(flist[0], 'r'))
+    elif _is_lzw(magic_bytes):
+        src = _Prefixed(magic_bytes, f)
+        if _lzw is None:
+            return stack.enter_context(
+                _Producer(lambda write: lzw.decompress(src, _Writer(write))))
+        return stack.enter_context(_Decoding(src, _lzw.Decompressor()))
+    elif _is_zst(magic_bytes):
+        zstandard = _import_zstd('open_decompressed')
+        dctx = zstandard.ZstdDecompressor(dict_data=_load_zstd_dict(zstd_dict))
+        return stack.enter_context(dctx.stream_reader(_Prefixed(magic_bytes, f),
+                                                      read_across_frames=True))
+    elif _is_xz(magic_bytes):
+        return stack.enter_context(lzma.LZMAFile(_Prefixed(magic_bytes, f), 'rb'))
+    elif _is_lz4(magic_bytes):
+        lz4_frame = _import_lz4('open_decompressed')
+        return stack.enter_context(lz4_frame.LZ4FrameFile(_Prefixed(magic_bytes, f), 'rb'))
+    return _Prefixed(magic_bytes, f)
+
+
+def _read_at_least(f, size):
+    data = b''
+    while len(data) < size:
+        chunk = f.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class _Prefixed(io.RawIOBase):
+    """Binary stream of some already read bytes followed by the rest of a stream."""
+
+    def __init__(self, prefix, f):
+        self._prefix = memoryview(prefix)
+        self._f = f
+        self.closers = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._f.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed and self.closers is not None:
+            self.closers.close()
+        super().close()
+
+
+class _Reader:
+    """Minimal binary file-like wrapper around a read callback."""
+
+    def __init__(self, read):
+        self.read = read
+
+
+class _Writer:
+    """Minimal binary file-like wrapper around a write callback."""
+
+    def __init__(self, write):
+        self.write = write
+
+
+class _Decoding(io.RawIOBase):
+    """Readable binary stream of the data decoded from a stream with an incremental
+    decompressor object, chunk by chunk in the calling thread."""
+
+    def __init__(self, f, decompressor):
+        self._f = f
+        self._decompressor = decompressor
+        self._pending = memoryview(b'')
+        self._eof = False
+        self.closers = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._pending:
+            if self._eof:
+                return 0
+            chunk = self._f.read(_CHUNK_SIZE)
+            if chunk:
+                self._pending = memoryview(self._decompressor.decompress(chunk))
+            else:
+                self._pending = memoryview(self._decompressor.flush())
+                self._eof = True
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed and self.closers is not None:
+            self.closers.close()
+        super().close()
+
+
+class _Encoding(io.RawIOBase):
+    """Writable binary stream that encodes the data with an incremental compressor object
+    and writes it to another stream. The compressed stream is finished on close."""
+
+    def __init__(self, f, compressor):
+        self._f = f
+        self._compressor = compressor
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError('write to closed file')
+        data = self._compressor.compress(b)
+        if data:
+            self._f.write(data)
+        return len(b)
+
+    def flush(self):
+        if not self.closed:
+            self._f.flush()
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._f.write(self._compressor.flush())
+                self._f.flush()
+            finally:
+                super().close()
+
+
+class _Producer(io.RawIOBase):
+    """Readable binary stream of the output of produce(write) run in a background thread.
+
+    The output is passed through a bounded queue, so the producer is blocked while the
+    consumer is not reading. Exceptions raised by the producer are re-raised on the reading
+    side and its return value is passed to on_eof() once all of the output has been read.
+    """
+
+    _maxsize = 8
+
+    def __init__(self, produce, on_eof=None):
+        self._queue = queue.Queue(self._maxsize)
+        self._pending = memoryview(b'')
+        self._done = False
+        self._cancelled = False
+        self._on_eof = on_eof
+        self.closers = None
+        self._thread = threading.Thread(target=self._run, args=(produce,), daemon=True)
+        self._thread.start()
+
+    def _run(self, produce):
+        result = error = None
+        try:
+            result = produce(self._write)
+        except BaseException as e:
+            error = e
+        self._queue.put((result, error))
+
+    def _write(self, data):
+        if self._cancelled:
+            raise BrokenPipeError('the reader has been closed')
+        if data:
+            self._queue.put(bytes(data))
+        return len(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._pending:
+            if self._done:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, tuple):
+                self._done = True
+                self._thread.join()
+                result, error = item
+                if error is not None:
+                    raise error
+                if self._on_eof is not None:
+                    self._on_eof(result)
+                return 0
+            self._pending = memoryview(item)
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._cancelled = True
+            # unblock the producer and wait for it to stop
+            while not self._done:
+                if isinstance(self._queue.get(), tuple):
+                    self._done = True
+            self._thread.join()
+            if self.closers is not None:
+                self.closers.close()
+        super().close()
+
+
+class _Consumer(io.RawIOBase):
+    """Writable binary stream whose contents are processed by consume(read) in a background thread.
+
+    The data is passed through a bounded queue, so writing blocks while the consumer is busy.
+    flush() waits until the consumer has requested all of the data written so far and
+    calls on_flush() from the background thread at that point. Exceptions raised by the consumer
+    are re-raised by the following write(), flush() or close() call and its return value is passed
+    to on_close().
+    """
+
+    _maxsize = 8
+
+    def __init__(self, consume, on_flush=None, on_close=None):
+        self._queue = queue.Queue(self._maxsize)
+        self._pending = memoryview(b'')
+        self._eof = False
+        self._result = None
+        self._error = None
+        self._error_raised = False
+        self._closing = False
+        self._on_flush = on_flush
+        self._on_close = on_close
+        self.closers = None
+        self._thread = threading.Thread(target=self._run, args=(consume,), daemon=True)
+        self._thread.start()
+
+    def _run(self, consume):
+        try:
+            self._result = consume(self._read)
+        except BaseException as e:
+            self._error = e
+        # discard any remaining input to never leave the writer blocked
+        while not self._eof:
+            self._read(_CHUNK_SIZE)
+
+    def _read(self, size=-1):
+        while not self._pending and not self._eof:
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+            elif isinstance(item, threading.Event):
+                try:
+                    if self._on_flush is not None and self._error is None:
+                        self._on_flush()
+                except BaseException as e:
+                    self._error = e
+                finally:
+                    item.set()
+            else:
+                self._pending = memoryview(item)
+        n = len(self._pending) if size is None or size < 0 else min(size, len(self._pending))
+        data = self._pending[:n].tobytes()
+        self._pending = self._pending[n:]
+        return data
+
+    def _raise_error(self):
+        if self._error is not None and not self._error_raised:
+            self._error_raised = True
+            raise self._error
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError('write to closed file')
+        self._raise_error()
+        if len(b):
+            self._queue.put(bytes(b))
+        return len(b)
+
+    def flush(self):
+        if self._closing or self.closed:
+            return
+        if self._thread.is_alive():
+            flushed = threading.Event()
+            self._queue.put(flushed)
+            flushed.wait()
+        self._raise_error()
+
+    def close(self):
+        if self.closed:
+            return
+        self._closing = True
+        try:
+            self._queue.put(None)
+            self._thread.join()
+            if self.closers is not None:
+                self.closers.close()
+        finally:
+            super().close()
+        self._raise_error()
+        if self._on_close is not None:
+            self._on_close(self._result)
+
+
+class _BufferedWriter(io.BufferedWriter):
+    """BufferedWriter that also flushes the underlying raw stream."""
+
+    _closing = False
+
+    def flush(self):
+        super().flush()
+        if not self._closing:
+            self.raw.flush()
+
+    def close(self):
+        self._closing = True
+        super().close()
@@ -4,6 +4,7 @@ from pathlib import Path
 import pytest
 from importlib_resources import files
 
+import hatanaka.hatanaka
 import hatanaka.test.data
 
 
@@ -28,6 +29,17 @@ def clean(txt):
     return re.sub(pattern, '', txt.replace('\r', ''), flags=re.M)
 
 
+@pytest.fixture(params=['extension', 'subprocess'])
+def engine(request, monkeypatch):
+    """Run the test with both the in-process extension and the executables."""
+    if request.param == 'extension':
+        if hatanaka.hatanaka._rnxcmp is None:
+            pytest.skip('the hatanaka._rnxcmp extension is not available')
+    else:
+        monkeypatch.setattr(hatanaka.hatanaka, '_rnxcmp', None)
+    return request.param
+
+
 @pytest.fixture
 def crx_sample():
     return get_data_path('sample.crx')
@@ -0,0 +1,146 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from hatanaka import ConversionStats, compress, decompress, decompress_archive, is_archive
+from hatanaka.archives import _run_archive
+from hatanaka.cli import decompress_cli
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+def make_tar(path, members, mode='w:gz'):
+    with tarfile.open(path, mode) as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1609556640
+            tar.addfile(info, io.BytesIO(data))
+    return path
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, 'w') as z:
+        for name, data in members.items():
+            z.writestr(name, data)
+    return path
+
+
+@pytest.fixture
+def members(rnx_bytes):
+    return {
+        'a/sample1.crx.gz': compress(rnx_bytes),
+        'a/sample2.crx': compress(rnx_bytes, compression='none'),
+        'b/sample3.rnx.bz2': compress(rnx_bytes, compression='bz2'),
+    }
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('suffix', ['.tar', '.tar.gz', '.zip'])
+def test_decompress_archive(tmp_path, members, rnx_bytes, workers, suffix):
+    path = tmp_path / ('archive' + suffix)
+    if suffix == '.zip':
+        make_zip(path, members)
+    else:
+        make_tar(path, members, 'w:gz' if suffix == '.tar.gz' else 'w')
+    assert is_archive(path)
+    out_dir = tmp_path / 'out'
+    out_paths = decompress_archive(path, out_dir, workers=workers, delete=True)
+    assert out_paths == [out_dir / 'a' / 'sample1.rnx', out_dir / 'a' / 'sample2.rnx',
+                         out_dir / 'b' / 'sample3.rnx']
+    assert [p.read_bytes() for p in out_paths] == [rnx_bytes] * 3
+    assert not path.exists()
+
+
+def test_decompress_archive_default_dir(tmp_path, members, rnx_bytes):
+    path = make_tar(tmp_path / 'archive.tgz', members)
+    out_paths = decompress_archive(path)
+    assert out_paths[0] == tmp_path / 'a' / 'sample1.rnx'
+    assert path.exists()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('suffix', ['.tar.xz', '.zip'])
+def test_repack_archive(tmp_path, members, rnx_bytes, workers, suffix):
+    path = make_tar(tmp_path / 'archive.tar.gz', members)
+    out_archive = tmp_path / ('out' + suffix)
+    names = decompress_archive(path, out_archive=out_archive, workers=workers)
+    assert [p.as_posix() for p in names] == ['a/sample1.rnx', 'a/sample2.rnx', 'b/sample3.rnx']
+    if suffix == '.zip':
+        with zipfile.ZipFile(out_archive) as z:
+            assert z.namelist() == [p.as_posix() for p in names]
+            assert all(z.read(name) == rnx_bytes for name in z.namelist())
+    else:
+        with tarfile.open(out_archive) as tar:
+            infos = tar.getmembers()
+            assert [info.name for info in infos] == [p.as_posix() for p in names]
+            assert all(info.mtime == 1609556640 for info in infos)
+            assert all(tar.extractfile(info).read() == rnx_bytes for info in infos)
+    assert not (tmp_path / 'a').exists()
+
+
+def test_archive_stats(tmp_path, members):
+    path = make_tar(tmp_path / 'archive.tar', members, 'w')
+    results = list(_run_archive(path, tmp_path, None, 1))
+    assert all(isinstance(stats, ConversionStats) for *_, stats in results)
+    assert [stats.bytes_in for *_, stats in results] == [len(x) for x in members.values()]
+    assert list(results[0][-1].stages) == ['container_decode', 'hatanaka', 'write']
+
+
+def test_archive_errors(tmp_path, members, rnx_bytes):
+    members['c/broken.crx'] = members['a/sample2.crx'][:-200]
+    members['../outside.crx.gz'] = members['a/sample1.crx.gz']
+    path = make_zip(tmp_path / 'archive.zip', members)
+    out_dir = tmp_path / 'out'
+    with pytest.raises(Exception):
+        decompress_archive(path, out_dir, workers=1, delete=True)
+    # the other files are still decompressed
+    assert (out_dir / 'b' / 'sample3.rnx').read_bytes() == rnx_bytes
+    assert not (tmp_path / 'outside.rnx').exists()
+    assert path.exists()
+    results = list(_run_archive(path, out_dir, None, 1))
+    assert isinstance(results[-1][3], ValueError)
+    assert 'unsafe' in str(results[-1][3])
+
+
+def test_zip_error_message(tmp_path, members):
+    path = make_zip(tmp_path / 'archive.zip', members)
+    with pytest.raises(ValueError, match='decompress_archive'):
+        decompress(path)
+
+
+def test_is_archive(tmp_path, members, crx_sample):
+    assert not is_archive(crx_sample)
+    assert not is_archive(make_zip(tmp_path / 'single.zip', {'sample.crx': b'x'}))
+    assert not is_archive(tmp_path / 'missing.tar')
+
+
+def test_archive_cli(tmp_path, members, rnx_bytes, capsys):
+    path = make_tar(tmp_path / 'archive.tar.gz', members)
+    single = tmp_path / 'single.crx'
+    single.write_bytes(members['a/sample2.crx'])
+    assert decompress_cli([str(path), str(single), '--progress', '--delete']) == 0
+    out, err = capsys.readouterr()
+    assert out.splitlines() == [
+        f'Created {str(tmp_path / "single.rnx")}',
+        f'Deleted {str(single)}',
+        f'Created {str(tmp_path / "a" / "sample1.rnx")}',
+        f'Created {str(tmp_path / "a" / "sample2.rnx")}',
+        f'Created {str(tmp_path / "b" / "sample3.rnx")}',
+        f'Deleted {str(path)}',
+    ]
+    assert err.splitlines()[1].startswith(f'[1] {str(path)}:a/sample1.crx.gz: ')
+    assert (tmp_path / 'b' / 'sample3.rnx').read_bytes() == rnx_bytes
+
+
+def test_archive_cli_repack(tmp_path, members, rnx_bytes, capsys):
+    path = make_zip(tmp_path / 'archive.zip', members)
+    out_archive = tmp_path / 'out.tar.bz2'
+    assert decompress_cli([str(path), '--out-archive', str(out_archive), '-j', '2']) == 0
+    assert capsys.readouterr().out.splitlines()[0] == \
+           f'Added a/sample1.rnx to {str(out_archive)}'
+    with tarfile.open(out_archive) as tar:
+        assert len(tar.getmembers()) == 3
+    assert decompress_cli([str(path), str(path), '--out-archive', str(out_archive)]) == 1
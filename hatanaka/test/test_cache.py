@@ -0,0 +1,127 @@
+import gzip
+import os
+import shutil
+from datetime import datetime
+
+import pytest
+
+from hatanaka import ConversionStats, DecompressionCache, compress, compress_on_disk, \
+    decompress, decompress_many, decompress_on_disk, open_compressed
+from hatanaka.cli import decompress_cli
+from .conftest import get_data_path
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+def decompress_stats(content, **kwargs):
+    stats = ConversionStats()
+    txt = decompress(content, stats=stats, **kwargs)
+    return txt, stats
+
+
+def test_cache(tmp_path, crx_sample, rnx_bytes):
+    cache = DecompressionCache(tmp_path / 'cache')
+    txt, stats = decompress_stats(crx_sample, cache=cache)
+    assert txt == rnx_bytes
+    assert 'hatanaka' in stats.stages
+    assert cache.size == len(rnx_bytes)
+    # the contents are hashed, not the path
+    copy_path = tmp_path / 'copy.crx'
+    shutil.copy(crx_sample, copy_path)
+    txt, stats = decompress_stats(copy_path, cache=cache)
+    assert txt == rnx_bytes
+    assert 'hatanaka' not in stats.stages
+    # other options give other results
+    txt, stats = decompress_stats(crx_sample.read_bytes(), cache=cache, obs_types='C1C')
+    assert txt != rnx_bytes
+    assert 'hatanaka' in stats.stages
+    assert decompress(crx_sample, cache=cache, obs_types='C1C') == txt
+    assert len(list(cache.directory.iterdir())) == 2
+    cache.clear()
+    assert cache.size == 0
+
+
+def test_cache_range(tmp_path, crx_sample):
+    cache = DecompressionCache(tmp_path / 'cache')
+    start = datetime(2010, 3, 5, 0, 0, 31)
+    expected = decompress(crx_sample, start=start)
+    assert decompress(crx_sample, start=start, cache=cache) == expected
+    txt, stats = decompress_stats(crx_sample, start=start, cache=cache)
+    assert txt == expected
+    assert 'hatanaka' not in stats.stages
+    assert decompress(crx_sample, cache=cache) != expected
+
+
+def test_cache_eviction(tmp_path, rnx_bytes):
+    contents = [compress(rnx_bytes, compression='none', date=i * 86400) for i in range(3)]
+    cache = DecompressionCache(tmp_path, max_size=2 * len(rnx_bytes))
+    paths = []
+    for i, crx in enumerate(contents[:2]):
+        decompress(crx, cache=cache)
+        paths += set(tmp_path.iterdir()) - set(paths)
+        os.utime(paths[i], (i, i))
+    # the first one is now used last
+    decompress(contents[0], cache=cache)
+    decompress(contents[2], cache=cache)
+    assert cache.size == 2 * len(rnx_bytes)
+    assert paths[0].exists()
+    assert not paths[1].exists()
+    # too large to be cached at all
+    cache.max_size = len(rnx_bytes) - 1
+    decompress(contents[1], cache=cache)
+    assert cache.size == 2 * len(rnx_bytes)
+
+
+def test_cache_skips_warnings(tmp_path, crx_sample):
+    cache = DecompressionCache(tmp_path)
+    crx = crx_sample.read_bytes().replace(b'\n> 2010', b'\nxx 2010')
+    with pytest.warns(UserWarning):
+        decompress(crx, skip_strange_epochs=True, cache=cache)
+    assert cache.size == 0
+    # plain files are not cached either
+    decompress(decompress(crx_sample), cache=cache)
+    assert cache.size == 0
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cache_on_disk(tmp_path, rnx_bytes, workers):
+    cache = DecompressionCache(tmp_path / 'cache')
+    paths = []
+    for i in range(2):
+        path = tmp_path / f'sample{i}.crx.gz'
+        path.write_bytes(compress(rnx_bytes))
+        paths.append(path)
+    out_paths = decompress_many(paths, workers=workers, cache=cache)
+    assert [p.read_bytes() for p in out_paths] == [rnx_bytes] * 2
+    assert len(list(cache.directory.iterdir())) == 1
+    stats = ConversionStats()
+    out_paths[0].unlink()
+    assert decompress_on_disk(paths[0], cache=cache, stats=stats) == out_paths[0]
+    assert out_paths[0].read_bytes() == rnx_bytes
+    assert 'hatanaka' not in stats.stages
+
+
+def test_cache_cli(tmp_path, rnx_bytes):
+    sample_path = tmp_path / 'sample.crx.gz'
+    shutil.copy(get_data_path('sample.crx.gz'), sample_path)
+    cache_dir = tmp_path / 'cache'
+    assert decompress_cli([str(sample_path), '--cache', str(cache_dir), '--cache-size', '10']) == 0
+    assert [p.read_bytes() for p in cache_dir.iterdir()] == [(tmp_path / 'sample.rnx').read_bytes()]
+
+
+def test_reproducible_compression(tmp_path, rnx_bytes, monkeypatch):
+    date = datetime(2021, 1, 2, 3, 4)
+    crx_gz = compress(rnx_bytes, date=date)
+    assert crx_gz[4:8] == b'\0\0\0\0'
+    assert b'02-Jan-21 03:04' in gzip.decompress(crx_gz)
+    assert compress(rnx_bytes, date=date) == crx_gz
+    path = tmp_path / 'sample.rnx'
+    path.write_bytes(rnx_bytes)
+    assert compress_on_disk(path, date=date).read_bytes() == crx_gz
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1609556640')
+    assert compress(rnx_bytes) == crx_gz
+    out_path = tmp_path / 'stream.crx.gz'
+    with open_compressed(out_path) as f:
+        f.write(rnx_bytes)
+    assert gzip.decompress(out_path.read_bytes()) == gzip.decompress(crx_gz)
+    assert out_path.read_bytes()[4:8] == b'\0\0\0\0'
@@ -5,6 +5,7 @@ from contextlib import contextmanager
 
 import pytest
 
+import hatanaka.cli
 from hatanaka.cli import compress_cli, decompress, decompress_cli
 from .conftest import clean, compress_pairs, decompress_pairs, get_data_path
 
@@ -136,3 +137,87 @@ def test_cli_no_delete_unchanged(tmp_path, rnx_str):
     expected_path = tmp_path / 'sample.crx.gz'
     assert sample_path.exists()
     assert expected_path == sample_path
+
+
+def test_compress_cli_level(tmp_path, rnx_bytes):
+    sample_path = tmp_path / 'sample.rnx'
+    sample_path.write_bytes(rnx_bytes)
+    assert compress_cli([str(sample_path), '-c', 'bz2', '-l', '1']) == 0
+    out_path = tmp_path / 'sample.crx.bz2'
+    assert out_path.read_bytes()[:4] == b'BZh1'
+    assert clean(decompress(out_path)) == clean(rnx_bytes)
+    with pytest.raises(SystemExit):
+        compress_cli([str(sample_path), '-l', '10'])
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_cli_jobs(tmp_path, rnx_bytes, jobs):
+    # prepare
+    paths = []
+    for i in range(3):
+        sample_path = tmp_path / f'sample{i}.crx.gz'
+        shutil.copy(get_data_path('sample.crx.gz'), sample_path)
+        paths.append(str(sample_path))
+    # decompress
+    retcode = decompress_cli(paths + ['--jobs', jobs])
+    # check
+    assert retcode == 0
+    for i in range(3):
+        assert clean((tmp_path / f'sample{i}.rnx').read_bytes()) == clean(rnx_bytes)
+
+
+@pytest.mark.parametrize('cli', [compress_cli, decompress_cli])
+@pytest.mark.parametrize('jobs, threads', [('1', None), ('2', 1)])
+def test_cli_jobs_threads(tmp_path, monkeypatch, cli, jobs, threads):
+    # the worker processes do not each start a thread per CPU
+    calls = []
+    monkeypatch.setattr(hatanaka.cli, '_run_many',
+                        lambda *args, **kwargs: calls.append(kwargs) or [])
+    paths = []
+    for i in range(2):
+        paths.append(tmp_path / f'sample{i}.crx')
+        shutil.copy(get_data_path('sample.crx'), paths[-1])
+    assert cli([str(p) for p in paths] + ['-j', jobs]) == 0
+    assert calls[0]['threads'] == threads
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_cli_jobs_exit_codes(tmp_path, rnx_bytes, jobs):
+    # prepare
+    bad_path = tmp_path / 'bad.rnx'
+    bad_path.write_bytes(rnx_bytes[:-100])
+    warn_path = tmp_path / 'warn.rnx'
+    warn_path.write_bytes(rnx_bytes + b'\0\0\0')
+    good_path = tmp_path / 'good.rnx'
+    good_path.write_bytes(rnx_bytes)
+    # compress
+    with pytest.warns(UserWarning):
+        retcode = compress_cli([str(warn_path), str(good_path), '-j', jobs])
+    assert retcode == 2
+    with pytest.warns(UserWarning):
+        retcode = compress_cli([str(bad_path), str(warn_path), str(good_path), '-j', jobs])
+    assert retcode == 1
+    assert (tmp_path / 'good.crx.gz').exists()
+
+
+def test_decompress_cli_epoch_selection(tmp_path, rnx_bytes):
+    sample_path = tmp_path / 'sample.crx'
+    shutil.copy(get_data_path('sample.crx'), sample_path)
+    assert decompress_cli([str(sample_path), '--interval', '60']) == 0
+    header = rnx_bytes[:rnx_bytes.index(b'END OF HEADER\n') + 14]
+    assert (tmp_path / 'sample.rnx').read_bytes() == header
+    with replace_stdin(get_data_path('sample.crx').read_bytes()), replace_stdout() as stdout:
+        assert decompress_cli(['--start', '2010-03-05T00:00:30', '--end', '2010-03-05T00:01']) == 0
+    assert stdout.read() == rnx_bytes
+
+
+def test_cli_projection(tmp_path):
+    sample_path = tmp_path / 'sample.crx'
+    shutil.copy(get_data_path('sample.crx'), sample_path)
+    assert decompress_cli([str(sample_path), '--systems', 'GS', '--obs-types', 'C1C,L1C']) == 0
+    expected = decompress(sample_path.read_bytes(), systems='GS', obs_types='C1C,L1C')
+    assert (tmp_path / 'sample.rnx').read_bytes() == expected
+    assert b'G    2 L1C C1C' in expected
+    with replace_stdin(expected), replace_stdout() as stdout:
+        assert compress_cli(['-c', 'none', '--satellites', 'G13']) == 0
+    assert decompress(stdout.read()) == decompress(expected, satellites='G13')
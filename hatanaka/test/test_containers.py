@@ -0,0 +1,137 @@
+import io
+import lzma
+import sys
+
+import pytest
+
+from hatanaka import compress, compress_on_disk, decompress, decompress_on_disk, \
+    get_compressed_path, get_decompressed_path, open_compressed, open_decompressed, \
+    train_zstd_dictionary
+from hatanaka.cli import compress_cli, decompress_cli
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+@pytest.fixture(params=['zst', 'xz', 'lz4'])
+def compression(request):
+    if request.param == 'zst':
+        pytest.importorskip('zstandard')
+    elif request.param == 'lz4':
+        pytest.importorskip('lz4.frame')
+    return request.param
+
+
+def station_file(rnx_bytes, i):
+    """The sample file with the header of a station of a network."""
+    header = [
+        (f'ST{i:02d}', 'MARKER NAME'),
+        ('OBSERVER            AGENCY', 'OBSERVER / AGENCY'),
+        (f'{i:05d}               SEPT POLARX5        5.4.0', 'REC # / TYPE / VERS'),
+        (f'{i:05d}               TRM59800.00     NONE', 'ANT # / TYPE'),
+        (f'  {4000000 + i}.0000  {1000000 + i}.0000  {4800000 + i}.0000', 'APPROX POSITION XYZ'),
+    ]
+    lines = b''.join(f'{value:60}{label}\n'.encode() for value, label in header)
+    pos = rnx_bytes.index(b'\n') + 1
+    return rnx_bytes[:pos] + lines + rnx_bytes[pos:]
+
+
+def test_round_trip(rnx_bytes, compression):
+    txt = compress(rnx_bytes, compression=compression)
+    assert decompress(txt) == rnx_bytes
+    assert decompress(compress(rnx_bytes, compression=compression, compresslevel=1)) == rnx_bytes
+
+
+def test_magic_bytes(rnx_bytes):
+    txt = compress(rnx_bytes, compression='xz')
+    assert txt[:6] == b'\xfd7zXZ\x00'
+    # xz files written by other tools are detected as well
+    assert decompress(lzma.compress(decompress(txt))) == rnx_bytes
+    with pytest.raises(ValueError, match='invalid xz data'):
+        decompress(txt[:-20])
+
+
+def test_on_disk(tmp_path, rnx_bytes, compression):
+    path = tmp_path / 'sample.rnx'
+    path.write_bytes(rnx_bytes)
+    out_path = compress_on_disk(path, compression=compression, delete=True)
+    assert out_path == tmp_path / f'sample.crx.{compression}'
+    assert get_compressed_path(path, True, compression) == out_path
+    assert get_decompressed_path(out_path) == path
+    # already compressed
+    assert compress_on_disk(out_path) == out_path
+    assert decompress_on_disk(out_path) == path
+    assert path.read_bytes() == rnx_bytes
+
+
+def test_streaming(rnx_bytes, compression):
+    f = io.BytesIO()
+    with open_compressed(f, compression) as out:
+        out.write(rnx_bytes[:500])
+        out.write(rnx_bytes[500:])
+    assert decompress(f.getvalue()) == rnx_bytes
+    with open_decompressed(io.BytesIO(f.getvalue())) as src:
+        assert src.read() == rnx_bytes
+
+
+def test_zstd_dictionary(tmp_path, rnx_bytes):
+    pytest.importorskip('zstandard')
+    samples = [station_file(rnx_bytes, i) for i in range(32)]
+    zstd_dict = train_zstd_dictionary(samples[:30], size=4096)
+    assert len(zstd_dict) <= 4096
+    dict_path = tmp_path / 'crinex.dict'
+    dict_path.write_bytes(zstd_dict)
+    for txt in samples[30:]:
+        plain = compress(txt, compression='zst', date=0)
+        with_dict = compress(txt, compression='zst', date=0, zstd_dict=zstd_dict)
+        assert len(with_dict) < len(plain) / 2
+        assert compress(txt, compression='zst', date=0, zstd_dict=dict_path) == with_dict
+        assert decompress(with_dict, zstd_dict=dict_path) == txt
+        with pytest.raises(ValueError, match='zstd dictionary'):
+            decompress(with_dict)
+    # the dictionary can also be trained on files that are already compressed
+    assert train_zstd_dictionary([compress(x) for x in samples[:30]], size=4096)
+    with pytest.raises(ValueError, match='could not train'):
+        train_zstd_dictionary(samples[:1])
+
+    f = io.BytesIO()
+    with open_compressed(f, 'zst', zstd_dict=zstd_dict) as out:
+        out.write(samples[31])
+    with open_decompressed(io.BytesIO(f.getvalue()), zstd_dict=dict_path) as src:
+        assert src.read() == samples[31]
+
+
+def test_zstd_cli(tmp_path, rnx_bytes):
+    pytest.importorskip('zstandard')
+    samples = [station_file(rnx_bytes, i) for i in range(32)]
+    dict_path = tmp_path / 'crinex.dict'
+    dict_path.write_bytes(train_zstd_dictionary(samples[:30], size=4096))
+    paths = []
+    for i, txt in enumerate(samples[30:]):
+        paths.append(tmp_path / f'st{i}.rnx')
+        paths[-1].write_bytes(txt)
+    args = ['-c', 'zst', '-l', '19', '--zstd-dict', str(dict_path), '--delete']
+    assert compress_cli(args + [str(p) for p in paths]) == 0
+    assert decompress_cli(['--zstd-dict', str(dict_path)] +
+                          [str(tmp_path / f'st{i}.crx.zst') for i in range(2)]) == 0
+    assert [p.read_bytes() for p in paths] == samples[30:]
+
+
+def test_cli_levels(tmp_path, rnx_bytes):
+    path = tmp_path / 'sample.rnx'
+    path.write_bytes(rnx_bytes)
+    assert compress_cli([str(path), '-c', 'xz', '-l', '0']) == 0
+    assert decompress((tmp_path / 'sample.crx.xz').read_bytes()) == rnx_bytes
+    for args in [['-l', '0'], ['-l', '10'], ['-c', 'xz', '-l', '10'], ['-c', 'rar']]:
+        with pytest.raises(SystemExit):
+            compress_cli([str(path)] + args)
+
+
+def test_missing_dependency(monkeypatch, rnx_bytes):
+    monkeypatch.setitem(sys.modules, 'zstandard', None)
+    with pytest.raises(ImportError, match=r'hatanaka\[zstd\]'):
+        compress(rnx_bytes, compression='zst')
+    with pytest.raises(ImportError, match=r'hatanaka\[zstd\]'):
+        decompress(b'\x28\xb5\x2f\xfd' + bytes(100))
+    monkeypatch.setitem(sys.modules, 'lz4.frame', None)
+    with pytest.raises(ImportError, match=r'hatanaka\[lz4\]'):
+        compress(rnx_bytes, compression='lz4')
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import hatanaka.index
+from hatanaka import build_index, compress, decompress, get_index_path, rnx2crx
+from hatanaka.index import _crx2rnx_parallel, _load_index, _read_crinex
+from .conftest import clean
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+t0 = datetime(2010, 3, 5, 0, 0, 30)
+event = b'>' + b' ' * 30 + b'4  1\n' + b'test comment'.ljust(60) + b'COMMENT\n'
+
+
+def make_epochs(rnx_bytes, n):
+    # copies of the sample epoch at 30 s intervals with an event record after the 710th one
+    header, body = rnx_bytes.split(b'END OF HEADER\n')
+    epochs = []
+    for i in range(n):
+        t = t0 + timedelta(seconds=30 * i)
+        time = f'{t:%Y %m %d %H %M}{t.second:3d}.0000000'.encode()
+        epochs.append(body.replace(b'2010 03 05 00 00 30.0000000', time))
+    if n > 710:
+        epochs[710] += event
+    return header + b'END OF HEADER\n', epochs
+
+
+@pytest.mark.parametrize('compression', ['gz', 'bz2', 'none'])
+@pytest.mark.parametrize('with_index', [False, True])
+def test_decompress_range(tmp_path, rnx_bytes, compression, with_index):
+    header, epochs = make_epochs(rnx_bytes, 2000)
+    path = tmp_path / 'sample.crx'
+    path.write_bytes(compress(header + b''.join(epochs), compression=compression,
+                              reinit_every_nth=50))
+    if with_index:
+        assert build_index(path, spacing=1) == get_index_path(path)
+        index = _load_index(path)
+        # the events initialize the data arcs as well
+        assert len(index.points) == 41
+        if compression == 'gz':
+            assert len(index.checkpoints) > 1
+        with path.open('rb') as f:
+            assert len(_read_crinex(f, index, t0 + timedelta(hours=6), None)) < 250000
+    start = t0 + timedelta(seconds=30 * 700 + 15)
+    end = start + timedelta(minutes=10)
+    assert decompress(path, start=start, end=end) == header + b''.join(epochs[701:721])
+    assert decompress(path, start=start) == header + b''.join(epochs[701:])
+    assert decompress(path, end=end) == header + b''.join(epochs[:721])
+    assert decompress(path, start=end, end=start) == header
+    assert decompress(path.read_bytes(), start=start, end=end) == header + b''.join(epochs[701:721])
+
+
+@pytest.mark.parametrize('compression', ['gz', 'none'])
+def test_decompress_interval(tmp_path, rnx_bytes, compression):
+    header, epochs = make_epochs(rnx_bytes, 800)
+    path = tmp_path / 'sample.crx'
+    path.write_bytes(compress(header + b''.join(epochs), compression=compression))
+    # the event after the 710th epoch is kept
+    expected = [epochs[i] if i % 2 else event if i == 710 else b'' for i in range(800)]
+    assert decompress(path, interval=60) == header + b''.join(expected)
+    start = t0 + timedelta(minutes=300)
+    expected = header + b''.join(epochs[i] + (event if i == 709 else b'')
+                                 for i in range(609, 720, 10))
+    assert decompress(path, start=start, end=start + timedelta(hours=1), interval=300) == expected
+    assert decompress(path, start=start, end=start + timedelta(hours=1),
+                      interval=timedelta(minutes=5), threads=1) == expected
+    assert decompress(header + b''.join(epochs), interval=60) == \
+        decompress(path.read_bytes(), interval=60)
+
+
+def test_decompress_range_rinex(rnx_bytes):
+    header, epochs = make_epochs(rnx_bytes, 20)
+    assert decompress(header + b''.join(epochs), start=t0 + timedelta(seconds=60)) == \
+        header + b''.join(epochs[2:])
+
+
+def test_outdated_index(tmp_path, rnx_bytes):
+    header, epochs = make_epochs(rnx_bytes, 1000)
+    path = tmp_path / 'sample.crx.gz'
+    path.write_bytes(compress(header + b''.join(epochs), reinit_every_nth=50))
+    build_index(path)
+    path.write_bytes(compress(header + b''.join(epochs[:800]), reinit_every_nth=20))
+    with pytest.warns(UserWarning, match='modified'):
+        result = decompress(path, start=t0 + timedelta(seconds=30 * 790))
+    assert result == header + b''.join(epochs[790:800])
+
+
+def test_index_errors(tmp_path, rnx_bytes):
+    path = tmp_path / 'sample.rnx'
+    path.write_bytes(rnx_bytes)
+    with pytest.raises(ValueError):
+        build_index(path)
+    with pytest.raises(ValueError):
+        decompress(rnx_bytes.replace(b'OBSERVATION DATA', b'NAVIGATION DATA '), start=t0)
+
+
+def test_parallel_decompress(monkeypatch, rnx_bytes):
+    monkeypatch.setattr(hatanaka.index, '_MIN_PART_SIZE', 5000)
+    header, epochs = make_epochs(rnx_bytes, 1000)
+    rnx = header + b''.join(epochs)
+    crx = compress(rnx, compression='none', reinit_every_nth=30)
+    assert _crx2rnx_parallel(crx, 4) == rnx
+    assert decompress(compress(rnx, reinit_every_nth=30), threads=4) == rnx
+    # the parts start after the event as well
+    crx = compress(rnx, compression='none')
+    assert _crx2rnx_parallel(crx, 4) == rnx
+    # problems are left for the serial decoding to report
+    lines = crx.splitlines(keepends=True)
+    damaged = b''.join(lines[:3000] + [b'strange\n'] + lines[3001:])
+    assert _crx2rnx_parallel(damaged, 4, skip_strange_epochs=True) is None
+    with pytest.warns(UserWarning):
+        decompress(damaged, skip_strange_epochs=True, threads=4)
+
+
+def test_parallel_compress(monkeypatch, rnx_bytes):
+    monkeypatch.setattr(hatanaka.index, '_MIN_PART_SIZE', 5000)
+    header, epochs = make_epochs(rnx_bytes, 600)
+    rnx = header + b''.join(epochs)
+    # the parts start at the epochs 150, 300 and 450
+    expected = compress(rnx, compression='none', reinit_every_nth=150)
+    assert clean(compress(rnx, compression='none', workers=4)) == clean(expected)
+    assert decompress(compress(rnx, workers=4)) == rnx
+    assert clean(rnx2crx(rnx, workers=4)) == clean(expected)
+    # small inputs are not split
+    assert clean(rnx2crx(rnx_bytes, workers=4)) == clean(rnx2crx(rnx_bytes))
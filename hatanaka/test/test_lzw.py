@@ -0,0 +1,120 @@
+import io
+import os
+
+import ncompress
+import pytest
+
+import hatanaka.general_compression
+import hatanaka.streaming
+from hatanaka import compress, decompress, open_compressed, open_decompressed
+
+try:
+    from hatanaka import _lzw
+except ImportError:  # pragma: no cover
+    _lzw = None
+
+requires_lzw = pytest.mark.skipif(_lzw is None, reason='the hatanaka._lzw extension is not available')
+
+
+@pytest.fixture(params=['extension', 'ncompress'])
+def lzw_codec(request, monkeypatch):
+    """Run the test with both the incremental codec and the ncompress fallback."""
+    if request.param == 'extension':
+        if _lzw is None:
+            pytest.skip('the hatanaka._lzw extension is not available')
+    else:
+        monkeypatch.setattr(hatanaka.general_compression, '_lzw', None)
+        monkeypatch.setattr(hatanaka.streaming, '_lzw', None)
+    return request.param
+
+
+def chunked(codec, data, size):
+    return b''.join(codec.compress(data[i:i + size]) if hasattr(codec, 'compress') else
+                    codec.decompress(data[i:i + size])
+                    for i in range(0, len(data), size)) + codec.flush()
+
+
+@pytest.fixture(scope='module')
+def samples(rnx_bytes_module):
+    return [
+        b'',
+        b'a',
+        b'abababababababababab',
+        rnx_bytes_module,
+        # many table resets and code width changes
+        rnx_bytes_module * 100 + os.urandom(200000) + rnx_bytes_module * 100,
+        bytes(2 ** 20),
+    ]
+
+
+@pytest.fixture(scope='module')
+def rnx_bytes_module():
+    from .conftest import get_data_path
+    return get_data_path('sample.rnx').read_bytes()
+
+
+@requires_lzw
+@pytest.mark.parametrize('chunk_size', [1, 1000, None])
+def test_decompressor(samples, chunk_size):
+    for data in samples:
+        compressed = ncompress.compress(data)
+        if chunk_size is None:
+            d = _lzw.Decompressor()
+            assert d.decompress(compressed) + d.flush() == data
+        elif chunk_size > 1 or len(data) < 100000:
+            assert chunked(_lzw.Decompressor(), compressed, chunk_size) == data
+
+
+@requires_lzw
+@pytest.mark.parametrize('chunk_size', [1, 1000, None])
+def test_compressor(samples, chunk_size):
+    for data in samples:
+        if chunk_size is None:
+            c = _lzw.Compressor()
+            compressed = c.compress(data) + c.flush()
+        elif chunk_size > 1 or len(data) < 100000:
+            compressed = chunked(_lzw.Compressor(), data, chunk_size)
+        else:
+            continue
+        # the same output as compress -b 16
+        assert compressed == ncompress.compress(data)
+        assert ncompress.decompress(compressed) == data
+
+
+@requires_lzw
+def test_codec_errors(rnx_bytes_module):
+    with pytest.raises(ValueError, match='LZW-compressed'):
+        _lzw.Decompressor().decompress(b'\x1f\x8b\x08\x00')
+    with pytest.raises(ValueError, match='LZW-compressed'):
+        d = _lzw.Decompressor()
+        d.decompress(b'\x1f')
+        d.flush()
+    with pytest.raises(ValueError, match='bits'):
+        _lzw.Decompressor().decompress(b'\x1f\x9d\x91')
+    compressed = bytearray(ncompress.compress(rnx_bytes_module))
+    compressed[100] = 0xff
+    compressed[101] = 0xff
+    with pytest.raises(ValueError, match='corrupt'):
+        _lzw.Decompressor().decompress(compressed)
+    c = _lzw.Compressor()
+    c.flush()
+    with pytest.raises(ValueError):
+        c.compress(b'x')
+
+
+@pytest.mark.usefixtures('lzw_codec')
+def test_decompress_lzw(crx_sample, rnx_bytes):
+    assert decompress(compress(rnx_bytes, compression='Z')) == rnx_bytes
+    assert decompress(ncompress.compress(crx_sample.read_bytes())) == rnx_bytes
+
+
+@pytest.mark.usefixtures('lzw_codec')
+def test_stream_lzw(tmp_path, rnx_bytes):
+    path = tmp_path / 'sample.crx.Z'
+    with open_compressed(path, 'Z', date=0) as f:
+        f.write(rnx_bytes)
+    assert path.read_bytes() == compress(rnx_bytes, compression='Z', date=0)
+    with open_decompressed(path) as f:
+        assert f.read() == rnx_bytes
+    with open_decompressed(io.BytesIO(ncompress.compress(rnx_bytes))) as f:
+        assert f.read() == rnx_bytes
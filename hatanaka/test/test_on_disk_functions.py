@@ -2,8 +2,8 @@ import shutil
 
 import pytest
 
-from hatanaka import HatanakaException, compress_on_disk, decompress, decompress_on_disk, \
-    get_compressed_path, get_decompressed_path
+from hatanaka import HatanakaException, compress_many, compress_on_disk, decompress, \
+    decompress_many, decompress_on_disk, get_compressed_path, get_decompressed_path
 from hatanaka.test.conftest import clean, compress_pairs, decompress_pairs, get_data_path
 
 
@@ -139,3 +139,59 @@ def test_on_disk_hatanaka_warning(tmp_path, crx_bytes):
     assert clean(crx_path.read_bytes()) == clean(crx_bytes)
     assert len(record) == 1
     assert record[0].message.args[0].startswith('rnx2crx: null characters')
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_decompress_many(tmp_path, rnx_bytes, workers):
+    # prepare
+    paths = []
+    for input_suffix, _ in decompress_pairs:
+        sample_path = tmp_path / input_suffix[1:] / ('sample' + input_suffix)
+        sample_path.parent.mkdir()
+        shutil.copy(get_data_path('sample' + input_suffix), sample_path)
+        paths.append(sample_path)
+    # decompress
+    out_paths = decompress_many(paths, workers=workers)
+    # check
+    assert len(out_paths) == len(decompress_pairs)
+    for path, out_path, (_, expected_suffix) in zip(paths, out_paths, decompress_pairs):
+        assert out_path == path.parent / ('sample' + expected_suffix)
+        assert clean(out_path.read_bytes()) == clean(rnx_bytes)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_compress_many(tmp_path, rnx_bytes, workers):
+    # prepare
+    paths = []
+    for i in range(3):
+        sample_path = tmp_path / f'sample{i}.rnx'
+        shutil.copy(get_data_path('sample.rnx'), sample_path)
+        paths.append(sample_path)
+    # compress
+    out_paths = compress_many(paths, workers=workers, compression='bz2', delete=True)
+    # check
+    assert out_paths == [tmp_path / f'sample{i}.crx.bz2' for i in range(3)]
+    for path, out_path in zip(paths, out_paths):
+        assert not path.exists()
+        assert clean(decompress(out_path)) == clean(rnx_bytes)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_many_errors_and_warnings(tmp_path, rnx_bytes, workers):
+    # prepare
+    bad_path = tmp_path / 'bad.rnx'
+    bad_path.write_bytes(rnx_bytes[:-100])
+    warn_path = tmp_path / 'warn.rnx'
+    warn_path.write_bytes(rnx_bytes + b'\0\0\0')
+    good_path = tmp_path / 'good.rnx'
+    good_path.write_bytes(rnx_bytes)
+    # compress
+    with pytest.warns(UserWarning) as record:
+        with pytest.raises(HatanakaException):
+            compress_many([bad_path, warn_path, good_path], workers=workers)
+    # check
+    assert len(record) == 1
+    assert record[0].message.args[0].startswith('rnx2crx: null characters')
+    assert not (tmp_path / 'bad.crx.gz').exists()
+    assert (tmp_path / 'warn.crx.gz').exists()
+    assert (tmp_path / 'good.crx.gz').exists()
@@ -0,0 +1,108 @@
+import gzip
+import io
+import shutil
+import zlib
+
+import pytest
+
+from hatanaka import HatanakaException, compress, decompress, open_compressed, open_decompressed
+from .conftest import clean, decompress_pairs, get_data_path
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+@pytest.mark.parametrize(
+    'input_suffix, expected_suffix',
+    decompress_pairs
+)
+def test_open_decompressed(tmp_path, rnx_bytes, input_suffix, expected_suffix):
+    # prepare
+    sample_path = tmp_path / ('sample' + input_suffix)
+    shutil.copy(get_data_path('sample' + input_suffix), sample_path)
+    # decompress
+    with open_decompressed(sample_path) as f:
+        converted = f.read()
+    # check
+    assert clean(converted) == clean(rnx_bytes)
+    with sample_path.open('rb') as f_in, open_decompressed(f_in) as f:
+        assert f.read() == converted
+
+
+def test_open_decompressed_lines(crx_bytes, rnx_bytes):
+    with open_decompressed(io.BytesIO(gzip.compress(crx_bytes))) as f:
+        lines = list(f)
+    assert lines == decompress(crx_bytes).splitlines(keepends=True)
+
+
+def test_open_decompressed_close_early(crx_bytes):
+    # large enough to fill the internal buffers
+    header_end = crx_bytes.index(b'END OF HEADER\n') + 14
+    txt = crx_bytes[:header_end] + crx_bytes[header_end:] * 200
+    f = open_decompressed(txt)
+    f.readline()
+    f.close()
+    assert f.closed
+
+
+def test_open_decompressed_error(crx_bytes):
+    with open_decompressed(crx_bytes[:-10]) as f:
+        with pytest.raises(HatanakaException) as excinfo:
+            f.read()
+    assert excinfo.value.args[0].startswith('The file seems to be truncated in the middle.')
+
+
+def test_open_decompressed_invalid():
+    with pytest.raises(ValueError):
+        open_decompressed(b'')
+    with pytest.raises(ValueError):
+        open_decompressed(b'blah')
+    with pytest.raises(ValueError):
+        open_decompressed(io.StringIO('blah'))
+
+
+@pytest.mark.parametrize('compression', ['gz', 'bz2', 'Z', 'none'])
+def test_open_compressed(tmp_path, rnx_bytes, compression):
+    out_path = tmp_path / 'sample.crx'
+    with open_compressed(out_path, compression) as f:
+        for line in rnx_bytes.splitlines(keepends=True):
+            f.write(line)
+    assert clean(decompress(out_path)) == clean(rnx_bytes)
+    assert clean(decompress(out_path)) == clean(decompress(compress(rnx_bytes, compression=compression)))
+
+
+def test_open_compressed_non_obs(rnx_bytes):
+    txt = rnx_bytes.replace(b'OBSERVATION', b'NAVIGATION ')
+    out = io.BytesIO()
+    with open_compressed(out, 'gz') as f:
+        f.write(txt)
+    assert gzip.decompress(out.getvalue()) == txt
+
+
+def test_open_compressed_flush(engine, rnx_bytes):
+    if engine == 'subprocess':
+        pytest.skip('the output of the rnx2crx executable is buffered')
+    expected = clean(compress(rnx_bytes, compression='none'))
+    out = io.BytesIO()
+    with open_compressed(out, 'gz') as f:
+        f.write(rnx_bytes)
+        f.flush()
+        # the epochs written so far are available before closing
+        partial = clean(zlib.decompressobj(31).decompress(out.getvalue()))
+        assert len(partial) > expected.index(b'END OF HEADER')
+        assert expected.startswith(partial)
+    assert clean(decompress(out.getvalue())) == clean(rnx_bytes)
+
+
+def test_open_compressed_error(rnx_bytes):
+    with pytest.raises(HatanakaException) as excinfo:
+        with open_compressed(io.BytesIO()) as f:
+            f.write(rnx_bytes[:-100])
+    assert excinfo.value.args[0].startswith('The RINEX file seems to be truncated in the middle.')
+
+
+def test_open_compressed_invalid(rnx_bytes):
+    with pytest.raises(ValueError):
+        with open_compressed(io.BytesIO()) as f:
+            f.write(b'blah')
+    with pytest.raises(ValueError):
+        open_compressed(io.BytesIO(), 'rar')
@@ -0,0 +1,100 @@
+import gzip
+import lzma
+import shutil
+from pathlib import Path
+
+import pytest
+
+from hatanaka import ConversionStats, compress, decompress, get_transcoded_path, \
+    train_zstd_dictionary, transcode, transcode_many, transcode_on_disk
+from hatanaka.cli import transcode_cli
+from hatanaka.general_compression import _decompress_container
+from .conftest import get_data_path
+
+
+@pytest.mark.parametrize('suffix', ['.Z', '.gz', '.bz2', '.zip', ''])
+@pytest.mark.parametrize('compression', ['gz', 'bz2', 'Z', 'xz', 'none'])
+def test_transcode(crx_sample, suffix, compression):
+    crx = crx_sample.read_bytes()
+    stats = ConversionStats()
+    txt = transcode(get_data_path('sample.crx' + suffix), compression, stats=stats)
+    # the Compact RINEX contents are kept as they are
+    assert bytes(_decompress_container(txt)) == crx
+    assert txt == compress(crx, compression=compression)
+    assert 'hatanaka' not in stats.stages
+    assert stats.bytes_out == len(txt)
+
+
+def test_transcode_rinex(rnx_bytes):
+    # plain RINEX files are not Hatanaka-compressed either
+    assert transcode(gzip.compress(rnx_bytes), 'xz', compresslevel=0) == \
+           lzma.compress(rnx_bytes, preset=0)
+
+
+def test_transcode_zstd_dict(tmp_path, crx_sample):
+    pytest.importorskip('zstandard')
+    zstd_dict = train_zstd_dictionary([crx_sample] * 20, size=1024)
+    txt = transcode(crx_sample, 'zst', zstd_dict=zstd_dict)
+    assert transcode(txt, 'none', zstd_dict=zstd_dict) == crx_sample.read_bytes()
+
+
+def test_transcode_errors(rnx_bytes):
+    with pytest.raises(ValueError, match='not a valid RINEX file'):
+        transcode(gzip.compress(b'x' * 100))
+    with pytest.raises(ValueError, match='not a valid RINEX file'):
+        transcode(gzip.compress(rnx_bytes[:50]))
+    with pytest.raises(ValueError):
+        transcode(rnx_bytes, 'rar')
+    with pytest.raises(NotImplementedError):
+        transcode(rnx_bytes, 'zip')
+
+
+def test_get_transcoded_path():
+    assert get_transcoded_path('1lsu0010.21d.Z', 'xz') == Path('1lsu0010.21d.xz')
+    assert get_transcoded_path('dir/sample.crx.gz') == Path('dir/sample.crx.gz')
+    assert get_transcoded_path('sample.crx.zip', 'none') == Path('sample.crx')
+    assert get_transcoded_path('sample.crx', 'bz2') == Path('sample.crx.bz2')
+    with pytest.raises(ValueError):
+        get_transcoded_path('sample')
+
+
+def test_transcode_on_disk(tmp_path, crx_sample):
+    path = tmp_path / 'sample.crx.Z'
+    shutil.copy(get_data_path('sample.crx.Z'), path)
+    out_path = transcode_on_disk(path, 'bz2', delete=True)
+    assert out_path == tmp_path / 'sample.crx.bz2'
+    assert not path.exists()
+    assert bytes(_decompress_container(out_path.read_bytes())) == crx_sample.read_bytes()
+    # already has the requested compression
+    assert transcode_on_disk(out_path, 'bz2', delete=True) == out_path
+    assert out_path.exists()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_transcode_many(tmp_path, rnx_bytes, workers):
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f'sample{i}.crx.gz')
+        paths[-1].write_bytes(compress(rnx_bytes))
+    out_paths = transcode_many(paths, 'Z', workers=workers, delete=True)
+    assert out_paths == [p.with_suffix('.Z') for p in paths]
+    assert [decompress(p) for p in out_paths] == [rnx_bytes] * 3
+    assert not any(p.exists() for p in paths)
+
+
+def test_transcode_cli(tmp_path, crx_sample, capsys):
+    paths = []
+    for suffix in ['.Z', '.gz']:
+        paths.append(tmp_path / ('sample' + suffix[1:] + '.crx' + suffix))
+        shutil.copy(get_data_path('sample.crx' + suffix), paths[-1])
+    assert transcode_cli([str(p) for p in paths] + ['-c', 'gz', '-l', '1', '--delete']) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out == [
+        f'Created {str(tmp_path / "sampleZ.crx.gz")}',
+        f'Deleted {str(paths[0])}',
+        f'{str(paths[1])} is already transcoded',
+    ]
+    assert bytes(_decompress_container((tmp_path / 'sampleZ.crx.gz').read_bytes())) == \
+           crx_sample.read_bytes()
+    with pytest.raises(SystemExit):
+        transcode_cli([str(paths[1]), '-c', 'gz', '-l', '0'])
@@ -0,0 +1,195 @@
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Union
+
+from .general_compression import _CONTAINER_SUFFIXES, _check_compression, _compress_container, \
+    _decompress_container, _open_input, _raise_many, _record_warnings, _run_many, \
+    _using_zstd_dict, _write_file
+from .stats import StatsArg, _conversion, _count_output
+
+__all__ = ['transcode', 'transcode_on_disk', 'transcode_many', 'get_transcoded_path']
+
+
+def transcode(content: Union[Path, str, bytes, memoryview, BinaryIO], compression: str = 'gz', *,
+              compresslevel: int = None, threads: int = None,
+              zstd_dict: Union[bytes, Path, str] = None, stats: StatsArg = None) -> bytes:
+    """Change the conventional compression of a (Compact) RINEX file.
+
+    Only the outer container is replaced, e.g. .crx.Z by .crx.zst. The Compact RINEX payload is
+    copied as is, without the Hatanaka decompression and compression round-trip of
+    :func:`decompress` followed by :func:`compress`, which makes this considerably faster and keeps
+    the original Compact RINEX bytes. The input container is deduced from the file contents.
+
+    Parameters
+    ----------
+    content : Path or str or bytes-like or binary file object
+        Path to a RINEX file or file contents as a bytes-like object
+        (bytes, bytearray, memoryview, mmap, ...) or as a binary file object.
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
+        The new compression.
+    compresslevel : int, optional
+        Compression level, as in :func:`compress`.
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression. Defaults to the number of CPUs.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for decompressing and compressing zstd files, as returned by
+        :func:`train_zstd_dictionary`, or the path to a file containing it.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
+
+    Returns
+    -------
+    bytes
+        The RINEX file contents in the new container.
+
+    Raises
+    ------
+    ValueError
+        For invalid file contents.
+    """
+    _check_compression(compression)
+    with _conversion(stats), _using_zstd_dict(zstd_dict), _open_input(content) as txt:
+        txt = bytes(_transcode(txt, compression, compresslevel, threads))
+        _count_output(txt)
+    return txt
+
+
+def transcode_on_disk(path: Union[Path, str], compression: str = 'gz', *, delete: bool = False,
+                      compresslevel: int = None, threads: int = None,
+                      zstd_dict: Union[bytes, Path, str] = None, stats: StatsArg = None) -> Path:
+    """Change the conventional compression of a (Compact) RINEX file and write it to disk.
+
+    Works like :func:`transcode`. The output file is named as given by :func:`get_transcoded_path`.
+    Files that already have the requested compression are ignored.
+
+    Parameters
+    ----------
+    path : Path or str
+        Path to a RINEX file.
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
+        The new compression.
+    delete : bool, default False
+        Delete the source file after successful transcoding.
+    compresslevel : int, optional
+        Compression level, as in :func:`compress`.
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression. Defaults to the number of CPUs.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for decompressing and compressing zstd files, as returned by
+        :func:`train_zstd_dictionary`, or the path to a file containing it.
+    stats : ConversionStats or callable, optional
+        A :class:`ConversionStats` object to fill in with the sizes and timings of the stages of
+        the conversion, or a function to call with it once the conversion has finished or failed.
+
+    Returns
+    -------
+    Path
+        Path to the transcoded RINEX file.
+
+    Raises
+    ------
+    ValueError
+        For invalid file contents.
+    """
+    path = Path(path)
+    _check_compression(compression)
+    out_path = get_transcoded_path(path, compression)
+    if out_path == path:
+        # already has the requested compression
+        return out_path
+    with _conversion(stats), _record_warnings() as warning_list, _using_zstd_dict(zstd_dict), \
+            _open_input(path) as txt:
+        _write_file(out_path, _transcode(txt, compression, compresslevel, threads))
+    assert out_path.exists()
+    if delete:
+        if len(warning_list) == 0:
+            path.unlink()
+    return out_path
+
+
+def transcode_many(paths: Iterable[Union[Path, str]], compression: str = 'gz', *,
+                   workers: int = None, delete: bool = False, compresslevel: int = None,
+                   threads: int = None,
+                   zstd_dict: Union[bytes, Path, str] = None) -> List[Path]:
+    """Change the conventional compression of many RINEX files in parallel.
+
+    Applies :func:`transcode_on_disk` to each file using a pool of worker processes.
+
+    Parameters
+    ----------
+    paths : iterable of Path or str
+        Paths to RINEX files.
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
+        The new compression.
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        If 1, the files are processed sequentially in the current process.
+    delete : bool, default False
+        Delete each source file after it has been transcoded successfully.
+    compresslevel : int, optional
+        Compression level, as in :func:`compress`.
+    threads : int, optional
+        Number of threads used for gzip and bzip2 compression of each file.
+        Defaults to 1 if several worker processes are used, otherwise to the number of CPUs.
+    zstd_dict : bytes or Path or str, optional
+        The Zstandard dictionary used for decompressing and compressing zstd files.
+
+    Returns
+    -------
+    list of Path
+        Paths to the transcoded RINEX files, in the same order as the input paths.
+
+    Raises
+    ------
+    ValueError
+        For invalid file contents.
+        If several files fail, the first error is raised after all other files have been processed.
+    """
+    paths = list(paths)
+    if threads is None and workers != 1 and len(paths) > 1:
+        # the worker processes already keep the CPUs busy
+        threads = 1
+    return _raise_many(_run_many(
+        transcode_on_disk, paths, workers,
+        compression=compression, delete=delete, compresslevel=compresslevel, threads=threads,
+        zstd_dict=zstd_dict))
+
+
+def get_transcoded_path(path: Union[Path, str], compression: str = 'gz') -> Path:
+    """Get the path of a RINEX file after changing its conventional compression.
+
+    Parameters
+    ----------
+    path : path or str
+        Path to the RINEX file, e.g. '1lsu0010.21d.Z'.
+    compression : 'gz' (default), 'bz2', 'Z', 'zst', 'xz', 'lz4' or 'none'
+        The new compression.
+
+    Returns
+    -------
+    Path
+        The path of the resulting RINEX file, e.g. '1lsu0010.21d.zst'.
+    """
+    path = Path(path)
+    parts = path.name.split('.')
+    if len(parts) <= 1:
+        raise ValueError(f"'{str(path)}' is not a valid RINEX file name")
+    if '.' + parts[-1].lower() in _CONTAINER_SUFFIXES:
+        parts.pop()
+    if compression != 'none':
+        parts.append(compression)
+    return path.parent / '.'.join(parts)
+
+
+def _transcode(txt, compression, compresslevel=None, threads=None):
+    txt = _decompress_container(txt)
+    _check_rinex(txt)
+    return _compress_container(txt, compression, compresslevel, threads)
+
+
+def _check_rinex(txt):
+    # the payload is copied without parsing it, only its first header line is checked
+    header = bytes(txt[:80])
+    if len(header) < 80 or not (b'COMPACT RINEX' in header or
+                                header.endswith(b'RINEX VERSION / TYPE')):
+        raise ValueError('not a valid RINEX file')
@@ -52,6 +52,17 @@
 /*                 2022-01-06                Y. Hatanaka                    */
 /*                  - VERSION is corrected to 4.1.0                         */
 /*                                                                          */
+/*     Modified for the hatanaka Python package                             */
+/*                  - global variables are moved to a context structure and */
+/*                    exit() calls are replaced with rnx_exit() so that the */
+/*                    conversion can run in-process and in parallel.        */
+/*                  - I/O goes through rnxio.c instead of stdin/stdout.     */
+/*                  - the command line program is built unless              */
+/*                    RNXCMP_LIBRARY is defined.                            */
+/*                  - the arrays of the satellites and data types grow with */
+/*                    the file instead of being fixed to MAXSAT x MAXTYPE.  */
+/*                    MAXSAT and MAXTYPE are only sanity limits now.        */
+/*                                                                          */
 /*     Copyright (c) 2007 Geospatial Information Authority of Japan         */
 /*                                                                          */
 /****************************************************************************/
@@ -62,6 +73,8 @@
 #include <string.h>
 #include <ctype.h>
 
+#include "rnxcmp.h"
+
 #define VERSION  "ver.4.1.0"
 
 /**** Exit codes are defined here. ****/
@@ -82,10 +95,16 @@
 
 /* define global constants */
 #define PROGNAME "CRX2RNX"
-#define MAXSAT    100         /* Maximum number of satellites observed at one epoch */
-#define MAXTYPE   100         /* Maximum number of data types   */
-#define MAXCLM   2048         /* Maximum columns in one line   (>MAXTYPE*19+3)  */
-#define MAX_BUFF_SIZE 204800  /* Maximum size of output buffer (>MAXSAT*(MAXTYPE*19+4)+60 */
+#ifndef MAXSAT
+#define MAXSAT    999         /* Maximum number of satellites observed at one epoch (I3) */
+#endif
+#ifndef MAXTYPE
+#define MAXTYPE   999         /* Maximum number of data types   */
+#endif
+#ifndef MAXCLM
+#define MAXCLM   8192         /* Maximum columns in one line   (>41+MAXSAT*3)  */
+#endif
+#define MAX_FIELD  32         /* Maximum size of one data field in the output buffer */
 #define MAX_DIFF_ORDER 5      /* Maximum order of difference to be dealt with */
 
 /* define data structure for fields of clock offset and observation records */
@@ -96,76 +115,147 @@ typedef struct clock_format{
 
 typedef struct data_format{
     long u[MAX_DIFF_ORDER+1];      /* upper X digits for each difference order */
-    long l[MAX_DIFF_ORDER+1];      /* lower 5 digits */
+    int  l[MAX_DIFF_ORDER+1];      /* lower 5 digits */
     int  order;
     int  arc_order;
 } data_format;
 
-/* define global variables */
-clock_format clk1,clk0;
-data_format dy1[MAXSAT][MAXTYPE],dy0[MAXSAT][MAXTYPE];
-char flag1[MAXSAT][MAXTYPE*2+1],flag[MAXSAT][MAXTYPE*2+1];
-
-int rinex_version,crinex_version;
-int nsat,ntype,ntype_gnss[UCHAR_MAX],ntype_record[MAXSAT],clk_order = 0, clk_arc_order = 0;
-char ep_top_from,ep_top_to;
-long nl_count = 0;
-int skip = 0;
-int output_overflow = 0;
-int exit_status = EXIT_SUCCESS;
-int delete_if_no_error = 0; /* default : not delete */
-int n_infile = 0;           /* number of input file (must be 0 or 1) */
-char infile[MAXCLM];        /**** name of input file ****/
-size_t C1 = sizeof("");               /* size of one character */
-size_t C2 = sizeof(" ");              /* size of 2-character string */
-size_t C3 = sizeof("  ");             /* size of 3-character string */
-
-char out_buff[MAX_BUFF_SIZE],*p_buff;
+/* rows of the arrays kept per satellite, see reserve() */
+#define DATA_ROW(ctx,dy,i) ((dy) + (size_t)(i)*(ctx)->max_type)
+#define FLAG_ROW(ctx,fl,i) ((fl) + (size_t)(i)*(2*(ctx)->max_type+1))
+
+/* define the state of one conversion (formerly global variables) */
+typedef struct crx2rnx_ctx{
+    rnx_io *io;
+    clock_format clk1,clk0;
+    /* max_sat x max_type data fields, grown to the largest epoch and the */
+    /* number of the data types defined in the header or event records   */
+    int max_sat,max_type;
+    data_format *dy1,*dy0;
+    char *flag1,*flag,*dflag;     /* max_sat x (2*max_type+1) */
+
+    int rinex_version,crinex_version;
+    int nsat,ntype,ntype_gnss[UCHAR_MAX+1],ntype_record[MAXSAT],clk_order,clk_arc_order;
+    char ep_top_from,ep_top_to;
+    long nl_count;
+    int skip;
+    int output_overflow;
+    int exit_status;
+    const crx2rnx_options *options;
+
+    char *out_buff,*p_buff;
+
+    /* decoded data of the current epoch when options->epoch_fn is set */
+    long long *values;            /* max_sat x max_type */
+    char *vflags;                 /* max_sat x 2*max_type */
+
+    /* state kept between epochs by the main loop */
+    char line[MAXCLM],sat_lst_old[MAXSAT*3];
+    int nsat1;
+
+    /* epoch selection: whether the current record is output and the time of the last record */
+    int selected;
+    int has_time;
+    long long time;
+
+    /* projection: whether each satellite of the current epoch is output and */
+    /* the epoch line with the number of satellites (and list for RINEX 2)   */
+    rnx_proj proj;
+    char sat_out[MAXSAT];
+    char proj_line[MAXCLM];
+} crx2rnx_ctx;
+
+/* "00" to "99" for formatting two digits at once */
+static const char digit_pairs[] =
+    "00010203040506070809101112131415161718192021222324252627282930313233343536373839"
+    "40414243444546474849505152535455565758596061626364656667686970717273747576777879"
+    "8081828384858687888990919293949596979899";
+
+static size_t C1 = sizeof("");               /* size of one character */
+static size_t C2 = sizeof(" ");              /* size of 2-character string */
+static size_t C3 = sizeof("  ");             /* size of 3-character string */
 
 /* declaration of functions */
-void fileopen(int argc, char *argv[]);
-void header(void);
-int  put_event_data(char *dline, char *p_event);
-void skip_to_next(char *dline);
-void process_clock(void);
-void set_sat_table(char *p_new, char *p_old, int nsat1, int *sattbl);
-void data(char *p_sat_lst, int *sattbl, char dflag[][MAXTYPE*2]);
-void repair(char *s, char *ds);
-int  getdiff(data_format *y, data_format *dy0, int i0, char *dflag);
-void putfield(data_format *y, char *flag);
-void read_clock(char *dline ,long *yu, long *yl);
-void print_clock(long yu, long yl, int shift_clk);
-int  read_chk_line(char *line);
-void error_exit(int error_no, char *string);
-void no_error_exit();
+static void convert(crx2rnx_ctx *ctx);
+static void header(crx2rnx_ctx *ctx);
+static void put_header_line(crx2rnx_ctx *ctx, char *line);
+static int  put_event_data(crx2rnx_ctx *ctx, char *dline, char *p_event);
+static void skip_to_next(crx2rnx_ctx *ctx, char *dline);
+static void process_clock(crx2rnx_ctx *ctx);
+static void set_sat_table(crx2rnx_ctx *ctx, char *p_new, char *p_old, int nsat1, int *sattbl);
+static void reserve(crx2rnx_ctx *ctx, int nsat, int ntype);
+static void *resize(crx2rnx_ctx *ctx, void *old, size_t size, int nrow_old, int ncol_old, int nrow, int ncol);
+static void data(crx2rnx_ctx *ctx, char *p_sat_lst, int *sattbl);
+static void put_epoch(crx2rnx_ctx *ctx, char *line, char *p_sat_lst);
+static char *project_epoch(crx2rnx_ctx *ctx, char *line, char *p_sat_lst, int *nsat);
+static void repair(char *s, char *ds);
+static int  getdiff(crx2rnx_ctx *ctx, data_format *y, const data_format *dy0, int i0, char *dflag);
+static void putfield(crx2rnx_ctx *ctx, data_format *y, char *flag);
+static char *put_digits(char *end, unsigned long v, int n);
+static void read_clock(crx2rnx_ctx *ctx, char *dline ,long *yu, long *yl);
+static void print_clock(crx2rnx_ctx *ctx, long yu, long yl, int shift_clk);
+static int  read_chk_line(crx2rnx_ctx *ctx, char *line);
+static int  select_record(crx2rnx_ctx *ctx, const char *line, int is_epoch);
+static int  epoch_time(const char *line, int rinex_version, long long *t);
+static void error_exit(crx2rnx_ctx *ctx, int error_no, char *string);
+static void no_error_exit(crx2rnx_ctx *ctx);
 
 /*---------------------------------------------------------------------*/
-int main(int argc, char *argv[]){
-    static char line[MAXCLM] = "", sat_lst_old[MAXSAT*3];
-    static int nsat1 = 0, n;
+int crx2rnx(rnx_io *io, const crx2rnx_options *options){
+/***********************************************************************/
+/*  Convert Compact RINEX read from io to RINEX and write it to io.    */
+/*  Returns the exit code of the conversion:                           */
+/*  EXIT_SUCCESS, EXIT_FAILURE, EXIT_WARNING or RNX_EXIT_IO_ERROR.     */
+/***********************************************************************/
+    crx2rnx_ctx *ctx;
+    int status;
+
+    if((ctx = calloc(1,sizeof(crx2rnx_ctx))) == NULL){
+        rnx_eprintf(io,"ERROR : memory allocation failed.\n");
+        return EXIT_FAILURE;
+    }
+    ctx->io = io;
+    ctx->skip = options->skip_strange_epochs;
+    ctx->output_overflow = options->output_overflow;
+    ctx->options = options;
+    ctx->exit_status = EXIT_SUCCESS;
+    ctx->selected = 1;
+    if(setjmp(io->env) == 0) convert(ctx);
+    status = io->exit_status;
+    rnx_proj_free(&ctx->proj);
+    free(ctx->dy1); free(ctx->dy0);
+    free(ctx->flag1); free(ctx->flag); free(ctx->dflag);
+    free(ctx->values); free(ctx->vflags);
+    free(ctx->out_buff);
+    free(ctx);
+    return status;
+}
+/*---------------------------------------------------------------------*/
+static void convert(crx2rnx_ctx *ctx){
+    char *line = ctx->line, *sat_lst_old = ctx->sat_lst_old;
+    int n;
 
-    char dline[MAXCLM],*p;
-    int sattbl[MAXSAT],i,j,*i0;
+    char dline[MAXCLM] = "",*p,*eline;
+    int sattbl[MAXSAT],i,*i0,nsat;
     size_t offset;
-    char dflag[MAXSAT][MAXTYPE*2];
+    data_format *dy;
     char *p_event,*p_nsat,*p_satlst,shift_clk;
        /* sattbl[i]: order (at the previous epoch) of i-th satellite */
        /* (at the current epoch). -1 is set for the new satellites   */
 
-    fileopen(argc,argv);
-    for(i=0;i<UCHAR_MAX;i++)ntype_gnss[i]=-1;  /** -1 unless GNSS type is defined **/
-    header();
-    if (rinex_version==2){
-        ep_top_from = '&';
-        ep_top_to   = ' ';
+    for(i=0;i<=UCHAR_MAX;i++)ctx->ntype_gnss[i]=-1;  /** -1 unless GNSS type is defined **/
+    header(ctx);
+    if (ctx->rinex_version==2){
+        ctx->ep_top_from = '&';
+        ctx->ep_top_to   = ' ';
         p_event   = &dline[28];  /** pointer to event flug **/
         p_nsat    =  &line[29];  /** pointer to n_sat **/
         p_satlst  =  &line[32];  /** pointer to address to add satellite list **/
         shift_clk = 1;
         offset=3;
     }else{
-        ep_top_from = '>';
-        ep_top_to =   '>';
+        ctx->ep_top_from = '>';
+        ctx->ep_top_to =   '>';
         p_event   = &dline[31];
         p_nsat    =  &line[32];
         p_satlst  =  &line[41];
@@ -173,201 +263,155 @@ int main(int argc, char *argv[]){
         offset=6;
     }
 
-    while( fgets(dline,MAXCLM,stdin) != NULL ){      /*** exit program successfully ***/
-        nl_count++;
+    while( rnx_gets(ctx->io,dline,MAXCLM) != NULL ){      /*** exit program successfully ***/
+        ctx->nl_count++;
         CHOP_LF(dline,p);
         SKIP:
-        if(crinex_version == 3) { /*** skip escape lines of CRINEX version 3 ***/
+        if(ctx->crinex_version == 3) { /*** skip escape lines of CRINEX version 3 ***/
             while(dline[0] == '&'){
-                nl_count++;
-                if( fgets(dline,MAXCLM,stdin) == NULL ) no_error_exit();
+                ctx->nl_count++;
+                if( rnx_gets(ctx->io,dline,MAXCLM) == NULL ) no_error_exit(ctx);
                 CHOP_LF(dline,p);
             }
         }
-        if(dline[0] == ep_top_from){
-            dline[0] = ep_top_to;
+        if(dline[0] == ctx->ep_top_from){
+            dline[0] = ctx->ep_top_to;
             if(*p_event!='0' && *p_event!='1' ){
-                if(put_event_data(dline,p_event)!=0) skip_to_next(dline);
+                if(put_event_data(ctx,dline,p_event)!=0) skip_to_next(ctx,dline);
                 goto SKIP;
             }
             line[0] = '\0';          /**** initialize arc for epoch data ***/
-            nsat1 = 0;               /**** initialize the all satellite arcs ****/
+            ctx->nsat1 = 0;          /**** initialize the all satellite arcs ****/
         }else if( dline[0] == '\032' ){
-            no_error_exit();   /** DOS EOF **/
+            no_error_exit(ctx);   /** DOS EOF **/
         }
         /****  read, repair the line  ****/
         repair(line,dline);
         p = &line[offset];  /** pointer to the space between year and month **/
-        if(line[0] != ep_top_to || strlen(line)<(26+offset) || *(p+23) != ' '
+        if(line[0] != ctx->ep_top_to || strlen(line)<(26+offset) || *(p+23) != ' '
                              || *(p+24) != ' ' || ! isdigit(*(p+25)) ) {
-            skip_to_next(dline);
+            skip_to_next(ctx,dline);
             goto SKIP;
         }
         CHOP_BLANK(line,p);
+        ctx->selected = select_record(ctx,line,1);
 
-        nsat = atoi(p_nsat);
-        if(nsat > MAXSAT) error_exit(6,p_nsat);
+        ctx->nsat = atoi(p_nsat);
+        if(ctx->nsat > MAXSAT) error_exit(ctx,6,p_nsat);
+        reserve(ctx,ctx->nsat,0);
 
-        set_sat_table(p_satlst,sat_lst_old,nsat1,sattbl); /****  set satellite table  ****/
-        if(read_chk_line(dline) != 0) {skip_to_next(dline);goto SKIP;}
-        read_clock(dline,clk1.u,clk1.l);
-        for(i=0,i0=sattbl ; i<nsat ; i++,i0++){
-            ntype = ntype_record[i];
-            if( getdiff(dy1[i],dy0[*i0],*i0,dflag[i]) != 0 ) {skip_to_next(dline);goto SKIP;}
+        set_sat_table(ctx,p_satlst,sat_lst_old,ctx->nsat1,sattbl); /****  set satellite table  ****/
+        if(read_chk_line(ctx,dline) != 0) {skip_to_next(ctx,dline);goto SKIP;}
+        read_clock(ctx,dline,ctx->clk1.u,ctx->clk1.l);
+        for(i=0,i0=sattbl ; i<ctx->nsat ; i++,i0++){
+            ctx->ntype = ctx->ntype_record[i];
+            if( getdiff(ctx,DATA_ROW(ctx,ctx->dy1,i),DATA_ROW(ctx,ctx->dy0,(*i0 < 0)? 0:*i0),*i0,
+                        FLAG_ROW(ctx,ctx->dflag,i)) != 0 ) {skip_to_next(ctx,dline);goto SKIP;}
         }
 
         /*************************************/
         /**** print the recovered line(s) ****/
         /*************************************/
-        if(dline[0] != '\0') process_clock();
-        p_buff = out_buff;
+        if(dline[0] != '\0') process_clock(ctx);
+        ctx->p_buff = ctx->out_buff;
 
-        if(rinex_version == 2){
-            if(clk_order >= 0){
-                p_buff += sprintf(p_buff,"%-68.68s",line);
-                print_clock(clk1.u[clk_order],clk1.l[clk_order],shift_clk);
+        if(!ctx->selected){
+            data(ctx,p_satlst,sattbl);   /** only keep track of the data arcs **/
+        }else if(ctx->options->epoch_fn != NULL){
+            data(ctx,p_satlst,sattbl);
+            put_epoch(ctx,line,p_satlst);
+        }else if(ctx->rinex_version == 2){
+            eline = project_epoch(ctx,line,p_satlst,&nsat);
+            if(ctx->clk_order >= 0){
+                ctx->p_buff += sprintf(ctx->p_buff,"%-68.68s",eline);
+                print_clock(ctx,ctx->clk1.u[ctx->clk_order],ctx->clk1.l[ctx->clk_order],shift_clk);
             }else{
-                p_buff += sprintf(p_buff,"%.68s\n",line);
+                ctx->p_buff += sprintf(ctx->p_buff,"%.68s\n",eline);
             }
-            for(p = &line[68],n=nsat-12; n>0; n-=12,p+=36) p_buff += sprintf(p_buff,"%32.s%.36s\n"," ",p);
+            for(p = &eline[68],n=nsat-12; n>0; n-=12,p+=36) ctx->p_buff += sprintf(ctx->p_buff,"%32.s%.36s\n"," ",p);
         }else{
-            if(clk_order >= 0){
-                p_buff += sprintf(p_buff,"%.41s",line);
-                print_clock(clk1.u[clk_order],clk1.l[clk_order],shift_clk);
+            eline = project_epoch(ctx,line,p_satlst,&nsat);
+            if(ctx->clk_order >= 0){
+                ctx->p_buff += sprintf(ctx->p_buff,"%-41.41s",eline);
+                print_clock(ctx,ctx->clk1.u[ctx->clk_order],ctx->clk1.l[ctx->clk_order],shift_clk);
             }else{
-                sprintf(p_buff,"%.41s",line);
-                CHOP_BLANK(p_buff,p);*p++ = '\n';p_buff=p;
+                sprintf(ctx->p_buff,"%.41s",eline);
+                CHOP_BLANK(ctx->p_buff,p);*p++ = '\n';ctx->p_buff=p;
             }
         }
-
-        data(p_satlst,sattbl,dflag);
-
-        *p_buff = '\0'; printf("%s",out_buff);
+        if(ctx->selected && ctx->options->epoch_fn == NULL){
+            data(ctx,p_satlst,sattbl);
+            *ctx->p_buff = '\0'; rnx_puts(ctx->io,ctx->out_buff);
+        }
         /****************************/
         /**** save current epoch ****/
         /****************************/
-        nsat1 = nsat;
-        clk0 = clk1;
-        strncpy(sat_lst_old,p_satlst,nsat*C3);
-        for(i=0;i<nsat;i++){
-            strncpy(flag1[i],flag[i],ntype_record[i]*C2);
-            for(j=0;j<ntype_record[i];j++) dy0[i][j] = dy1[i][j];
+        ctx->nsat1 = ctx->nsat;
+        ctx->clk0 = ctx->clk1;
+        strncpy(sat_lst_old,p_satlst,ctx->nsat*C3);
+        for(i=0;i<ctx->nsat;i++){
+            strncpy(FLAG_ROW(ctx,ctx->flag1,i),FLAG_ROW(ctx,ctx->flag,i),ctx->ntype_record[i]*C2);
         }
+        dy = ctx->dy0; ctx->dy0 = ctx->dy1; ctx->dy1 = dy;   /** the data of dy1 are all set at the next epoch **/
     }
-    no_error_exit();
+    no_error_exit(ctx);
 }
 /*---------------------------------------------------------------------*/
-void fileopen(int argc, char *argv[]){
-    char *p,outfile[MAXCLM],*progname;
-    int force = 0, help = 0;
-    int nfout = 0;  /*** =0 default output file name ***/
-                    /*** =1 standard output          ***/
-    FILE *ifp;
-
-    progname = argv[0];
-    argc--;argv++;
-    for(;argc>0;argc--,argv++){
-        if((*argv)[0] != '-'){
-            strncpy(infile,*argv,C1*MAXCLM);
-            n_infile++;
-        }else if(strcmp(*argv,"-")   == 0){
-            nfout = 1;
-        }else if(strcmp(*argv,"-f")  == 0){
-            force = 1;
-        }else if(strcmp(*argv,"-d")  == 0){
-            delete_if_no_error = 1;    /* delete the original file if
-                                          no error in the conversion */
-        }else if(strcmp(*argv,"-s")  == 0){
-            skip  = 1;
-        }else if(strcmp(*argv,"--output_overflow")  == 0){
-            /* output the data without stopping with an error even if  */
-            /* digits of an output data exceed the limit of the format */
-            /* (a hidden option for checking)                          */
-            output_overflow = 1;
-        }else if(strcmp(*argv,"-h")  == 0){
-            help = 1;
-        }else{
-            help = 1;
-        }
-    }
-
-    if(strlen(infile) == MAXCLM)error_exit(14,infile);
-    if(help == 1 || n_infile > 1  || n_infile < 0) error_exit(1,progname);
-    if(n_infile == 0) return;  /*** stdin & stdout will be used if input file name is not given ***/
-
-    /***********************/
-    /*** open input file ***/
-    /***********************/
-    p = strrchr(infile,'.');
-    if(p == NULL || *(p+4) != '\0' 
-                 || ( toupper(*(p+3)) != 'D'
-                      && strcmp(p+1,"CRX") != 0
-                      && strcmp(p+1,"crx") != 0 )
-    ) error_exit(3,p);
-
-    if((ifp = fopen(infile,"r")) == NULL) error_exit(4,infile);
-
-    /************************/
-    /*** open output file ***/
-    /************************/
-    if(nfout == 0) {
-        strcpy(outfile,infile);
-        p = strrchr(outfile,'.');
-        if     (*(p+3) == 'd') { *(p+3) = 'o';}
-        else if(*(p+3) == 'D') { *(p+3) = 'O';}
-        else if( strcmp(p+1,"crx") == 0) { strcpy((p+1),"rnx");}
-        else if( strcmp(p+1,"CRX") == 0) { strcpy((p+1),"RNX");}
-        
-        if((freopen(outfile,"r",stdout)) != NULL && force == 0){
-            fprintf(stderr,"The file %s already exists. Overwrite?(n)",outfile);
-            if(getchar() != 'y') exit(EXIT_SUCCESS);
-        }
-        freopen(outfile,"w",stdout);
-    }
-    fclose(ifp);
-    freopen(infile,"r",stdin);
-}
-/*---------------------------------------------------------------------*/
-void header(void){
-    char line[MAXCLM],*p;
-    if( read_chk_line(line) == 1 ) error_exit(5,"1.0-2.0");
-    crinex_version = atoi(line);
+static void header(crx2rnx_ctx *ctx){
+    char line[MAXCLM] = "",*p;
+    if( read_chk_line(ctx,line) == 1 ) error_exit(ctx,5,"1.0-2.0");
+    ctx->crinex_version = atoi(line);
     if( (strncmp(&line[0],"1.0",C3) != 0 && strncmp(&line[0],"3.0",C3) != 0) ||
-         strncmp(&line[60],"CRINEX VERS   / TYPE",C1*19) != 0 ) error_exit(5,"1.0-2.0");
-    if( read_chk_line(line) == 1 ) error_exit(8,line);
+         strncmp(&line[60],"CRINEX VERS   / TYPE",C1*19) != 0 ) error_exit(ctx,5,"1.0-2.0");
+    if( read_chk_line(ctx,line) == 1 ) error_exit(ctx,8,line);
 
-    if( read_chk_line(line) == 1 ) error_exit(8,line);
+    if( read_chk_line(ctx,line) == 1 ) error_exit(ctx,8,line);
     CHOP_BLANK(line,p);
-    printf("%s\n",line);
+    rnx_printf(ctx->io,"%s\n",line);
     if(strncmp(&line[60],"RINEX VERSION / TYPE",C1*20) != 0 ||
-       (line[5]!='2' && line[5]!='3' && line[5]!='4' ) ) error_exit(15,"2.x, 3.x  or 4.x");
-    rinex_version=atoi(line);
+       (line[5]!='2' && line[5]!='3' && line[5]!='4' ) ) error_exit(ctx,15,"2.x, 3.x  or 4.x");
+    ctx->rinex_version=atoi(line);
+    if(rnx_proj_init(&ctx->proj,&ctx->options->projection,ctx->rinex_version) != 0) error_exit(ctx,21,"memory allocation failed");
 
     do {
-        read_chk_line(line);
+        read_chk_line(ctx,line);
         CHOP_BLANK(line,p);
-        printf("%s\n",line);
+        put_header_line(ctx,line);
         if       (strncmp(&line[60],"# / TYPES OF OBSERV",C1*19) == 0 && line[5] != ' '){
-             ntype = atoi(line);                                        /** for RINEX2 **/
+             ctx->ntype = atoi(line);                                        /** for RINEX2 **/
+             if (ctx->ntype > MAXTYPE) error_exit(ctx,16,line);
+             reserve(ctx,0,ctx->ntype);
         } else if(strncmp(&line[60],"SYS / # / OBS TYPES",C1*19) == 0){ /** for RINEX3  **/
-             if (line[0] != ' ') ntype_gnss[(unsigned int)line[0]] = atoi(&line[3]);
-             if (ntype_gnss[(unsigned int)line[0]] > MAXTYPE) error_exit(16,line);
+             if (line[0] != ' ') ctx->ntype_gnss[(unsigned char)line[0]] = atoi(&line[3]);
+             if (ctx->ntype_gnss[(unsigned char)line[0]] > MAXTYPE) error_exit(ctx,16,line);
+             reserve(ctx,0,ctx->ntype_gnss[(unsigned char)line[0]]);
         }
     }while(strncmp(&line[60],"END OF HEADER",C1*13) != 0);
 }
 /*---------------------------------------------------------------------*/
-void read_clock(char *dline, long *yu, long *yl){
+static void put_header_line(crx2rnx_ctx *ctx, char *line){
+/***********************************************************************/
+/*  Output a header line, or its replacement if the data is projected. */
+/***********************************************************************/
+    switch(rnx_proj_header(&ctx->proj,line)){
+        case 0 : rnx_printf(ctx->io,"%s\n",line); break;
+        case 1 : rnx_puts(ctx->io,ctx->proj.out); break;
+        default: error_exit(ctx,21,ctx->proj.out);
+    }
+}
+/*---------------------------------------------------------------------*/
+static void read_clock(crx2rnx_ctx *ctx, char *dline, long *yu, long *yl){
     char *p,*s,*p1;
 
     p = dline;
 
     if(*p == '\0'){
-        clk_order = -1;
+        ctx->clk_order = -1;
     }else{
         if(*(p+1) == '&') {        /**** for the case of arc initialization ****/
-            sscanf(p,"%d&",&clk_arc_order);
-            if(clk_arc_order > MAX_DIFF_ORDER) error_exit(7,dline);
-            clk_order = -1;
+            sscanf(p,"%d&",&ctx->clk_arc_order);
+            if(ctx->clk_arc_order > MAX_DIFF_ORDER) error_exit(ctx,7,dline);
+            ctx->clk_order = -1;
             p += 2;
         }
         p1 = p; if(*p == '-') p1++;
@@ -385,109 +429,118 @@ void read_clock(char *dline, long *yu, long *yl){
     }
 }
 /*---------------------------------------------------------------------*/
-void process_clock(void){
+static void process_clock(crx2rnx_ctx *ctx){
     int i,j;
+    clock_format *clk1 = &ctx->clk1, *clk0 = &ctx->clk0;
     /****************************************/
     /**** recover the clock offset value ****/
     /****************************************/
-    if(clk_order < clk_arc_order){
-        clk_order++;
-        for(i=0,j=1 ; i<clk_order ; i++,j++){
-            clk1.u[j] = clk1.u[i]+clk0.u[i];
-            clk1.l[j] = clk1.l[i]+clk0.l[i];
-            clk1.u[j] += clk1.l[j]/100000000;  /*** to avoid overflow of dy1.l ***/
-            clk1.l[j] %= 100000000;
+    if(ctx->clk_order < ctx->clk_arc_order){
+        ctx->clk_order++;
+        for(i=0,j=1 ; i<ctx->clk_order ; i++,j++){
+            clk1->u[j] = clk1->u[i]+clk0->u[i];
+            clk1->l[j] = clk1->l[i]+clk0->l[i];
+            clk1->u[j] += clk1->l[j]/100000000;  /*** to avoid overflow of dy1.l ***/
+            clk1->l[j] %= 100000000;
         }
     }else{
-        for(i=0,j=1 ; i<clk_order ; i++,j++){
-            clk1.u[j] = clk1.u[i]+clk0.u[j];
-            clk1.l[j] = clk1.l[i]+clk0.l[j];
-            clk1.u[j] += clk1.l[j]/100000000;
-            clk1.l[j] %= 100000000;
+        for(i=0,j=1 ; i<ctx->clk_order ; i++,j++){
+            clk1->u[j] = clk1->u[i]+clk0->u[j];
+            clk1->l[j] = clk1->l[i]+clk0->l[j];
+            clk1->u[j] += clk1->l[j]/100000000;
+            clk1->l[j] %= 100000000;
         }
     }
     /* Signs of py1->u and py1->l can be different at this stage */
     /*   and will be adjustied before outputting */
 }
 /*---------------------------------------------------------------------*/
-int  put_event_data(char *dline, char *p_event){
+static int  put_event_data(crx2rnx_ctx *ctx, char *dline, char *p_event){
 /***********************************************************************/
 /*  - Put event data for one event.                                    */
 /*  - This function is called when the event flag > 1.                 */
 /***********************************************************************/
-    int i,n;
+    int i,n,selected;
     char *p;
     do {
-        dline[0] = ep_top_to;
+        dline[0] = ctx->ep_top_to;
         CHOP_BLANK(dline,p);
-        printf("%s\n",dline);
+        selected = select_record(ctx,dline,0);
+        if(selected) rnx_printf(ctx->io,"%s\n",dline);
         if( strlen(dline) > 29 ){
             n = atoi((p_event+1));
             for(i=0;i<n;i++){
-                read_chk_line(dline);
+                read_chk_line(ctx,dline);
                 CHOP_BLANK(dline,p);
-                printf("%s\n",dline);
+                if(selected) rnx_printf(ctx->io,"%s\n",dline);
+                if(ctx->proj.active && (strncmp(&dline[60],"# / TYPES OF OBSERV",C1*19) == 0
+                                        || strncmp(&dline[60],"SYS / # / OBS TYPES",C1*19) == 0) ){
+                     error_exit(ctx,21,"the observation types redefined in an event record can not be projected");
+                }
                 if       (strncmp(&dline[60],"# / TYPES OF OBSERV",C1*19) == 0 && dline[5] != ' ' ){
-                     ntype = atoi(dline);                                        /** for RINEX2 **/
+                     ctx->ntype = atoi(dline);                                        /** for RINEX2 **/
+                     if (ctx->ntype > MAXTYPE) error_exit(ctx,16,dline);
+                     reserve(ctx,0,ctx->ntype);
                 } else if(strncmp(&dline[60],"SYS / # / OBS TYPES",C1*19) == 0){ /** for RINEX3 **/
-                     if (dline[0] != ' ') ntype_gnss[(unsigned int)dline[0]]=atoi(&dline[3]);
-                     if (ntype_gnss[(unsigned int)dline[0]] > MAXTYPE) error_exit(16,dline);
+                     if (dline[0] != ' ') ctx->ntype_gnss[(unsigned char)dline[0]]=atoi(&dline[3]);
+                     if (ctx->ntype_gnss[(unsigned char)dline[0]] > MAXTYPE) error_exit(ctx,16,dline);
+                     reserve(ctx,0,ctx->ntype_gnss[(unsigned char)dline[0]]);
                 }
             }
         }
 
         do {
-            nl_count++;
-            if(fgets(dline,MAXCLM,stdin) == NULL) exit(exit_status);  /*** eof: exit program successfully ***/
-        } while (crinex_version >= 3 && dline[0] == '&');
+            ctx->nl_count++;
+            if(rnx_gets(ctx->io,dline,MAXCLM) == NULL) no_error_exit(ctx);  /*** eof: exit program successfully ***/
+        } while (ctx->crinex_version >= 3 && dline[0] == '&');
         CHOP_LF(dline,p);
 
-        if(dline[0] != ep_top_from || strlen(dline)<29   || ! isdigit(*p_event) ) {
-            if( ! skip ) error_exit(9,dline);
-            fprintf(stderr,"WARNING :  The epoch should be initialized, but not.\n");
+        if(dline[0] != ctx->ep_top_from || strlen(dline)<29   || ! isdigit(*p_event) ) {
+            if( ! ctx->skip ) error_exit(ctx,9,dline);
+            rnx_eprintf(ctx->io,"WARNING :  The epoch should be initialized, but not.\n");
             return 1;
         }
     }while(*p_event != '0' && *p_event != '1');
     return 0;
 }
 /*---------------------------------------------------------------------*/
-void skip_to_next(char *dline){
+static void skip_to_next(crx2rnx_ctx *ctx, char *dline){
     char *p;
-    exit_status=EXIT_WARNING;
-    fprintf(stderr,"    line %ld : skip until an initialized epoch is found.",nl_count);
-    if(rinex_version == 2) {
+    ctx->exit_status=EXIT_WARNING;
+    rnx_eprintf(ctx->io,"    line %ld : skip until an initialized epoch is found.",ctx->nl_count);
+    if(ctx->rinex_version == 2) {
         p = dline+3;    /** pointer to the space between year and month **/
     }else{
         p = dline+6;
     }
 
     do {
-        nl_count++;
-        if(fgets(dline,MAXCLM,stdin) == NULL) {
-            fprintf(stderr,"  .....next epoch not found before EOF.\n");
-            if(rinex_version == 2) {
-                printf("%29d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
+        ctx->nl_count++;
+        if(rnx_gets(ctx->io,dline,MAXCLM) == NULL) {
+            rnx_eprintf(ctx->io,"  .....next epoch not found before EOF.\n");
+            if(ctx->rinex_version == 2) {
+                rnx_printf(ctx->io,"%29d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
             }else{
-                printf(">%31d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
+                rnx_printf(ctx->io,">%31d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
             }
-            exit(exit_status);
+            rnx_exit(ctx->io,ctx->exit_status);
         }
-    }while(dline[0] != ep_top_from || strlen(dline) < 29   || *p != ' ' 
+    }while(dline[0] != ctx->ep_top_from || strlen(dline) < 29   || *p != ' ' 
               || *(p+3)  != ' ' || *(p+6)  != ' ' || *(p+9)  != ' ' 
               || *(p+12) != ' ' || *(p+23) != ' ' || *(p+24) != ' ' 
               || ! isdigit(*(p+25)) );
 
     CHOP_LF(dline,p);
-    fprintf(stderr,"  .....next epoch found at line %ld.\n",nl_count);
-    if(rinex_version == 2) {
-        printf("%29d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
+    rnx_eprintf(ctx->io,"  .....next epoch found at line %ld.\n",ctx->nl_count);
+    if(ctx->rinex_version == 2) {
+        rnx_printf(ctx->io,"%29d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
     }else{
-        printf(">%31d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
+        rnx_printf(ctx->io,">%31d%3d\n%-60sCOMMENT\n",4,1,"  *** Some epochs are skipped by CRX2RNX ***");
     }
 
 }
 /*---------------------------------------------------------------------*/
-void set_sat_table(char *p_new, char *p_old, int nsat1, int *sattbl){
+static void set_sat_table(crx2rnx_ctx *ctx, char *p_new, char *p_old, int nsat1, int *sattbl){
 /***********************************************************************/
 /*  - Read number of satellites (nsat)                                 */
 /*  - Compare the satellite list at the epoch (*p_new) and that at the */
@@ -499,15 +552,15 @@ void set_sat_table(char *p_new, char *p_old, int nsat1, int *sattbl){
     char *ps;
 
     /*** set # of data types for each satellite ***/
-    if(rinex_version == 2 ) {             /** for RINEX2 **/
-        for (i=0 ; i<nsat ; i++){ ntype_record[i]=ntype; }
+    if(ctx->rinex_version == 2 ) {             /** for RINEX2 **/
+        for (i=0 ; i<ctx->nsat ; i++){ ctx->ntype_record[i]=ctx->ntype; }
     }else{                                /** for RINEX3 **/
-        for (i=0,ps=p_new ; i<nsat ; i++,ps+=3){
-            ntype_record[i] = ntype_gnss[(unsigned int)*ps];  /*** # of data type for the GNSS system ***/
-            if(ntype_record[i]<0)error_exit(20,p_new);
+        for (i=0,ps=p_new ; i<ctx->nsat ; i++,ps+=3){
+            ctx->ntype_record[i] = ctx->ntype_gnss[(unsigned char)*ps];  /*** # of data type for the GNSS system ***/
+            if(ctx->ntype_record[i]<0)error_exit(ctx,20,p_new);
         }
     }
-    for (i=0; i<nsat ; i++,p_new+=3){
+    for (i=0; i<ctx->nsat ; i++,p_new+=3){
         *sattbl = -1;
         for(j=0,ps=p_old ; j<nsat1 ; j++,ps+=3){
             if(strncmp(p_new,ps,C3) == 0){
@@ -519,7 +572,52 @@ void set_sat_table(char *p_new, char *p_old, int nsat1, int *sattbl){
     }
 }
 /*---------------------------------------------------------------------*/
-void data(char *p_sat_lst, int *sattbl, char dflag[][MAXTYPE*2]){
+static void reserve(crx2rnx_ctx *ctx, int nsat, int ntype){
+/***********************************************************************/
+/*  Grow the arrays kept per satellite and data type to hold at least  */
+/*  nsat satellites and ntype data types, keeping their contents.      */
+/*  The number of satellites is doubled to grow only a few times.      */
+/***********************************************************************/
+    int max_sat = ctx->max_sat, max_type = ctx->max_type;
+    size_t size, used = (ctx->out_buff == NULL)? 0:(size_t)(ctx->p_buff - ctx->out_buff);
+    char *p;
+
+    if(nsat > max_sat) max_sat = (nsat > 2*max_sat || 2*max_sat > MAXSAT)? nsat:2*max_sat;
+    if(ntype > max_type) max_type = ntype;
+    if(max_sat == ctx->max_sat && max_type == ctx->max_type) return;
+
+    ctx->dy1    = resize(ctx,ctx->dy1,   sizeof(data_format),ctx->max_sat,ctx->max_type,max_sat,max_type);
+    ctx->dy0    = resize(ctx,ctx->dy0,   sizeof(data_format),ctx->max_sat,ctx->max_type,max_sat,max_type);
+    ctx->flag1  = resize(ctx,ctx->flag1, C1,ctx->max_sat,2*ctx->max_type+1,max_sat,2*max_type+1);
+    ctx->flag   = resize(ctx,ctx->flag,  C1,ctx->max_sat,2*ctx->max_type+1,max_sat,2*max_type+1);
+    ctx->dflag  = resize(ctx,ctx->dflag, C1,0,0,max_sat,2*max_type+1);
+    ctx->values = resize(ctx,ctx->values,sizeof(long long),0,0,max_sat,max_type);
+    ctx->vflags = resize(ctx,ctx->vflags,C1,0,0,max_sat,2*max_type);
+
+    /*** epoch line(s), clock offset and the data lines of all satellites ***/
+    size = (size_t)max_sat*(max_type*MAX_FIELD+8) + 2*MAXCLM;
+    if((p = realloc(ctx->out_buff,size)) == NULL) error_exit(ctx,21,"memory allocation failed");
+    ctx->out_buff = p;
+    ctx->p_buff = p + used;
+    ctx->max_sat = max_sat;
+    ctx->max_type = max_type;
+}
+/*---------------------------------------------------------------------*/
+static void *resize(crx2rnx_ctx *ctx, void *old, size_t size, int nrow_old, int ncol_old, int nrow, int ncol){
+/***********************************************************************/
+/*  Reallocate an array of nrow_old x ncol_old elements of size bytes  */
+/*  as nrow x ncol elements, copying the rows and clearing the rest.   */
+/***********************************************************************/
+    char *p;
+    int i;
+
+    if((p = calloc((size_t)nrow*ncol+1,size)) == NULL) error_exit(ctx,21,"memory allocation failed");
+    for(i=0;i<nrow_old && i<nrow;i++) memcpy(p+(size_t)i*ncol*size,(char *)old+(size_t)i*ncol_old*size,(size_t)ncol_old*size);
+    free(old);
+    return p;
+}
+/*---------------------------------------------------------------------*/
+static void data(crx2rnx_ctx *ctx, char *p_sat_lst, int *sattbl){
 /********************************************************************/
 /*  Functions                                                       */
 /*      (1) compose the original data from 3rd order difference     */
@@ -532,36 +630,48 @@ void data(char *p_sat_lst, int *sattbl, char dflag[][MAXTYPE*2]){
 /*   date of previous epoch are set to dy0                           */
 /********************************************************************/
     data_format *py1,*py0;
-    int  i,j,k,k1,*i0;
-    char *p;
+    int  i,j,k,k1,*i0,ntype,nkeep,nput,put_sat,put;
+    char *p,*flag,*dflag;
+    const char *keep;
+    int  decode_only = ctx->options->epoch_fn != NULL || !ctx->selected;
+    long long *value = ctx->values;
+    char *vflag = ctx->vflags;
 
-    for(i=0,i0=sattbl,p=p_sat_lst ; i<nsat ; i++,i0++,p+=3){
+    for(i=0,i0=sattbl,p=p_sat_lst ; i<ctx->nsat ; i++,i0++,p+=3){
         /**** set # of data types for the GNSS type    ****/
         /**** and write satellite ID in case of RINEX3 ****/
         /**** ---------------------------------------- ****/
-        if(rinex_version >= 3 ){
-            ntype = ntype_record[i];
-            strncpy(p_buff,p,C3);
-            p_buff += 3;
+        put_sat = !decode_only && (!ctx->proj.active || ctx->sat_out[i]);
+        if(ctx->rinex_version >= 3 ){
+            ctx->ntype = ctx->ntype_record[i];
+            if(put_sat){
+                strncpy(ctx->p_buff,p,C3);
+                ctx->p_buff += 3;
+            }
         }
+        ntype = ctx->ntype;
+        if((nkeep = rnx_proj_types(&ctx->proj,*p,&keep)) < 0) nkeep = ntype;
+        flag = FLAG_ROW(ctx,ctx->flag,i);
+        dflag = FLAG_ROW(ctx,ctx->dflag,i);
         /**** repair the data flags ****/
         /**** ----------------------****/
         if(*i0 < 0){       /* new satellite */
-            if(rinex_version >= 3 ){
-                *flag[i] = '\0';
+            if(ctx->rinex_version >= 3 ){
+                *flag = '\0';
             }else{
-                sprintf(flag[i],"%-*s",ntype*2,dflag[i]);
+                sprintf(flag,"%-*s",ntype*2,dflag);
             }
         }else{
-            strncpy(flag[i],flag1[*i0],ntype*C2);
+            strncpy(flag,FLAG_ROW(ctx,ctx->flag1,*i0),ntype*C2);
         }
-        repair(flag[i],dflag[i]);
+        repair(flag,dflag);
 
         /**** recover the date, and output ****/
         /**** ---------------------------- ****/
-        for(j=0,py1=dy1[i] ; j<ntype ; j++,py1++){
+        for(j=0,nput=0,py1=DATA_ROW(ctx,ctx->dy1,i) ; j<ntype ; j++,py1++){
+            put = put_sat && (keep == NULL || keep[j]);
             if(py1->arc_order >= 0){
-                py0 = &(dy0[*i0][j]);
+                py0 = DATA_ROW(ctx,ctx->dy0,*i0) + j;
                 if(py1->order < py1->arc_order){
                     (py1->order)++;
                     for(k=0,k1=1; k<py1->order; k++,k1++){
@@ -580,24 +690,96 @@ void data(char *p_sat_lst, int *sattbl, char dflag[][MAXTYPE*2]){
                 }
                 /* Signs of py1->u and py1->l can be different at this stage */
                 /*   and will be adjusted before outputting                 */
-                putfield(py1,&flag[i][j*2]);
+                if(decode_only){
+                    *value++ = (long long)py1->u[py1->order]*100000 + py1->l[py1->order];
+                    *vflag++ = flag[j*2];
+                    *vflag++ = flag[j*2+1];
+                    continue;
+                }
+                if(!put) continue;
+                putfield(ctx,py1,&flag[j*2]);
             }else{
-                if (crinex_version == 1 ) {                       /*** CRINEX 1 assumes that flags are always ***/
-                    p_buff += sprintf(p_buff,"                "); /*** blank if data field is blank           ***/
-                    flag[i][j*2] = flag[i][j*2+1] = ' ';
-                }else{                                            /*** CRINEX 3 evaluate flags independently **/
-                    p_buff += sprintf(p_buff,"              %c%c",flag[i][j*2],flag[i][j*2+1]);
+                if (ctx->crinex_version == 1 ) {                            /*** CRINEX 1 assumes that flags are always ***/
+                    if(put){ memset(ctx->p_buff,' ',16); ctx->p_buff += 16; }  /*** blank if data field is blank ***/
+                    flag[j*2] = flag[j*2+1] = ' ';
+                }else if(put){                                         /*** CRINEX 3 evaluate flags independently **/
+                    memset(ctx->p_buff,' ',14);
+                    ctx->p_buff[14] = flag[j*2];
+                    ctx->p_buff[15] = flag[j*2+1];
+                    ctx->p_buff += 16;
+                }
+                if(decode_only){
+                    *value++ = RNX_MISSING_VALUE;
+                    *vflag++ = flag[j*2];
+                    *vflag++ = flag[j*2+1];
+                    continue;
                 }
+                if(!put) continue;
             }
-            if((j+1) == ntype || (rinex_version==2 && (j+1)%5 == 0 ) ){
-                while(*--p_buff == ' '){}; p_buff++;  /*** cut spaces ***/
-                *p_buff++ = '\n';
+            if(++nput == nkeep || (ctx->rinex_version==2 && nput%5 == 0 ) ){
+                while(*--ctx->p_buff == ' '){}; ctx->p_buff++;  /*** cut spaces ***/
+                *ctx->p_buff++ = '\n';
             }
         }
     }
 }
 /*---------------------------------------------------------------------*/
-void repair(char *s, char *ds){
+static char *project_epoch(crx2rnx_ctx *ctx, char *line, char *p_sat_lst, int *nsat){
+/***********************************************************************/
+/*  Decide which satellites of the epoch are output and return the     */
+/*  epoch line with the number of them and, for RINEX 2, their list.   */
+/***********************************************************************/
+    char *p,*q,num[4];
+    int i;
+
+    *nsat = ctx->nsat;
+    if(!ctx->proj.active) return line;
+    for(i=0,*nsat=0,p=p_sat_lst ; i<ctx->nsat ; i++,p+=3){
+        ctx->sat_out[i] = rnx_proj_sat(&ctx->proj,p);
+        *nsat += ctx->sat_out[i];
+    }
+    if(*nsat == ctx->nsat) return line;
+    if(ctx->rinex_version == 2){
+        q = ctx->proj_line + sprintf(ctx->proj_line,"%-29.29s%3d",line,*nsat);
+        for(i=0,p=p_sat_lst ; i<ctx->nsat ; i++,p+=3){
+            if(ctx->sat_out[i]){ strncpy(q,p,C3); q += 3; }
+        }
+        *q = '\0';
+    }else{
+        sprintf(ctx->proj_line,"%-35.41s",line);
+        sprintf(num,"%3d",*nsat);
+        strncpy(ctx->proj_line+32,num,C3);
+    }
+    return ctx->proj_line;
+}
+/*---------------------------------------------------------------------*/
+static void put_epoch(crx2rnx_ctx *ctx, char *line, char *p_sat_lst){
+/***********************************************************************/
+/*  Pass the decoded epoch to the epoch callback of the options.       */
+/***********************************************************************/
+    crx2rnx_epoch epoch;
+    char *p;
+    int i,n;
+
+    /* the flags beyond the end of the flag strings are NUL */
+    for(i=0,n=0; i<ctx->nsat; i++) n += ctx->ntype_record[i];
+    for(p=ctx->vflags; p<ctx->vflags+2*n; p++){
+        if(*p == '\0') *p = ' ';
+    }
+    epoch.line = line;
+    epoch.rinex_version = ctx->rinex_version;
+    epoch.nsat = ctx->nsat;
+    epoch.sat_list = p_sat_lst;
+    epoch.ntype = ctx->ntype_record;
+    epoch.values = ctx->values;
+    epoch.flags = ctx->vflags;
+    epoch.has_clock = ctx->clk_order >= 0;
+    epoch.clock = epoch.has_clock ? (long long)ctx->clk1.u[ctx->clk_order]*100000000 + ctx->clk1.l[ctx->clk_order] : 0;
+    if(rnx_flush(ctx->io) != 0
+       || ctx->options->epoch_fn(ctx->options->epoch_opaque,&epoch) != 0) rnx_exit(ctx->io,RNX_EXIT_IO_ERROR);
+}
+/*---------------------------------------------------------------------*/
+static void repair(char *s, char *ds){
     for(; *s != '\0' && *ds != '\0' ; ds++,s++){
         if(*ds == ' ')continue;
         if(*ds == '&')
@@ -613,15 +795,16 @@ void repair(char *s, char *ds){
     }
 }
 /*---------------------------------------------------------------------*/
-int  getdiff(data_format *y, data_format *dy0, int i0, char *dflag){
+static int  getdiff(crx2rnx_ctx *ctx, data_format *y, const data_format *dy0, int i0, char *dflag){
     int j,length;
     char *s,*s1,*s2,line[MAXCLM];
 
+    *line = '\0';   /* nothing to show in the error message at EOF */
     /******************************************/
     /****  separate the fields with '\0'   ****/
     /******************************************/
-    if(read_chk_line(line)!=0) return 1;
-    for(j=0,s=line; j<ntype; s++){
+    if(read_chk_line(ctx,line)!=0) return 1;
+    for(j=0,s=line; j<ctx->ntype; s++){
         if(*s == '\0') {
             j++;
             *(s+1) = '\0';
@@ -630,13 +813,14 @@ int  getdiff(data_format *y, data_format *dy0, int i0, char *dflag){
             *s = '\0';
         }
     }
-    strcpy(dflag,s);
+    strncpy(dflag,s,2*ctx->max_type);   /** the flags beyond the data types are not used **/
+    dflag[2*ctx->max_type] = '\0';
 
     /************************************/
     /*     read the differenced data    */
     /************************************/
     s1 = line;
-    for(j=0;j<ntype;j++,y++,dy0++){
+    for(j=0;j<ctx->ntype;j++,y++,dy0++){
         if(*s1 == '\0'){
             y->arc_order = -1;      /**** arc_order < 0 means that the field is blank ****/
             y->order = -1;
@@ -646,14 +830,14 @@ int  getdiff(data_format *y, data_format *dy0, int i0, char *dflag){
                 y->order = -1;
                 y->arc_order = atoi(s1);
                 s1 += 2;
-                if(y->arc_order > MAX_DIFF_ORDER) error_exit(7,line);
+                if(y->arc_order > MAX_DIFF_ORDER) error_exit(ctx,7,line);
             }else if(i0 < 0){
-                if( ! skip ) error_exit(11,line);
-                fprintf(stderr,"WARNING : New satellite, but data arc is not initialized.\n");
+                if( ! ctx->skip ) error_exit(ctx,11,line);
+                rnx_eprintf(ctx->io,"WARNING : New satellite, but data arc is not initialized.\n");
                 return 1;
             }else if(dy0->arc_order < 0){
-                if( ! skip ) error_exit(12,line);
-                fprintf(stderr,"WARNING : New data sequence but without initialization.\n");
+                if( ! ctx->skip ) error_exit(ctx,12,line);
+                rnx_eprintf(ctx->io,"WARNING : New data sequence but without initialization.\n");
                 return 1;
             }else{
                 y->order = dy0->order;
@@ -663,10 +847,10 @@ int  getdiff(data_format *y, data_format *dy0, int i0, char *dflag){
             if(*s1 == '-') length--;
             if(length < 6){ 
                 y->u[0] = 0;
-                y->l[0] = atol(s1);
+                y->l[0] = atoi(s1);
             }else{
                 s = s2-5;
-                y->l[0] = atol(s); *s = '\0';
+                y->l[0] = atoi(s); *s = '\0';
                 y->u[0] = atol(s1);
                 if(y->u[0] < 0) y->l[0] = -y->l[0];
             }
@@ -676,8 +860,15 @@ int  getdiff(data_format *y, data_format *dy0, int i0, char *dflag){
     return 0;
 }
 /*---------------------------------------------------------------------*/
-void putfield(data_format *y, char *flag){
-    int  i;
+static void putfield(crx2rnx_ctx *ctx, data_format *y, char *flag){
+/***********************************************************************/
+/*  Output a data field as F14.3 followed by the two flags.            */
+/*  The digits are written two at a time from a table; sprintf is only */
+/*  used for values out of the range of the format.                    */
+/***********************************************************************/
+    int  i,l,h,f;
+    long u;
+    char *p_buff = ctx->p_buff,*p;
 
     i = y->order;
 
@@ -687,38 +878,75 @@ void putfield(data_format *y, char *flag){
         y->u[i]-- ; y->l[i] += 100000 ;
     }
     /* The signs of y->u and y->l are the same (or zero) at this stage */
+    u = y->u[i];
+    l = y->l[i];
 
-    if(y->u[i]!=0){                                    /* ex) 123.456  -123.456 */
-       p_buff += sprintf(p_buff,"%8ld %5.5ld%c%c",y->u[i],labs(y->l[i]),*flag,*(flag+1));
+    if( u > 99999999 || u < -9999999 ){                /* wider than F14.3 */
+       p_buff += sprintf(p_buff,"%8ld %5.5d%c%c",u,abs(l),*flag,*(flag+1));
        p_buff[-8] = p_buff[-7];
        p_buff[-7] = p_buff[-6];
-       if( y->u[i] > 99999999 || y->u[i] < -9999999 ){
-          if( output_overflow ) {
-             fprintf(stderr,"Warning: line %ld. : Data record becomes out of range allowed in the RINEX format. The output is corrupted.\n",nl_count);
-             exit_status=EXIT_WARNING;
-          }else{
-             error_exit(17,"Data record");
-          }
+       p_buff[-6] = '.';
+       ctx->p_buff = p_buff;
+       if( ctx->output_overflow ) {
+          rnx_eprintf(ctx->io,"Warning: line %ld. : Data record becomes out of range allowed in the RINEX format. The output is corrupted.\n",ctx->nl_count);
+          ctx->exit_status=EXIT_WARNING;
+       }else{
+          error_exit(ctx,17,"Data record");
        }
+       return;
+    }
+
+    /*** u : upper 8 digits of the integer part, h : lower 2 digits of the integer part, ***/
+    /*** f : fractional part. The integer part is left out if it is 0, ex) -.123      ***/
+    h = abs(l)/1000;
+    f = abs(l)%1000;
+    memset(p_buff,' ',10);
+    p_buff[10] = '.';
+    put_digits(p_buff+14,(unsigned long)f,3);
+    if(u != 0){
+        put_digits(p_buff+10,(unsigned long)h,2);
+        p = put_digits(p_buff+8,(unsigned long)labs(u),0);
+    }else if(h != 0){
+        p = put_digits(p_buff+10,(unsigned long)h,0);
     }else{
-       p_buff += sprintf(p_buff,"         %5.5ld%c%c",labs(y->l[i]),*flag,*(flag+1));
-       if (p_buff[-7] != '0' ){                        /* ex)  12.345    -2.345 */
-           p_buff[-8] = p_buff[-7];
-           p_buff[-7] = p_buff[-6];
-           if(y->l[i] <0) p_buff[-9]='-';
-       }else if (p_buff[-6] != '0' ){                  /* ex)   1.234    -1.234 */
-           p_buff[-7] = p_buff[-6];
-           p_buff[-8] = (y->l[i] <0)? '-':' ';
-       }else{                                          /* ex)    .123     -.123 */
-           p_buff[-7] = (y->l[i] <0)? '-':' ';
-       }
+        p = p_buff+10;
+    }
+    if(u < 0 || l < 0) p[-1] = '-';
+    p_buff[14] = *flag;
+    p_buff[15] = *(flag+1);
+    ctx->p_buff = p_buff+16;
+}
+/*---------------------------------------------------------------------*/
+static char *put_digits(char *end, unsigned long v, int n){
+/***********************************************************************/
+/*  Write v in decimal ending just before end, padded with zeros to n  */
+/*  digits (n = 0: no padding), and return the first digit.            */
+/***********************************************************************/
+    char *p = end;
+
+    while(v >= 100){
+        p -= 2;
+        memcpy(p,&digit_pairs[2*(v%100)],2);
+        v /= 100;
     }
-    p_buff[-6] = '.';
+    if(v >= 10){
+        p -= 2;
+        memcpy(p,&digit_pairs[2*v],2);
+    }else if(v > 0 || p == end){
+        *--p = (char)('0'+v);
+    }
+    while(p > end-n) *--p = '0';
+    return p;
 }
 /*---------------------------------------------------------------------*/
-void print_clock(long yu, long yl, int shift_clk){
-    char tmp[8],*p_tmp,*p;
-    int n,sgn;
+static void print_clock(crx2rnx_ctx *ctx, long yu, long yl, int shift_clk){
+/***********************************************************************/
+/*  Output the receiver clock offset as F12.9 (shift_clk = 1) or       */
+/*  F15.12 (shift_clk = 4) followed by a line feed.                    */
+/***********************************************************************/
+    char tmp[24],*p_tmp,*p;
+    int n,sgn,neg;
+    unsigned long au,scale;
 
     if(yu<0 && yl>0){
         yu++ ; yl -= 100000000;
@@ -726,46 +954,141 @@ void print_clock(long yu, long yl, int shift_clk){
         yu-- ; yl += 100000000;
     }
     /* The signs of yu and yl are the same (or zero) at this stage */
+    neg = yu<0 || yl<0;
+    au = (unsigned long)labs(yu);
+    scale = (shift_clk == 1)? 10:10000;
+
+    if( au < (neg ? 10:100)*scale ){
+        /*** yu: the integer part (up to two columns, including the sign) and ***/
+        /*** the first shift_clk digits of the fractional part                ***/
+        p = ctx->p_buff;
+        p[0] = p[1] = ' ';
+        p[2] = '.';
+        put_digits(p+3+shift_clk,au%scale,shift_clk);
+        put_digits(p+11+shift_clk,(unsigned long)labs(yl),8);
+        p[11+shift_clk] = '\n';
+        if(au >= scale){
+            p = put_digits(p+2,au/scale,0);
+        }else{
+            p += 2;
+        }
+        if(neg) p[-1] = '-';
+        ctx->p_buff += 12+shift_clk;
+        return;
+    }
 
-    /** add ond more digit to handle '-0'(RINEX2) or '-0000'(RINEX3) **/
-    sgn = (yl<0) ? -1:1;
+    /** add one more digit to handle '-0'(RINEX2) or '-0000'(RINEX3) **/
+    sgn = neg ? -1:1;
     n = sprintf(tmp,"%.*ld",shift_clk+1,yu*10+sgn); /** AT LEAST fractional parts are filled with 0 **/
     n--;                           /** n: number of digits excluding the additional digit **/
     p_tmp = &tmp[n];
     *p_tmp = '\0';
     p_tmp -= shift_clk;       /** pointer to the top of last "shift_clk" digits **/
-    p_buff += sprintf(p_buff,"  .%s",p_tmp);  /** print last "shift_clk" digits.  **/
+    ctx->p_buff += sprintf(ctx->p_buff,"  .%s",p_tmp);  /** print last "shift_clk" digits.  **/
     if( n > shift_clk ){
         p_tmp--;
-        p = p_buff-shift_clk-2;
+        p = ctx->p_buff-shift_clk-2;
         *p = *p_tmp;
 
         if( n > shift_clk+1 ){
              *(p-1) =* (p_tmp-1);
              if( n > shift_clk+2 ){
-                 if( output_overflow ) {
-                    fprintf(stderr,"Warning: line %ld. : Clock offset becomes out of range allowed in the RINEX format. The output is corrupted.\n",nl_count);
-                    exit_status=EXIT_WARNING;
+                 if( ctx->output_overflow ) {
+                    rnx_eprintf(ctx->io,"Warning: line %ld. : Clock offset becomes out of range allowed in the RINEX format. The output is corrupted.\n",ctx->nl_count);
+                    ctx->exit_status=EXIT_WARNING;
                  }else{
-                    error_exit(17,"Clock offset");
+                    error_exit(ctx,17,"Clock offset");
                  }
              }
         }
     }
 
-    p_buff += sprintf(p_buff,"%8.8ld\n",labs(yl));
+    ctx->p_buff += sprintf(ctx->p_buff,"%8.8ld\n",labs(yl));
+}
+/*---------------------------------------------------------------------*/
+static int  select_record(crx2rnx_ctx *ctx, const char *line, int is_epoch){
+/***********************************************************************/
+/*  Return whether an epoch or event record is selected for output by  */
+/*  the start, end and interval options. Exits at the end time.        */
+/***********************************************************************/
+    const crx2rnx_options *o = ctx->options;
+    long long t;
+
+    if(!o->has_start && !o->has_end && o->interval <= 0) return 1;
+    if(epoch_time(line,ctx->rinex_version,&t) == 0){
+        ctx->time = t;
+        ctx->has_time = 1;
+    }
+    if(o->has_end && ctx->has_time && ctx->time >= o->end) no_error_exit(ctx);
+    if(o->has_start && (!ctx->has_time || ctx->time < o->start)) return 0;
+    if(is_epoch && o->interval > 0 && (!ctx->has_time || ctx->time % o->interval != 0)) return 0;
+    return 1;
 }
 /*---------------------------------------------------------------------*/
-int  read_chk_line(char *line){
+static int  get_digits(const char *s, int n, long *value){
+/***********************************************************************/
+/*  Read an integer from n characters padded with spaces.              */
+/*  Returns 1 if the field is blank or not a number.                   */
+/***********************************************************************/
+    int i,found=0;
+    *value = 0;
+    for(i=0; i<n && s[i] != '\0'; i++){
+        if(isdigit((unsigned char)s[i])){
+            *value = *value*10 + (s[i]-'0');
+            found = 1;
+        }else if(s[i] != ' ' || found){
+            return 1;
+        }
+    }
+    return !found;
+}
+/*---------------------------------------------------------------------*/
+static int  epoch_time(const char *line, int rinex_version, long long *t){
+/***********************************************************************/
+/*  Read the time of an epoch or event line in units of 1e-7 s since   */
+/*  1970-01-01. Returns 1 if the time fields are blank or invalid.     */
+/***********************************************************************/
+    long f[5],sec,frac;
+    long long y,m,era,yoe,doy,doe;
+    const char *p;
+    int i,offset = (rinex_version == 2) ? 1 : 2;
+    size_t len = strlen(line);
+
+    if(len < (size_t)(3*offset+23)) return 1;
+    if(get_digits(&line[offset],2*offset,&f[0]) != 0) return 1;
+    for(i=1,p=&line[3*offset+1]; i<5; i++,p+=3){
+        if(get_digits(p,2,&f[i]) != 0) return 1;
+    }
+    /** seconds as F11.7 **/
+    if(get_digits(&line[3*offset+12],3,&sec) != 0 || line[3*offset+15] != '.') return 1;
+    for(i=0,frac=0,p=&line[3*offset+16]; i<7; i++,p++){
+        if(!isdigit((unsigned char)*p)) return 1;
+        frac = frac*10 + (*p-'0');
+    }
+    if(rinex_version == 2) f[0] += (f[0] < 80) ? 2000 : 1900;
+    if(f[1] < 1 || f[1] > 12) return 1;
+
+    /** days since 1970-01-01 of the proleptic Gregorian calendar **/
+    m = f[1];
+    y = f[0] - (m <= 2);
+    era = (y >= 0 ? y : y-399) / 400;
+    yoe = y - era*400;
+    doy = (153*(m + (m > 2 ? -3 : 9)) + 2)/5 + f[2]-1;
+    doe = yoe*365 + yoe/4 - yoe/100 + doy;
+    *t = ((era*146097 + doe - 719468)*86400 + f[3]*3600 + f[4]*60 + sec)*10000000LL + frac;
+    return 0;
+}
+/*---------------------------------------------------------------------*/
+static int  read_chk_line(crx2rnx_ctx *ctx, char *line){
     char *p;
  
-    nl_count++;
-    if( fgets(line,MAXCLM,stdin) == NULL ) error_exit(8,line);
+    ctx->nl_count++;
+    if( rnx_gets(ctx->io,line,MAXCLM) == NULL ) error_exit(ctx,8,line);
     if( (p = strchr(line,'\n')) == NULL) {
-        if( fgetc(stdin) == EOF ) {     /** check if EOF is there **/
-            error_exit(8,line);
+        if( rnx_getc(ctx->io) == EOF ) {     /** check if EOF is there **/
+            error_exit(ctx,8,line);
         }else{
-            if( ! skip ) error_exit(13,line);
+            if( ! ctx->skip ) error_exit(ctx,13,line);
             return 1;
         }
     }
@@ -775,9 +1098,183 @@ int  read_chk_line(char *line){
     return 0;
 }
 /*---------------------------------------------------------------------*/
-void error_exit(int error_no, char *string){
+static void error_exit(crx2rnx_ctx *ctx, int error_no, char *string){
+    rnx_io *io = ctx->io;
+    long nl_count = ctx->nl_count;
+
+    if(error_no == 5 ){
+        rnx_eprintf(io,"ERROR : The file format is not Compact RINEX or the version of\n");
+        rnx_eprintf(io,"        the format is not valid. This software can deal with\n");
+        rnx_eprintf(io,"        only Compact RINEX format ver.%s.\n",string);
+    }
+    if(error_no == 6 ){
+        rnx_eprintf(io,"ERROR at line %ld : exceed maximum number of satellites(%d)\n",nl_count,MAXSAT);
+        rnx_eprintf(io,"      start>%s<end\n",string);
+    }
+    if(error_no == 7 ){
+        rnx_eprintf(io,"ERROR at line %ld : exceed maximum order of difference (%d)\n",nl_count,MAX_DIFF_ORDER);
+        rnx_eprintf(io,"      start>%s<end\n",string);
+    }
+    if(error_no == 8 ){
+        rnx_eprintf(io,"ERROR : The file seems to be truncated in the middle.\n");
+        rnx_eprintf(io,"        The conversion is interrupted after reading the line %ld :\n",nl_count);
+        rnx_eprintf(io,"      start>%s<end\n",string);
+    }
+    if(error_no == 9 ){
+        rnx_eprintf(io,"ERROR at line %ld : The arc should be initialized, but not.\n",nl_count);
+        rnx_eprintf(io,"      start>%s<end\n",string);
+    }
+    if(error_no == 11){
+        rnx_eprintf(io,"ERROR at line %ld : New satellite, but data arc is not initialized.\n",nl_count);
+        rnx_eprintf(io,"      start>%s<end\n",string);
+    }
+    if(error_no == 12){
+        rnx_eprintf(io,"ERROR at line %ld : The data field in previous epoch is blank, but the arc is not initialized.\n",nl_count);
+        rnx_eprintf(io,"      start>%s<end\n",string);
+    }
+    if(error_no == 13){
+        rnx_eprintf(io,"ERROR at line %ld : null character is found in the line or the line is too long (>%d) at line.\n",nl_count,MAXCLM);
+        rnx_eprintf(io,"      start>%s<end\n",string);
+    }
+    if(error_no == 15 ){
+        rnx_eprintf(io,"ERROR : The format version of the original RINEX file is not valid.\n");
+        rnx_eprintf(io,"         This software can deal with only (compressed) RINEX format ver.%s.\n",string);
+    }
+    if(error_no == 16 ){
+        rnx_eprintf(io,"ERROR at line %ld. : Number of data types exceed MAXTYPE(%d).\n",nl_count,MAXTYPE);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 17 ){
+        rnx_eprintf(io,"ERROR at line %ld. : %s becomes out of range allowed in the RINEX format.\n",nl_count,string);
+    }
+    if(error_no == 20 ){
+        rnx_eprintf(io,"ERROR at line %ld. : A GNSS type not defined in the header is found.\n",nl_count);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 21 ){
+        rnx_eprintf(io,"ERROR at line %ld. : %s.\n",nl_count,string);
+    }
+    rnx_exit(io,EXIT_FAILURE);
+}
+/*---------------------------------------------------------------------*/
+static void no_error_exit(crx2rnx_ctx *ctx) {
+    rnx_exit(ctx->io,ctx->exit_status);
+}
+
+#ifndef RNXCMP_LIBRARY
+/***********************************************************************/
+/*  command line program                                               */
+/***********************************************************************/
+static int  delete_if_no_error = 0; /* default : not delete */
+static int  n_infile = 0;           /* number of input file (must be 0 or 1) */
+static char infile[MAXCLM];         /**** name of input file ****/
+
+static void fileopen(int argc, char *argv[], crx2rnx_options *options);
+static void usage_exit(int error_no, char *string);
+
+/*---------------------------------------------------------------------*/
+int main(int argc, char *argv[]){
+    crx2rnx_options options = {0,0};
+    rnx_io io;
+    int status;
+
+    fileopen(argc,argv,&options);
+    if(rnx_io_init(&io) != 0){
+        fprintf(stderr,"ERROR : memory allocation failed.\n");
+        exit(EXIT_FAILURE);
+    }
+    rnx_io_set_stdio(&io);
+    status = crx2rnx(&io,&options);
+    rnx_flush(&io);
+    rnx_io_free(&io);
+    fflush(stdout);
+    if (status == EXIT_SUCCESS && delete_if_no_error && n_infile == 1)  remove(infile);
+    return status;
+}
+/*---------------------------------------------------------------------*/
+static void fileopen(int argc, char *argv[], crx2rnx_options *options){
+    char *p,outfile[MAXCLM],*progname;
+    int force = 0, help = 0;
+    int nfout = 0;  /*** =0 default output file name ***/
+                    /*** =1 standard output          ***/
+    FILE *ifp;
+
+    progname = argv[0];
+    argc--;argv++;
+    for(;argc>0;argc--,argv++){
+        if((*argv)[0] != '-'){
+            strncpy(infile,*argv,C1*MAXCLM);
+            n_infile++;
+        }else if(strcmp(*argv,"-")   == 0){
+            nfout = 1;
+        }else if(strcmp(*argv,"-f")  == 0){
+            force = 1;
+        }else if(strcmp(*argv,"-d")  == 0){
+            delete_if_no_error = 1;    /* delete the original file if
+                                          no error in the conversion */
+        }else if(strcmp(*argv,"-s")  == 0){
+            options->skip_strange_epochs = 1;
+        }else if(strcmp(*argv,"--systems") == 0 && argc > 1){
+            argc--;argv++;
+            options->projection.systems = *argv;
+        }else if(strcmp(*argv,"--satellites") == 0 && argc > 1){
+            argc--;argv++;
+            options->projection.satellites = *argv;
+        }else if(strcmp(*argv,"--obs_types") == 0 && argc > 1){
+            argc--;argv++;
+            options->projection.obs_types = *argv;
+        }else if(strcmp(*argv,"--output_overflow")  == 0){
+            /* output the data without stopping with an error even if  */
+            /* digits of an output data exceed the limit of the format */
+            /* (a hidden option for checking)                          */
+            options->output_overflow = 1;
+        }else if(strcmp(*argv,"-h")  == 0){
+            help = 1;
+        }else{
+            help = 1;
+        }
+    }
+
+    if(strlen(infile) == MAXCLM)usage_exit(14,infile);
+    if(help == 1 || n_infile > 1  || n_infile < 0) usage_exit(1,progname);
+    if(n_infile == 0) return;  /*** stdin & stdout will be used if input file name is not given ***/
+
+    /***********************/
+    /*** open input file ***/
+    /***********************/
+    p = strrchr(infile,'.');
+    if(p == NULL || *(p+4) != '\0' 
+                 || ( toupper(*(p+3)) != 'D'
+                      && strcmp(p+1,"CRX") != 0
+                      && strcmp(p+1,"crx") != 0 )
+    ) usage_exit(3,p);
+
+    if((ifp = fopen(infile,"r")) == NULL) usage_exit(4,infile);
+
+    /************************/
+    /*** open output file ***/
+    /************************/
+    if(nfout == 0) {
+        strcpy(outfile,infile);
+        p = strrchr(outfile,'.');
+        if     (*(p+3) == 'd') { *(p+3) = 'o';}
+        else if(*(p+3) == 'D') { *(p+3) = 'O';}
+        else if( strcmp(p+1,"crx") == 0) { strcpy((p+1),"rnx");}
+        else if( strcmp(p+1,"CRX") == 0) { strcpy((p+1),"RNX");}
+        
+        if((freopen(outfile,"r",stdout)) != NULL && force == 0){
+            fprintf(stderr,"The file %s already exists. Overwrite?(n)",outfile);
+            if(getchar() != 'y') exit(EXIT_SUCCESS);
+        }
+        freopen(outfile,"w",stdout);
+    }
+    fclose(ifp);
+    freopen(infile,"r",stdin);
+}
+/*---------------------------------------------------------------------*/
+static void usage_exit(int error_no, char *string){
     if(error_no == 1 ){
-        fprintf(stderr,"Usage: %s [file] [-] [-f] [-s] [-d] [-h]\n",string);
+        fprintf(stderr,"Usage: %s [file] [-] [-f] [-s] [-d] [--systems GNSS] [--satellites PRNS] [--obs_types TYPES] [-h]\n",string);
         fprintf(stderr,"    stdin and stdout are used if input file name is not given.\n");
         fprintf(stderr,"    -  : output to stdout\n");
         fprintf(stderr,"    -f : force overwrite of output file\n");
@@ -792,12 +1289,14 @@ void error_exit(int error_no, char *string){
         fprintf(stderr,"    -d      : delete the input file if conversion finishes without errors\n");
         fprintf(stderr,"              (i.e. exit code = %d or %d).\n",EXIT_SUCCESS,EXIT_WARNING);
         fprintf(stderr,"              This option does nothing if stdin is used for the input.\n");
+        fprintf(stderr,"    --systems GNSS     : output only these GNSS systems, e.g. GE\n");
+        fprintf(stderr,"    --satellites PRNS  : output only these satellites, e.g. G01G05E11\n");
+        fprintf(stderr,"    --obs_types TYPES  : output only these observation types, e.g. \"C1C L1C\"\n");
         fprintf(stderr,"    -h : display help message\n\n");
         fprintf(stderr,"    exit code = %d (success)\n",EXIT_SUCCESS);
         fprintf(stderr,"              = %d (error)\n",  EXIT_FAILURE);
         fprintf(stderr,"              = %d (warning)\n",EXIT_WARNING);
         fprintf(stderr,"    [version : %s]\n",VERSION);
-        exit(EXIT_FAILURE);
     }
     if(error_no == 3 ){
         fprintf(stderr,"ERROR : invalid file name  %s\n",string);
@@ -805,82 +1304,14 @@ void error_exit(int error_no, char *string){
         fprintf(stderr,"To convert the files whose name is not fit to the above conventions,\n");
         fprintf(stderr,"use of this program as a filter is also possible. \n");
         fprintf(stderr,"    for example)  cat file.in | %s - > file.out\n",PROGNAME);
-        exit(EXIT_FAILURE);
     }
     if(error_no == 4 ){
         fprintf(stderr,"ERROR : can't open %s\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 5 ){
-        fprintf(stderr,"ERROR : The file format is not Compact RINEX or the version of\n");
-        fprintf(stderr,"        the format is not valid. This software can deal with\n");
-        fprintf(stderr,"        only Compact RINEX format ver.%s.\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 6 ){
-        fprintf(stderr,"ERROR at line %ld : exceed maximum number of satellites(%d)\n",nl_count,MAXSAT);
-        fprintf(stderr,"      start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 7 ){
-        fprintf(stderr,"ERROR at line %ld : exceed maximum order of difference (%d)\n",nl_count,MAX_DIFF_ORDER);
-        fprintf(stderr,"      start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 8 ){
-        fprintf(stderr,"ERROR : The file seems to be truncated in the middle.\n");
-        fprintf(stderr,"        The conversion is interrupted after reading the line %ld :\n",nl_count);
-        fprintf(stderr,"      start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 9 ){
-        fprintf(stderr,"ERROR at line %ld : The arc should be initialized, but not.\n",nl_count);
-        fprintf(stderr,"      start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 11){
-        fprintf(stderr,"ERROR at line %ld : New satellite, but data arc is not initialized.\n",nl_count);
-        fprintf(stderr,"      start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 12){
-        fprintf(stderr,"ERROR at line %ld : The data field in previous epoch is blank, but the arc is not initialized.\n",nl_count);
-        fprintf(stderr,"      start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 13){
-        fprintf(stderr,"ERROR at line %ld : null character is found in the line or the line is too long (>%d) at line.\n",nl_count,MAXCLM);
-        fprintf(stderr,"      start>%s<end\n",string);
-        exit(EXIT_FAILURE);
     }
     if(error_no == 14 ){
-        fprintf(stderr,"ERROR at line %ld. : Length of file name exceed MAXCLM(%d).\n",nl_count,MAXCLM);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 15 ){
-        fprintf(stderr,"ERROR : The format version of the original RINEX file is not valid.\n");
-        fprintf(stderr,"         This software can deal with only (compressed) RINEX format ver.%s.\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 16 ){
-        fprintf(stderr,"ERROR at line %ld. : Number of data types exceed MAXTYPE(%d).\n",nl_count,MAXTYPE);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 17 ){
-        fprintf(stderr,"ERROR at line %ld. : %s becomes out of range allowed in the RINEX format.\n",nl_count,string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 20 ){
-        fprintf(stderr,"ERROR at line %ld. : A GNSS type not defined in the header is found.\n",nl_count);
+        fprintf(stderr,"ERROR at line %ld. : Length of file name exceed MAXCLM(%d).\n",0L,MAXCLM);
         fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
     }
-
-}
-/*---------------------------------------------------------------------*/
-void no_error_exit() {
-    if (delete_if_no_error && exit_status != 2 && n_infile == 1)  remove(infile);
-    exit(exit_status);
+    exit(EXIT_FAILURE);
 }
+#endif /* RNXCMP_LIBRARY */
@@ -53,6 +53,17 @@
 /*                    + Error in case a bad GNSS type is detected even if   */
 /*                      option -s is specified.                             */
 /*                                                                          */
+/*     Modified for the hatanaka Python package                             */
+/*                  - global variables are moved to a context structure and */
+/*                    exit() calls are replaced with rnx_exit() so that the */
+/*                    conversion can run in-process and in parallel.        */
+/*                  - I/O goes through rnxio.c instead of stdin/stdout.     */
+/*                  - the command line program is built unless              */
+/*                    RNXCMP_LIBRARY is defined.                            */
+/*                  - the arrays of the satellites and data types grow with */
+/*                    the file instead of being fixed to MAXSAT x MAXTYPE.  */
+/*                    MAXSAT and MAXTYPE are only sanity limits now.        */
+/*                                                                          */
 /*     Copyright (c) 2007 Geospatial Information Authority of Japan         */
 /*                                                                          */
 /****************************************************************************/
@@ -64,6 +75,8 @@
 #include <ctype.h>
 #include <time.h>
 
+#include "rnxcmp.h"
+
 #define VERSION  "ver.4.1.0"
 
 /**** Exit codes are defined here.   ****/
@@ -78,16 +91,22 @@
 #endif
 
 /*** define macro to flush or clear the output buffer ***/
-#define FLUSH_BUFF printf("%s",top_buff), *(p_buff = top_buff)='\0'
-#define CLEAR_BUFF *(p_buff = top_buff) = '\0'
+#define FLUSH_BUFF rnx_puts(ctx->io,ctx->top_buff), *(ctx->p_buff = ctx->top_buff)='\0'
+#define CLEAR_BUFF *(ctx->p_buff = ctx->top_buff) = '\0'
 
 #define CRX_VERSION1 "1.0"    /* CRINEX version for RINEX 2.x */
 #define CRX_VERSION2 "3.0"    /* CRINEX version for RINEX 3.x */
 #define PROGNAME "RNX2CRX"
-#define MAXSAT    100         /* Maximum number of satellites observed at one epoch */
-#define MAXTYPE   100         /* Maximum number of data types for a GNSS system */
-#define MAXCLM   2048         /* Maximum columns in one line   (>MAXTYPE*19+3)  */
-#define MAX_BUFF_SIZE 204800  /* Maximum size of output buffer (>MAXSAT*(MAXTYPE*19+4)+60 */
+#ifndef MAXSAT
+#define MAXSAT    999         /* Maximum number of satellites observed at one epoch (I3) */
+#endif
+#ifndef MAXTYPE
+#define MAXTYPE   999         /* Maximum number of data types for a GNSS system */
+#endif
+#ifndef MAXCLM
+#define MAXCLM   8192         /* Maximum columns in one line   (>41+MAXSAT*3)  */
+#endif
+#define MAX_FIELD  32         /* Maximum size of one data field and its flags in the output buffer */
 #define ARC_ORDER 3           /* order of difference to take    */
 
 /* define data structure for fields of clock offset and observation records */
@@ -101,125 +120,187 @@ typedef struct clock_format{
 
 typedef struct data_format{
     long u[ARC_ORDER+1];      /* upper X digits */
-    long l[ARC_ORDER+1];      /* lower 5 digits (can be 6-7 digits for deltas) */
+    int  l[ARC_ORDER+1];      /* lower 5 digits (can be 6-7 digits for deltas) */
     int order;
 } data_format;
 
-/* define global variables */
-long ep_count = 0;
-long ep_reset = 0;
-long nl_count = 0;
-int rinex_version;          /* =2, 3 or 4 */
-int nsat,ntype,ntype_gnss[UCHAR_MAX],ntype_record[MAXSAT],clk_order = -1;
-int exit_status = EXIT_SUCCESS;
-int skip_strange_epoch = 0; /* default : stop with error */
-int delete_if_no_error = 0; /* default : not delete */
-int n_infile = 0;           /* number of input file (must be 0 or 1) */
-
-/*
-clock_format clk1,clk0 = {0,0,0,0,0,0,0,0};
-*/
-clock_format clk1,clk0 = {{0,0,0,0},{0,0,0,0}};
-data_format dy0[MAXSAT][MAXTYPE], dy1[MAXSAT][MAXTYPE];
-char flag0[MAXSAT][MAXTYPE*2], flag[MAXSAT][MAXTYPE*2];
-char out_buff[MAX_BUFF_SIZE] = {'x','\0'};  /**** a character is put as a stopper to avoid memory overflow ****/
-char *top_buff=&out_buff[1],*p_buff;        /**** therefore, actual buffer start from the second character ****/
-char infile[MAXCLM];                        /**** name of input file ****/
-size_t C1  = sizeof("");               /* size of one character */
-size_t C2  = sizeof(" ");              /* size of 2-character string */
-size_t C3  = sizeof("  ");             /* size of 3-character string */
-size_t C14 = sizeof("             ");  /* size of 14-character string */
-
-char oldline[MAXCLM] = {'&','\0'};
-int nsat_old = 0;
+/* rows of the arrays kept per satellite, see reserve() */
+#define DATA_ROW(ctx,dy,i) ((dy) + (size_t)(i)*(ctx)->max_type)
+#define FLAG_ROW(ctx,fl,i) ((fl) + (size_t)(i)*(2*(ctx)->max_type+1))
+
+/* define the state of one conversion (formerly global variables) */
+typedef struct rnx2crx_ctx{
+    rnx_io *io;
+    long ep_count;
+    long ep_reset;
+    long nl_count;
+    int rinex_version;          /* =2, 3 or 4 */
+    int nsat,ntype,ntype_gnss[UCHAR_MAX+1],ntype_record[MAXSAT],clk_order;
+    int exit_status;
+    int skip_strange_epoch;     /* default : stop with error */
+
+    clock_format clk1,clk0;
+    /* max_sat x max_type data fields, grown to the largest epoch and the */
+    /* number of the data types defined in the header or event records   */
+    int max_sat,max_type;
+    data_format *dy0,*dy1;
+    char *flag0,*flag;             /* max_sat x (2*max_type+1) */
+    char *out_buff;                /**** a character is put as a stopper to avoid memory overflow ****/
+    char *top_buff,*p_buff;        /**** therefore, actual buffer start from the second character ****/
+
+    char oldline[MAXCLM];
+    int nsat_old;
+
+    const rnx2crx_options *options;
+    rnx_proj proj;              /* projection of the output */
+} rnx2crx_ctx;
+
+/* "00" to "99" for formatting two digits at once */
+static const char digit_pairs[] =
+    "00010203040506070809101112131415161718192021222324252627282930313233343536373839"
+    "40414243444546474849505152535455565758596061626364656667686970717273747576777879"
+    "8081828384858687888990919293949596979899";
+
+static size_t C1  = sizeof("");               /* size of one character */
+static size_t C2  = sizeof(" ");              /* size of 2-character string */
+static size_t C3  = sizeof("  ");             /* size of 3-character string */
+static size_t C14 = sizeof("             ");  /* size of 14-character string */
 
 /* declaration of functions */
-void parse_args(int argc, char *argv[]);
-void header(void);
-int  get_next_epoch(char *p_line);
-void skip_to_next(char *p_line);
-void initialize_all(char *oldline,int *nsat_old, int count);
-void put_event_data(char *p_line);
-void read_clock(char *line,int shift_cl);
-void process_clock(void);
-int  set_sat_table(char *p_new, char *p_old, int nsat_old,int *sattbl);
-int  read_more_sat(int n, char *p);
-void data(int *sattbl);
-char *strdiff(char *s1, char *s2, char *ds);
-int  ggetline(data_format *py1, char *flag, char *sat_id, int *ntype_rec);
-void read_value(char *p, long *pu, long *pl);
-void take_diff(data_format *py1, data_format *py0);
-void putdiff(long dddu, long dddl);
-void put_clock(long du, long dl, int clk_order);
-int  read_chk_line(char *line);
-void error_exit(int error_no, char *string);
-void no_error_exit();
+static void convert(rnx2crx_ctx *ctx);
+static void header(rnx2crx_ctx *ctx);
+static void put_header_line(rnx2crx_ctx *ctx, char *line);
+static int  get_next_epoch(rnx2crx_ctx *ctx, char *p_line);
+static void skip_to_next(rnx2crx_ctx *ctx, char *p_line);
+static void initialize_all(rnx2crx_ctx *ctx, char *oldline,int *nsat_old, int count);
+static void put_event_data(rnx2crx_ctx *ctx, char *p_line);
+static void read_clock(rnx2crx_ctx *ctx, char *line,int shift_cl);
+static void process_clock(rnx2crx_ctx *ctx);
+static int  set_sat_table(rnx2crx_ctx *ctx, char *p_new, char *p_old, int nsat_old,int *sattbl);
+static int  read_more_sat(rnx2crx_ctx *ctx, int n, char *p);
+static int  project(rnx2crx_ctx *ctx, int i, char *sat_id);
+static void reserve(rnx2crx_ctx *ctx, int nsat, int ntype);
+static void *resize(rnx2crx_ctx *ctx, void *old, size_t size, int nrow_old, int ncol_old, int nrow, int ncol);
+static void data(rnx2crx_ctx *ctx, int *sattbl);
+static char *strdiff(char *s1, char *s2, char *ds);
+static int  ggetline(rnx2crx_ctx *ctx, data_format *py1, char *flag, char *sat_id, int *ntype_rec);
+static void read_value(const char *p, long *pu, int *pl);
+static long parse_long(const char *s, const char *end);
+static void take_diff(data_format *py1, data_format *py0);
+static void putdiff(rnx2crx_ctx *ctx, long dddu, long dddl);
+static void put_clock(rnx2crx_ctx *ctx, long du, long dl, int clk_order);
+static char *put_number(char *p, long v, int n);
+static int  read_chk_line(rnx2crx_ctx *ctx, char *line);
+static void error_exit(rnx2crx_ctx *ctx, int error_no, char *string);
+static void no_error_exit(rnx2crx_ctx *ctx);
 
 /*---------------------------------------------------------------------*/
-int main(int argc, char *argv[]){
-    char newline[MAXCLM];
+int rnx2crx(rnx_io *io, const rnx2crx_options *options){
+/***********************************************************************/
+/*  Convert RINEX read from io to Compact RINEX and write it to io.    */
+/*  Returns the exit code of the conversion:                           */
+/*  EXIT_SUCCESS, EXIT_FAILURE, EXIT_WARNING or RNX_EXIT_IO_ERROR.     */
+/***********************************************************************/
+    rnx2crx_ctx *ctx;
+    int status;
+
+    if((ctx = calloc(1,sizeof(rnx2crx_ctx))) == NULL){
+        rnx_eprintf(io,"ERROR : memory allocation failed.\n");
+        return EXIT_FAILURE;
+    }
+    ctx->io = io;
+    ctx->skip_strange_epoch = options->skip_strange_epochs;
+    ctx->ep_reset = options->reinit_every_nth;
+    ctx->options = options;
+    ctx->exit_status = EXIT_SUCCESS;
+    ctx->clk_order = -1;
+    ctx->oldline[0] = '&';
+    if(setjmp(io->env) == 0) convert(ctx);
+    status = io->exit_status;
+    rnx_proj_free(&ctx->proj);
+    free(ctx->dy0); free(ctx->dy1);
+    free(ctx->flag0); free(ctx->flag);
+    free(ctx->out_buff);
+    free(ctx);
+    return status;
+}
+/*---------------------------------------------------------------------*/
+static void convert(rnx2crx_ctx *ctx){
+    char newline[MAXCLM] = "";
     char dummy[2] = {'\0','\0'};
-    char *p,*p_event,*p_nsat,*p_satlst,*p_satold,*p_clock;
-    int sattbl[MAXSAT],i,j,shift_clk;
+    char *p,*p_event,*p_nsat,*p_satlst,*p_satold,*p_clock,num[4];
+    int sattbl[MAXSAT],i,n,shift_clk;
+    data_format *dy;
        /* sattbl[i]: order (at the previous epoch) of i-th satellite */
        /* (at the current epoch). -1 is set for the new satellites   */
 
-    parse_args(argc,argv);
-    for(i=0;i<UCHAR_MAX;i++) ntype_gnss[i] = -1;  /** -1 unless GNSS type is defined **/
-    header();
-    if (rinex_version==2){
+    for(i=0;i<=UCHAR_MAX;i++) ctx->ntype_gnss[i] = -1;  /** -1 unless GNSS type is defined **/
+    reserve(ctx,0,0);    /** allocate the output buffer **/
+    header(ctx);
+    if (ctx->rinex_version==2){
         p_event  = &newline[28];  /** pointer to event flag **/
         p_nsat   = &newline[29];  /** pointer to n_sat **/
         p_satlst = &newline[32];  /** pointer to satellite list **/
-        p_satold = &oldline[32];  /** pointer to n_sat of the previous epoch **/
+        p_satold = &ctx->oldline[32];  /** pointer to n_sat of the previous epoch **/
         p_clock  = &newline[68];  /** pointer to clock offset data **/
         shift_clk = 1;
     }else{
         p_event  = &newline[31];
         p_nsat   = &newline[32];
         p_satlst = &newline[41];
-        p_satold = &oldline[41];
+        p_satold = &ctx->oldline[41];
         p_clock  = &newline[41];
         shift_clk = 4;
     }
 
     for(CLEAR_BUFF;;FLUSH_BUFF){
         SKIP:
-        if( ! get_next_epoch(newline) ) no_error_exit();
+        if( ! get_next_epoch(ctx,newline) ) no_error_exit(ctx);
 
         /*** if event flag > 1, then (1)output event data  */
         /*** (2)initialize all data arcs, and continue to next epoch ***/
         if( atoi(strncpy(dummy,p_event,C1)) > 1) {
-            put_event_data(newline);
-            initialize_all(oldline,&nsat_old,0);
+            put_event_data(ctx,newline);
+            initialize_all(ctx,ctx->oldline,&ctx->nsat_old,0);
             continue;
         }
 
-        if( ep_reset > 0 && ++ep_count > ep_reset ) initialize_all(oldline,&nsat_old,1);
+        if( ctx->ep_reset > 0 && ++ctx->ep_count > ctx->ep_reset ) initialize_all(ctx,ctx->oldline,&ctx->nsat_old,1);
 
         if(strchr(newline,'\0') > p_clock){
-            read_clock(p_clock,shift_clk);        /**** read clock offset ****/
+            read_clock(ctx,p_clock,shift_clk);        /**** read clock offset ****/
         }else{
-            clk_order = -1;                       /*** reset data arc for clock offset ***/
+            ctx->clk_order = -1;                      /*** reset data arc for clock offset ***/
         }
 
-        nsat = atoi(p_nsat);
-        if(nsat > MAXSAT) error_exit(8,newline);
-        if(nsat > 12 && rinex_version == 2) read_more_sat(nsat,p_satlst);  /*** read continuation lines ***/
+        ctx->nsat = atoi(p_nsat);
+        if(ctx->nsat > MAXSAT) error_exit(ctx,8,newline);
+        reserve(ctx,ctx->nsat,0);
+        if(ctx->nsat > 12 && ctx->rinex_version == 2) read_more_sat(ctx,ctx->nsat,p_satlst);  /*** read continuation lines ***/
 
         /**** get observation ****/
-        for(i=0,p=p_satlst ; i<nsat ; i++,p+=3) {
-            if( ggetline(dy1[i],flag[i],p,&ntype_record[i]) ) {
+        for(i=0,n=0,p=p_satlst ; n<ctx->nsat ; n++) {
+            if( ggetline(ctx,DATA_ROW(ctx,ctx->dy1,i),FLAG_ROW(ctx,ctx->flag,i),p,&ctx->ntype_record[i]) ) {
                 CLEAR_BUFF;
-                exit_status = EXIT_WARNING;
+                ctx->exit_status = EXIT_WARNING;
                 goto SKIP;
             }
+            if( ctx->proj.active && ! project(ctx,i,p) ){   /*** leave out the satellite ***/
+                if(ctx->rinex_version == 2) memmove(p,p+3,strlen(p+3)+1);
+                continue;
+            }
+            i++; p+=3;
         }
         *p = '\0';    /*** terminate satellite list ***/
+        if(i < ctx->nsat){
+            ctx->nsat = i;
+            sprintf(num,"%3d",ctx->nsat);
+            strncpy(p_nsat,num,C3);
+        }
 
-        if(set_sat_table(p_satlst,p_satold,nsat_old,sattbl) ){
+        if(set_sat_table(ctx,p_satlst,p_satold,ctx->nsat_old,sattbl) ){
             CLEAR_BUFF;
-            exit_status = EXIT_WARNING;
+            ctx->exit_status = EXIT_WARNING;
             continue;
         }
 
@@ -227,131 +308,83 @@ int main(int argc, char *argv[]){
         /**** print change of the line & clock offset difference ****/
         /**** and data difference                               ****/
         /***********************************************************/
-        p_buff = strdiff(oldline,newline,p_buff);
-        if(clk_order > -1) {
-            if(clk_order > 0) process_clock();            /**** process clock offset ****/
-            put_clock(clk1.u[clk_order],clk1.l[clk_order],clk_order);
+        ctx->p_buff = strdiff(ctx->oldline,newline,ctx->p_buff);
+        if(ctx->clk_order > -1) {
+            if(ctx->clk_order > 0) process_clock(ctx);            /**** process clock offset ****/
+            put_clock(ctx,ctx->clk1.u[ctx->clk_order],ctx->clk1.l[ctx->clk_order],ctx->clk_order);
         }else{
-            *p_buff++ = '\n';
+            *ctx->p_buff++ = '\n';
         }
-        data(sattbl); *p_buff = '\0';
+        data(ctx,sattbl); *ctx->p_buff = '\0';
         /**************************************/
         /**** save current epoch to buffer ****/
         /**************************************/
-        nsat_old = nsat;
-        sprintf(oldline,"%s",newline);
-        clk0 = clk1;
-        for(i=0;i<nsat;i++){
-            strcpy(flag0[i],flag[i]);
-            for(j=0;j<ntype_record[i];j++) dy0[i][j] = dy1[i][j];
-        }
+        ctx->nsat_old = ctx->nsat;
+        sprintf(ctx->oldline,"%s",newline);
+        ctx->clk0 = ctx->clk1;
+        for(i=0;i<ctx->nsat;i++) strcpy(FLAG_ROW(ctx,ctx->flag0,i),FLAG_ROW(ctx,ctx->flag,i));
+        dy = ctx->dy0; ctx->dy0 = ctx->dy1; ctx->dy1 = dy;   /** the data of dy1 are all set at the next epoch **/
     }
 }
 /*---------------------------------------------------------------------*/
-void parse_args(int argc, char *argv[]){
-    char *p,outfile[MAXCLM],*progname;
-    int force = 0, help = 0;
-    int nfout = 0;  /*** =0 default output file name ***/
-                    /*** =1 standard output          ***/
-    FILE *ifp;
-
-    progname = argv[0];
-    argc--;argv++;
-    for(;argc>0;argc--,argv++){
-        if((*argv)[0] != '-'){
-            strncpy(infile,*argv,C1*MAXCLM);
-            n_infile++;
-        }else if(strcmp(*argv,"-")   == 0){
-            nfout = 1;                 /* output to standard output */
-        }else if(strcmp(*argv,"-f")  == 0){
-            force = 1;                 /* overwrite if the output file exists */
-        }else if(strcmp(*argv,"-d")  == 0){
-            delete_if_no_error = 1;    /* delete the original file if 
-                                          no error in the conversion */
-        }else if(strcmp(*argv,"-s")  == 0){
-            skip_strange_epoch = 1;
-        }else if(strcmp(*argv,"-e")  == 0){
-            argc--;argv++;
-            sscanf(*argv,"%ld",&ep_reset);
-        }else if(strcmp(*argv,"-h")  == 0){
-            help = 1;
-        }else{
-            help = 1;
-        }
-    }
+static void header(rnx2crx_ctx *ctx){
+    char line[MAXCLM] = "", line2[41], timestring[20], *env;
+    time_t tc;
+    struct tm tm_buf, *tp;
 
-    if(strlen(infile) == MAXCLM) error_exit(14,infile);
-    if(help == 1 || n_infile > 1 || n_infile < 0) error_exit(1,progname);
-    if(n_infile == 0) return;  /*** stdin & stdout will be used if input file name is not given ***/
+    /*** a fixed date makes the output reproducible ***/
+    if(ctx->options->has_date) tc = (time_t)ctx->options->date;
+    else if( (env = getenv("SOURCE_DATE_EPOCH")) != NULL && *env != '\0' ) tc = (time_t)strtoll(env,NULL,10);
+    else tc = time(NULL);
 
-    /***********************/
-    /*** open input file ***/
-    /***********************/
-    p = strrchr(infile,'.');
-    if(p == NULL || *(p+4) != '\0'
-                 || ( toupper(*(p+3)) != 'O'
-                      && strcmp(p+1,"RNX") != 0
-                      && strcmp(p+1,"rnx") != 0 )
-    ) error_exit(4,p);
-
-    if((ifp=fopen(infile,"r")) == NULL) error_exit(5,infile);
-
-    /************************/
-    /*** open output file ***/
-    /************************/
-    if(nfout == 0){
-        strcpy(outfile,infile);
-        p = strrchr(outfile,'.');
-        if     (*(p+3) == 'o') { *(p+3) = 'd';}
-        else if(*(p+3) == 'O') { *(p+3) = 'D';}
-        else if( strcmp(p+1,"rnx") == 0) { strcpy((p+1),"crx");}
-        else if( strcmp(p+1,"RNX") == 0) { strcpy((p+1),"CRX");}
-
-        if((freopen(outfile,"r",stdout)) != NULL && force == 0){
-            fprintf(stderr,"The file %s already exists. Overwrite?(n)",outfile);
-            if(getchar() != 'y') exit(EXIT_SUCCESS);
-        }
-        freopen(outfile,"w",stdout);
-    }
-    fclose(ifp);
-    freopen(infile,"r",stdin);
-}
-/*---------------------------------------------------------------------*/
-void header(void){
-    char line[MAXCLM], line2[41], timestring[20];
-    time_t tc = time(NULL);
-    struct tm *tp;
-
-    if( (tp = gmtime(&tc)) == NULL) tp = localtime(&tc);
+    /*** use the reentrant versions since conversions may run in parallel threads ***/
+#ifdef _WIN32
+    tp = (gmtime_s(&tm_buf,&tc) == 0 || localtime_s(&tm_buf,&tc) == 0) ? &tm_buf : NULL;
+#else
+    if( (tp = gmtime_r(&tc,&tm_buf)) == NULL) tp = localtime_r(&tc,&tm_buf);
+#endif
     strftime(timestring, C1*20, "%d-%b-%y %H:%M", tp);
 
     /*** Check RINEX VERSION / TYPE ***/
-    read_chk_line(line);
+    read_chk_line(ctx,line);
     if(strncmp(&line[60],"RINEX VERSION / TYPE",C1*20) != 0 ||
-       strncmp(&line[20],"O",C1)     != 0 ) error_exit(15,line);
+       strncmp(&line[20],"O",C1)     != 0 ) error_exit(ctx,15,line);
 
-    rinex_version = atoi(line);
-    if      ( rinex_version == 2 ){printf("%-20.20s",CRX_VERSION1);}
-    else if ( rinex_version == 3 || rinex_version == 4 ){printf("%-20.20s",CRX_VERSION2);}
-    else                          {error_exit(15,line);}
-    printf("%-40.40s%-20.20s\n","COMPACT RINEX FORMAT","CRINEX VERS   / TYPE");
+    ctx->rinex_version = atoi(line);
+    if      ( ctx->rinex_version == 2 ){rnx_printf(ctx->io,"%-20.20s",CRX_VERSION1);}
+    else if ( ctx->rinex_version == 3 || ctx->rinex_version == 4 ){rnx_printf(ctx->io,"%-20.20s",CRX_VERSION2);}
+    else                          {error_exit(ctx,15,line);}
+    rnx_printf(ctx->io,"%-40.40s%-20.20s\n","COMPACT RINEX FORMAT","CRINEX VERS   / TYPE");
 
     sprintf(line2,"%s %s",PROGNAME,VERSION);
-    printf("%-40.40s%-20.20sCRINEX PROG / DATE\n",line2,timestring);
-    printf("%s\n",line);
+    rnx_printf(ctx->io,"%-40.40s%-20.20sCRINEX PROG / DATE\n",line2,timestring);
+    rnx_printf(ctx->io,"%s\n",line);
+    if(rnx_proj_init(&ctx->proj,&ctx->options->projection,ctx->rinex_version) != 0) error_exit(ctx,22,"memory allocation failed");
     do{
-        read_chk_line(line);
-        printf("%s\n",line);
+        read_chk_line(ctx,line);
+        put_header_line(ctx,line);
         if       (strncmp(&line[60],"# / TYPES OF OBSERV",C1*19) == 0 && line[5] != ' '){
-            ntype = atoi(line);                                        /** for RINEX2 **/
+            ctx->ntype = atoi(line);                                        /** for RINEX2 **/
+            if (ctx->ntype > MAXTYPE) error_exit(ctx,16,line);
+            reserve(ctx,0,ctx->ntype);
         } else if(strncmp(&line[60],"SYS / # / OBS TYPES",C1*19) == 0){ /** for RINEX3 **/
-            if (line[0] != ' ') ntype_gnss[(unsigned int)line[0]] = atoi(&line[3]);
-            if (ntype_gnss[(unsigned int)line[0]] > MAXTYPE) error_exit(16,line);
+            if (line[0] != ' ') ctx->ntype_gnss[(unsigned char)line[0]] = atoi(&line[3]);
+            if (ctx->ntype_gnss[(unsigned char)line[0]] > MAXTYPE) error_exit(ctx,16,line);
+            reserve(ctx,0,ctx->ntype_gnss[(unsigned char)line[0]]);
         }
     }while( strncmp(&line[60],"END OF HEADER",C1*13) != 0);
 }
 /*---------------------------------------------------------------------*/
-int  get_next_epoch(char *p_line){
+static void put_header_line(rnx2crx_ctx *ctx, char *line){
+/**** output a header line, or its replacement if the data is projected ****/
+    switch(rnx_proj_header(&ctx->proj,line)){
+        case 0 : rnx_printf(ctx->io,"%s\n",line); break;
+        case 1 : rnx_puts(ctx->io,ctx->proj.out); break;
+        default: error_exit(ctx,22,ctx->proj.out);
+    }
+}
+/*---------------------------------------------------------------------*/
+static int  get_next_epoch(rnx2crx_ctx *ctx, char *p_line){
 /**** find next epoch line.                                                          ****/
 /**** If the line seems to be abnormal, print warning message                        ****/
 /**** and skip until next epoch is found                                             ****/
@@ -360,38 +393,38 @@ int  get_next_epoch(char *p_line){
 /****               2 : trouble in the line                                          ****/
     char *p;
 
-    nl_count++;
-    if( fgets(p_line,MAXCLM,stdin) == NULL ) return 0;  /*** EOF: exit program successfully ***/
+    ctx->nl_count++;
+    if( rnx_gets(ctx->io,p_line,MAXCLM) == NULL ) return 0;  /*** EOF: exit program successfully ***/
 
     if( (p = strchr(p_line,'\n')) == NULL) {
         if( *p_line == '\032' ) return 0;              /** DOS EOF **/
-        if( *p_line != '\0' || feof(stdin) == 0 ) {
-             if( ! skip_strange_epoch ) error_exit(12,p_line);
-             skip_to_next(p_line);
+        if( *p_line != '\0' || rnx_eof(ctx->io) == 0 ) {
+             if( ! ctx->skip_strange_epoch ) error_exit(ctx,12,p_line);
+             skip_to_next(ctx,p_line);
              return 2;
         }
-        fprintf(stderr,"WARNING: null characters are detected at the end of file --> neglected.\n");
-        exit_status = EXIT_WARNING;
+        rnx_eprintf(ctx->io,"WARNING: null characters are detected at the end of file --> neglected.\n");
+        ctx->exit_status = EXIT_WARNING;
         return 0;
     }
     if( *(p-1) == '\r' ){*(--p)='\0';};                   /*** remove DOS CR/LF ***/
     while(*--p == ' ' && p>p_line){};*++p = '\0';         /*** chop blank ***/
 
-    if (rinex_version == 2) {
+    if (ctx->rinex_version == 2) {
         if( strlen(p_line)<29   || *p_line != ' '
                 ||  *(p_line+27) != ' ' || ! isdigit(*(p_line+28))
                 || (*(p_line+29) != ' ' && ! isdigit(*(p_line+29)) && *(p_line+29) != '\0') ) {
             /**** ------- something strange is found in the epoch line ****/
-            if( ! skip_strange_epoch ) error_exit(6,p_line);
+            if( ! ctx->skip_strange_epoch ) error_exit(ctx,6,p_line);
             if(*(p_line+18) != '.')  CLEAR_BUFF;
-            skip_to_next(p_line);
+            skip_to_next(ctx,p_line);
             return 2;
         }
     }else{    /* rinex_version == 3 or 4 */
         if( *p_line != '>' ){
-            if( ! skip_strange_epoch ) error_exit(6,p_line);
+            if( ! ctx->skip_strange_epoch ) error_exit(ctx,6,p_line);
             CLEAR_BUFF;
-            skip_to_next(p_line);
+            skip_to_next(ctx,p_line);
             return 2;
         }
         while(p < (p_line+41)) *p++ = ' '; /*** pad blank ***/
@@ -400,13 +433,15 @@ int  get_next_epoch(char *p_line){
     return 1;
 }
 /*---------------------------------------------------------------------*/
-void skip_to_next(char *p_line){
-    fprintf(stderr," WARNING at line %ld: strange format. skip to next epoch.\n",nl_count);
-    exit_status = EXIT_WARNING;
+static void skip_to_next(rnx2crx_ctx *ctx, char *p_line){
+    char *p;
+
+    rnx_eprintf(ctx->io," WARNING at line %ld: strange format. skip to next epoch.\n",ctx->nl_count);
+    ctx->exit_status = EXIT_WARNING;
 
-    if (rinex_version == 2) {
+    if (ctx->rinex_version == 2) {
         do {                               /**** try to find next epoch line ****/
-            read_chk_line(p_line);
+            read_chk_line(ctx,p_line);
            } while( strlen(p_line) <29 || *p_line!=' ' || *(p_line+3)  != ' ' 
                    || *(p_line+6)  != ' ' || *(p_line+9)  != ' ' 
                    || *(p_line+12) != ' ' || *(p_line+15) != ' '
@@ -415,102 +450,115 @@ void skip_to_next(char *p_line){
                    || (strlen(p_line)>68 && *(p_line+70)!='.') );
     }else{    /*** for RINEX3 ***/
         do {
-            read_chk_line(p_line);
+            read_chk_line(ctx,p_line);
         } while( *p_line != '>');
+        p = strchr(p_line,'\0');               /*** pad blank as in get_next_epoch ***/
+        while(p < (p_line+41)) *p++ = ' ';
+        *p = '\0';
     }
-    initialize_all(oldline,&nsat_old,0);             /**** initialize all data ***/
+    initialize_all(ctx,ctx->oldline,&ctx->nsat_old,0);             /**** initialize all data ***/
 }
 /*---------------------------------------------------------------------*/
-void initialize_all(char *oldline,int *nsat_old,int count){
+static void initialize_all(rnx2crx_ctx *ctx, char *oldline,int *nsat_old,int count){
     strcpy(oldline,"&");        /**** initialize the epoch data arc ****/
-    clk_order = -1;             /**** initialize the clock data arc ****/
+    ctx->clk_order = -1;        /**** initialize the clock data arc ****/
     *nsat_old = 0;              /**** initialize the all satellite arcs ****/
-    ep_count = count;
+    ctx->ep_count = count;
 }
 /*---------------------------------------------------------------------*/
-void put_event_data(char *p_line){
+static void put_event_data(rnx2crx_ctx *ctx, char *p_line){
 /**** This routine is called when event flag >1 is set.  ****/
 /****      read # of event information lines and output  ****/
     int i,n;
     char *p;
 
-    if (rinex_version == 2 ) {
-        if(*(p_line+26) == '.') error_exit(6,p_line);
-        printf("&%s\n",(p_line+1));
+    if (ctx->rinex_version == 2 ) {
+        if(*(p_line+26) == '.') error_exit(ctx,6,p_line);
+        rnx_printf(ctx->io,"&%s\n",(p_line+1));
         if( strlen(p_line) > 29 ){
             n = atoi((p_line+29));     /** n: number of lines to follow **/
             for(i=0;i<n;i++){
-                read_chk_line(p_line);
-                printf("%s\n",p_line);
+                read_chk_line(ctx,p_line);
+                rnx_printf(ctx->io,"%s\n",p_line);
+                if(ctx->proj.active && strncmp((p_line+60),"# / TYPES OF OBSERV",C1*19) == 0)
+                    error_exit(ctx,22,"the observation types redefined in an event record can not be projected");
                 if(strncmp((p_line+60),"# / TYPES OF OBSERV",C1*19) == 0 && *(p_line+5) != ' ') {
-                    *flag[0] = '\0';
-                    ntype = atoi(p_line);
-                    if (ntype > MAXTYPE) error_exit(16,p_line);
+                    *ctx->flag = '\0';
+                    ctx->ntype = atoi(p_line);
+                    if (ctx->ntype > MAXTYPE) error_exit(ctx,16,p_line);
+                    reserve(ctx,0,ctx->ntype);
                 }
             }
         }
     } else {
-        if( strlen(p_line)<35 ||  *(p_line+29) == '.') error_exit(6,p_line);
+        if( strlen(p_line)<35 ||  *(p_line+29) == '.') error_exit(ctx,6,p_line);
         /* chop blanks that were padded in get_next_epoch */
         p = strchr(p_line+35,'\0');while(*--p == ' '){};*++p = '\0';
-        printf("%s\n",p_line);
+        rnx_printf(ctx->io,"%s\n",p_line);
         n = atoi((p_line+32));         /** n: number of lines to follow **/
         for(i=0;i<n;i++){
-            read_chk_line(p_line);
-            printf("%s\n",p_line);
+            read_chk_line(ctx,p_line);
+            rnx_printf(ctx->io,"%s\n",p_line);
+            if(ctx->proj.active && strncmp((p_line+60),"SYS / # / OBS TYPES",C1*19) == 0)
+                error_exit(ctx,22,"the observation types redefined in an event record can not be projected");
             if(strncmp((p_line+60),"SYS / # / OBS TYPES",C1*19) == 0 && *p_line != ' '){
-                *flag[0] = '\0';
-                ntype_gnss[(unsigned int)*p_line] = atoi((p_line+3));
-                if (ntype_gnss[(unsigned int)*p_line] > MAXTYPE) error_exit(16,p_line);
+                *ctx->flag = '\0';
+                ctx->ntype_gnss[(unsigned char)*p_line] = atoi((p_line+3));
+                if (ctx->ntype_gnss[(unsigned char)*p_line] > MAXTYPE) error_exit(ctx,16,p_line);
+                reserve(ctx,0,ctx->ntype_gnss[(unsigned char)*p_line]);
             }
         }
     }
 }
 /*---------------------------------------------------------------------*/
-void read_clock(char *p_clock,int shift_clk){
+static void read_clock(rnx2crx_ctx *ctx, char *p_clock,int shift_clk){
 /****  read the clock offset value ****/
 /**  *p_clock : pointer to beginning of clock data **/
     char *p_dot;      /** pointer for decimal point **/
     p_dot = p_clock + 2;
-    if(*p_dot != '.')error_exit(7,p_clock);
+    if(*p_dot != '.')error_exit(ctx,7,p_clock);
 
-    strncpy(p_dot,p_dot+1,C1*shift_clk);  /**** shift digits because of too  ****/
+    memmove(p_dot,p_dot+1,C1*shift_clk);   /**** shift digits because of too  ****/
     *(p_dot+shift_clk) = '.';             /**** many digits for fractional part ****/
-    sscanf(p_clock,"%ld.%ld",&clk1.u[0],&clk1.l[0]);
-    if(*p_clock == '-' || *(p_clock+1) == '-') clk1.l[0] = -clk1.l[0];
-    if(clk_order < ARC_ORDER) clk_order++;
+    sscanf(p_clock,"%ld.%ld",&ctx->clk1.u[0],&ctx->clk1.l[0]);
+    if(*p_clock == '-' || *(p_clock+1) == '-') ctx->clk1.l[0] = -ctx->clk1.l[0];
+    if(ctx->clk_order < ARC_ORDER) ctx->clk_order++;
     *p_clock = '\0';
 }
 /*---------------------------------------------------------------------*/
-void process_clock(void){
+static void process_clock(rnx2crx_ctx *ctx){
     int i;
-    for(i=0;i<clk_order;i++){
-        clk1.u[i+1] = clk1.u[i]-clk0.u[i];
-        clk1.l[i+1] = clk1.l[i]-clk0.l[i];
+    for(i=0;i<ctx->clk_order;i++){
+        ctx->clk1.u[i+1] = ctx->clk1.u[i]-ctx->clk0.u[i];
+        ctx->clk1.l[i+1] = ctx->clk1.l[i]-ctx->clk0.l[i];
     }
 }
 /*---------------------------------------------------------------------*/
-int  set_sat_table(char *p_new, char *p_old, int nsat_old,int *sattbl){
+static int  set_sat_table(rnx2crx_ctx *ctx, char *p_new, char *p_old, int nsat_old,int *sattbl){
     /**** sattbl : order of the satellites in the previous epoch   ****/
     /**** if *sattbl is set to  -1, the data arc for the satellite ****/
     /**** will be initialized                                      ****/
     int i,j;
     char *ps;
 
-    for (i=0;i< nsat;i++,p_new+=3){
+    for (i=0;i< ctx->nsat;i++,p_new+=3){
         *sattbl = -1;
-        ps = p_old;
-        for(j=0;j<nsat_old;j++,ps+=3){
-            if(strncmp(p_new,ps,C3) == 0){
-                *sattbl = j;
-                break;
+        if(i < nsat_old && strncmp(p_new,p_old+3*i,C3) == 0){
+            *sattbl = i;        /*** usually the satellites are in the same order ***/
+        }else{
+            ps = p_old;
+            for(j=0;j<nsat_old;j++,ps+=3){
+                if(strncmp(p_new,ps,C3) == 0){
+                    *sattbl = j;
+                    break;
+                }
             }
         }
         /*** check double entry ***/
-        for(j=i+1,ps=p_new+3 ; j<nsat ; j++,ps+=3){
+        for(j=i+1,ps=p_new+3 ; j<ctx->nsat ; j++,ps+=3){
             if(strncmp(p_new,ps,C3) == 0){
-                if( ! skip_strange_epoch ) error_exit(13,p_new);
-                fprintf(stderr,"WARNING:Duplicated satellite in one epoch at line %ld. ... skip\n",nl_count);
+                if( ! ctx->skip_strange_epoch ) error_exit(ctx,13,p_new);
+                rnx_eprintf(ctx->io,"WARNING:Duplicated satellite in one epoch at line %ld. ... skip\n",ctx->nl_count);
                 return 1;
             }
         }
@@ -519,13 +567,13 @@ int  set_sat_table(char *p_new, char *p_old, int nsat_old,int *sattbl){
     return 0;
 }
 /*---------------------------------------------------------------------*/
-int  read_more_sat(int n, char *p){
+static int  read_more_sat(rnx2crx_ctx *ctx, int n, char *p){
 /**** read continuation line of satellite list (for RINEX2) ****/
-    char line[MAXCLM];
+    char line[MAXCLM] = "";
     
     do {
         p += 36;
-        if( read_chk_line(line) ) return 1;
+        if( read_chk_line(ctx,line) ) return 1;
          /**** append satellite table ****/
         if(line[2] == ' '){
             sprintf(p,"%s",&line[32]);
@@ -537,7 +585,70 @@ int  read_more_sat(int n, char *p){
     return 0;
 }
 /*---------------------------------------------------------------------*/
-void data(int *sattbl){
+static int  project(rnx2crx_ctx *ctx, int i, char *sat_id){
+/**** leave out the data fields of the i-th satellite that are not output ****/
+/**** return value  0 : the satellite is not output at all                ****/
+/****               1 : otherwise                                         ****/
+    const char *keep;
+    data_format *dy1 = DATA_ROW(ctx,ctx->dy1,i);
+    char *flag = FLAG_ROW(ctx,ctx->flag,i);
+    int j,k;
+
+    if( ! rnx_proj_sat(&ctx->proj,sat_id) ) return 0;
+    if( rnx_proj_types(&ctx->proj,*sat_id,&keep) < 0 ) return 1;
+    for(j=0,k=0 ; j<ctx->ntype_record[i] ; j++){
+        if( ! keep[j] ) continue;
+        dy1[k] = dy1[j];
+        flag[k*2]   = flag[j*2];
+        flag[k*2+1] = flag[j*2+1];
+        k++;
+    }
+    flag[k*2] = '\0';
+    ctx->ntype_record[i] = k;
+    return 1;
+}
+/*---------------------------------------------------------------------*/
+static void reserve(rnx2crx_ctx *ctx, int nsat, int ntype){
+/**** grow the arrays kept per satellite and data type to hold at least ****/
+/**** nsat satellites and ntype data types, keeping their contents.      ****/
+/**** The number of satellites is doubled to grow only a few times.      ****/
+    int max_sat = ctx->max_sat, max_type = ctx->max_type;
+    size_t size, used = (ctx->out_buff == NULL)? 1:(size_t)(ctx->p_buff - ctx->out_buff);
+    char *p;
+
+    if(nsat > max_sat) max_sat = (nsat > 2*max_sat || 2*max_sat > MAXSAT)? nsat:2*max_sat;
+    if(ntype > max_type) max_type = ntype;
+    if(max_sat == ctx->max_sat && max_type == ctx->max_type && ctx->out_buff != NULL) return;
+
+    ctx->dy0   = resize(ctx,ctx->dy0,  sizeof(data_format),ctx->max_sat,ctx->max_type,max_sat,max_type);
+    ctx->dy1   = resize(ctx,ctx->dy1,  sizeof(data_format),ctx->max_sat,ctx->max_type,max_sat,max_type);
+    ctx->flag0 = resize(ctx,ctx->flag0,C1,ctx->max_sat,2*ctx->max_type+1,max_sat,2*max_type+1);
+    ctx->flag  = resize(ctx,ctx->flag, C1,ctx->max_sat,2*ctx->max_type+1,max_sat,2*max_type+1);
+
+    /*** epoch line, clock offset and the data lines of all satellites ***/
+    size = (size_t)max_sat*(max_type*MAX_FIELD+8) + 2*MAXCLM;
+    if((p = realloc(ctx->out_buff,size)) == NULL) error_exit(ctx,22,"memory allocation failed");
+    if(ctx->out_buff == NULL){ p[0] = 'x'; p[1] = '\0'; }
+    ctx->out_buff = p;
+    ctx->top_buff = p + 1;
+    ctx->p_buff = p + used;
+    ctx->max_sat = max_sat;
+    ctx->max_type = max_type;
+}
+/*---------------------------------------------------------------------*/
+static void *resize(rnx2crx_ctx *ctx, void *old, size_t size, int nrow_old, int ncol_old, int nrow, int ncol){
+/**** reallocate an array of nrow_old x ncol_old elements of size bytes ****/
+/**** as nrow x ncol elements, copying the rows and clearing the rest   ****/
+    char *p;
+    int i;
+
+    if((p = calloc((size_t)nrow*ncol+1,size)) == NULL) error_exit(ctx,22,"memory allocation failed");
+    for(i=0;i<nrow_old && i<nrow;i++) memcpy(p+(size_t)i*ncol*size,(char *)old+(size_t)i*ncol_old*size,(size_t)ncol_old*size);
+    free(old);
+    return p;
+}
+/*---------------------------------------------------------------------*/
+static void data(rnx2crx_ctx *ctx, int *sattbl){
 /********************************************************************/
 /*  Function : output the 3rd order difference of data              */
 /*       u : upper X digits of the data                             */
@@ -546,84 +657,95 @@ void data(int *sattbl){
 /*   py->u : upper digits of the 3rd order difference of the data   */
 /*   py->l : lower digits of the 3rd order difference of the data   */
 /********************************************************************/
-    data_format *py1;
+    data_format *py1,*py0;
     int  i,j,*i0;
-    char *p;
+    char *p,*flag,*flag0;
 
-    for(i=0,i0 = sattbl ; i<nsat ; i++,i0++){
-        for(j=0,py1=dy1[i] ; j<ntype_record[i] ; j++,py1++){
+    for(i=0,i0 = sattbl ; i<ctx->nsat ; i++,i0++){
+        py0 = (*i0 < 0)? NULL:DATA_ROW(ctx,ctx->dy0,*i0);
+        flag = FLAG_ROW(ctx,ctx->flag,i);
+        flag0 = (*i0 < 0)? NULL:FLAG_ROW(ctx,ctx->flag0,*i0);
+        for(j=0,py1=DATA_ROW(ctx,ctx->dy1,i) ; j<ctx->ntype_record[i] ; j++,py1++){
             if( py1->order >= 0 ){       /*** if the numerical data field is non-blank ***/
-                if(*i0 < 0 || dy0[*i0][j].order == -1){
+                if(*i0 < 0 || py0[j].order == -1){
                     /**** initialize the data arc ****/
-                    py1->order = 0; p_buff += sprintf(p_buff,"%d&",ARC_ORDER);
+                    py1->order = 0; ctx->p_buff += sprintf(ctx->p_buff,"%d&",ARC_ORDER);
                 }else{
-                    take_diff(py1,&(dy0[*i0][j]));
+                    take_diff(py1,&py0[j]);
                     if(labs( py1->u[py1->order]) > 100000){
                         /**** initialization of the arc for large cycle slip  ****/
-                        py1->order = 0; p_buff += sprintf(p_buff,"%d&",ARC_ORDER);
+                        py1->order = 0; ctx->p_buff += sprintf(ctx->p_buff,"%d&",ARC_ORDER);
                     }
                 }
-                putdiff(py1->u[py1->order],py1->l[py1->order]);
-            }else if(*i0 >= 0 && rinex_version == 2){
+                putdiff(ctx,py1->u[py1->order],py1->l[py1->order]);
+            }else if(*i0 >= 0 && ctx->rinex_version == 2){
                 /**** CRINEX1 (RINEX2) initialize flags for blank field, not put '&' ****/
-                flag0[*i0][j*2] = flag0[*i0][j*2+1] = ' ';
+                flag0[j*2] = flag0[j*2+1] = ' ';
             }
-            if(j < ntype_record[i]-1) *p_buff++ = ' ';   /** ' ' :field separator **/
+            if(j < ctx->ntype_record[i]-1) *ctx->p_buff++ = ' ';   /** ' ' :field separator **/
         }
-        *(p_buff++) = ' ';  /* write field separator */
+        *(ctx->p_buff++) = ' ';  /* write field separator */
         if(*i0 < 0){             /* if new satellite initialize all LLI & SN flags */
-            if(rinex_version == 2){
-                p_buff = strdiff("",    flag[i],p_buff);
+            if(ctx->rinex_version == 2){
+                ctx->p_buff = strdiff("",    flag,ctx->p_buff);
             }else{          /*  replace space with '&' for CRINEX3(RINEX3)  */
-                for(p=flag[i]; *p != '\0' ; p++) *p_buff++ = (*p == ' ')? '&':*p;
-                *p_buff++ = '\n'; *p_buff = '\0';
+                for(p=flag; *p != '\0' ; p++) *ctx->p_buff++ = (*p == ' ')? '&':*p;
+                *ctx->p_buff++ = '\n'; *ctx->p_buff = '\0';
             }
         }else{
-            p_buff = strdiff(flag0[*i0],flag[i],p_buff);
+            ctx->p_buff = strdiff(flag0,flag,ctx->p_buff);
         }
     }
 }
 /*---------------------------------------------------------------------*/
-char *strdiff(char *s1, char *s2, char *ds){
+static char *strdiff(char *s1, char *s2, char *ds){
 /********************************************************************/
 /**   copy only the difference of string s2 from string s1         **/
 /**   '&' is marked when some character changed to a space         **/
 /**   trailing blank is eliminated and '/n' is added               **/
 /********************************************************************/
-    for(; *s1 != '\0'  && *s2 != '\0' ; s2++){
-        if(*s2 == *(s1++))
-            *ds++ = ' ';
-        else if(*s2 == ' ')
-            *ds++ = '&';
-        else
-            *ds++ = *s2;
-    }
-    strcpy(ds,s1);
-    for(;*ds;ds++){ if(*ds != ' ') *ds = '&'; }
-    while(*s2) *ds++ = *s2++;
+    size_t i,n,n1,n2;
+
+    n1 = strlen(s1);
+    n2 = strlen(s2);
+    n = (n1 < n2)? n1:n2;
+    for(i=0 ; i<n ; ){
+        if(n-i >= 8 && memcmp(s1+i,s2+i,8) == 0){     /*** skip unchanged parts 8 characters at once ***/
+            memset(ds+i,' ',8);
+            i += 8;
+        }else{
+            ds[i] = (s2[i] == s1[i])? ' ' : (s2[i] == ' ')? '&' : s2[i];
+            i++;
+        }
+    }
+    ds += n;
+    for(i=n ; i<n1 ; i++) *ds++ = (s1[i] == ' ')? ' ':'&';
+    memcpy(ds,s2+n,n2-n);
+    ds += n2-n;
 
     for(ds-- ; *ds == ' ' ; ds--);    /*** find pointer of last non-space character ***/
     *++ds = '\n'; *++ds = '\0';       /*** chop spaces at the end of the line ***/
     return ds;
 }
 /*---------------------------------------------------------------------*/
-int  ggetline(data_format *py1, char *flag, char *sat_id, int *ntype_rec){
+static int  ggetline(rnx2crx_ctx *ctx, data_format *py1, char *flag, char *sat_id, int *ntype_rec){
 /**** read data line for one satellite and       ****/
 /**** set data difference and flags to variables ****/
     char line[MAXCLM],*p,*pmax,*p_1st_rec;
     int i,j,nfield,max_field;
 
-    if( read_chk_line(line) ) return 1;
-    if(rinex_version == 2 ) {             /** for RINEX2 **/
+    *line = '\0';   /* nothing to show in the error message at EOF */
+    if( read_chk_line(ctx,line) ) return 1;
+    if(ctx->rinex_version == 2 ) {             /** for RINEX2 **/
         max_field = 5;                             /** maximum data types in one line **/
-        *ntype_rec = ntype;                        /** # of data types for the satellite **/
+        *ntype_rec = ctx->ntype;                   /** # of data types for the satellite **/
         p_1st_rec = line;                          /** pointer to the start of the first record **/
     }else{                                /** for RINEX3 **/
         strncpy(sat_id,line,C3);                   /** put satellite ID to the list of satellites **/
-        max_field = *ntype_rec = ntype_gnss[(unsigned int)line[0]];  /*** # of data types for the GNSS system ***/
+        max_field = *ntype_rec = ctx->ntype_gnss[(unsigned char)line[0]];  /*** # of data types for the GNSS system ***/
         if(max_field<0) {
-           if( ! skip_strange_epoch ) error_exit(21,line);
-           fprintf(stderr,"WARNING at line %ld. : GNSS type '%c' is not defined in the header. ... skip\n",nl_count,(unsigned int)line[0]);
+           if( ! ctx->skip_strange_epoch ) error_exit(ctx,21,line);
+           rnx_eprintf(ctx->io,"WARNING at line %ld. : GNSS type '%c' is not defined in the header. ... skip\n",ctx->nl_count,(unsigned int)line[0]);
            return 1;
         }
         p_1st_rec = line+3;
@@ -639,8 +761,8 @@ int  ggetline(data_format *py1, char *flag, char *sat_id, int *ntype_rec){
         }else{
 	    for(*p = ' ' ; p > pmax && *p == ' ' ; p--){};
             if(p > pmax) {
-                if( ! skip_strange_epoch ) error_exit(9,line);
-                fprintf(stderr,"WARNING: mismatch of number of the data types at line %ld. ... skip\n",nl_count);
+                if( ! ctx->skip_strange_epoch ) error_exit(ctx,9,line);
+                rnx_eprintf(ctx->io,"WARNING: mismatch of number of the data types at line %ld. ... skip\n",ctx->nl_count);
                 return 1;
             }
         }
@@ -650,55 +772,67 @@ int  ggetline(data_format *py1, char *flag, char *sat_id, int *ntype_rec){
             if( *(p+10) == '.' ){
                 *flag++ = *(p+14);
                 *flag++ = *(p+15);
-                *(p+14) = '\0';
                 read_value(p,&(py1->u[0]),&(py1->l[0]));
                 py1->order = 0;
             }else if( strncmp(p,"              ",C14) == 0 ){
-                if( rinex_version == 2 && strncmp((p+14),"  ",C2) != 0 ) error_exit(20,line);
+                if( ctx->rinex_version == 2 && strncmp((p+14),"  ",C2) != 0 ) error_exit(ctx,20,line);
                 *flag++ = *(p+14);
                 *flag++ = *(p+15);
                 py1->order = -1;
             }else{
-                if( ! skip_strange_epoch ) error_exit(10,p);
-                fprintf(stderr,"WARNING: abnormal data field at line %ld....skip\n",nl_count);
+                if( ! ctx->skip_strange_epoch ) error_exit(ctx,10,p);
+                rnx_eprintf(ctx->io,"WARNING: abnormal data field at line %ld....skip\n",ctx->nl_count);
                 return 1;
             }
         }
         if(i+max_field < *ntype_rec){
-            if( read_chk_line(line) ) return 1;   /* read continuation line */
+            if( read_chk_line(ctx,line) ) return 1;   /* read continuation line */
         }
     }
     *flag = '\0';
     return 0;
 }
 /*---------------------------------------------------------------------*/
-void read_value(char *p, long *pu, long *pl){
+static void read_value(const char *p, long *pu, int *pl){
 /**** divide the data into lower 5 digits and upper digits     ****/
-/**** input p :  pointer to one record (14 characters + '\0')  ****/
+/**** input p :  pointer to one record (14 characters)         ****/
 /**** output  *pu, *pl: upper and lower digits the data        ****/
+/**** The lower digits are taken from the columns 9-10 and     ****/
+/**** 12-14, ex. 123.456 -> 23456,  -.345 -> -345,             ****/
+/****            -12.345 -> 12345, -1.234 -> -1234,            ****/
+/**** and the upper digits from the columns 1-8 if any.        ****/
+    char low[5];
 
-    char *p7,*p8,*p9;
-    p7 = p +7;
-    p8 = p7+1;
-    p9 = p8+1;
+    low[0] = p[8];
+    low[1] = p[9];
+    low[2] = p[11];
+    low[3] = p[12];
+    low[4] = p[13];
+    *pl = (int)parse_long(low,low+5);
 
-    *(p9+1) = *p9;            /* shift two digits: ex. 123.456 -> 1223456,  -.345 ->   -345 */
-    *p9 = *p8;                /*                       -12.345 -> -112345, -1.234 -> --1234 */
-    *pl = atol(p9);           /*                         0.123 ->  . 0123, -0.123 -> --0123 */
-    
-    if(*p7 == ' '){
+    if(p[7] == ' '){
         *pu = 0;
-    }else if(*p7 == '-'){
+    }else if(p[7] == '-'){
         *pu = 0;
         *pl = -*pl;
     }else{
-        *p8 = '.';
-        *pu = atol(p);
+        *pu = parse_long(p,p+8);
         if(*pu < 0) *pl = -*pl;
     }
 }
 /*---------------------------------------------------------------------*/
-void take_diff(data_format *py1, data_format *py0){
+static long parse_long(const char *s, const char *end){
+/**** same as atol() for the characters from s to end ****/
+    long v = 0;
+    int neg = 0;
+
+    while(s < end && isspace((unsigned char)*s)) s++;
+    if(s < end && (*s == '-' || *s == '+')) neg = (*s++ == '-');
+    for( ; s < end && *s >= '0' && *s <= '9' ; s++) v = v*10 + (*s-'0');
+    return neg ? -v:v;
+}
+/*---------------------------------------------------------------------*/
+static void take_diff(data_format *py1, data_format *py0){
     int k;
 
     py1->order = py0->order;
@@ -711,7 +845,7 @@ void take_diff(data_format *py1, data_format *py0){
     }
 }
 /*---------------------------------------------------------------------*/
-void putdiff(long dddu, long dddl){
+static void putdiff(rnx2crx_ctx *ctx, long dddu, long dddl){
 
     dddu += dddl/100000 ; dddl %= 100000;
     if(dddu<0 && dddl>0){
@@ -721,13 +855,14 @@ void putdiff(long dddu, long dddl){
     }
 
     if(dddu == 0){
-        p_buff += sprintf(p_buff,"%ld",dddl);
+        ctx->p_buff = put_number(ctx->p_buff,dddl,1);
     }else{
-        p_buff += sprintf(p_buff,"%ld%5.5ld",dddu,labs(dddl));
+        ctx->p_buff = put_number(ctx->p_buff,dddu,1);
+        ctx->p_buff = put_number(ctx->p_buff,labs(dddl),5);
     }
 }
 /*---------------------------------------------------------------------*/
-void put_clock(long du, long dl, int c_order){
+static void put_clock(rnx2crx_ctx *ctx, long du, long dl, int c_order){
 /***********************************/
 /****  output clock diff. data  ****/
 /***********************************/
@@ -737,28 +872,54 @@ void put_clock(long du, long dl, int c_order){
     }else if(du>0 && dl<0){
         du-- ; dl += 100000000;
     }
-    if(c_order == 0) p_buff += sprintf(p_buff,"%d&",ARC_ORDER);
+    if(c_order == 0) ctx->p_buff += sprintf(ctx->p_buff,"%d&",ARC_ORDER);
     if(du == 0){
-        p_buff += sprintf(p_buff,"%ld\n",dl);
+        ctx->p_buff = put_number(ctx->p_buff,dl,1);
     }else{
-        p_buff += sprintf(p_buff,"%ld%8.8ld\n",du,labs(dl));
+        ctx->p_buff = put_number(ctx->p_buff,du,1);
+        ctx->p_buff = put_number(ctx->p_buff,labs(dl),8);
+    }
+    *ctx->p_buff++ = '\n';
+    *ctx->p_buff = '\0';
+}
+/*---------------------------------------------------------------------*/
+static char *put_number(char *p, long v, int n){
+/**** write v with at least n digits as sprintf("%.*ld",n,v) ****/
+/**** and return the end of the output (not terminated)      ****/
+    char tmp[24],*end = tmp+sizeof(tmp),*q = end;
+    unsigned long a = (v < 0)? 0UL-(unsigned long)v : (unsigned long)v;
+
+    while(a >= 100){
+        q -= 2;
+        memcpy(q,&digit_pairs[2*(a%100)],2);
+        a /= 100;
+    }
+    if(a >= 10){
+        q -= 2;
+        memcpy(q,&digit_pairs[2*a],2);
+    }else if(a > 0 || q == end){
+        *--q = (char)('0'+a);
     }
+    while(q > end-n) *--q = '0';
+    if(v < 0) *p++ = '-';
+    memcpy(p,q,end-q);
+    return p+(end-q);
 }
 /*---------------------------------------------------------------------*/
-int  read_chk_line(char *line){
+static int  read_chk_line(rnx2crx_ctx *ctx, char *line){
     char *p;
 /***************************************/
 /* Read and check one line.            */
 /* The end of the line should be '\n'. */
 /***************************************/
-    nl_count++;
-    if( fgets(line,MAXCLM,stdin) == NULL ) error_exit(11,line);
+    ctx->nl_count++;
+    if( rnx_gets(ctx->io,line,MAXCLM) == NULL ) error_exit(ctx,11,line);
     if( (p = strchr(line,'\n')) == NULL) {
-        if( fgetc(stdin) == EOF ) {
-            error_exit(11,line);
+        if( rnx_getc(ctx->io) == EOF ) {
+            error_exit(ctx,11,line);
         }else{
-            if( ! skip_strange_epoch ) error_exit(12,line);
-            fprintf(stderr,"WARNING: null character is found or the line is too long (>%d) at line %ld.\n",MAXCLM,nl_count);
+            if( ! ctx->skip_strange_epoch ) error_exit(ctx,12,line);
+            rnx_eprintf(ctx->io,"WARNING: null character is found or the line is too long (>%d) at line %ld.\n",MAXCLM,ctx->nl_count);
             return 1;
         }
     }
@@ -767,9 +928,186 @@ int  read_chk_line(char *line){
     return 0;
 }
 /*---------------------------------------------------------------------*/
-void error_exit(int error_no, char *string){
+static void error_exit(rnx2crx_ctx *ctx, int error_no, char *string){
+    rnx_io *io = ctx->io;
+    long nl_count = ctx->nl_count;
+
+    if(error_no == 6 ){
+        rnx_eprintf(io,"ERROR when reading line %ld.\n",nl_count);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 7 ){
+        rnx_eprintf(io,"ERROR at line %ld: invalid format for clock offset.\n",nl_count);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 8 ){
+        rnx_eprintf(io,"ERROR at line %ld : number of satellites exceed the maximum(%d).\n",nl_count,MAXSAT);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 9 ){
+        rnx_eprintf(io,"ERROR at line %ld : mismatch of number of the data types.\n",nl_count);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 10){
+        rnx_eprintf(io,"ERROR at line %ld : abnormal data field.\n",nl_count);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 11){
+        rnx_eprintf(io,"ERROR : The RINEX file seems to be truncated in the middle.\n");
+        rnx_eprintf(io,"        The conversion is interrupted after reading line %ld :\n",nl_count);
+        rnx_eprintf(io,"        start>%s<end\n",string);
+    }
+    if(error_no == 12 ){
+        rnx_eprintf(io,"ERROR at line %ld. : null character is found or the line is too long (>%d).\n",nl_count,MAXCLM);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 13 ){
+        rnx_eprintf(io,"ERROR at line %ld. : Duplicated satellite in one epoch.\n",nl_count);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 15 ){
+        rnx_eprintf(io,"The first line is :\n%s\n\n",string);
+        rnx_eprintf(io,"ERROR : The file format is not valid. This program is applicable\n");
+        rnx_eprintf(io,"        only to RINEX Version 2/3/4 Observation file.\n");
+    }
+    if(error_no == 16 ){
+        rnx_eprintf(io,"ERROR at line %ld. : Number of data types exceed MAXTYPE(%d).\n",nl_count,MAXTYPE);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 20 ){
+        rnx_eprintf(io,"ERROR at line %ld. : data is blank but there is flag.\n",nl_count);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 21 ){
+        rnx_eprintf(io,"ERROR at line %ld. : GNSS type '%c' is not defined in the header.\n",nl_count,(unsigned int)string[0]);
+        rnx_eprintf(io,"     start>%s<end\n",string);
+    }
+    if(error_no == 22 ){
+        rnx_eprintf(io,"ERROR at line %ld. : %s.\n",nl_count,string);
+    }
+    rnx_exit(io,EXIT_FAILURE);
+}
+/*---------------------------------------------------------------------*/
+static void no_error_exit(rnx2crx_ctx *ctx) {
+    rnx_exit(ctx->io,ctx->exit_status);
+}
+
+#ifndef RNXCMP_LIBRARY
+/***********************************************************************/
+/*  command line program                                               */
+/***********************************************************************/
+static int  delete_if_no_error = 0; /* default : not delete */
+static int  n_infile = 0;           /* number of input file (must be 0 or 1) */
+static char infile[MAXCLM];         /**** name of input file ****/
+
+static void parse_args(int argc, char *argv[], rnx2crx_options *options);
+static void usage_exit(int error_no, char *string);
+
+/*---------------------------------------------------------------------*/
+int main(int argc, char *argv[]){
+    rnx2crx_options options = {0,0};
+    rnx_io io;
+    int status;
+
+    parse_args(argc,argv,&options);
+    if(rnx_io_init(&io) != 0){
+        fprintf(stderr,"ERROR : memory allocation failed.\n");
+        exit(EXIT_FAILURE);
+    }
+    rnx_io_set_stdio(&io);
+    status = rnx2crx(&io,&options);
+    rnx_flush(&io);
+    rnx_io_free(&io);
+    fflush(stdout);
+    if (status == EXIT_SUCCESS && delete_if_no_error && n_infile == 1)  remove(infile);
+    return status;
+}
+/*---------------------------------------------------------------------*/
+static void parse_args(int argc, char *argv[], rnx2crx_options *options){
+    char *p,outfile[MAXCLM],*progname;
+    int force = 0, help = 0;
+    int nfout = 0;  /*** =0 default output file name ***/
+                    /*** =1 standard output          ***/
+    FILE *ifp;
+
+    progname = argv[0];
+    argc--;argv++;
+    for(;argc>0;argc--,argv++){
+        if((*argv)[0] != '-'){
+            strncpy(infile,*argv,C1*MAXCLM);
+            n_infile++;
+        }else if(strcmp(*argv,"-")   == 0){
+            nfout = 1;                 /* output to standard output */
+        }else if(strcmp(*argv,"-f")  == 0){
+            force = 1;                 /* overwrite if the output file exists */
+        }else if(strcmp(*argv,"-d")  == 0){
+            delete_if_no_error = 1;    /* delete the original file if 
+                                          no error in the conversion */
+        }else if(strcmp(*argv,"-s")  == 0){
+            options->skip_strange_epochs = 1;
+        }else if(strcmp(*argv,"-e")  == 0){
+            argc--;argv++;
+            sscanf(*argv,"%ld",&options->reinit_every_nth);
+        }else if(strcmp(*argv,"--systems") == 0 && argc > 1){
+            argc--;argv++;
+            options->projection.systems = *argv;
+        }else if(strcmp(*argv,"--satellites") == 0 && argc > 1){
+            argc--;argv++;
+            options->projection.satellites = *argv;
+        }else if(strcmp(*argv,"--obs_types") == 0 && argc > 1){
+            argc--;argv++;
+            options->projection.obs_types = *argv;
+        }else if(strcmp(*argv,"--date") == 0 && argc > 1){
+            argc--;argv++;
+            options->has_date = 1;
+            options->date = strtoll(*argv,NULL,10);
+        }else if(strcmp(*argv,"-h")  == 0){
+            help = 1;
+        }else{
+            help = 1;
+        }
+    }
+
+    if(strlen(infile) == MAXCLM) usage_exit(14,infile);
+    if(help == 1 || n_infile > 1 || n_infile < 0) usage_exit(1,progname);
+    if(n_infile == 0) return;  /*** stdin & stdout will be used if input file name is not given ***/
+
+    /***********************/
+    /*** open input file ***/
+    /***********************/
+    p = strrchr(infile,'.');
+    if(p == NULL || *(p+4) != '\0'
+                 || ( toupper(*(p+3)) != 'O'
+                      && strcmp(p+1,"RNX") != 0
+                      && strcmp(p+1,"rnx") != 0 )
+    ) usage_exit(4,p);
+
+    if((ifp=fopen(infile,"r")) == NULL) usage_exit(5,infile);
+
+    /************************/
+    /*** open output file ***/
+    /************************/
+    if(nfout == 0){
+        strcpy(outfile,infile);
+        p = strrchr(outfile,'.');
+        if     (*(p+3) == 'o') { *(p+3) = 'd';}
+        else if(*(p+3) == 'O') { *(p+3) = 'D';}
+        else if( strcmp(p+1,"rnx") == 0) { strcpy((p+1),"crx");}
+        else if( strcmp(p+1,"RNX") == 0) { strcpy((p+1),"CRX");}
+
+        if((freopen(outfile,"r",stdout)) != NULL && force == 0){
+            fprintf(stderr,"The file %s already exists. Overwrite?(n)",outfile);
+            if(getchar() != 'y') exit(EXIT_SUCCESS);
+        }
+        freopen(outfile,"w",stdout);
+    }
+    fclose(ifp);
+    freopen(infile,"r",stdin);
+}
+/*---------------------------------------------------------------------*/
+static void usage_exit(int error_no, char *string){
     if(error_no == 1 ){
-        fprintf(stderr,"Usage: %s [file] [-] [-f] [-e # of epochs] [-s] [-d] [-h]\n",string);
+        fprintf(stderr,"Usage: %s [file] [-] [-f] [-e # of epochs] [-s] [-d] [--systems GNSS] [--satellites PRNS] [--obs_types TYPES] [--date SECONDS] [-h]\n",string);
         fprintf(stderr,"    stdin and stdout are used if input file name is not given.\n");
         fprintf(stderr,"    -       : output to stdout\n");
         fprintf(stderr,"    -f      : force overwrite of output file\n");
@@ -783,12 +1121,16 @@ void error_exit(int error_no, char *string){
         fprintf(stderr,"    -d      : delete the input file if conversion finishes without errors\n");
         fprintf(stderr,"              (i.e. exit code = %d or %d).\n",EXIT_SUCCESS,EXIT_WARNING);
         fprintf(stderr,"              This option does nothing if stdin is used for the input.\n");
+        fprintf(stderr,"    --systems GNSS     : output only these GNSS systems, e.g. GE\n");
+        fprintf(stderr,"    --satellites PRNS  : output only these satellites, e.g. G01G05E11\n");
+        fprintf(stderr,"    --obs_types TYPES  : output only these observation types, e.g. \"C1C L1C\"\n");
+        fprintf(stderr,"    --date SECONDS     : time of the CRINEX PROG / DATE line in seconds since\n");
+        fprintf(stderr,"                         1970-01-01 UTC (default: $SOURCE_DATE_EPOCH or now)\n");
         fprintf(stderr,"    -h      : display this message\n\n");
         fprintf(stderr,"    exit code = %d (success)\n",EXIT_SUCCESS);
         fprintf(stderr,"              = %d (error)\n",  EXIT_FAILURE);
         fprintf(stderr,"              = %d (warning)\n",EXIT_WARNING);
         fprintf(stderr,"    [version : %s]\n",VERSION);
-        exit(EXIT_FAILURE);
     }
     if(error_no == 4 ){
         fprintf(stderr,"ERROR : invalid file name  %s\n",string);
@@ -796,82 +1138,14 @@ void error_exit(int error_no, char *string){
         fprintf(stderr,"To convert the files whose name is not fit to the above conventions,\n");
         fprintf(stderr,"use of this program as a filter is also possible. \n");
         fprintf(stderr,"    for example)  cat file.in | %s - > file.out\n",PROGNAME);
-        exit(EXIT_FAILURE);
     }
     if(error_no == 5 ){
         fprintf(stderr,"ERROR : can't open %s\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 6 ){
-        fprintf(stderr,"ERROR when reading line %ld.\n",nl_count);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 7 ){
-        fprintf(stderr,"ERROR at line %ld: invalid format for clock offset.\n",nl_count);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 8 ){
-        fprintf(stderr,"ERROR at line %ld : number of satellites exceed the maximum(%d).\n",nl_count,MAXSAT);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 9 ){
-        fprintf(stderr,"ERROR at line %ld : mismatch of number of the data types.\n",nl_count);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 10){
-        fprintf(stderr,"ERROR at line %ld : abnormal data field.\n",nl_count);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 11){
-        fprintf(stderr,"ERROR : The RINEX file seems to be truncated in the middle.\n");
-        fprintf(stderr,"        The conversion is interrupted after reading line %ld :\n",nl_count);
-        fprintf(stderr,"        start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 12 ){
-        fprintf(stderr,"ERROR at line %ld. : null character is found or the line is too long (>%d).\n",nl_count,MAXCLM);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 13 ){
-        fprintf(stderr,"ERROR at line %ld. : Duplicated satellite in one epoch.\n",nl_count);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
     }
     if(error_no == 14 ){
-        fprintf(stderr,"ERROR at line %ld. : Length of file name exceed MAXCLM(%d).\n",nl_count,MAXCLM);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 15 ){
-        fprintf(stderr,"The first line is :\n%s\n\n",string);
-        fprintf(stderr,"ERROR : The file format is not valid. This program is applicable\n");
-        fprintf(stderr,"        only to RINEX Version 2/3/4 Observation file.\n");
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 16 ){
-        fprintf(stderr,"ERROR at line %ld. : Number of data types exceed MAXTYPE(%d).\n",nl_count,MAXTYPE);
+        fprintf(stderr,"ERROR at line %ld. : Length of file name exceed MAXCLM(%d).\n",0L,MAXCLM);
         fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
     }
-    if(error_no == 20 ){
-        fprintf(stderr,"ERROR at line %ld. : data is blank but there is flag.\n",nl_count);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-    if(error_no == 21 ){
-        fprintf(stderr,"ERROR at line %ld. : GNSS type '%c' is not defined in the header.\n",nl_count,(unsigned int)string[0]);
-        fprintf(stderr,"     start>%s<end\n",string);
-        exit(EXIT_FAILURE);
-    }
-}
-/*---------------------------------------------------------------------*/
-void no_error_exit() {
-    if (delete_if_no_error && exit_status != 2 && n_infile == 1)  remove(infile);
-    exit(exit_status);
+    exit(EXIT_FAILURE);
 }
+#endif /* RNXCMP_LIBRARY */
@@ -0,0 +1,72 @@
+/****************************************************************************/
+/*     rnxcmp.h                                                             */
+/*                                                                          */
+/*     Library interface of RNX2CRX and CRX2RNX.                            */
+/*     Both functions return the exit code of the corresponding command    */
+/*     line program: 0 (success), 1 (error) or 2 (warning), or              */
+/*     RNX_EXIT_IO_ERROR if a read or write callback of io failed.          */
+/*     Error and warning messages are written to the message handler of io. */
+/****************************************************************************/
+#ifndef RNXCMP_H
+#define RNXCMP_H
+
+#include "rnxio.h"
+#include "rnxproj.h"
+
+/* Observation value of a blank data field in crx2rnx_epoch.values */
+#define RNX_MISSING_VALUE (-9223372036854775807LL - 1)
+
+/* One epoch of observation data decoded by crx2rnx.                          */
+/* The arrays are only valid for the duration of the callback.                */
+typedef struct crx2rnx_epoch{
+    const char *line;          /* recovered epoch line (without clock offset) */
+    int rinex_version;
+    int nsat;                  /* number of satellites */
+    const char *sat_list;      /* satellite IDs, 3 characters each */
+    const int *ntype;          /* number of data fields of each satellite */
+    const long long *values;   /* observations in units of 0.001, or RNX_MISSING_VALUE */
+    const char *flags;         /* LLI and signal strength of each observation */
+    int has_clock;             /* whether the receiver clock offset is given */
+    long long clock;           /* in units of 1e-12 s (RINEX 3) or 1e-9 s (RINEX 2) */
+} crx2rnx_epoch;
+
+/* Return 0 to continue and non-zero to stop the conversion with RNX_EXIT_IO_ERROR. */
+typedef int (*crx2rnx_epoch_fn)(void *opaque, const crx2rnx_epoch *epoch);
+
+typedef struct crx2rnx_options{
+    int skip_strange_epochs;  /* -s */
+    int output_overflow;      /* --output_overflow */
+    /* If set, the epochs with flag 0 or 1 are passed to epoch_fn in decoded */
+    /* form instead of being written out. The header, event records and     */
+    /* comments are still written to io, which is flushed before each call.  */
+    crx2rnx_epoch_fn epoch_fn;
+    void *epoch_opaque;
+    /* Epoch selection. Only the records with start <= time < end are output */
+    /* if has_start / has_end are set and, if interval > 0, only the epochs   */
+    /* with flag 0 or 1 whose time is a multiple of interval. Event records   */
+    /* without a time go with the preceding record. The other epochs are      */
+    /* decoded without being formatted and the conversion stops at the first  */
+    /* record at or after end. Times are in units of 1e-7 s since 1970-01-01  */
+    /* in the time system of the file.                                        */
+    int has_start, has_end;
+    long long start, end, interval;
+    /* Systems, satellites and observation types to output (see rnxproj.h). */
+    /* Not applied to the epochs passed to epoch_fn.                        */
+    rnx_projection projection;
+} crx2rnx_options;
+
+typedef struct rnx2crx_options{
+    int skip_strange_epochs;  /* -s */
+    long reinit_every_nth;    /* -e (0: never) */
+    /* Systems, satellites and observation types to output (see rnxproj.h). */
+    rnx_projection projection;
+    /* Time of the CRINEX PROG / DATE line in seconds since 1970-01-01 UTC  */
+    /* if has_date is set, otherwise $SOURCE_DATE_EPOCH or the current time. */
+    int has_date;
+    long long date;
+} rnx2crx_options;
+
+int crx2rnx(rnx_io *io, const crx2rnx_options *options);
+int rnx2crx(rnx_io *io, const rnx2crx_options *options);
+
+#endif /* RNXCMP_H */
@@ -0,0 +1,192 @@
+/****************************************************************************/
+/*     rnxio.c                                                              */
+/*                                                                          */
+/*     Buffered line I/O shared by RNX2CRX and CRX2RNX. See rnxio.h.        */
+/****************************************************************************/
+
+#include <stdarg.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "rnxio.h"
+
+/*---------------------------------------------------------------------*/
+int rnx_io_init(rnx_io *io){
+    memset(io,0,sizeof(rnx_io));
+    io->in_buf  = malloc(RNX_IN_BUFF_SIZE);
+    io->out_buf = malloc(RNX_OUT_BUFF_SIZE);
+    if(io->in_buf == NULL || io->out_buf == NULL){
+        rnx_io_free(io);
+        return 1;
+    }
+    io->in_size  = RNX_IN_BUFF_SIZE;
+    io->in_owned = 1;
+    io->out_size = RNX_OUT_BUFF_SIZE;
+    return 0;
+}
+/*---------------------------------------------------------------------*/
+void rnx_io_set_input_buffer(rnx_io *io, const char *buf, size_t size){
+    if(io->in_owned) free(io->in_buf);
+    io->in_owned = 0;
+    io->in_buf  = (char *)buf;
+    io->in_size = io->in_len = size;
+    io->in_pos  = 0;
+    io->read = NULL;
+}
+/*---------------------------------------------------------------------*/
+void rnx_io_free(rnx_io *io){
+    if(io->in_owned) free(io->in_buf);
+    free(io->out_buf);
+    io->in_buf = io->out_buf = NULL;
+    io->in_owned = 0;
+}
+/*---------------------------------------------------------------------*/
+static int fill(rnx_io *io){
+/**** read more input into the buffer. return 0 at the end of input ****/
+    size_t n;
+
+    if(io->read == NULL){
+        io->in_eof = 1;
+        return 0;
+    }
+    if(io->flush_on_read && rnx_flush(io) != 0) rnx_exit(io,RNX_EXIT_IO_ERROR);
+    n = io->read(io->read_opaque,io->in_buf,io->in_size);
+    if(n == (size_t)-1) rnx_exit(io,RNX_EXIT_IO_ERROR);
+    io->in_pos = 0;
+    io->in_len = n;
+    if(n == 0){
+        io->in_eof = 1;
+        return 0;
+    }
+    return 1;
+}
+/*---------------------------------------------------------------------*/
+static size_t read_stdin(void *opaque, char *buf, size_t size){
+    size_t n = fread(buf,1,size,stdin);
+    return (n == 0 && ferror(stdin)) ? (size_t)-1 : n;
+}
+static int write_stdout(void *opaque, const char *buf, size_t size){
+    return fwrite(buf,1,size,stdout) != size;
+}
+static int write_stderr(void *opaque, const char *buf, size_t size){
+    return fwrite(buf,1,size,stderr) != size;
+}
+void rnx_io_set_stdio(rnx_io *io){
+    io->read = read_stdin;
+    io->write = write_stdout;
+    io->err_write = write_stderr;
+}
+/*---------------------------------------------------------------------*/
+char *rnx_gets(rnx_io *io, char *s, int n){
+    char *p = s, *q;
+    size_t avail, len;
+
+    if(n <= 0) return NULL;
+    n--;
+    while(n > 0){
+        if(io->in_pos == io->in_len && ! fill(io)) break;
+        avail = io->in_len - io->in_pos;
+        len = (avail < (size_t)n) ? avail : (size_t)n;
+        q = memchr(io->in_buf+io->in_pos,'\n',len);
+        if(q != NULL) len = q - (io->in_buf+io->in_pos) + 1;
+        memcpy(p,io->in_buf+io->in_pos,len);
+        io->in_pos += len;
+        p += len;
+        n -= (int)len;
+        if(q != NULL) break;
+    }
+    if(p == s) return NULL;
+    *p = '\0';
+    return s;
+}
+/*---------------------------------------------------------------------*/
+int rnx_getc(rnx_io *io){
+    if(io->in_pos == io->in_len && ! fill(io)) return EOF;
+    return (unsigned char)io->in_buf[io->in_pos++];
+}
+/*---------------------------------------------------------------------*/
+int rnx_eof(rnx_io *io){
+    return io->in_eof;
+}
+/*---------------------------------------------------------------------*/
+static void reserve(rnx_io *io, size_t n){
+/**** make room for n more bytes in the output buffer ****/
+    size_t size;
+    char *p;
+
+    if(io->out_len+n <= io->out_size) return;
+    if(io->write != NULL){
+        if(rnx_flush(io) != 0) rnx_exit(io,RNX_EXIT_IO_ERROR);
+        if(n <= io->out_size) return;
+    }
+    for(size=io->out_size*2; size < io->out_len+n; size*=2);
+    if((p = realloc(io->out_buf,size)) == NULL){
+        rnx_eprintf(io,"ERROR : memory allocation failed.\n");
+        rnx_exit(io,EXIT_FAILURE);
+    }
+    io->out_buf = p;
+    io->out_size = size;
+}
+/*---------------------------------------------------------------------*/
+void rnx_write(rnx_io *io, const char *s, size_t n){
+    reserve(io,n);
+    memcpy(io->out_buf+io->out_len,s,n);
+    io->out_len += n;
+}
+/*---------------------------------------------------------------------*/
+void rnx_puts(rnx_io *io, const char *s){
+    rnx_write(io,s,strlen(s));
+}
+/*---------------------------------------------------------------------*/
+void rnx_printf(rnx_io *io, const char *format, ...){
+    va_list ap;
+    int n;
+    size_t avail;
+
+    avail = io->out_size - io->out_len;
+    va_start(ap,format);
+    n = vsnprintf(io->out_buf+io->out_len,avail,format,ap);
+    va_end(ap);
+    if(n < 0) return;
+    if((size_t)n >= avail){
+        reserve(io,(size_t)n+1);
+        va_start(ap,format);
+        vsnprintf(io->out_buf+io->out_len,(size_t)n+1,format,ap);
+        va_end(ap);
+    }
+    io->out_len += n;
+}
+/*---------------------------------------------------------------------*/
+int rnx_flush(rnx_io *io){
+    size_t n = io->out_len;
+
+    if(io->write == NULL || n == 0) return 0;
+    io->out_len = 0;
+    return io->write(io->write_opaque,io->out_buf,n);
+}
+/*---------------------------------------------------------------------*/
+void rnx_eprintf(rnx_io *io, const char *format, ...){
+    va_list ap;
+    char msg[1024],*p = msg;
+    int n;
+
+    if(io->err_write == NULL) return;
+    va_start(ap,format);
+    n = vsnprintf(msg,sizeof(msg),format,ap);
+    va_end(ap);
+    if(n < 0) return;
+    if((size_t)n >= sizeof(msg)){
+        if((p = malloc((size_t)n+1)) == NULL) return;
+        va_start(ap,format);
+        vsnprintf(p,(size_t)n+1,format,ap);
+        va_end(ap);
+    }
+    io->err_write(io->err_opaque,p,(size_t)n);
+    if(p != msg) free(p);
+}
+/*---------------------------------------------------------------------*/
+void rnx_exit(rnx_io *io, int status){
+    io->exit_status = status;
+    longjmp(io->env,1);
+}
@@ -0,0 +1,78 @@
+/****************************************************************************/
+/*     rnxio.h                                                              */
+/*                                                                          */
+/*     Buffered line I/O shared by RNX2CRX and CRX2RNX.                     */
+/*                                                                          */
+/*     The conversion routines do not touch stdin/stdout/stderr directly.   */
+/*     Instead they read and write through an rnx_io object whose sources  */
+/*     and sinks are supplied by the caller. This allows the same code to   */
+/*     be used both by the command line programs and in-process (e.g. from  */
+/*     a Python extension module), where calling exit() is not an option.   */
+/*     Fatal errors and the end of the conversion are signalled by a        */
+/*     longjmp() back to the entry point of the conversion (rnx_exit()).    */
+/****************************************************************************/
+#ifndef RNXIO_H
+#define RNXIO_H
+
+#include <setjmp.h>
+#include <stddef.h>
+
+#define RNX_IN_BUFF_SIZE  65536
+#define RNX_OUT_BUFF_SIZE 65536
+
+/* exit status used when a read or write callback fails */
+#define RNX_EXIT_IO_ERROR (-1)
+
+/* Read up to size bytes into buf. Return the number of bytes read,           */
+/* 0 at the end of input or (size_t)-1 on errors.                             */
+typedef size_t (*rnx_read_fn)(void *opaque, char *buf, size_t size);
+/* Write size bytes from buf. Return 0 on success and non-zero on errors.     */
+typedef int (*rnx_write_fn)(void *opaque, const char *buf, size_t size);
+
+typedef struct rnx_io{
+    /**** input ****/
+    rnx_read_fn read;         /* NULL: the whole input is given in in_buf  */
+    void  *read_opaque;
+    char  *in_buf;
+    size_t in_size;           /* allocated size of in_buf */
+    size_t in_pos;            /* read position in in_buf */
+    size_t in_len;            /* number of valid bytes in in_buf */
+    int    in_eof;            /* the end of input has been reached (cf. feof()) */
+    int    in_owned;          /* in_buf was allocated by rnx_io_init() */
+    /**** output ****/
+    rnx_write_fn write;       /* NULL: accumulate all the output in out_buf */
+    void  *write_opaque;
+    char  *out_buf;
+    size_t out_size;          /* allocated size of out_buf */
+    size_t out_len;           /* number of bytes in out_buf */
+    int    flush_on_read;     /* flush the output before blocking for more input */
+    /**** diagnostic messages (stderr) ****/
+    rnx_write_fn err_write;   /* NULL: messages are discarded */
+    void  *err_opaque;
+    /**** termination ****/
+    jmp_buf env;
+    int    exit_status;
+} rnx_io;
+
+/* The input, output and message handlers must be set after rnx_io_init(). */
+/* rnx_io_set_input_buffer() can be used instead of a read callback for     */
+/* input that is already available in memory. No copy of it is made.       */
+int   rnx_io_init(rnx_io *io);
+void  rnx_io_set_input_buffer(rnx_io *io, const char *buf, size_t size);
+void  rnx_io_set_stdio(rnx_io *io);          /* stdin, stdout and stderr */
+void  rnx_io_free(rnx_io *io);
+
+char *rnx_gets(rnx_io *io, char *s, int n);  /* same semantics as fgets() */
+int   rnx_getc(rnx_io *io);                  /* same semantics as fgetc() */
+int   rnx_eof(rnx_io *io);                   /* same semantics as feof()  */
+
+void  rnx_write(rnx_io *io, const char *s, size_t n);
+void  rnx_puts(rnx_io *io, const char *s);   /* write s without adding '\n' */
+void  rnx_printf(rnx_io *io, const char *format, ...);
+int   rnx_flush(rnx_io *io);                 /* non-zero if writing failed */
+void  rnx_eprintf(rnx_io *io, const char *format, ...);
+
+/* terminate the conversion with the given exit status */
+void  rnx_exit(rnx_io *io, int status);
+
+#endif /* RNXIO_H */
@@ -0,0 +1,243 @@
+/****************************************************************************/
+/*     rnxproj.c                                                            */
+/*                                                                          */
+/*     Projection of the observation data shared by RNX2CRX and CRX2RNX.    */
+/*     See rnxproj.h.                                                       */
+/****************************************************************************/
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "rnxproj.h"
+
+static int  label_is(const char *line, const char *label);
+static int  system_selected(const rnx_proj *proj, int sys);
+static int  type_selected(const rnx_proj *proj, const char *code);
+static int  code_kept(const rnx_proj *proj, int sys, const char *code);
+static int  read_codes(rnx_proj *proj, const char *line);
+static int  put_record(rnx_proj *proj);
+static int  reserve(rnx_proj *proj, size_t size);
+static int  set_error(rnx_proj *proj, const char *message);
+
+/*---------------------------------------------------------------------*/
+int rnx_proj_init(rnx_proj *proj, const rnx_projection *spec, int rinex_version){
+    int i;
+
+    memset(proj,0,sizeof(rnx_proj));
+    proj->spec = spec;
+    proj->active = spec != NULL
+                   && (spec->systems != NULL || spec->satellites != NULL || spec->obs_types != NULL);
+    proj->rinex_version = rinex_version;
+    for(i=0;i<=UCHAR_MAX;i++) proj->nkeep[i] = -1;
+    proj->keep_line = 1;
+    return reserve(proj,256);
+}
+/*---------------------------------------------------------------------*/
+void rnx_proj_free(rnx_proj *proj){
+    int i;
+
+    for(i=0;i<=UCHAR_MAX;i++){
+        free(proj->codes[i]);
+        free(proj->keep[i]);
+        proj->codes[i] = proj->keep[i] = NULL;
+    }
+    free(proj->out);
+    proj->out = NULL;
+    proj->out_size = 0;
+}
+/*---------------------------------------------------------------------*/
+int rnx_proj_header(rnx_proj *proj, const char *line){
+    if(!proj->active) return 0;
+    *proj->out = '\0';
+
+    if( (proj->rinex_version == 2 && label_is(line,"# / TYPES OF OBSERV"))
+     || (proj->rinex_version >= 3 && label_is(line,"SYS / # / OBS TYPES")) ){
+        switch(read_codes(proj,line)){
+            case 0 : break;
+            case 1 : return 1;                              /** stray continuation line **/
+            default: return -1;
+        }
+        if(proj->ncode < proj->ntype[proj->sys]) return 1;  /** continued on the next line **/
+        return put_record(proj) == 0 ? 1 : -1;
+    }
+    if(label_is(line,"# OF SATELLITES") || label_is(line,"PRN / # OF OBS")) return 1;
+    if(proj->rinex_version >= 3 && label_is(line,"SYS / ")){
+        /*** records of the dropped systems and observation types, ***/
+        /*** continued on the lines starting with a blank           ***/
+        if(line[0] != ' '){
+            proj->keep_line = system_selected(proj,(unsigned char)line[0])
+                              && proj->nkeep[(unsigned char)line[0]] != 0;
+            if(proj->keep_line && label_is(line,"SYS / PHASE SHIFT") && strlen(line) >= 5)
+                proj->keep_line = code_kept(proj,(unsigned char)line[0],line+2);
+        }
+        return proj->keep_line ? 0 : 1;
+    }
+    return 0;
+}
+/*---------------------------------------------------------------------*/
+int rnx_proj_sat(const rnx_proj *proj, const char *sat){
+    char id[4];
+    const char *p;
+
+    if(!proj->active) return 1;
+    /*** blank means GPS in RINEX 2 ***/
+    id[0] = (sat[0] == ' ')? 'G':sat[0];
+    id[1] = (sat[1] == ' ')? '0':sat[1];
+    id[2] = sat[2];
+    id[3] = '\0';
+    if(!system_selected(proj,(unsigned char)id[0])) return 0;
+    if(proj->spec->satellites != NULL){
+        for(p=proj->spec->satellites ; p[0] && p[1] && p[2] ; p+=3){
+            if(strncmp(p,id,3) == 0) break;
+        }
+        if(!(p[0] && p[1] && p[2])) return 0;
+    }
+    if(proj->rinex_version >= 3 && proj->nkeep[(unsigned char)sat[0]] == 0) return 0;
+    return 1;
+}
+/*---------------------------------------------------------------------*/
+int rnx_proj_types(const rnx_proj *proj, int sys, const char **keep){
+    int i = (proj->rinex_version == 2)? 0:(unsigned char)sys;
+
+    if(!proj->active || proj->nkeep[i] < 0 || proj->nkeep[i] == proj->ntype[i]){
+        *keep = NULL;
+        return -1;
+    }
+    *keep = proj->keep[i];
+    return proj->nkeep[i];
+}
+/*---------------------------------------------------------------------*/
+static int  label_is(const char *line, const char *label){
+    return strlen(line) > 60 && strncmp(line+60,label,strlen(label)) == 0;
+}
+/*---------------------------------------------------------------------*/
+static int  system_selected(const rnx_proj *proj, int sys){
+    /*** sys = 0: the observation types of RINEX 2, common to all systems ***/
+    return sys == 0 || proj->spec->systems == NULL || strchr(proj->spec->systems,sys) != NULL;
+}
+/*---------------------------------------------------------------------*/
+static int  type_selected(const rnx_proj *proj, const char *code){
+    const char *p;
+    size_t n = strlen(code);
+
+    if(proj->spec->obs_types == NULL) return 1;
+    if(n == 0) return 0;
+    for(p=proj->spec->obs_types ; (p = strstr(p,code)) != NULL ; p++){
+        if( (p == proj->spec->obs_types || *(p-1) == ' ') && (p[n] == ' ' || p[n] == '\0') ) return 1;
+    }
+    return 0;
+}
+/*---------------------------------------------------------------------*/
+static int  code_kept(const rnx_proj *proj, int sys, const char *code){
+    /*** codes of unknown types are kept ***/
+    int i;
+
+    if(proj->codes[sys] == NULL) return 1;
+    for(i=0;i<proj->ntype[sys];i++){
+        if(strncmp(proj->codes[sys]+4*i,code,3) == 0) return proj->keep[sys][i];
+    }
+    return 1;
+}
+/*---------------------------------------------------------------------*/
+static int  read_codes(rnx_proj *proj, const char *line){
+/**** collect the codes of an observation type record        ****/
+/****   RINEX 2   : I6,9(4X,A2), continuation lines 6X,9(4X,A2)  ****/
+/****   RINEX 3/4 : A1,2X,I3,13(1X,A3), continuation 6X,13(1X,A3) ****/
+/**** returns 1 for a continuation line of no record               ****/
+    char buf[81],*code;
+    int  i,n,sys,first,step,len,per_line,is_new;
+
+    snprintf(buf,sizeof(buf),"%-80.80s",line);
+    if(proj->rinex_version == 2){
+        first = 10; step = 6; len = 2; per_line = 9;
+        is_new = buf[5] != ' ';
+        sys = 0;
+        n = atoi(buf);
+    }else{
+        first = 7; step = 4; len = 3; per_line = 13;
+        is_new = buf[0] != ' ';
+        sys = (unsigned char)buf[0];
+        n = atoi(buf+3);
+    }
+    if(is_new){
+        if(n < 0) n = 0;
+        free(proj->codes[sys]);
+        free(proj->keep[sys]);
+        proj->codes[sys] = malloc(4*(size_t)n+1);
+        proj->keep[sys] = malloc((size_t)n+1);
+        if(proj->codes[sys] == NULL || proj->keep[sys] == NULL){
+            proj->ntype[sys] = 0;
+            return set_error(proj,"memory allocation failed");
+        }
+        proj->sys = sys;
+        proj->ntype[sys] = n;
+        proj->ncode = 0;
+    }else if(proj->ncode >= proj->ntype[proj->sys]){
+        return 1;
+    }
+    for(i=0 ; i<per_line && proj->ncode < proj->ntype[proj->sys] ; i++,proj->ncode++){
+        code = proj->codes[proj->sys] + 4*proj->ncode;
+        memcpy(code,buf+first+step*i,len);
+        code[len] = '\0';
+        while(*code == ' ') memmove(code,code+1,len--);
+    }
+    return 0;
+}
+/*---------------------------------------------------------------------*/
+static int  put_record(rnx_proj *proj){
+/**** decide which types of the system are kept and write the record ****/
+    int  i,k,sys = proj->sys,per_line;
+    char *p,*top = NULL,*code;
+    const char *label;
+
+    proj->nkeep[sys] = 0;
+    for(i=0;i<proj->ntype[sys];i++){
+        code = proj->codes[sys] + 4*i;
+        proj->keep[sys][i] = system_selected(proj,sys) && type_selected(proj,code);
+        proj->nkeep[sys] += proj->keep[sys][i];
+    }
+    if(proj->nkeep[sys] == 0){
+        if(proj->rinex_version == 2) return set_error(proj,"none of the observation types is selected");
+        return 0;   /*** the whole system is left out ***/
+    }
+
+    if(proj->rinex_version == 2){
+        per_line = 9;
+        label = "# / TYPES OF OBSERV";
+    }else{
+        per_line = 13;
+        label = "SYS / # / OBS TYPES";
+    }
+    if(reserve(proj,(size_t)(proj->nkeep[sys]/per_line+1)*82+1) != 0) return -1;
+    for(i=0,k=0,p=proj->out ; i<proj->ntype[sys] ; i++){
+        if(!proj->keep[sys][i]) continue;
+        if(k%per_line == 0){
+            if(k > 0) p += sprintf(p,"%*s%s\n",(int)(60-(p-top)),"",label);
+            top = p;
+            if(k > 0)                           p += sprintf(p,"%6s","");
+            else if(proj->rinex_version == 2)   p += sprintf(p,"%6d",proj->nkeep[sys]);
+            else                                p += sprintf(p,"%c  %3d",sys,proj->nkeep[sys]);
+        }
+        code = proj->codes[sys] + 4*i;
+        p += (proj->rinex_version == 2)? sprintf(p,"    %2s",code):sprintf(p," %-3s",code);
+        k++;
+    }
+    sprintf(p,"%*s%s\n",(int)(60-(p-top)),"",label);
+    return 0;
+}
+/*---------------------------------------------------------------------*/
+static int  reserve(rnx_proj *proj, size_t size){
+    char *p;
+
+    if(size <= proj->out_size) return 0;
+    if((p = realloc(proj->out,size)) == NULL) return set_error(proj,"memory allocation failed");
+    proj->out = p;
+    proj->out_size = size;
+    return 0;
+}
+/*---------------------------------------------------------------------*/
+static int  set_error(rnx_proj *proj, const char *message){
+    if(proj->out_size > 0) snprintf(proj->out,proj->out_size,"%s",message);
+    return -1;
+}
@@ -0,0 +1,61 @@
+/****************************************************************************/
+/*     rnxproj.h                                                            */
+/*                                                                          */
+/*     Projection of the observation data shared by RNX2CRX and CRX2RNX.    */
+/*                                                                          */
+/*     Only the selected GNSS systems, satellites and observation types    */
+/*     are output. The observation type records of the header are          */
+/*     rewritten to match and the records that would become inconsistent  */
+/*     (# OF SATELLITES, PRN / # OF OBS and the SYS / ... records of the    */
+/*     dropped systems) are left out. The converters still read all the   */
+/*     data fields and ask rnx_proj_sat() and rnx_proj_types() which of    */
+/*     them to write.                                                       */
+/****************************************************************************/
+#ifndef RNXPROJ_H
+#define RNXPROJ_H
+
+#include <limits.h>
+#include <stddef.h>
+
+/* Selection of the data to output. NULL keeps everything.                   */
+typedef struct rnx_projection{
+    const char *systems;      /* GNSS systems, e.g. "GE"                         */
+    const char *satellites;   /* satellite IDs, 3 characters each, e.g. "G01E11" */
+    const char *obs_types;    /* observation codes separated by spaces,          */
+                              /* e.g. "C1C L1C" (RINEX 3/4) or "C1 L1" (RINEX 2)  */
+} rnx_projection;
+
+typedef struct rnx_proj{
+    const rnx_projection *spec;
+    int active;               /* whether anything is selected at all */
+    int rinex_version;
+    /* per GNSS system (index 0 for RINEX 2): the observation codes (4 bytes */
+    /* each), whether each of them is kept and the number of kept ones       */
+    char *codes[UCHAR_MAX+1];
+    char *keep[UCHAR_MAX+1];
+    int  ntype[UCHAR_MAX+1];
+    int  nkeep[UCHAR_MAX+1];  /* -1 until the observation types are defined */
+    /* observation type record being read */
+    int  sys, ncode;
+    /* whether the continuation lines of the last SYS / ... record are kept */
+    int  keep_line;
+    /* replacement of the header line, or an error message */
+    char  *out;
+    size_t out_size;
+} rnx_proj;
+
+/* Return 0 on success and 1 if the memory allocation failed.                */
+int  rnx_proj_init(rnx_proj *proj, const rnx_projection *spec, int rinex_version);
+void rnx_proj_free(rnx_proj *proj);
+/* Process one header line (without the line feed). Returns                  */
+/*    0 : output the line as it is,                                          */
+/*    1 : output proj->out instead, which holds zero or more complete lines, */
+/*   -1 : error, described by proj->out.                                     */
+int  rnx_proj_header(rnx_proj *proj, const char *line);
+/* Whether the data of a satellite (3 characters) is output.                 */
+int  rnx_proj_sat(const rnx_proj *proj, const char *sat);
+/* Number of the observation types of a GNSS system that are output and a    */
+/* flag for each of them in *keep, or -1 if all of them are output.          */
+int  rnx_proj_types(const rnx_proj *proj, int sys, const char **keep);
+
+#endif /* RNXPROJ_H */
@@ -4,8 +4,9 @@ from distutils import ccompiler
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
-from setuptools import setup
+from setuptools import Extension, setup
 from setuptools.command.build_clib import build_clib as _build_clib
+from setuptools.command.build_ext import build_ext as _build_ext
 
 
 class build_clib(_build_clib):
@@ -40,7 +41,15 @@ class build_clib(_build_clib):
             shutil.copy(f, "hatanaka/bin/")
 
 
-cmdclass = {"build_clib": build_clib}
+class build_ext(_build_ext):
+    def build_extensions(self):
+        # The "libraries" built by build_clib are the rnx2crx and crx2rnx executables,
+        # which must not be linked against the extension module.
+        self.compiler.set_libraries([])
+        super().build_extensions()
+
+
+cmdclass = {"build_clib": build_clib, "build_ext": build_ext}
 
 try:
     from wheel.bdist_wheel import bdist_wheel as _bdist_wheel
@@ -49,8 +58,6 @@ try:
     class bdist_wheel(_bdist_wheel):
         def get_tag(self):
             impl, abi_tag, plat_name = super().get_tag()
-            impl = "py3"
-            abi_tag = "none"
             if "linux" in plat_name:
                 plat_name = get_policy_name(POLICY_PRIORITY_HIGHEST)
             return impl, abi_tag, plat_name
@@ -59,10 +66,35 @@ try:
 except ImportError:
     pass
 
+rnxcmp_ext = Extension(
+    "hatanaka._rnxcmp",
+    sources=[
+        "hatanaka/_rnxcmp.c",
+        "rnxcmp/source/rnx2crx.c",
+        "rnxcmp/source/crx2rnx.c",
+        "rnxcmp/source/rnxio.c",
+        "rnxcmp/source/rnxproj.c",
+    ],
+    include_dirs=["rnxcmp/source"],
+    define_macros=[("RNXCMP_LIBRARY", None)],
+    # the executables are used as a fallback if the extension can't be built
+    optional=True,
+)
+
+lzw_ext = Extension(
+    "hatanaka._lzw",
+    sources=["hatanaka/_lzw.c"],
+    # ncompress is used as a fallback if the extension can't be built
+    optional=True,
+)
+
 setup(
     libraries=[
-        ("rnx2crx", {"sources": ["rnxcmp/source/rnx2crx.c"]}),
-        ("crx2rnx", {"sources": ["rnxcmp/source/crx2rnx.c"]}),
+        ("rnx2crx", {"sources": ["rnxcmp/source/rnx2crx.c", "rnxcmp/source/rnxio.c",
+                                 "rnxcmp/source/rnxproj.c"]}),
+        ("crx2rnx", {"sources": ["rnxcmp/source/crx2rnx.c", "rnxcmp/source/rnxio.c",
+                                 "rnxcmp/source/rnxproj.c"]}),
     ],
+    ext_modules=[rnxcmp_ext, lzw_ext],
     cmdclass=cmdclass,
 )